@@ -1,21 +1,146 @@
 # analysis_tools/constellation_viewer.py
+import time
+
 import pyqtgraph as pg
-from PyQt5.QtWidgets import QWidget, QVBoxLayout
+from PyQt5.QtCore import QRectF, QTimer
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QDoubleSpinBox, QCheckBox, QPushButton
+)
 import numpy as np
 
+from core.constellation import (
+    RECOVERY_ORDERS, DensityHistogram, normalize_power, recover_carrier, recover_timing
+)
+
+
 class ConstellationViewer(QWidget):
-    def __init__(self):
-        super().__init__()
+    """Constellation shown as a decaying density image.
+
+    Samples come either from update_constellation() or, when an IQTap is given,
+    from the live IQ history on a refresh timer. Rendering cost is one
+    bins x bins image per refresh regardless of how many samples arrived.
+    """
+
+    REFRESH_MS = 50
+
+    def __init__(self, tap=None, title="Constellation Diagram", parent=None):
+        super().__init__(parent)
+        self.tap = tap
+        self.histogram = DensityHistogram()
+        self.last_update = None
+        self.rate_window_start = time.perf_counter()
+        self.rate_window_points = 0
+        self.setWindowTitle(title)
+
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        self.plot_widget = pg.PlotWidget(title="Constellation Diagram")
-        self.plot_widget.setLabel('left', 'In-Phase')
-        self.plot_widget.setLabel('bottom', 'Quadrature')
+        controls = QHBoxLayout()
+        self.bins_combo = QComboBox()
+        self.bins_combo.addItems(['128', '256', '512'])
+        self.bins_combo.setCurrentText(str(self.histogram.bins))
+        self.bins_combo.currentTextChanged.connect(self.on_bins_changed)
+        controls.addWidget(QLabel("Bins:"))
+        controls.addWidget(self.bins_combo)
+
+        self.fade_spin = QDoubleSpinBox()
+        self.fade_spin.setRange(0.0, 60.0)
+        self.fade_spin.setSingleStep(0.1)
+        self.fade_spin.setValue(self.histogram.half_life)
+        self.fade_spin.setSuffix(" s")
+        self.fade_spin.setToolTip("Half-life of the density; 0 keeps everything")
+        self.fade_spin.valueChanged.connect(self.on_fade_changed)
+        controls.addWidget(QLabel("Fade:"))
+        controls.addWidget(self.fade_spin)
+
+        self.normalize_check = QCheckBox("Normalize")
+        self.normalize_check.setChecked(True)
+        controls.addWidget(self.normalize_check)
+
+        self.recovery_combo = QComboBox()
+        self.recovery_combo.addItems(['Off'] + list(RECOVERY_ORDERS))
+        self.recovery_combo.setToolTip("Carrier recovery for the selected modulation")
+        controls.addWidget(QLabel("Recovery:"))
+        controls.addWidget(self.recovery_combo)
+
+        self.symbol_rate_spin = QDoubleSpinBox()
+        self.symbol_rate_spin.setRange(0.0, 50000.0)
+        self.symbol_rate_spin.setDecimals(1)
+        self.symbol_rate_spin.setSuffix(" kSym/s")
+        self.symbol_rate_spin.setToolTip("Symbol rate for timing recovery; 0 shows every sample")
+        controls.addWidget(self.symbol_rate_spin)
+
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.clicked.connect(self.histogram.clear)
+        controls.addWidget(self.clear_button)
+        layout.addLayout(controls)
+
+        self.plot_widget = pg.PlotWidget(title=title)
+        self.plot_widget.setLabel('left', 'Quadrature')
+        self.plot_widget.setLabel('bottom', 'In-Phase')
+        self.plot_widget.setAspectLocked(True)
         layout.addWidget(self.plot_widget)
 
-        self.scatter = pg.ScatterPlotItem()
-        self.plot_widget.addItem(self.scatter)
+        self.image_item = pg.ImageItem()
+        self.image_item.setColorMap(pg.colormap.get('inferno'))
+        self.plot_widget.addItem(self.image_item)
+        self.set_image_rect()
+
+        self.rate_label = QLabel("")
+        layout.addWidget(self.rate_label)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        if self.tap is not None:
+            self.refresh_timer.start(self.REFRESH_MS)
+
+    def set_image_rect(self):
+        # The rect is applied relative to the image size, so an image must be present
+        self.image_item.setImage(self.histogram.image(), autoLevels=False, levels=(0.0, 1.0))
+        extent = self.histogram.extent
+        self.image_item.setRect(QRectF(-extent, -extent, 2 * extent, 2 * extent))
+
+    def on_bins_changed(self, bins_text):
+        self.histogram = DensityHistogram(int(bins_text), self.histogram.extent, self.fade_spin.value())
+        self.clear_button.clicked.disconnect()
+        self.clear_button.clicked.connect(self.histogram.clear)
+        self.set_image_rect()
+
+    def on_fade_changed(self, half_life):
+        self.histogram.half_life = half_life
+
+    def refresh(self):
+        # Pull whatever arrived since the last refresh from the live tap
+        self.update_constellation(self.tap.read())
 
     def update_constellation(self, data):
-        self.scatter.setData(x=data.real, y=data.imag)
+        now = time.perf_counter()
+        elapsed = now - self.last_update if self.last_update is not None else 0.0
+        self.last_update = now
+
+        points = self.prepare(np.asarray(data, dtype=np.complex64))
+        self.histogram.accumulate(points, elapsed)
+        self.image_item.setImage(self.histogram.image(), autoLevels=False, levels=(0.0, 1.0))
+
+        self.rate_window_points += len(points)
+        if now - self.rate_window_start >= 1.0:
+            rate = self.rate_window_points / (now - self.rate_window_start)
+            self.rate_label.setText(f"{rate / 1e6:.2f} M points/s")
+            self.rate_window_start = now
+            self.rate_window_points = 0
+
+    def prepare(self, samples):
+        # Optional timing and carrier recovery, then scaling to the plot extent
+        symbol_rate = self.symbol_rate_spin.value() * 1e3
+        if symbol_rate > 0 and self.tap is not None:
+            samples = recover_timing(samples, self.tap.sample_rate / symbol_rate)
+        recovery = self.recovery_combo.currentText()
+        if recovery != 'Off':
+            samples = recover_carrier(samples, RECOVERY_ORDERS[recovery])
+        if self.normalize_check.isChecked():
+            samples = normalize_power(samples)
+        return samples
+
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        event.accept()
@@ -0,0 +1,68 @@
+# batch_process.py
+import argparse
+import logging
+import os
+import sys
+
+from core.batch_processing import (
+    DEFAULT_CHUNK_SAMPLES, DEFAULT_MAX_ROWS, IQ_FORMATS, BatchSettings, process_files, write_detections_csv
+)
+from core.fft_backend import FFT_SIZES
+from core.spectrogram import WINDOW_FUNCTIONS
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Turn raw IQ captures into spectrograms, max-hold/average traces and detection reports")
+    parser.add_argument('files', nargs='+', help="Raw IQ captures (fc32 or sc16, interleaved I/Q)")
+    parser.add_argument('--sample-rate', type=float, default=None,
+                        help="Sample rate of the captures in Hz; taken from each file's recorder sidecar if omitted")
+    parser.add_argument('--center-freq', type=float, default=None,
+                        help="Center frequency in Hz; taken from each file's recorder sidecar if omitted")
+    parser.add_argument('--format', choices=IQ_FORMATS, default=None,
+                        help="Sample format; guessed from the file extension by default")
+    parser.add_argument('--fft-size', type=int, choices=FFT_SIZES, default=1024)
+    parser.add_argument('--window', choices=WINDOW_FUNCTIONS, default='Hamming')
+    parser.add_argument('--overlap', type=float, default=0.5, help="Frame overlap fraction")
+    parser.add_argument('--calibration-db', type=float, default=0.0)
+    parser.add_argument('--threshold-db', type=float, default=10.0,
+                        help="Detection threshold above the noise floor")
+    parser.add_argument('--min-occupancy', type=float, default=0.01,
+                        help="Fraction of frames a bin must be above the threshold to count as occupied")
+    parser.add_argument('--max-rows', type=int, default=DEFAULT_MAX_ROWS,
+                        help="Spectrogram rows kept per file; longer captures are peak-decimated")
+    parser.add_argument('--chunk-samples', type=int, default=DEFAULT_CHUNK_SAMPLES,
+                        help="Samples per pool task")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--output-dir', default='batch_output')
+    parser.add_argument('--png', action='store_true', help="Also render a PNG per file")
+    return parser.parse_args(argv)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    args = parse_args(sys.argv[1:])
+    settings = BatchSettings(args.sample_rate, args.center_freq, args.fft_size, args.window, args.overlap,
+                             args.calibration_db, args.threshold_db, args.min_occupancy, args.chunk_samples, args.max_rows)
+    try:
+        for path in args.files:
+            settings.for_capture(path)
+    except ValueError as e:
+        print(f"{e}; --sample-rate is required for captures without a recorder sidecar", file=sys.stderr)
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+    results = process_files(args.files, settings, args.output_dir, args.format, args.workers, args.png)
+    report = os.path.join(args.output_dir, 'detections.csv')
+    write_detections_csv(report, results)
+    for result in results:
+        print(f"{result.path}: {result.frames} frames, {len(result.detections)} detections")
+        for detection in result.detections:
+            print(f"  {detection['peak_hz'] / 1e6:12.6f} MHz  {detection['peak_db']:7.1f} dB  "
+                  f"occupancy {detection['occupancy'] * 100:5.1f}%")
+    print(f"Detections written to {report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
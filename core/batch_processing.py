@@ -0,0 +1,293 @@
+import copy
+import csv
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.fft_backend import NumpyFFT
+from core.recorder import read_sidecar
+from core.spectrogram import compute_spectrogram
+
+# Raw IQ file formats: interleaved float32 I/Q, or interleaved int16 I/Q (full scale 32768)
+IQ_FORMATS = ('fc32', 'sc16')
+FORMAT_EXTENSIONS = {
+    '.fc32': 'fc32', '.cf32': 'fc32', '.cfile': 'fc32', '.raw': 'fc32', '.bin': 'fc32',
+    '.sc16': 'sc16', '.cs16': 'sc16',
+}
+
+# Complex samples handed to one pool task; bounds the memory of each worker
+DEFAULT_CHUNK_SAMPLES = 1 << 22
+
+# Spectrogram rows kept per file; longer captures are peak-decimated in time
+DEFAULT_MAX_ROWS = 4096
+
+DETECTION_FIELDS = ('file', 'start_hz', 'stop_hz', 'peak_hz', 'peak_db', 'average_db', 'occupancy')
+
+
+def guess_format(path):
+    """Format from a recorder sidecar if there is one, otherwise from the file extension"""
+    metadata = read_sidecar(path)
+    if metadata is not None:
+        return metadata['format']
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'fc32')
+
+
+def sample_count(path, iq_format):
+    return os.path.getsize(path) // (8 if iq_format == 'fc32' else 4)
+
+
+def read_samples(path, iq_format, start, stop):
+    """Samples [start, stop) of a raw capture as complex64, read through a memory map.
+
+    Only the requested range is paged in, so multi-GB captures are processed in
+    constant memory.
+    """
+    if iq_format == 'fc32':
+        return np.memmap(path, dtype=np.complex64, mode='r', offset=8 * start, shape=(stop - start,))
+    raw = np.memmap(path, dtype=np.int16, mode='r', offset=4 * start, shape=(2 * (stop - start),))
+    samples = raw.astype(np.float32).view(np.complex64)
+    samples *= np.float32(1.0 / 32768)
+    return samples
+
+
+class BatchSettings:
+    """Spectrogram and detection parameters shared by every chunk of a batch.
+
+    A sample rate or center frequency left as None is taken from each
+    capture's recorder sidecar (see for_capture).
+    """
+
+    def __init__(self, sample_rate=None, center_freq=None, fft_size=1024, window_name='Hamming', overlap=0.5,
+                 calibration_db=0.0, threshold_db=10.0, min_occupancy=0.01, chunk_samples=DEFAULT_CHUNK_SAMPLES,
+                 max_rows=DEFAULT_MAX_ROWS):
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.fft_size = fft_size
+        self.window_name = window_name
+        self.overlap = overlap
+        self.calibration_db = calibration_db
+        self.threshold_db = threshold_db  # Detection level above the noise floor
+        self.min_occupancy = min_occupancy  # Fraction of frames a bin must exceed it to count as a detection
+        self.chunk_samples = chunk_samples
+        self.max_rows = max_rows
+
+    @property
+    def hop(self):
+        return max(1, int(round(self.fft_size * (1.0 - self.overlap))))
+
+    def for_capture(self, path):
+        """A copy with the sample rate and center frequency not given here read from the capture's sidecar"""
+        settings = copy.copy(self)
+        if settings.sample_rate is None or settings.center_freq is None:
+            metadata = read_sidecar(path) or {}
+            if settings.sample_rate is None:
+                settings.sample_rate = metadata.get('sample_rate')
+            if settings.center_freq is None:
+                settings.center_freq = metadata.get('center_freq', 0.0)
+        if settings.sample_rate is None:
+            raise ValueError(f"{path}: no sample rate given and no recorder sidecar to take it from")
+        return settings
+
+
+def plan_chunks(samples, settings):
+    """Split a capture into chunks of whole output rows.
+
+    Returns (frames, rows_per_line, chunks) where each chunk is (first frame,
+    frame count). Chunks hold a multiple of rows_per_line frames, so decimated
+    rows never straddle two chunks and the result does not depend on chunking.
+    """
+    fft_size, hop = settings.fft_size, settings.hop
+    if samples < fft_size:
+        return 0, 1, []
+    frames = (samples - fft_size) // hop + 1
+    rows_per_line = -(-frames // settings.max_rows)
+    chunk_frames = max(1, settings.chunk_samples // hop // rows_per_line) * rows_per_line
+    chunks = [(first, min(chunk_frames, frames - first)) for first in range(0, frames, chunk_frames)]
+    return frames, rows_per_line, chunks
+
+
+def process_chunk(path, iq_format, first_frame, frame_count, rows_per_line, settings):
+    """Spectrogram statistics of one chunk; runs in a pool worker.
+
+    Returns a dict with the peak-decimated spectrogram rows, per-bin max hold,
+    the per-bin sum of linear power (for the average trace) and per-bin counts
+    of frames above the frame's median plus the detection threshold.
+    """
+    hop, fft_size = settings.hop, settings.fft_size
+    start = first_frame * hop
+    samples = read_samples(path, iq_format, start, start + (frame_count - 1) * hop + fft_size)
+    # Pool workers already run in parallel, so each one uses the single-threaded backend
+    rows, _ = compute_spectrogram(samples, fft_size, settings.window_name, settings.overlap,
+                                  NumpyFFT(), settings.calibration_db)
+    decimated = np.maximum.reduceat(rows, np.arange(0, len(rows), rows_per_line), axis=0)
+    floor = np.median(rows[:, ::4], axis=1, keepdims=True)  # Every 4th bin is plenty for a noise floor
+    exceed = np.count_nonzero(rows > floor + settings.threshold_db, axis=0)
+    linear = np.power(np.float32(10.0), rows * np.float32(0.1))
+    return {
+        'first_frame': first_frame,
+        'rows': decimated,
+        'max_hold': rows.max(axis=0),
+        'linear_sum': linear.sum(axis=0, dtype=np.float64),
+        'exceed': exceed,
+        'frames': len(rows),
+    }
+
+
+def find_detections(max_hold, average, occupancy, freqs, threshold_db, min_occupancy):
+    """Contiguous bin runs that are busy on average or often enough.
+
+    A bin counts when its average rises threshold_db above the median of the
+    average trace, or when it exceeded its frame's noise floor by threshold_db
+    in at least min_occupancy of the frames (intermittent signals). Max hold
+    alone is not used: over many frames noise peaks reach well above the floor.
+    """
+    noise_floor = float(np.median(average))
+    busy = (average > noise_floor + threshold_db) | (occupancy >= min_occupancy)
+    above = np.concatenate(([False], busy, [False]))
+    edges = np.flatnonzero(np.diff(above.astype(np.int8)))
+    detections = []
+    for start, stop in zip(edges[::2], edges[1::2]):
+        peak = start + int(np.argmax(max_hold[start:stop]))
+        detections.append({
+            'start_hz': float(freqs[start]),
+            'stop_hz': float(freqs[stop - 1]),
+            'peak_hz': float(freqs[peak]),
+            'peak_db': float(max_hold[peak]),
+            'average_db': float(10 * np.log10(np.mean(10 ** (average[start:stop] / 10)))),
+            'occupancy': float(occupancy[start:stop].max()),
+        })
+    return detections
+
+
+class FileResult:
+    """Merged statistics of one capture"""
+
+    def __init__(self, path, frames, rows_per_line, settings):
+        self.path = path
+        self.frames = frames
+        self.rows_per_line = rows_per_line
+        self.settings = settings
+        self.freqs = settings.center_freq + np.fft.fftshift(
+            np.fft.fftfreq(settings.fft_size, d=1.0 / settings.sample_rate))
+        lines = -(-frames // rows_per_line) if frames else 0
+        self.spectrogram = np.empty((lines, settings.fft_size), dtype=np.float32)
+        self.max_hold = np.full(settings.fft_size, -np.inf, dtype=np.float32)
+        self.linear_sum = np.zeros(settings.fft_size, dtype=np.float64)
+        self.exceed = np.zeros(settings.fft_size, dtype=np.int64)
+        self.detections = []
+
+    def merge(self, chunk):
+        line = chunk['first_frame'] // self.rows_per_line
+        self.spectrogram[line:line + len(chunk['rows'])] = chunk['rows']
+        np.maximum(self.max_hold, chunk['max_hold'], out=self.max_hold)
+        self.linear_sum += chunk['linear_sum']
+        self.exceed += chunk['exceed']
+
+    def finish(self):
+        frames = max(self.frames, 1)
+        self.average = (10 * np.log10(np.maximum(self.linear_sum / frames, 1e-30))).astype(np.float32)
+        self.occupancy = (self.exceed / frames).astype(np.float32)
+        self.detections = find_detections(self.max_hold, self.average, self.occupancy, self.freqs,
+                                          self.settings.threshold_db, self.settings.min_occupancy)
+
+    @property
+    def times(self):
+        # Start time of each spectrogram line, in seconds from the start of the capture
+        return np.arange(len(self.spectrogram)) * self.rows_per_line * self.settings.hop / self.settings.sample_rate
+
+    def save_npz(self, path):
+        np.savez_compressed(
+            path, spectrogram=self.spectrogram, freqs=self.freqs, times=self.times,
+            max_hold=self.max_hold, average=self.average, occupancy=self.occupancy,
+            detections=np.array([[d[field] for field in DETECTION_FIELDS[1:]] for d in self.detections],
+                                dtype=np.float64).reshape(-1, len(DETECTION_FIELDS) - 1),
+            detection_fields=np.array(DETECTION_FIELDS[1:]),
+            sample_rate=self.settings.sample_rate, fft_size=self.settings.fft_size,
+            rows_per_line=self.rows_per_line)
+
+    def save_png(self, path):
+        import matplotlib  # Only needed when PNGs are requested
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        freqs_mhz = self.freqs / 1e6
+        duration = self.frames * self.settings.hop / self.settings.sample_rate
+        figure, (top, bottom) = plt.subplots(2, 1, figsize=(10, 8), sharex=True,
+                                             gridspec_kw={'height_ratios': [3, 1]})
+        top.imshow(self.spectrogram, aspect='auto', origin='lower', cmap='viridis',
+                   extent=(freqs_mhz[0], freqs_mhz[-1], 0, duration))
+        top.set_ylabel("Time (s)")
+        top.set_title(os.path.basename(self.path))
+        bottom.plot(freqs_mhz, self.max_hold, label="Max hold", linewidth=0.7)
+        bottom.plot(freqs_mhz, self.average, label="Average", linewidth=0.7)
+        for detection in self.detections:
+            bottom.axvspan(detection['start_hz'] / 1e6, detection['stop_hz'] / 1e6, color='red', alpha=0.2)
+        bottom.set_xlabel("Frequency (MHz)")
+        bottom.set_ylabel("Power (dB)")
+        bottom.legend(loc='upper right')
+        figure.tight_layout()
+        figure.savefig(path, dpi=100)
+        plt.close(figure)
+
+
+def process_files(paths, settings, output_dir=None, iq_format=None, workers=None, png=False):
+    """Process captures on a process pool, chunk by chunk; returns one FileResult per path.
+
+    Chunks of every file are submitted together, so a single large capture
+    still spreads across all workers. Results are merged as they complete and
+    each file is written as soon as its last chunk is in. Each file gets its
+    own sample rate and center frequency (BatchSettings.for_capture); all of
+    them are resolved before any work starts.
+    """
+    started = time.perf_counter()
+    file_settings = {path: settings.for_capture(path) for path in paths}
+    results, pending = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for path in paths:
+            file_format = iq_format or guess_format(path)
+            frames, rows_per_line, chunks = plan_chunks(sample_count(path, file_format), file_settings[path])
+            results[path] = FileResult(path, frames, rows_per_line, file_settings[path])
+            pending[path] = len(chunks)
+            for first_frame, frame_count in chunks:
+                futures.append((path, pool.submit(process_chunk, path, file_format, first_frame,
+                                                  frame_count, rows_per_line, file_settings[path])))
+            if not chunks:
+                logging.warning(f"{path}: shorter than one FFT frame, skipped")
+                results[path].finish()
+
+        for path, future in futures:
+            results[path].merge(future.result())
+            pending[path] -= 1
+            if pending[path] == 0:
+                finish_file(results[path], output_dir, png)
+
+    elapsed = time.perf_counter() - started
+    total = sum(result.frames for result in results.values()) * settings.hop
+    logging.info(f"Processed {len(paths)} files, {total / 1e6:.1f} M samples in {elapsed:.2f} s "
+                 f"({total / max(elapsed, 1e-9) / 1e6:.1f} MS/s)")
+    return [results[path] for path in paths]
+
+
+def finish_file(result, output_dir, png):
+    result.finish()
+    if output_dir is None:
+        return
+    # The extension is kept so that captures differing only in format do not collide
+    stem = os.path.join(output_dir, os.path.basename(result.path))
+    result.save_npz(stem + '.npz')
+    if png:
+        result.save_png(stem + '.png')
+    logging.info(f"{result.path}: {result.frames} frames, {len(result.detections)} detections")
+
+
+def write_detections_csv(path, results):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=DETECTION_FIELDS)
+        writer.writeheader()
+        for result in results:
+            for detection in result.detections:
+                writer.writerow({'file': result.path, **detection})
@@ -0,0 +1,63 @@
+import threading
+
+from core.sample_formats import allocate
+
+
+class BufferPool:
+    """Fixed set of preallocated sample blocks passed between threads without copying.
+
+    The receive thread acquire()s a block, fills it in place and hands it to
+    the processing side, which release()s it when done. Nothing is allocated
+    after construction. When every block is out (the consumer is holding them
+    all), acquire() returns None and counts the miss in `exhausted`. The caller
+    then drops the block it was about to hand over and fills it again, so the
+    newest data is lost rather than memory growing.
+
+    Blocks are shaped (frames, fft_size), with a trailing I/Q axis for sc16.
+    Blocks from an older pool, released after a size change, are ignored.
+    """
+
+    def __init__(self, count, frames, fft_size, cpu_format='fc32'):
+        self.shape = (frames, fft_size)
+        self.cpu_format = cpu_format
+        self.buffers = []
+        for _ in range(count):
+            buffer = allocate(frames * fft_size, cpu_format)
+            self.buffers.append(buffer.reshape(self.shape + buffer.shape[1:]))
+        self.owned = {id(buffer) for buffer in self.buffers}
+        self.free = list(self.buffers)
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return len(self.buffers)
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers)
+
+    def available(self):
+        with self._lock:
+            return len(self.free)
+
+    def acquire(self):
+        """A free block, or None when all of them are in use"""
+        with self._lock:
+            if self.free:
+                return self.free.pop()
+            self.exhausted += 1
+            return None
+
+    def release(self, buffer):
+        """Return a block; blocks that are not from this pool, or already free, are ignored"""
+        if id(buffer) not in self.owned:
+            return
+        with self._lock:
+            if not any(free is buffer for free in self.free):
+                self.free.append(buffer)
+
+    @staticmethod
+    def samples(buffer):
+        """Flat (samples,) or (samples, 2) view of a block, for recv() and partial copies"""
+        return buffer.reshape((-1,) + buffer.shape[2:])
@@ -0,0 +1,285 @@
+import collections
+import logging
+import threading
+import time
+
+import numpy as np
+
+from core.metrics import PipelineMetrics
+
+
+class Burst:
+    """One detected burst; positions are sample sequence numbers of the channel's IQ stream"""
+
+    def __init__(self, start, stop, sample_rate, peak_power_db, mean_power_db, freq_offset_hz, bandwidth_hz):
+        self.start = start
+        self.stop = stop
+        self.sample_rate = sample_rate
+        self.peak_power_db = peak_power_db  # Instantaneous |x|^2, dBFS
+        self.mean_power_db = mean_power_db
+        self.freq_offset_hz = freq_offset_hz  # From the tuned frequency
+        self.bandwidth_hz = bandwidth_hz
+        self.start_time = None  # Host time, filled in by the worker
+
+    @property
+    def duration(self):
+        return (self.stop - self.start) / self.sample_rate
+
+    def __repr__(self):
+        return (f"Burst({self.duration * 1e6:.1f} us, {self.peak_power_db:.1f} dBFS peak, "
+                f"{self.freq_offset_hz / 1e3:+.1f} kHz, {self.bandwidth_hz / 1e3:.1f} kHz wide)")
+
+
+class BurstDetector:
+    """Time-domain energy detector for short bursts, run on every sample.
+
+    Instantaneous power |x|^2 is summed over a sliding window of
+    `window_samples` as differences of one float64 cumulative sum per block;
+    the last window - 1 powers are carried into the next block, and the
+    scratch arrays are reused while the block size allows. A burst is a run
+    of samples whose envelope stays above the lower level and reaches the
+    upper level `threshold_db` over the noise floor (hysteresis of
+    `hysteresis_db`). Runs are found with a diff over one comparison, so a
+    block without bursts costs a few passes over the samples and nothing is
+    visited in Python.
+
+    The noise floor follows the median of a strided subsample of the
+    envelope, smoothed over blocks, so continuous carriers become part of
+    the floor. The envelope trails the signal by the window, so each stop is
+    moved back by window - 1 samples.
+
+    Frequency offset and bandwidth come from the lag-1 autocorrelation over
+    the burst (pulse-pair estimate), with the noise floor taken out of the
+    zero-lag power: the offset from its phase and the width from its
+    magnitude, reported as the width of a flat spectrum with the same RMS
+    spread.
+    """
+
+    NOISE_SUBSAMPLE = 4096  # Envelope values the noise median is taken from
+
+    def __init__(self, sample_rate, window_samples=16, threshold_db=10.0, hysteresis_db=3.0, noise_smoothing=0.1,
+                 min_samples=1):
+        self.sample_rate = sample_rate
+        self.window_samples = max(1, int(window_samples))
+        self.threshold_db = threshold_db
+        self.hysteresis_db = hysteresis_db
+        self.noise_smoothing = noise_smoothing
+        self.min_samples = min_samples
+        self.cumulative = np.zeros(0, dtype=np.float64)
+        self.window_sums = np.zeros(0, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self.tail = np.zeros(self.window_samples - 1, dtype=np.float32)
+        self.noise_power = None
+        self.sequence = None  # Sequence number of the next expected sample
+        self.open = None  # Sums of a burst still above the lower level at the end of the last block
+
+    @property
+    def noise_floor_db(self):
+        return 10 * np.log10(self.noise_power) if self.noise_power else None
+
+    def envelope(self, power):
+        """Sum of the power over the window ending at each sample of the block"""
+        window, count = self.window_samples, len(power)
+        if len(self.cumulative) < count + 1:
+            self.cumulative = np.empty(count + 1, dtype=np.float64)
+            self.window_sums = np.empty(count, dtype=np.float64)
+        cumulative = self.cumulative[:count + 1]
+        sums = self.window_sums[:count]
+        cumulative[0] = 0.0
+        np.cumsum(power, out=cumulative[1:])
+        np.subtract(cumulative[window:], cumulative[:count + 1 - window], out=sums[window - 1:])
+        if window > 1:
+            # The first windows reach back into the previous block
+            head = min(window - 1, count)
+            # The window ending at sample i holds i + 1 new samples and the last window - 1 - i carried ones
+            carried = np.cumsum(self.tail[::-1])[::-1]  # carried[j] = sum(tail[j:])
+            sums[:head] = cumulative[1:head + 1] + carried[:head]
+            self.tail = np.concatenate((self.tail, power[-(window - 1):]))[-(window - 1):]
+        return sums
+
+    def process(self, samples, start=None):
+        """Bursts that ended in this block of complex64 samples; `start` is the first sample's sequence"""
+        if start is None:
+            start = self.sequence if self.sequence is not None else 0
+        if self.sequence is not None and start != self.sequence:
+            self.reset()  # Samples were skipped; runs cannot continue across the hole
+        self.sequence = start + len(samples)
+        count = len(samples)
+        if count == 0:
+            return []
+
+        power = np.square(samples.real)
+        power += np.square(samples.imag)
+        sums = self.envelope(power)
+
+        window = self.window_samples
+        stride = max(1, count // self.NOISE_SUBSAMPLE)
+        block_noise = float(np.median(sums[::stride])) / window
+        if self.noise_power is None:
+            self.noise_power = block_noise
+        else:
+            self.noise_power += self.noise_smoothing * (block_noise - self.noise_power)
+        upper = max(self.noise_power, 1e-30) * 10 ** (self.threshold_db / 10) * window
+        lower = upper * 10 ** (-self.hysteresis_db / 10)
+
+        above = (sums > lower).view(np.int8)
+        edges = np.diff(above, prepend=np.int8(self.open is not None), append=np.int8(0))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        if self.open is None and not len(starts):
+            return []
+
+        bursts = []
+        lag = window - 1
+        if self.open is not None:
+            run_stop, stops = stops[0], stops[1:]
+            self.open['reached'] |= run_stop > 0 and sums[:run_stop].max() > upper
+            if run_stop < count:
+                self.accumulate(self.open, samples, power, 0, run_stop - lag)
+                burst = self.close(self.open, start + run_stop - lag)
+                if burst is not None:
+                    bursts.append(burst)
+                self.open = None
+            else:
+                self.accumulate(self.open, samples, power, 0, count)
+
+        if len(starts):
+            # Peak envelope of each run: reduceat over [start, stop) pairs, the open run separately
+            closed = stops < count
+            bounds = np.column_stack((starts[closed], stops[closed])).ravel()
+            peaks = np.maximum.reduceat(sums, bounds)[::2] if len(bounds) else []
+            for run_start, run_stop, peak in zip(starts[closed], stops[closed], peaks):
+                if peak <= upper:
+                    continue
+                run_stop = max(run_start + 1, run_stop - lag)
+                run = self.new_run(start + run_start, True)
+                self.accumulate(run, samples, power, run_start, run_stop)
+                burst = self.close(run, start + run_stop)
+                if burst is not None:
+                    bursts.append(burst)
+            if not closed[-1]:
+                # Still above the lower level at the end of the block
+                run_start = starts[-1]
+                self.open = self.new_run(start + run_start, bool(sums[run_start:].max() > upper))
+                self.accumulate(self.open, samples, power, run_start, count)
+        return bursts
+
+    @staticmethod
+    def new_run(start, reached):
+        return {'start': start, 'reached': reached, 'peak': 0.0, 'energy': 0.0, 'r0': 0.0, 'r1': 0j,
+                'count': 0, 'pairs': 0}
+
+    @staticmethod
+    def accumulate(run, samples, power, first, last):
+        # Peak, energy and lag-1 autocorrelation of samples[first:last]
+        first = max(first, 0)
+        if last <= first:
+            return
+        run['peak'] = max(run['peak'], float(power[first:last].max()))
+        run['energy'] += float(power[first:last].sum(dtype=np.float64))
+        run['count'] += last - first
+        if last - first > 1:
+            segment = samples[first:last]
+            run['r1'] += complex(np.vdot(segment[:-1], segment[1:]))
+            run['r0'] += float(power[first:last - 1].sum(dtype=np.float64))
+            run['pairs'] += last - first - 1
+
+    def close(self, run, stop):
+        if not run['reached'] or stop - run['start'] < self.min_samples or run['count'] == 0:
+            return None
+        # White noise adds to the zero-lag power only
+        signal_r0 = run['r0'] - (self.noise_power or 0.0) * run['pairs']
+        if signal_r0 > 0 and run['r1'] != 0:
+            offset = np.angle(run['r1']) / (2 * np.pi) * self.sample_rate
+            coherence = min(max(abs(run['r1']) / signal_r0, 1e-12), 1.0)
+            # Gaussian pulse-pair spread, scaled to the equivalent flat width (sqrt(12) sigma)
+            sigma = self.sample_rate * np.sqrt(max(-2 * np.log(coherence), 0.0)) / (2 * np.pi)
+            bandwidth = np.sqrt(12) * sigma
+        else:
+            offset = bandwidth = 0.0
+        return Burst(run['start'], stop, self.sample_rate, 10 * np.log10(max(run['peak'], 1e-30)),
+                     10 * np.log10(max(run['energy'] / run['count'], 1e-30)), float(offset), float(bandwidth))
+
+
+class BurstDetectorWorker:
+    """Runs a BurstDetector over a channel's IQHistory on its own thread.
+
+    Like the demodulator, it polls the ring and never blocks the receive
+    thread; if it falls more than max_latency seconds behind, it skips ahead
+    and restarts detection. The newest bursts are kept in `bursts`, with host
+    times from the history's time markers. The processing margin is the
+    signal time processed per second of processing time (real_time_factor);
+    above 1 the detector keeps up with the stream.
+    """
+
+    POLL_INTERVAL = 0.01  # Seconds
+
+    def __init__(self, iq_history, detector_factory, metrics=None, channel=0, max_latency=0.5, keep=256):
+        self.iq_history = iq_history
+        self.detector_factory = detector_factory  # sample_rate -> BurstDetector
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        self.channel = channel
+        self.max_latency = max_latency
+        self.bursts = collections.deque(maxlen=keep)
+        self.burst_count = 0
+        self.running = False
+        self.thread = None
+        self.samples_in = 0
+        self.skipped_samples = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _run(self):
+        history = self.iq_history
+        sequence = history.written
+        detector = None
+        try:
+            while self.running:
+                sample_rate = history.sample_rate
+                if detector is None or detector.sample_rate != sample_rate:
+                    detector = self.detector_factory(sample_rate)
+                began = time.perf_counter()
+                start, samples = history.read_since(sequence, int(self.max_latency * sample_rate))
+                if len(samples) == 0:
+                    time.sleep(self.POLL_INTERVAL)
+                    continue
+                if start != sequence:
+                    self.skipped_samples += start - sequence
+                sequence = start + len(samples)
+
+                bursts = detector.process(samples, start)
+                if bursts:
+                    markers = history._markers()
+                    for burst in bursts:
+                        burst.start_time = history.time_at(burst.start, markers)[0]
+                    self.bursts.extend(bursts)
+                    self.burst_count += len(bursts)
+                    self.metrics.increment('bursts_total', self.channel, len(bursts))
+                elapsed = time.perf_counter() - began
+                self.busy_seconds += elapsed
+                self.samples_in += len(samples)
+                self.metrics.observe('burst_detect_seconds', self.channel, elapsed)
+                self.metrics.set_gauge('burst_detector_real_time_factor', self.channel, self.real_time_factor())
+        except Exception as e:
+            logging.error(f"Burst detector on RX{self.channel} stopped: {e}")
+        finally:
+            self.running = False
+
+    def real_time_factor(self):
+        """Signal seconds processed per second of CPU time spent processing"""
+        if self.busy_seconds <= 0:
+            return 0.0
+        return self.samples_in / self.iq_history.sample_rate / self.busy_seconds
@@ -0,0 +1,155 @@
+import contextlib
+import threading
+import time
+
+from core.frame_processor import FrameProcessor
+from core.persistence import PersistenceHistogram
+from core.roi_measurements import RoiMeasurements
+from core.spectrum_stats import SpectrumStatistics
+
+# Port names of the B2xx receive channels; further channels are numbered
+RX_CHANNEL_LABELS = ('TX/RX', 'RX2')
+READ_ATTEMPTS = 100
+
+
+def channel_label(rx_channel):
+    return RX_CHANNEL_LABELS[rx_channel] if rx_channel < len(RX_CHANNEL_LABELS) else f"RX{rx_channel + 1}"
+
+
+class Radio:
+    """One USRP and the pipeline that serves it: control, receiver and command worker.
+
+    Every radio has its own receive threads, buffer pools, IQ histories and
+    command thread, and each of its channels its own pipeline worker, so
+    radios never wait on each other. Its channels occupy registry indices
+    first_channel .. first_channel + channel_count - 1.
+    """
+
+    __slots__ = ('index', 'serial', 'label', 'usrp_control', 'tx_rx', 'device_commands', 'first_channel')
+
+    def __init__(self, index, usrp_control, tx_rx=None, device_commands=None, first_channel=0, label=None):
+        self.index = index
+        self.serial = usrp_control.serial
+        self.label = label if label is not None else (self.serial or f"USRP {index + 1}")
+        self.usrp_control = usrp_control
+        self.tx_rx = tx_rx
+        self.device_commands = device_commands
+        self.first_channel = first_channel
+
+    @property
+    def channel_count(self):
+        return self.tx_rx.num_rx_channels if self.tx_rx is not None else 0
+
+    def __repr__(self):
+        return f"Radio({self.index}, {self.label!r})"
+
+
+class ChannelState:
+    """Everything kept for one receive channel: DSP state, latest spectrum and display items.
+
+    Slotted, so the per-frame path reads fixed attributes instead of building
+    attribute names. The DSP objects (frame processor, statistics, persistence,
+    ROI measurements, waterfall history) own preallocated numpy arrays;
+    `spectrum` and `freq_bins` reference the newest results without copying.
+    The channel's PipelineWorker changes them inside updating(), as does the
+    GUI when it reconfigures them, so the two never overlap. `version` is a
+    seqlock counter, odd inside updating(), so other threads copy consistent
+    results with read_consistent() without taking the lock. Display items
+    stay None until the GUI creates them.
+    """
+
+    __slots__ = ('index', 'rx_channel', 'label', 'radio', 'frame_processor', 'statistics', 'persistence', 'rois',
+                 'roi_measurements', 'waterfall_history', 'trigger', 'worker', 'lock', 'version', 'spectrum', 'freq_bins',
+                 'spectrum_plot',
+                 'spectrum_curve', 'combined_curve', 'trace_curves', 'persistence_image', 'waterfall_plot',
+                 'waterfall_image', 'time_label')
+
+    def __init__(self, index, rx_channel=None, label=None, radio=None):
+        self.index = index  # Position in the registry
+        self.rx_channel = index if rx_channel is None else rx_channel  # Channel number on the device
+        self.label = label if label is not None else channel_label(self.rx_channel)
+        self.radio = radio  # The Radio this channel is received on
+        self.frame_processor = FrameProcessor()
+        self.statistics = SpectrumStatistics(())
+        self.persistence = PersistenceHistogram()
+        self.rois = []
+        self.roi_measurements = RoiMeasurements()
+        self.waterfall_history = None
+        self.trigger = None  # TriggerWorker while capture triggers are armed
+        self.worker = None  # PipelineWorker that processes the channel's blocks
+        self.lock = threading.Lock()  # Held while the results or DSP state change
+        self.version = 0  # Seqlock: incremented on entering and leaving updating()
+        self.spectrum = None  # Newest spectrum in dB
+        self.freq_bins = None  # Its bin offsets from the centre frequency, in Hz
+        self.spectrum_plot = None
+        self.spectrum_curve = None
+        self.combined_curve = None  # Curve in the combined view, with more than one radio
+        self.trace_curves = {}  # Statistic name -> curve
+        self.persistence_image = None
+        self.waterfall_plot = None
+        self.waterfall_image = None
+        self.time_label = None
+
+    @contextlib.contextmanager
+    def updating(self):
+        """Change the channel's results or DSP state, excluding the pipeline worker; readers retry meanwhile"""
+        with self.lock:
+            self.version += 1
+            try:
+                yield self
+            finally:
+                self.version += 1
+
+    def __repr__(self):
+        return f"ChannelState({self.index}, {self.label!r})"
+
+
+class InconsistentRead(RuntimeError):
+    """A channel's results kept changing while they were being copied"""
+
+
+def read_consistent(channel, read, attempts=READ_ATTEMPTS):
+    """Seqlock read: read() is retried while the channel is being updated or was updated meanwhile.
+
+    read() should copy what it needs, as the arrays it reads are overwritten
+    by the next block.
+    """
+    for _ in range(attempts):
+        version = channel.version
+        if version % 2 == 0:
+            value = read()
+            if channel.version == version:
+                return value
+        time.sleep(0.0005)
+    raise InconsistentRead(f"Channel {channel.index} results kept changing during the read")
+
+
+class ChannelRegistry:
+    """Channels in display order, looked up by index.
+
+    Indices are dense (0..n-1), so per-channel data elsewhere can live in lists
+    or arrays indexed the same way.
+    """
+
+    def __init__(self):
+        self.channels = []
+
+    def add(self, rx_channel=None, label=None, radio=None):
+        channel = ChannelState(len(self.channels), rx_channel, label, radio)
+        self.channels.append(channel)
+        return channel
+
+    def clear(self):
+        self.channels = []
+
+    def indices(self):
+        return list(range(len(self.channels)))
+
+    def __getitem__(self, index):
+        return self.channels[index]
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def __len__(self):
+        return len(self.channels)
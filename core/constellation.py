@@ -0,0 +1,142 @@
+import numpy as np
+
+from core.decimation import Mixer, MultistageDecimator, smooth_factor
+
+# Modulation orders offered for carrier recovery: name -> power used to strip the modulation
+RECOVERY_ORDERS = {'BPSK': 2, 'QPSK': 4, '8PSK': 8, 'QAM': 4}
+
+
+class DensityHistogram:
+    """Decaying 2-D histogram of IQ points, rendered as an image.
+
+    Points are binned with one vectorized bincount per update, so the cost grows
+    with the number of samples but the rendered image is always bins x bins.
+    """
+
+    def __init__(self, bins=256, extent=1.5, half_life=0.5):
+        self.bins = bins
+        self.extent = extent  # The image covers [-extent, extent] on both axes
+        self.half_life = half_life  # Seconds for old points to fade to half intensity
+        self.counts = np.zeros((bins, bins), dtype=np.float32)
+        self.display = np.zeros((bins, bins), dtype=np.float32)
+        self.total_points = 0
+
+    def clear(self):
+        self.counts[:] = 0
+        self.total_points = 0
+
+    def decay(self, elapsed):
+        if self.half_life > 0 and elapsed > 0:
+            self.counts *= np.float32(0.5 ** (elapsed / self.half_life))
+
+    def accumulate(self, samples, elapsed=0.0):
+        """Fade the existing density by `elapsed` seconds, then add the samples"""
+        self.decay(elapsed)
+        if len(samples) == 0:
+            return
+        scale = self.bins / (2.0 * self.extent)
+        x = samples.real * scale + self.bins / 2
+        y = samples.imag * scale + self.bins / 2
+        inside = (x >= 0) & (x < self.bins) & (y >= 0) & (y < self.bins)
+        flat = y[inside].astype(np.intp) * self.bins + x[inside].astype(np.intp)
+        self.counts += np.bincount(flat, minlength=self.bins * self.bins).reshape(self.bins, self.bins)
+        self.total_points += len(samples)
+
+    def image(self):
+        """Log-scaled density normalized to [0, 1]; rows are Q, columns are I"""
+        np.log1p(self.counts, out=self.display)
+        peak = self.display.max()
+        if peak > 0:
+            self.display *= 1.0 / peak
+        return self.display
+
+
+def normalize_power(samples):
+    """Scale samples to unit RMS so the constellation fills a fixed extent"""
+    rms = np.sqrt(np.mean(np.abs(samples) ** 2)) if len(samples) else 0.0
+    return samples / rms if rms > 0 else samples
+
+
+def recover_timing(samples, samples_per_symbol):
+    """Feed-forward symbol timing recovery (Oerder & Meyr) with linear interpolation.
+
+    The symbol-rate spectral line of |x|^2 gives the timing phase of the whole
+    block; one interpolated sample is returned per symbol.
+    """
+    if samples_per_symbol < 2 or len(samples) < 2 * samples_per_symbol:
+        return samples
+    n = np.arange(len(samples))
+    line = np.sum(np.abs(samples) ** 2 * np.exp(-2j * np.pi * n / samples_per_symbol))
+    offset = (-np.angle(line) / (2 * np.pi) * samples_per_symbol) % samples_per_symbol
+    positions = offset + samples_per_symbol * np.arange(int((len(samples) - 1 - offset) // samples_per_symbol))
+    index = positions.astype(np.intp)
+    fraction = (positions - index).astype(np.float32)
+    return samples[index] * (1 - fraction) + samples[index + 1] * fraction
+
+
+def recover_carrier(symbols, order, block=256):
+    """Feed-forward carrier recovery for M-PSK and square QAM.
+
+    The frequency offset comes from the peak of the spectrum of symbols**order;
+    the residual phase is estimated per block (Viterbi & Viterbi) and unwrapped
+    across blocks. QPSK/QAM are rotated so the points sit on the diagonals.
+    """
+    count = len(symbols)
+    if count < block:
+        return symbols
+    powered = symbols ** order
+    size = 1 << int(np.ceil(np.log2(count)))
+    spectrum = np.fft.fft(powered, size)
+    freq = np.fft.fftfreq(size)[np.argmax(np.abs(spectrum))] / order  # Cycles per symbol
+    n = np.arange(count)
+    derotated = symbols * np.exp(-2j * np.pi * freq * n).astype(np.complex64)
+
+    blocks = count // block
+    sums = (derotated[:blocks * block] ** order).reshape(blocks, block).sum(axis=1)
+    reference = np.pi if order == 4 else 0.0
+    phases = np.unwrap(np.angle(sums) - reference) / order
+    phase = np.repeat(phases, block)
+    phase = np.concatenate((phase, np.full(count - len(phase), phases[-1])))
+    return derotated * np.exp(-1j * phase).astype(np.complex64)
+
+
+class IQTap:
+    """Reads new samples of one channel from its IQHistory, optionally narrowed to an ROI.
+
+    With an ROI the samples are mixed down by offset_hz (phase-continuous across
+    reads, using the sample sequence numbers) and decimated with a multistage
+    polyphase filter to about twice the ROI bandwidth.
+    """
+
+    def __init__(self, iq_history, offset_hz=0.0, bandwidth_hz=None, max_samples=1 << 18):
+        self.iq_history = iq_history
+        self.offset_hz = offset_hz
+        self.bandwidth_hz = bandwidth_hz
+        self.max_samples = max_samples
+        self.sequence = iq_history.written
+        self.filter_rate = None
+
+    def setup_filter(self, sample_rate):
+        self.mixer = Mixer(self.offset_hz, sample_rate)
+        self.decimator = MultistageDecimator(
+            sample_rate, smooth_factor(sample_rate / (2 * self.bandwidth_hz)), self.bandwidth_hz / 2)
+        self.filter_rate = sample_rate
+
+    @property
+    def sample_rate(self):
+        rate = self.iq_history.sample_rate
+        if self.bandwidth_hz is None:
+            return rate
+        return rate / smooth_factor(rate / (2 * self.bandwidth_hz))
+
+    def read(self):
+        """New samples since the previous read (possibly empty)"""
+        history = self.iq_history
+        start, samples = history.read_since(self.sequence, self.max_samples)
+        self.sequence = start + len(samples)
+        if self.bandwidth_hz is None or len(samples) == 0:
+            return samples
+
+        if self.filter_rate != history.sample_rate:
+            self.setup_filter(history.sample_rate)
+        return self.decimator.process(self.mixer.process(samples, start))
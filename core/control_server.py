@@ -0,0 +1,312 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+UNAVAILABLE = -32000  # Application error: no device yet, or data busy
+
+
+def default_socket_path():
+    return os.path.join(os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(), 'b205-spectrum.sock')
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def encode_message(message):
+    """One JSON line followed by the raw bytes of every numpy array in the message.
+
+    Arrays are replaced by {"$array": n, "dtype": ..., "shape": ..., "nbytes": ...}
+    descriptors, and their bytes follow the line in the order of n, so bulk
+    spectra are sent without text conversion.
+    """
+    arrays = []
+
+    def convert(value):
+        if isinstance(value, np.ndarray):
+            array = np.ascontiguousarray(value)
+            arrays.append(array)
+            return {'$array': len(arrays) - 1, 'dtype': array.dtype.str, 'shape': list(array.shape),
+                    'nbytes': array.nbytes}
+        if isinstance(value, dict):
+            return {key: convert(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [convert(item) for item in value]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    line = json.dumps(convert(message), separators=(',', ':')).encode() + b'\n'
+    return b''.join([line] + [array.reshape(-1).view(np.uint8) for array in arrays])
+
+
+def array_descriptors(message):
+    """The array descriptors of a decoded JSON message, in payload order"""
+    found = []
+
+    def walk(value):
+        if isinstance(value, dict):
+            if '$array' in value:
+                found.append(value)
+            else:
+                for item in value.values():
+                    walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(message)
+    return sorted(found, key=lambda descriptor: descriptor['$array'])
+
+
+def attach_arrays(message, payload):
+    """Replace the descriptors in a decoded message by arrays read from `payload`"""
+    offset = 0
+    arrays = []
+    for descriptor in array_descriptors(message):
+        nbytes = descriptor['nbytes']
+        array = np.frombuffer(payload, dtype=descriptor['dtype'], count=nbytes // np.dtype(descriptor['dtype']).itemsize,
+                              offset=offset).reshape(descriptor['shape'])
+        arrays.append(array)
+        offset += nbytes
+
+    def replace(value):
+        if isinstance(value, dict):
+            if '$array' in value:
+                return arrays[value['$array']]
+            return {key: replace(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [replace(item) for item in value]
+        return value
+
+    return replace(message)
+
+
+class ControlServer:
+    """JSON-RPC 2.0 over a Unix socket, served by an asyncio loop on a daemon thread.
+
+    Requests are newline-delimited JSON objects (or JSON-RPC batch arrays).
+    A client may write any number of requests without waiting, so many
+    commands share one round trip; each connection executes them in arrival
+    order and answers in the same order. Responses carrying arrays use
+    encode_message() framing.
+
+    `methods` maps names to callables taking the request params. Most run on
+    a small pool of worker threads, so queries do not wait for the GUI thread
+    however busy it is with RX processing, and a slow one (a device query, a
+    retried read) does not hold up the other connections; names in
+    `gui_methods` are handed to `invoke` (callable -> concurrent.futures.Future),
+    which runs them on the GUI thread.
+    """
+
+    def __init__(self, methods, path=None, gui_methods=(), invoke=None, workers=4):
+        self.methods = dict(methods)
+        self.gui_methods = set(gui_methods)
+        self.invoke = invoke
+        self.path = path or default_socket_path()
+        self.workers = workers
+        self.executor = None
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.requests_served = 0
+
+    def start(self):
+        started = threading.Event()
+        failure = []
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='control')
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.server = self.loop.run_until_complete(self._listen())
+            except Exception as e:
+                failure.append(e)
+                started.set()
+                self.loop.close()
+                return
+            started.set()
+            try:
+                self.loop.run_forever()
+            finally:
+                self.server.close()
+                self.loop.run_until_complete(self.server.wait_closed())
+                self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        if failure:
+            self.thread = None
+            self.executor.shutdown(wait=False)
+            logging.error(f"Failed to start control server: {failure[0]}")
+            raise failure[0]
+        logging.info(f"Control server listening on {self.path}")
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2.0)
+        self.thread = None
+        self.executor.shutdown(wait=False)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        logging.info("Control server stopped")
+
+    async def _listen(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left over from a previous run
+        server = await asyncio.start_unix_server(self._serve_client, self.path, limit=1 << 20)
+        os.chmod(self.path, 0o600)
+        return server
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                data = await self._handle_line(line)
+                if data:
+                    writer.write(data)
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logging.error(f"Control connection error: {e}")
+        finally:
+            writer.close()
+
+    async def _handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return encode_message(self._error(None, PARSE_ERROR, f"Parse error: {e}"))
+        if isinstance(request, list):
+            if not request:
+                return encode_message(self._error(None, INVALID_REQUEST, "Empty batch"))
+            responses = [await self._call(item) for item in request]
+            responses = [response for response in responses if response is not None]
+            return encode_message(responses) if responses else None
+        response = await self._call(request)
+        return encode_message(response) if response is not None else None
+
+    @staticmethod
+    def _error(request_id, code, message):
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+    async def _call(self, request):
+        if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' \
+                or not isinstance(request.get('method'), str):
+            return self._error(request.get('id') if isinstance(request, dict) else None, INVALID_REQUEST,
+                               "Invalid request")
+        request_id = request.get('id')
+        name = request['method']
+        method = self.methods.get(name)
+        if method is None:
+            return self._error(request_id, METHOD_NOT_FOUND, f"Unknown method: {name}")
+        params = request.get('params', {})
+        args, kwargs = (params, {}) if isinstance(params, list) else ((), params)
+        if not isinstance(kwargs, dict):
+            return self._error(request_id, INVALID_PARAMS, "params must be an object or an array")
+
+        try:
+            if name in self.gui_methods and self.invoke is not None:
+                result = await asyncio.wrap_future(self.invoke(lambda: method(*args, **kwargs)))
+            else:
+                result = await self.loop.run_in_executor(self.executor, functools.partial(method, *args, **kwargs))
+        except RpcError as e:
+            return self._error(request_id, e.code, e.message)
+        except (TypeError, ValueError, KeyError, IndexError) as e:
+            return self._error(request_id, INVALID_PARAMS, f"{type(e).__name__}: {e}")
+        except Exception as e:
+            logging.error(f"Control method {name} failed: {e}")
+            return self._error(request_id, INTERNAL_ERROR, str(e))
+        finally:
+            self.requests_served += 1
+        if 'id' not in request:
+            return None  # Notification
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+
+class ControlClient:
+    """Blocking client for scripts and test benches.
+
+    call() waits for one result; pipeline() writes several requests before
+    reading any answer, and batch() sends them as one JSON-RPC batch. Array
+    results come back as numpy arrays. Errors raise RpcError.
+    """
+
+    def __init__(self, path=None, timeout=5.0):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path or default_socket_path())
+        self.file = self.socket.makefile('rb')
+        self.next_id = 1
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, method, params=None):
+        request = {'jsonrpc': '2.0', 'id': self.next_id, 'method': method, 'params': params or {}}
+        self.next_id += 1
+        return request
+
+    def read_message(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Control server closed the connection")
+        message = json.loads(line)
+        descriptors = array_descriptors(message)
+        if not descriptors:
+            return message
+        return attach_arrays(message, self.file.read(sum(descriptor['nbytes'] for descriptor in descriptors)))
+
+    @staticmethod
+    def result(response):
+        if 'error' in response:
+            raise RpcError(response['error']['code'], response['error']['message'])
+        return response['result']
+
+    def call(self, method, **params):
+        return self.pipeline([(method, params)])[0]
+
+    def pipeline(self, calls):
+        """Results of (method, params) pairs, all written before the first answer is read"""
+        requests = [self.request(method, params) for method, params in calls]
+        self.socket.sendall(b''.join(json.dumps(request).encode() + b'\n' for request in requests))
+        return [self.result(self.read_message()) for _ in requests]
+
+    def batch(self, calls):
+        """Results of (method, params) pairs sent as one JSON-RPC batch"""
+        requests = [self.request(method, params) for method, params in calls]
+        self.socket.sendall(json.dumps(requests).encode() + b'\n')
+        responses = {response['id']: response for response in self.read_message()}
+        return [self.result(responses[request['id']]) for request in requests]
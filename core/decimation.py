@@ -0,0 +1,163 @@
+import numpy as np
+
+# Largest decimation applied by one filter stage; bigger factors are split into stages
+MAX_STAGE_FACTOR = 8
+STOPBAND_ATTENUATION_DB = 70
+
+
+def smooth_factor(max_factor):
+    """Largest integer <= max_factor whose prime factors are all <= 7.
+
+    Such factors split into short stages, so a slightly lower decimation (and a
+    slightly higher output rate) is preferred over a large prime single stage.
+    """
+    for factor in range(max(1, int(max_factor)), 0, -1):
+        remainder = factor
+        for prime in (2, 3, 5, 7):
+            while remainder % prime == 0:
+                remainder //= prime
+        if remainder == 1:
+            return factor
+    return 1
+
+
+def plan_stages(factor):
+    """Split a decimation factor into stage factors, largest first.
+
+    The first stage runs at the highest rate but only has to protect the final
+    passband, so it gets the widest transition band and the shortest filter.
+    """
+    primes = []
+    remainder = factor
+    for prime in (2, 3, 5, 7):
+        while remainder % prime == 0:
+            primes.append(prime)
+            remainder //= prime
+    if remainder > 1:
+        primes.append(remainder)
+
+    stages = []
+    for prime in sorted(primes, reverse=True):
+        # First fit into an existing stage, otherwise open a new one
+        for index, stage in enumerate(stages):
+            if stage * prime <= MAX_STAGE_FACTOR:
+                stages[index] = stage * prime
+                break
+        else:
+            stages.append(prime)
+    return sorted(stages, reverse=True)
+
+
+def design_stage_taps(input_rate, factor, passband_hz):
+    """Kaiser-window low-pass for one stage that keeps [0, passband_hz] free of aliases"""
+    from scipy import signal  # Only needed when a decimator is built
+    output_rate = input_rate / factor
+    stopband_hz = max(output_rate - passband_hz, passband_hz * 1.05)
+    width = (stopband_hz - passband_hz) / (input_rate / 2)
+    numtaps, beta = signal.kaiserord(STOPBAND_ATTENUATION_DB, width)
+    cutoff = (passband_hz + stopband_hz) / 2
+    return signal.firwin(numtaps, cutoff, window=('kaiser', beta), fs=input_rate).astype(np.float32)
+
+
+class PolyphaseDecimator:
+    """Streaming FIR decimator that only computes the samples it keeps.
+
+    Uses scipy's polyphase upfirdn on each block with the last len(taps) - 1
+    input samples prepended, so the output is identical to filtering one long
+    stream. The taps are zero-padded so the first kept output of a block always
+    lines up with a polyphase output of upfirdn.
+    """
+
+    def __init__(self, taps, factor):
+        from scipy import signal
+        self.upfirdn = signal.upfirdn
+        self.factor = factor
+        padded = -(-(len(taps) - 1) // factor) * factor + 1
+        self.taps = np.zeros(padded, dtype=np.float32)
+        self.taps[:len(taps)] = taps
+        self.reset()
+
+    def reset(self, dtype=np.complex64):
+        self.history = np.zeros(len(self.taps) - 1, dtype=dtype)
+        self.phase = 0  # Index in the next block of the next sample to keep
+
+    def process(self, samples):
+        count = len(samples)
+        if samples.dtype != self.history.dtype:
+            self.reset(samples.dtype)
+        buffer = np.concatenate((self.history, samples))
+        self.history = buffer[len(buffer) - len(self.history):]
+        kept = -(-(count - self.phase) // self.factor) if count > self.phase else 0
+        if kept:
+            first = (len(self.taps) - 1) // self.factor
+            output = self.upfirdn(self.taps, buffer[self.phase:], 1, self.factor)[first:first + kept]
+        else:
+            output = samples[:0]
+        self.phase = (self.phase - count) % self.factor
+        return output.astype(samples.dtype, copy=False)
+
+
+class MultistageDecimator:
+    """Chain of polyphase decimators dividing the rate by `factor` in stages.
+
+    passband_hz is the one-sided bandwidth that has to survive at the output;
+    every stage only rejects what would alias into it, so the total work is
+    dominated by the low-rate stages and scales with the output bandwidth.
+    """
+
+    def __init__(self, input_rate, factor, passband_hz):
+        self.input_rate = input_rate
+        self.factor = factor
+        self.stages = []
+        rate = input_rate
+        for stage_factor in plan_stages(factor) if factor > 1 else []:
+            self.stages.append(PolyphaseDecimator(design_stage_taps(rate, stage_factor, passband_hz), stage_factor))
+            rate /= stage_factor
+        self.output_rate = rate
+
+    @property
+    def stage_factors(self):
+        return [stage.factor for stage in self.stages]
+
+    @property
+    def total_taps(self):
+        return sum(len(stage.taps) for stage in self.stages)
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, samples):
+        for stage in self.stages:
+            samples = stage.process(samples)
+        return samples
+
+
+class Mixer:
+    """Shifts samples down by offset_hz, phase-continuous across blocks.
+
+    The phase of each block comes from the sample sequence number of its first
+    sample, so blocks may be skipped without losing phase coherence. The
+    per-sample phasors are a cached table scaled by one start phasor per block,
+    which is several times cheaper than evaluating exp() for every sample.
+    """
+
+    def __init__(self, offset_hz, sample_rate):
+        self.offset_hz = offset_hz
+        self.sample_rate = sample_rate
+        self.table = np.ones(0, dtype=np.complex64)
+
+    def phasors(self, count):
+        if len(self.table) < count:
+            cycles = (self.offset_hz / self.sample_rate) * np.arange(count, dtype=np.float64)
+            self.table = np.exp(-2j * np.pi * (cycles - np.floor(cycles))).astype(np.complex64)
+        return self.table[:count]
+
+    def process(self, samples, start_sequence):
+        if not self.offset_hz or len(samples) == 0:
+            return samples
+        cycles = (self.offset_hz / self.sample_rate) * start_sequence
+        start = np.complex64(np.exp(-2j * np.pi * (cycles - np.floor(cycles))))
+        output = samples * self.phasors(len(samples))
+        output *= start
+        return output
@@ -0,0 +1,276 @@
+import errno
+import logging
+import os
+import stat
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+from core.decimation import Mixer, MultistageDecimator, smooth_factor
+from core.metrics import PipelineMetrics
+
+DEMOD_MODES = ('AM', 'FM', 'USB', 'LSB')
+DEFAULT_AUDIO_RATE = 48000
+
+# Audio bandwidth kept per mode, in Hz
+AUDIO_BANDWIDTHS = {'AM': 5000.0, 'FM': 3000.0, 'USB': 3000.0, 'LSB': 3000.0}
+WIDEBAND_FM_DEVIATION = 50e3  # At or above this deviation FM carries 15 kHz broadcast audio
+
+
+class Demodulator:
+    """Streaming AM/FM/SSB demodulator for one channel or ROI.
+
+    Each block is mixed down (offset_hz is the carrier relative to the tuned
+    frequency), decimated to the channel bandwidth, demodulated, and decimated
+    again to about audio_rate. Both decimations are multistage polyphase
+    filters, so the cost per input sample stays low and most of the work runs at
+    the channel and audio rates. SSB uses the Weaver method: the sideband is
+    centered at baseband for the channel filter and shifted back before taking
+    the real part.
+    """
+
+    def __init__(self, mode, sample_rate, offset_hz=0.0, audio_rate=DEFAULT_AUDIO_RATE,
+                 fm_deviation_hz=5000.0, deemphasis_us=None):
+        if mode not in DEMOD_MODES:
+            raise ValueError(f"Unknown demodulation mode: {mode}")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.fm_deviation_hz = fm_deviation_hz
+        self.audio_bandwidth_hz = AUDIO_BANDWIDTHS[mode]
+        if mode == 'FM' and fm_deviation_hz >= WIDEBAND_FM_DEVIATION:
+            self.audio_bandwidth_hz = 15000.0
+
+        if mode == 'FM':
+            channel_bandwidth = 2 * (fm_deviation_hz + self.audio_bandwidth_hz)  # Carson's rule
+        elif mode == 'AM':
+            channel_bandwidth = 2 * self.audio_bandwidth_hz
+        else:
+            channel_bandwidth = self.audio_bandwidth_hz
+        # SSB filters the sideband centered at baseband, half the audio bandwidth either side
+        self.weaver_hz = {'USB': 1, 'LSB': -1}.get(mode, 0) * self.audio_bandwidth_hz / 2
+        self.offset_hz = offset_hz + self.weaver_hz
+        self.mixer = Mixer(self.offset_hz, sample_rate)
+
+        channel_rate = max(channel_bandwidth, audio_rate)
+        self.channel_decimator = MultistageDecimator(
+            sample_rate, smooth_factor(sample_rate / channel_rate), channel_bandwidth / 2)
+        self.channel_rate = self.channel_decimator.output_rate
+        self.weaver_mixer = Mixer(-self.weaver_hz, self.channel_rate)
+        self.audio_decimator = MultistageDecimator(
+            self.channel_rate, smooth_factor(self.channel_rate / audio_rate), self.audio_bandwidth_hz)
+        self.audio_rate = self.audio_decimator.output_rate
+
+        self.deemphasis_us = deemphasis_us if mode == 'FM' else None
+        self.reset()
+
+    def reset(self):
+        self.channel_decimator.reset()
+        self.audio_decimator.reset()
+        self.channel_sequence = 0  # Channel-rate samples produced, for the Weaver shift
+        self.previous = np.complex64(0)  # Last channel sample, for FM phase differences
+        self.carrier_level = 0.0  # Smoothed AM envelope
+        self.dc = 0.0
+        self.deemphasis_state = np.zeros(1)
+        self.peak = 1e-6
+
+    def process(self, samples, start_sequence=0):
+        """Demodulate one block of raw IQ; returns float32 audio in [-1, 1] at audio_rate"""
+        baseband = self.mixer.process(samples, start_sequence)
+        channel = self.channel_decimator.process(baseband)
+        if len(channel) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        if self.mode == 'FM':
+            audio = self.demodulate_fm(channel)
+        elif self.mode == 'AM':
+            audio = self.demodulate_am(channel)
+        else:
+            audio = self.demodulate_ssb(channel)
+        audio = self.audio_decimator.process(audio.astype(np.float32, copy=False))
+        if self.deemphasis_us:
+            audio = self.deemphasize(audio)
+        return self.normalize(audio)
+
+    def demodulate_fm(self, channel):
+        # Phase difference between consecutive samples, scaled so full deviation is 1.0
+        delayed = np.concatenate(([self.previous], channel[:-1]))
+        self.previous = channel[-1]
+        phase = np.angle(channel * np.conj(delayed))
+        return phase * (self.channel_rate / (2 * np.pi * self.fm_deviation_hz))
+
+    def demodulate_am(self, channel):
+        # Envelope relative to a slowly tracked carrier level, so the output is modulation depth
+        envelope = np.abs(channel)
+        alpha = min(1.0, 20.0 / self.channel_rate * len(envelope))  # About a 50 ms time constant
+        self.carrier_level += alpha * (float(np.mean(envelope)) - self.carrier_level)
+        if self.carrier_level <= 0:
+            return np.zeros(len(envelope), dtype=np.float32)
+        return envelope / self.carrier_level - 1.0
+
+    def demodulate_ssb(self, channel):
+        # Shift the sideband back so it starts at 0 Hz; the real part is the audio
+        shifted = self.weaver_mixer.process(channel, self.channel_sequence)
+        self.channel_sequence += len(channel)
+        return shifted.real
+
+    def deemphasize(self, audio):
+        from scipy import signal
+        pole = np.exp(-1.0 / (self.audio_rate * self.deemphasis_us * 1e-6))
+        output, self.deemphasis_state = signal.lfilter([1 - pole], [1, -pole], audio, zi=self.deemphasis_state)
+        return output.astype(np.float32)
+
+    def normalize(self, audio):
+        if len(audio) == 0:
+            return audio
+        # Slow DC removal and a peak-following gain with about a 2 s release
+        self.dc += min(1.0, len(audio) / self.audio_rate) * (float(np.mean(audio)) - self.dc)
+        audio = audio - np.float32(self.dc)
+        release = 0.5 ** (len(audio) / (2.0 * self.audio_rate))
+        self.peak = max(float(np.max(np.abs(audio))), self.peak * release, 1e-6)
+        return np.clip(audio * np.float32(0.8 / self.peak), -1.0, 1.0).astype(np.float32)
+
+
+class WavSink:
+    """16-bit mono WAV file"""
+
+    def __init__(self, path, sample_rate):
+        self.path = path
+        self.file = wave.open(path, 'wb')
+        self.file.setnchannels(1)
+        self.file.setsampwidth(2)
+        self.file.setframerate(int(round(sample_rate)))
+
+    def write(self, audio):
+        self.file.writeframes(to_pcm16(audio))
+
+    def close(self):
+        self.file.close()
+
+
+class PipeSink:
+    """Raw signed 16-bit little-endian mono samples on a binary stream (stdout, a FIFO)"""
+
+    def __init__(self, stream, close_stream=False):
+        self.stream = stream
+        self.close_stream = close_stream
+
+    def write(self, audio):
+        self.stream.write(to_pcm16(audio))
+        self.stream.flush()
+
+    def close(self):
+        if self.close_stream:
+            self.stream.close()
+
+
+def to_pcm16(audio):
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+def open_audio_sink(target, sample_rate, keep_waiting=lambda: True, poll_interval=0.1):
+    """'-' writes raw PCM to stdout, a .wav path writes a WAV file, anything else (a FIFO) raw PCM.
+
+    Opening a FIFO waits for a reader to attach, polling without blocking so
+    the wait ends with None once `keep_waiting()` turns false.
+    """
+    if target == '-':
+        return PipeSink(sys.stdout.buffer)
+    if target.lower().endswith('.wav'):
+        return WavSink(target, sample_rate)
+    if not (os.path.exists(target) and stat.S_ISFIFO(os.stat(target).st_mode)):
+        return PipeSink(open(target, 'wb'), close_stream=True)
+    logging.info(f"Waiting for a reader on {target}")
+    while keep_waiting():
+        try:
+            fd = os.open(target, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno != errno.ENXIO:  # ENXIO: no reader yet
+                raise
+            time.sleep(poll_interval)
+            continue
+        os.set_blocking(fd, True)  # Once a reader is there, a slow one holds up the worker as a file would
+        return PipeSink(os.fdopen(fd, 'wb'), close_stream=True)
+    return None
+
+
+class DemodulatorWorker:
+    """Feeds a Demodulator from a channel's IQHistory on its own thread.
+
+    The receive thread is never blocked: the worker polls the ring for new
+    samples. If it falls more than max_latency seconds behind, it skips ahead
+    and resets the filters, so a slow sink costs audio rather than memory.
+    `open_sink(keep_waiting)` is called on the worker thread, since opening a
+    FIFO waits for its reader; it returns the sink, or None if stopped first.
+    """
+
+    POLL_INTERVAL = 0.02  # Seconds
+
+    def __init__(self, iq_history, demodulator_factory, open_sink, metrics=None, channel=0, max_latency=0.5):
+        self.iq_history = iq_history
+        self.demodulator_factory = demodulator_factory  # sample_rate -> Demodulator
+        self.open_sink = open_sink
+        self.sink = None
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        self.channel = channel
+        self.max_latency = max_latency
+        self.running = False
+        self.thread = None
+        self.samples_in = 0
+        self.samples_out = 0
+        self.skipped_samples = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _run(self):
+        history = self.iq_history
+        demodulator = None
+        try:
+            self.sink = self.open_sink(lambda: self.running)
+            sequence = history.written  # Audio starts once the sink is open
+            while self.running and self.sink is not None:
+                sample_rate = history.sample_rate
+                if demodulator is None or demodulator.sample_rate != sample_rate:
+                    demodulator = self.demodulator_factory(sample_rate)
+                start, samples = history.read_since(sequence, int(self.max_latency * sample_rate))
+                if len(samples) == 0:
+                    time.sleep(self.POLL_INTERVAL)
+                    continue
+                if start != sequence:
+                    self.skipped_samples += start - sequence
+                    demodulator.reset()
+                sequence = start + len(samples)
+
+                began = time.perf_counter()
+                audio = demodulator.process(samples, start)
+                self.sink.write(audio)
+                elapsed = time.perf_counter() - began
+                self.busy_seconds += elapsed
+                self.samples_in += len(samples)
+                self.samples_out += len(audio)
+                self.metrics.observe('demod_seconds', self.channel, elapsed)
+        except Exception as e:
+            logging.error(f"Demodulator on RX{self.channel} stopped: {e}")
+        finally:
+            self.running = False
+            if self.sink is not None:
+                self.sink.close()
+
+    def real_time_factor(self):
+        """Signal seconds processed per second of CPU time spent processing"""
+        if self.busy_seconds <= 0:
+            return 0.0
+        return self.samples_in / self.iq_history.sample_rate / self.busy_seconds
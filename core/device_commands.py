@@ -0,0 +1,121 @@
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from core.metrics import PipelineMetrics
+
+
+class DeviceCommandWorker(QObject):
+    """Applies radio settings on a background thread, coalescing bursts of requests.
+
+    Only the latest pending value of each (parameter, channel) pair is applied, so
+    dragging a slider across hundreds of positions costs at most one retune per
+    pass of the worker. Before the first command of a pass that changes a
+    channel's frequency or rate, the retune start callback is told the channel,
+    so the receiver stops assembling frames from then on. After the pass the
+    retune callback is told the same channel, so the receiver can discard
+    samples taken while the LO and clocks settle and then resume. It is called
+    even when the change failed, so a failed retune does not stall the stream.
+    """
+
+    command_applied = pyqtSignal(str, int, float)  # Parameter, channel, actual value
+    command_failed = pyqtSignal(str, int, str)  # Parameter, channel, error message
+
+    # Clock then rate first: changing them can move the tuned frequency on some
+    # devices. The master clock is device-wide and is submitted on channel 0.
+    APPLY_ORDER = ('master_clock_rate', 'rate', 'freq', 'gain', 'bandwidth')
+    RETUNE_PARAMETERS = ('rate', 'freq')
+
+    def __init__(self, usrp_control, metrics=None, retune_callback=None, settle_time=0.1, first_channel=0,
+                 retune_start_callback=None):
+        super().__init__()
+        self.usrp_control = usrp_control
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        # Metrics are labelled first_channel + RX channel, like the radio's TxRx
+        self.first_channel = first_channel
+        self.retune_callback = retune_callback
+        self.retune_start_callback = retune_start_callback
+        self.settle_time = settle_time
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def submit(self, parameter, channel, value):
+        """Queue a setting; replaces any value for the same parameter not yet applied"""
+        if parameter not in self.APPLY_ORDER:
+            raise ValueError(f"Unknown device parameter: {parameter}")
+        with self.condition:
+            if (parameter, channel) in self.pending:
+                self.metrics.increment('coalesced_commands_total', self.first_channel + channel)
+            self.pending[(parameter, channel)] = value
+            self.condition.notify()
+
+    def pending_count(self):
+        with self.condition:
+            return len(self.pending)
+
+    def _take_pending(self):
+        with self.condition:
+            while self.running and not self.pending:
+                self.condition.wait()
+            pending, self.pending = self.pending, {}
+        return sorted(pending.items(), key=lambda item: (self.APPLY_ORDER.index(item[0][0]), item[0][1]))
+
+    def _apply(self, parameter, channel, value):
+        control = self.usrp_control
+        if parameter == 'master_clock_rate':
+            return control.set_master_clock_rate(value)
+        if parameter == 'rate':
+            # The settling time is covered by discarding samples rather than sleeping here
+            return control.set_rx_rate(value, channel, settle=0)
+        if parameter == 'freq':
+            return control.set_rx_freq(value, channel)
+        if parameter == 'gain':
+            return control.set_rx_gain(value, channel)
+        return control.set_bandwidth(value, channel)
+
+    def _notify(self, callback, channel, *args):
+        if callback is None:
+            return
+        try:
+            callback(channel, *args)
+        except Exception as e:
+            logging.warning(f"Retune notification for RX{channel} failed: {e}")
+
+    def _run(self):
+        while True:
+            commands = self._take_pending()
+            if not self.running:
+                break
+            retuning = sorted({channel for (parameter, channel), _ in commands if parameter in self.RETUNE_PARAMETERS})
+            for channel in retuning:
+                self._notify(self.retune_start_callback, channel)
+            retuned = set()
+            for (parameter, channel), value in commands:
+                try:
+                    actual = self._apply(parameter, channel, value)
+                    self.command_applied.emit(parameter, channel, float(actual))
+                    if parameter in self.RETUNE_PARAMETERS:
+                        retuned.add(channel)
+                except Exception as e:
+                    logging.error(f"Failed to apply {parameter}={value} on RX{channel}: {e}")
+                    self.command_failed.emit(parameter, channel, str(e))
+            for channel in retuning:
+                if channel in retuned:
+                    self.metrics.increment('retunes_total', self.first_channel + channel)
+                self._notify(self.retune_callback, channel, self.settle_time)
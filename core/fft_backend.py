@@ -0,0 +1,131 @@
+import importlib.util
+import logging
+import os
+import time
+
+import numpy as np
+
+# scipy.fft and pyfftw are imported when a backend using them is created, so that
+# importing this module stays cheap at application startup
+
+# Transform sizes offered in the UI, up to 1M points for narrow resolution bandwidths
+MIN_FFT_SIZE = 1 << 9
+MAX_FFT_SIZE = 1 << 20
+FFT_SIZES = [1 << n for n in range(9, 21)]
+
+
+class NumpyFFT:
+    """Reference backend: single-threaded numpy.fft, result cast back to complex64.
+
+    Always allocates its output (numpy.fft computes in complex128).
+    """
+
+    name = 'numpy'
+
+    def fft(self, x, overwrite=False):
+        return np.fft.fft(x, axis=-1).astype(np.complex64, copy=False)
+
+
+class ScipyFFT:
+    """scipy.fft with a worker pool; keeps complex64 in and out.
+
+    With overwrite=True a complex64 input is transformed in place and returned,
+    so nothing is allocated.
+    """
+
+    name = 'scipy'
+
+    def __init__(self, workers=None):
+        import scipy.fft
+        self.scipy_fft = scipy.fft
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    def fft(self, x, overwrite=False):
+        return self.scipy_fft.fft(x, axis=-1, workers=self.workers, overwrite_x=overwrite)
+
+
+class FFTWFFT:
+    """pyFFTW with one cached plan per input shape.
+
+    The returned array is the plan's internal output buffer and is overwritten by
+    the next call with the same shape; copy it if it has to outlive the frame.
+    Nothing is allocated per call, so `overwrite` makes no difference.
+    """
+
+    name = 'pyfftw'
+
+    def __init__(self, threads=None, planner_effort='FFTW_MEASURE'):
+        try:
+            import pyfftw
+            import pyfftw.builders
+        except ImportError:
+            raise RuntimeError("pyFFTW is not installed")
+        self.pyfftw = pyfftw
+        self.threads = threads if threads is not None else (os.cpu_count() or 1)
+        self.planner_effort = planner_effort
+        self.plans = {}
+
+    def fft(self, x, overwrite=False):
+        plan = self.plans.get(x.shape)
+        if plan is None:
+            template = self.pyfftw.empty_aligned(x.shape, dtype=np.complex64)
+            plan = self.pyfftw.builders.fft(template, axis=-1, threads=self.threads,
+                                       planner_effort=self.planner_effort)
+            self.plans[x.shape] = plan
+        return plan(x)
+
+
+def backend_names():
+    """Names of the backends usable on this host, without importing them"""
+    names = [NumpyFFT.name, ScipyFFT.name]
+    if importlib.util.find_spec('pyfftw') is not None:
+        names.append(FFTWFFT.name)
+    return names
+
+
+def available_backends():
+    """Instantiate every backend usable on this host"""
+    backends = [NumpyFFT(), ScipyFFT()]
+    if importlib.util.find_spec('pyfftw') is not None:
+        try:
+            backends.append(FFTWFFT())
+        except Exception as e:
+            logging.warning(f"pyFFTW backend unavailable: {e}")
+    return backends
+
+
+def benchmark_backend(backend, size=4096, batch=4, repeats=5):
+    """Best-of-N wall time for one transform of a batch x size complex64 block"""
+    rng = np.random.default_rng(0)
+    data = (rng.standard_normal((batch, size)) + 1j * rng.standard_normal((batch, size))).astype(np.complex64)
+    backend.fft(data)  # Warm-up (plan creation, thread pool start)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.fft(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def select_fastest_backend(size=4096, batch=4, repeats=5):
+    """Benchmark the available backends briefly and return the fastest one"""
+    timings = []
+    for backend in available_backends():
+        try:
+            timings.append((benchmark_backend(backend, size, batch, repeats), backend))
+        except Exception as e:
+            logging.warning(f"FFT backend {backend.name} failed self-benchmark: {e}")
+    if not timings:
+        return NumpyFFT()
+    timings.sort(key=lambda item: item[0])
+    summary = ", ".join(f"{backend.name}={elapsed * 1e6:.0f} us" for elapsed, backend in timings)
+    logging.info(f"FFT backend self-benchmark ({batch}x{size}): {summary}; using {timings[0][1].name}")
+    return timings[0][1]
+
+
+def get_backend(name):
+    """Create a backend by name"""
+    for backend_class in (NumpyFFT, ScipyFFT, FFTWFFT):
+        if backend_class.name == name:
+            return backend_class()
+    raise ValueError(f"Unknown or unavailable FFT backend: {name}")
@@ -0,0 +1,96 @@
+import numpy as np
+
+from core.sample_formats import to_complex64
+from core.spectral_storage import SPECTRUM_DTYPE
+from core.spectrogram import window_coefficients
+
+
+class SpectrumSettings:
+    """The FFT backend (by name), window and calibration that turn IQ frames into display spectra.
+
+    Plain values, so they can be handed to worker threads and processes; the
+    main window replaces the object on every change instead of mutating it.
+    """
+
+    __slots__ = ('fft_backend', 'window_name', 'calibration_db')
+
+    def __init__(self, fft_backend='numpy', window_name='Hamming', calibration_db=0.0):
+        self.fft_backend = fft_backend
+        self.window_name = window_name
+        self.calibration_db = calibration_db
+
+
+class FrameProcessor:
+    """Turns blocks of IQ frames into calibrated dB spectra in buffers reused from call to call.
+
+    Scratch arrays are allocated once per block shape (frames, fft_size) and
+    every step writes into them with out= and in-place ufuncs. Operations that
+    would broadcast a row over the block run frame by frame instead, as numpy
+    allocates iterator buffers for broadcasts and reductions:
+
+    - sc16 blocks are converted into the complex scratch, fc32 blocks are read as is
+    - the window carries a (-1)^n factor, which centres DC like fftshift without a copy
+    - the FFT runs in place with scipy; pyFFTW writes into its plan's own buffer
+    - magnitude, log and calibration are written into one float32 block
+
+    The spectra returned by process() and the rows returned by waterfall_rows()
+    are overwritten by the next call, so each channel needs its own processor.
+    """
+
+    def __init__(self):
+        self.shape = None
+        self.window_key = None
+        self.column_count = None
+
+    def plan(self, shape):
+        self.shape = shape
+        self.samples = np.empty(shape, dtype=np.complex64)
+        self.power_db = np.empty(shape, dtype=SPECTRUM_DTYPE)
+        self.window_key = None
+        self.column_count = None
+
+    def window(self, window_name, size):
+        if self.window_key != (window_name, size):
+            self.window_key = (window_name, size)
+            alternating = np.where(np.arange(size) % 2, -1.0, 1.0)
+            self.shifted_window = (window_coefficients(window_name, size) * alternating).astype(np.complex64)
+        return self.shifted_window
+
+    def process(self, block, fft_backend, window_name='Hamming', calibration_db=0.0):
+        """(frames, fft_size) fftshifted power spectra in dB of a host-format block"""
+        shape = block.shape[:2]
+        if shape != self.shape:
+            self.plan(shape)
+        samples = self.samples
+        window = self.window(window_name, shape[1])
+        if block.dtype == np.complex64:
+            for source, frame in zip(block, samples):
+                np.multiply(source, window, out=frame)
+        else:
+            to_complex64(block, out=samples)
+            for frame in samples:
+                np.multiply(frame, window, out=frame)
+
+        spectra = fft_backend.fft(samples, overwrite=True)
+        power_db = self.power_db
+        np.abs(spectra, out=power_db)
+        np.add(power_db, np.float32(1e-12), out=power_db)
+        np.log10(power_db, out=power_db)
+        np.multiply(power_db, np.float32(20.0), out=power_db)
+        np.add(power_db, np.float32(calibration_db), out=power_db)
+        return power_db
+
+    def waterfall_rows(self, power_db, max_columns):
+        """Peak-preserving decimation of the spectra to at most `max_columns` columns"""
+        columns = min(power_db.shape[1], max_columns)
+        if columns == power_db.shape[1]:
+            return power_db
+        if self.column_count != columns:
+            self.column_count = columns
+            self.rows = np.empty((power_db.shape[0], columns), dtype=SPECTRUM_DTYPE)
+        groups = power_db.reshape(power_db.shape[0], columns, -1)
+        rows = self.rows
+        np.copyto(rows, groups[..., 0])
+        for member in range(1, groups.shape[-1]):
+            np.maximum(rows, groups[..., member], out=rows)
+        return rows
@@ -0,0 +1,188 @@
+import threading
+
+import numpy as np
+
+from core.sample_formats import allocate, to_complex64
+
+# Raw IQ kept per channel by default: 4M complex64 samples (32 MB), 4 s at 1 MSps
+DEFAULT_IQ_HISTORY_SAMPLES = 1 << 22
+
+
+class IQClip:
+    """Contiguous raw IQ copied out of an IQHistory"""
+
+    def __init__(self, samples, sample_rate, start_time, start_sequence=None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.start_time = start_time  # Host time of the first sample
+        self.start_sequence = start_sequence  # Its sequence number in the history
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+
+class IQHistory:
+    """Ring buffer of the most recent raw IQ samples of one channel, with host timestamps.
+
+    Written by the receive thread on every recv(). Time is tracked with sparse
+    markers (sample sequence, host time, sample rate) recorded at the start, every
+    MARKER_INTERVAL seconds and after each discontinuity, so a host time maps to a
+    sample position without storing a timestamp per packet. Readers copy a time
+    range out with extract(), or a range of sample sequence numbers with
+    extract_range(); either drops any part overwritten during the copy.
+
+    Samples are stored in the receive format (complex64 for fc32, int16 I/Q
+    pairs for sc16, which halves the memory) and converted to complex64 when
+    read, unless a reader asks for the raw samples.
+    """
+
+    MARKER_INTERVAL = 0.05  # Seconds
+    MAX_MARKERS = 1 << 14
+
+    def __init__(self, capacity, sample_rate, cpu_format='fc32'):
+        self.capacity = int(capacity)
+        self.sample_rate = sample_rate
+        self.cpu_format = cpu_format
+        self.data = allocate(self.capacity, cpu_format)
+        self.written = 0  # Samples written since creation; sequence number of the next sample
+        self.write_end = 0  # End of the write in progress; samples before write_end - capacity may be gone
+        self.marker_seq = np.zeros(self.MAX_MARKERS, dtype=np.int64)
+        self.marker_time = np.zeros(self.MAX_MARKERS, dtype=np.float64)
+        self.marker_rate = np.zeros(self.MAX_MARKERS, dtype=np.float64)
+        self.marker_count = 0
+        self.last_marker_time = None
+        self.force_marker = True
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @property
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def set_sample_rate(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.force_marker = True
+
+    def mark_discontinuity(self):
+        """Samples were lost; re-anchor the time base at the next write"""
+        self.force_marker = True
+
+    def write(self, samples, timestamp):
+        """Append samples; timestamp is the host time of the first one"""
+        count = len(samples)
+        if count == 0:
+            return
+        if count > self.capacity:
+            skipped = count - self.capacity
+            samples = samples[skipped:]
+            timestamp += skipped / self.sample_rate
+            self.written += skipped
+            self.force_marker = True
+            count = self.capacity
+
+        if self.force_marker or timestamp - self.last_marker_time >= self.MARKER_INTERVAL:
+            with self.lock:
+                slot = self.marker_count % self.MAX_MARKERS
+                self.marker_seq[slot] = self.written
+                self.marker_time[slot] = timestamp
+                self.marker_rate[slot] = self.sample_rate
+                self.marker_count += 1
+            self.last_marker_time = timestamp
+            self.force_marker = False
+
+        self.write_end = self.written + count
+        start = self.written % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        if first < count:
+            self.data[:count - first] = samples[first:]
+        self.written += count
+
+    def _markers(self):
+        # Chronological copy of the live markers
+        with self.lock:
+            count = min(self.marker_count, self.MAX_MARKERS)
+            order = np.arange(self.marker_count - count, self.marker_count) % self.MAX_MARKERS
+            return self.marker_seq[order], self.marker_time[order], self.marker_rate[order]
+
+    def sequence_at(self, timestamp, markers=None):
+        """Sample sequence number recorded at a host time, clipped to the stored range"""
+        seqs, times, rates = markers if markers is not None else self._markers()
+        if not len(seqs):
+            return self.written
+        index = max(0, int(np.searchsorted(times, timestamp, side='right')) - 1)
+        sequence = seqs[index] + int(round((timestamp - times[index]) * rates[index]))
+        if index + 1 < len(seqs):
+            sequence = min(sequence, seqs[index + 1])
+        return int(np.clip(sequence, self.oldest, self.written))
+
+    def time_at(self, sequence, markers=None):
+        seqs, times, rates = markers if markers is not None else self._markers()
+        if not len(seqs):
+            return 0.0, self.sample_rate
+        index = max(0, int(np.searchsorted(seqs, sequence, side='right')) - 1)
+        return times[index] + (sequence - seqs[index]) / rates[index], rates[index]
+
+    def _copy(self, first, count, raw):
+        # Samples first .. first + count - 1 as at most two slices of the ring, copied or converted
+        head = first % self.capacity
+        pieces = (self.data[head:head + count],)
+        if head + count > self.capacity:
+            pieces = (self.data[head:], self.data[:head + count - self.capacity])
+        if raw:
+            return np.concatenate(pieces) if len(pieces) > 1 else pieces[0].copy()
+        if len(pieces) == 1:
+            return to_complex64(pieces[0]) if pieces[0].dtype != np.complex64 else pieces[0].copy()
+        return np.concatenate([to_complex64(piece) for piece in pieces])
+
+    def extract(self, start_time, end_time, raw=False):
+        """Copy of the samples recorded between two host times, or None if nothing is stored.
+
+        With raw=True the clip holds the samples in the storage format instead of complex64.
+        """
+        markers = self._markers()
+        return self.extract_range(self.sequence_at(start_time, markers), self.sequence_at(end_time, markers),
+                                  raw, markers)
+
+    def extract_range(self, first, last, raw=False, markers=None):
+        """Copy of samples first .. last - 1 by sequence number, clipped to what is stored, or None"""
+        markers = markers if markers is not None else self._markers()
+        first = max(int(first), self.oldest)
+        last = min(int(last), self.written)
+        if last <= first:
+            return None
+
+        samples = self._copy(first, last - first, raw)
+        # The writer may have lapped the start of the range while it was copied
+        overwritten = self.write_end - self.capacity - first
+        if overwritten > 0:
+            samples = samples[overwritten:]
+            first += overwritten
+        if len(samples) == 0:
+            return None
+        clip_start, sample_rate = self.time_at(first, markers)
+        return IQClip(samples, sample_rate, clip_start, first)
+
+    def read_since(self, sequence, max_samples=None, raw=False):
+        """Samples written after `sequence`, as (sequence of the first sample, samples).
+
+        At most the newest max_samples are returned; a reader that falls behind
+        skips ahead rather than accumulating latency. With raw=True the samples
+        are returned in the storage format instead of complex64.
+        """
+        end = self.written
+        start = max(sequence, self.oldest)
+        if max_samples is not None:
+            start = max(start, end - max_samples)
+        if end <= start:
+            return end, self.data[:0] if raw else to_complex64(self.data[:0])
+        samples = self._copy(start, end - start, raw)
+        overwritten = self.write_end - self.capacity - start
+        if overwritten > 0:
+            samples = samples[overwritten:]
+            start += overwritten
+        return start, samples
@@ -0,0 +1,294 @@
+import bisect
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class RollingHistogram:
+    """Keeps the last `window` observations of a value in a fixed ring buffer.
+
+    `count`, `total` and the per-bucket counts at `bounds` cover every
+    observation since the last reset, for exporting as Prometheus counters.
+    """
+
+    def __init__(self, window=1024, bounds=()):
+        self.window = window
+        self.values = np.zeros(window, dtype=np.float64)
+        self.index = 0
+        self.filled = 0
+        self.count = 0
+        self.total = 0.0
+        self.bounds = tuple(bounds)
+        self.bucket_counts = [0] * len(self.bounds)
+
+    def observe(self, value):
+        # O(1) on the hot path; statistics are computed only when read
+        self.values[self.index] = value
+        self.index = (self.index + 1) % self.window
+        if self.filled < self.window:
+            self.filled += 1
+        self.count += 1
+        self.total += value
+        bucket = bisect.bisect_left(self.bounds, value)  # First bound >= value
+        if bucket < len(self.bounds):
+            self.bucket_counts[bucket] += 1
+
+    def recent(self):
+        return self.values[:self.filled]
+
+    def summary(self):
+        recent = self.recent()
+        if len(recent) == 0:
+            return {'count': self.count, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+        return {
+            'count': self.count,
+            'mean': float(np.mean(recent)),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(np.max(recent)),
+        }
+
+    def buckets(self):
+        """Observations since the reset at or below each of `bounds` (Prometheus `le` buckets)"""
+        counts = list(self.bucket_counts)
+        for n in range(1, len(counts)):
+            counts[n] += counts[n - 1]
+        return counts
+
+    def reset(self):
+        self.index = 0
+        self.filled = 0
+        self.count = 0
+        self.total = 0.0
+        self.bucket_counts = [0] * len(self.bounds)
+
+
+class PipelineMetrics:
+    """Per-channel latency histograms, counters and gauges for the RX/DSP/display pipeline"""
+
+    # Histograms are recorded in seconds
+    HISTOGRAMS = {
+        'recv_seconds': "Time spent inside rx_streamer.recv()",
+        'fft_seconds': "Time spent windowing, transforming and converting a frame to dB",
+        'waterfall_seconds': "Time spent updating waterfall history",
+        'render_seconds': "Time spent pushing a channel to the plots",
+        'roi_seconds': "Time spent measuring all ROIs of a channel on one frame",
+        'demod_seconds': "Time spent demodulating one block of IQ to audio",
+        'trigger_seconds': "Time spent on spectra and the capture trigger for one read of a channel's raw IQ",
+        'burst_detect_seconds': "Time spent reading and scanning one batch of raw IQ for bursts",
+        'stage_seconds': "Time spent in a processing pipeline stage on one block, per channel:stage",
+    }
+    COUNTERS = {
+        'samples_total': "Samples received from the device",
+        'frames_total': "Frames handed to the processing stage",
+        'dropped_frames_total': "Frames dropped because the processing queue was full",
+        'pool_exhausted_total': "Blocks dropped because no pooled receive buffer was free",
+        'overflows_total': "Overflow ('O') events reported in rx_metadata",
+        'sequence_errors_total': "Out-of-sequence ('D') events reported in rx_metadata",
+        'timeouts_total': "recv() calls that timed out",
+        'gap_samples_total': "Samples missing between consecutive rx_metadata timestamps",
+        'retunes_total': "Frequency or sample rate changes applied to the device",
+        'coalesced_commands_total': "Device settings superseded before they were applied",
+        'retune_discarded_samples_total': "Samples discarded while the LO settled after a retune",
+        'triggers_total': "Capture triggers that fired (after the holdoff)",
+        'bursts_written_total': "Triggered IQ bursts saved to disk",
+        'bursts_dropped_total': "Triggered IQ bursts dropped by the write queue or rate limit",
+        'bursts_total': "Bursts found by the time-domain burst detector",
+        'stage_dropped_blocks_total': "Blocks dropped because a threaded or process stage's queue was full",
+    }
+    GAUGES = {
+        'samples_per_second': "Receive throughput over the last second",
+        'queue_depth': "Frames emitted by the receiver but not yet processed",
+        'time_to_window_seconds': "Process start until the main window was first shown",
+        'time_to_device_seconds': "Process start until the radio was opened and configured",
+        'time_to_first_spectrum_seconds': "Process start until the first spectrum was drawn",
+        'burst_detector_real_time_factor': "Signal seconds the burst detector scans per second of processing",
+    }
+    BUCKET_BOUNDS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 1e-1, 5e-1)
+
+    def __init__(self, window=1024, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, channel):
+        key = (name, channel)
+        hist = self.histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(key, RollingHistogram(self.window, self.BUCKET_BOUNDS))
+        return hist
+
+    def observe(self, name, channel, seconds):
+        if self.enabled:
+            self.histogram(name, channel).observe(seconds)
+
+    def increment(self, name, channel, amount=1):
+        if self.enabled:
+            key = (name, channel)
+            if key in self.counters:
+                self.counters[key] += amount
+            else:
+                with self._lock:  # New series only appear under the lock the exporters copy under
+                    self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, channel, value):
+        if self.enabled:
+            key = (name, channel)
+            if key in self.gauges:
+                self.gauges[key] = value
+            else:
+                with self._lock:
+                    self.gauges[key] = value
+
+    def get_counter(self, name, channel):
+        return self.counters.get((name, channel), 0)
+
+    def get_gauge(self, name, channel):
+        return self.gauges.get((name, channel), 0.0)
+
+    def snapshot(self):
+        """Copy of all series, keyed by (name, channel)"""
+        with self._lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            'histograms': {key: hist.summary() for key, hist in histograms.items()},
+            'counters': counters,
+            'gauges': gauges,
+        }
+
+    def reset(self):
+        with self._lock:
+            for hist in self.histograms.values():
+                hist.reset()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def to_prometheus(self, prefix='b205'):
+        """Render all series in the Prometheus text exposition format.
+
+        Histograms are exported cumulatively since the last reset, as
+        Prometheus expects; the rolling window only feeds summary().
+        """
+        lines = []
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+        histograms, counters, gauges = (sorted(series, key=lambda item: (item[0][0], str(item[0][1])))
+                                        for series in (histograms, counters, gauges))
+
+        declared = set()
+        for (name, channel), hist in histograms:
+            metric = f"{prefix}_{name}"
+            if metric not in declared:
+                lines.append(f"# HELP {metric} {self.HISTOGRAMS.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            count, total = hist.count, hist.total  # Read before the buckets so +Inf never trails them
+            for bound, bucket_count in zip(hist.bounds, hist.buckets()):
+                lines.append(f'{metric}_bucket{{channel="{channel}",le="{bound:g}"}} {min(bucket_count, count)}')
+            lines.append(f'{metric}_bucket{{channel="{channel}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{channel="{channel}"}} {total:.9g}')
+            lines.append(f'{metric}_count{{channel="{channel}"}} {count}')
+
+        for series, kind, descriptions in ((counters, 'counter', self.COUNTERS), (gauges, 'gauge', self.GAUGES)):
+            for (name, channel), value in series:
+                metric = f"{prefix}_{name}"
+                if metric not in declared:
+                    lines.append(f"# HELP {metric} {descriptions.get(name, name)}")
+                    lines.append(f"# TYPE {metric} {kind}")
+                    declared.add(metric)
+                lines.append(f'{metric}{{channel="{channel}"}} {value:.9g}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the Prometheus text file atomically (for node_exporter's textfile collector)"""
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+            logging.info(f"Metrics written to {path}")
+        except Exception as e:
+            logging.error(f"Failed to write metrics to {path}: {e}")
+            raise
+
+
+class StageTimer:
+    """Context manager recording the elapsed time of a block into a metrics histogram"""
+
+    __slots__ = ('metrics', 'name', 'channel', 'start')
+
+    def __init__(self, metrics, name, channel):
+        self.metrics = metrics
+        self.name = name
+        self.channel = channel
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, self.channel, time.perf_counter() - self.start)
+        return False
+
+
+class MetricsServer:
+    """Serves /metrics over HTTP on localhost from a daemon thread"""
+
+    def __init__(self, metrics, port=9105, host='127.0.0.1'):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        import http.server  # Only needed once the endpoint is enabled
+        metrics = self.metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.httpd = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+            self.port = self.httpd.server_address[1]
+            self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+            self.thread.start()
+            logging.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+        except Exception as e:
+            logging.error(f"Failed to start metrics endpoint: {e}")
+            raise
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.thread.join(timeout=1.0)
+            self.httpd = None
+            logging.info("Metrics endpoint stopped")
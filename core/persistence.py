@@ -0,0 +1,73 @@
+import numpy as np
+
+# Power axis of the persistence image, in dB (0.5 dB per row by default)
+PERSISTENCE_FLOOR_DB = -160.0
+PERSISTENCE_CEILING_DB = 20.0
+
+
+class PersistenceHistogram:
+    """Decaying power-vs-frequency histogram of spectra, rendered as an image.
+
+    The image is always `rows` power levels by `columns` frequencies, whatever
+    the FFT size: wider spectra are binned down (every bin counts) and narrower
+    ones are sampled up. Each update bins a single spectrum or a batch of them
+    with one bincount over flattened indices, and fades what was there by the
+    time the batch covers, so hundreds of spectra per second cost one pass each
+    and the render cost stays fixed.
+    """
+
+    def __init__(self, columns=1024, rows=360, floor_db=PERSISTENCE_FLOOR_DB, ceiling_db=PERSISTENCE_CEILING_DB,
+                 half_life=1.0):
+        self.columns = columns
+        self.rows = rows
+        self.floor_db = floor_db
+        self.ceiling_db = ceiling_db
+        self.half_life = half_life  # Seconds for old spectra to fade to half intensity
+        self.counts = np.zeros((rows, columns), dtype=np.float32)
+        self.display = np.zeros((rows, columns), dtype=np.float32)
+        self.total_spectra = 0
+        self.bins = None
+        self.bin_columns = None  # Column of every FFT bin, or None when there are fewer bins than columns
+        self.column_bins = None  # FFT bin sampled for every column in that case
+
+    def clear(self):
+        self.counts[:] = 0
+        self.total_spectra = 0
+
+    def decay(self, elapsed):
+        if self.half_life > 0 and elapsed > 0:
+            self.counts *= np.float32(0.5 ** (elapsed / self.half_life))
+
+    def map_bins(self, bins):
+        # Recomputed only when the FFT size changes
+        self.bins = bins
+        if bins >= self.columns:
+            self.bin_columns = np.arange(bins) * self.columns // bins
+            self.column_bins = None
+        else:
+            self.bin_columns = np.arange(self.columns)
+            self.column_bins = np.arange(self.columns) * bins // self.columns
+
+    def accumulate(self, power_db, elapsed=0.0):
+        """Fade the existing image by `elapsed` seconds, then add one spectrum or a batch of them"""
+        self.decay(elapsed)
+        spectra = np.atleast_2d(power_db)
+        if spectra.shape[1] != self.bins:
+            self.map_bins(spectra.shape[1])
+        if self.column_bins is not None:
+            spectra = spectra[:, self.column_bins]
+        scale = self.rows / (self.ceiling_db - self.floor_db)
+        levels = ((spectra - self.floor_db) * scale).astype(np.intp)
+        np.clip(levels, 0, self.rows - 1, out=levels)
+        levels *= self.columns
+        levels += self.bin_columns
+        self.counts += np.bincount(levels.ravel(), minlength=self.rows * self.columns).reshape(self.rows, self.columns)
+        self.total_spectra += len(spectra)
+
+    def image(self):
+        """Log-scaled density normalized to [0, 1]; rows are power (floor first), columns frequency"""
+        np.log1p(self.counts, out=self.display)
+        peak = self.display.max()
+        if peak > 0:
+            self.display *= 1.0 / peak
+        return self.display
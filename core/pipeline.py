@@ -0,0 +1,462 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+import numpy as np
+
+from core.metrics import PipelineMetrics
+
+
+class BlockSpec:
+    """Shape and dtype of the blocks passed along one connection of a pipeline.
+
+    Dimensions are ints for fixed sizes or names ('frames', 'bins') for sizes
+    that change from block to block; names only document the axis.
+    """
+
+    __slots__ = ('dtype', 'shape')
+
+    def __init__(self, dtype, shape):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+
+    def accepts(self, other):
+        if self.dtype != other.dtype or len(self.shape) != len(other.shape):
+            return False
+        return all(not (isinstance(mine, int) and isinstance(theirs, int)) or mine == theirs
+                   for mine, theirs in zip(self.shape, other.shape))
+
+    def matches(self, block):
+        return (block.dtype == self.dtype and block.ndim == len(self.shape)
+                and all(not isinstance(size, int) or size == actual for size, actual in zip(self.shape, block.shape)))
+
+    def __repr__(self):
+        return f"BlockSpec({self.dtype}, {self.shape})"
+
+
+def as_specs(spec):
+    # A stage may accept several specs; None declares nothing
+    if spec is None:
+        return ()
+    return spec if isinstance(spec, tuple) else (spec,)
+
+
+class BlockContext:
+    """What the stages know about a block besides its samples.
+
+    A new context is made for every block, so stages running on other threads
+    may keep it. `state` is the channel's live ChannelState; it is not sent to
+    other processes. Everything else is plain values, so stages that only
+    need those (the FFT stage included) also work in a ProcessStage.
+    """
+
+    __slots__ = ('channel', 'state', 'timestamp', 'sample_rate', 'center_freq', 'fft_size', 'frame_interval',
+                 'freq_bins', 'settings')
+
+    def __init__(self, channel=0, state=None, timestamp=0.0, sample_rate=1.0, center_freq=0.0, fft_size=0,
+                 frame_interval=0.0, freq_bins=None, settings=None):
+        self.channel = channel  # Registry index, also the metrics channel
+        self.state = state
+        self.timestamp = timestamp  # Host time at which the block's last frame was received
+        self.sample_rate = sample_rate
+        self.center_freq = center_freq
+        self.fft_size = fft_size
+        self.frame_interval = frame_interval  # Seconds between emitted blocks at the display frame rate
+        self.freq_bins = freq_bins  # Bin offsets from the centre frequency in Hz
+        self.settings = settings  # SpectrumSettings: FFT backend name, window and calibration
+
+    @property
+    def frame_seconds(self):
+        # Signal time covered by one frame
+        return self.fft_size / self.sample_rate
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'state'}
+
+    def __setstate__(self, values):
+        self.state = None
+        for name, value in values.items():
+            setattr(self, name, value)
+
+
+class Stage:
+    """One step of a Pipeline.
+
+    process(block, context) returns the block for the stages connected after
+    this one, or None when there is nothing to pass on (always, for sinks).
+    A stage must not modify its input block: when several stages consume it,
+    they all get the same read-only view of it. active() lets a stage sit out
+    blocks (and skip its timing) when it has nothing to do.
+    """
+
+    name = 'stage'
+    input_spec = None  # BlockSpec, or a tuple of accepted BlockSpecs; None accepts any block
+    output_spec = None  # None for sinks
+    metric = 'stage_seconds'  # Histogram its processing time is recorded in
+
+    def __init__(self):
+        self.enabled = True
+
+    def active(self, context):
+        return self.enabled
+
+    def process(self, block, context):
+        raise NotImplementedError
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Pipeline:
+    """Stages connected in a tree from one source, run block by block.
+
+    add() checks that the new stage accepts what it is connected to, so a
+    dtype or rank mismatch shows up when the graph is built, not mid-stream.
+    process() runs every active stage depth-first, in the order they were
+    added. A block with several consumers is handed to each of them as the
+    same read-only view, never copied. Each stage's processing time (without
+    the stages after it) goes to its metric histogram, or to stage_seconds
+    under "channel:stage" for stages without one, and is summed in
+    `timings`.
+
+    A Pipeline also works as a stage (a sink fed to its source), so a whole
+    branch can be wrapped in a ThreadedStage or ProcessStage. Several threads
+    may run process() at once, one per channel (see PipelineWorker); stages
+    keep per-channel state in the ChannelState or keyed by context.channel.
+    """
+
+    name = 'pipeline'
+    output_spec = None
+    metric = 'stage_seconds'
+
+    def __init__(self, source_spec=None, metrics=None, check_blocks=False):
+        self.source_spec = source_spec
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        self.check_blocks = check_blocks  # Verify each output against its stage's spec (for tests)
+        self.enabled = True
+        self.children = {None: []}  # Stage (None for the source) -> stages fed by it
+        self.parents = {}
+        self.timings = {}  # Stage -> [blocks, seconds]
+        self.timings_lock = threading.Lock()
+
+    @property
+    def input_spec(self):
+        return self.source_spec
+
+    def __getstate__(self):
+        # Sent to a ProcessStage's child: its timings stay there, and metrics hold a lock
+        state = dict(self.__dict__)
+        state['metrics'] = None
+        state['timings_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.metrics = PipelineMetrics(enabled=False)
+        self.timings_lock = threading.Lock()
+
+    def active(self, context):
+        return self.enabled
+
+    def add(self, stage, after=None):
+        """Connect `stage` after another stage (or the source); returns the stage"""
+        if stage in self.parents:
+            raise ValueError(f"Stage {stage.name} is already in the pipeline")
+        if after is not None:
+            if after not in self.parents:
+                raise ValueError(f"Stage {after.name} is not in the pipeline")
+            if after.output_spec is None:
+                raise ValueError(f"Stage {after.name} is a sink; nothing can follow it")
+        self.check_connection(self.source_spec if after is None else after.output_spec, stage)
+        stage.start()
+        self.parents[stage] = after
+        self.children[stage] = []
+        self.children[after].append(stage)
+        self.timings[stage] = [0, 0.0]
+        return stage
+
+    @staticmethod
+    def check_connection(offered, stage):
+        accepted = as_specs(stage.input_spec)
+        offered = as_specs(offered)
+        if not accepted or not offered:
+            return
+        for spec in offered:
+            if not any(candidate.accepts(spec) for candidate in accepted):
+                raise ValueError(f"Stage {stage.name} accepts {accepted}, not {spec}")
+
+    def set_source_spec(self, spec):
+        for stage in self.children[None]:
+            self.check_connection(spec, stage)
+        self.source_spec = spec
+
+    def remove(self, stage):
+        """Disconnect a stage and everything after it, closing them"""
+        for child in list(self.children[stage]):
+            self.remove(child)
+        self.children[self.parents.pop(stage)].remove(stage)
+        del self.children[stage]
+        del self.timings[stage]
+        stage.close()
+
+    def stages(self, parent=None):
+        """All stages after `parent` (default: the source) in processing order"""
+        ordered = []
+        for stage in self.children[parent]:
+            ordered.append(stage)
+            ordered.extend(self.stages(stage))
+        return ordered
+
+    def process(self, block, context):
+        self._run(None, block, context)
+
+    def _run(self, parent, block, context):
+        consumers = [stage for stage in self.children[parent] if stage.active(context)]
+        if len(consumers) > 1 and isinstance(block, np.ndarray) and block.flags.writeable:
+            block = block.view()
+            block.flags.writeable = False
+        for stage in consumers:
+            began = time.perf_counter()
+            output = stage.process(block, context)
+            elapsed = time.perf_counter() - began
+            timing = self.timings[stage]
+            with self.timings_lock:
+                timing[0] += 1
+                timing[1] += elapsed
+            if stage.metric == 'stage_seconds':
+                self.metrics.observe('stage_seconds', f"{context.channel}:{stage.name}", elapsed)
+            else:
+                self.metrics.observe(stage.metric, context.channel, elapsed)
+            if output is not None and self.children[stage]:
+                if self.check_blocks and not any(spec.matches(output) for spec in as_specs(stage.output_spec)):
+                    raise ValueError(f"Stage {stage.name} produced {output.dtype} {output.shape}, "
+                                     f"not {stage.output_spec}")
+                self._run(stage, output, context)
+
+    def stage_timings(self):
+        """(name, blocks, mean seconds per block) for every stage in processing order"""
+        report = []
+        for stage in self.stages():
+            blocks, seconds = self.timings[stage]
+            report.append((stage.name, blocks, seconds / blocks if blocks else 0.0))
+        return report
+
+    def start(self):
+        pass
+
+    def close(self):
+        for stage in self.stages():
+            stage.close()
+
+
+class PipelineWorker:
+    """Runs a Pipeline on the blocks of one channel, on the channel's own thread.
+
+    The receive thread hands each block over with submit() and goes straight
+    back to the device. The worker builds the block's context with
+    make_context(timestamp) and processes it inside the channel's
+    updating(), so readers on other threads copy results under the seqlock
+    and GUI changes to the channel's DSP state wait for the block. The block
+    then goes to on_done(block), which returns it to the receiver's pool.
+    With one worker per channel, channels and radios are processed in
+    parallel wherever numpy releases the GIL.
+
+    The queue has no bound of its own: the receiver stops handing blocks over
+    once max_pending_frames of them are unconsumed. Blocks still queued at
+    stop() are returned unprocessed.
+    """
+
+    def __init__(self, pipeline, state, make_context, on_done, on_error=None):
+        self.pipeline = pipeline
+        self.state = state
+        self.make_context = make_context  # timestamp -> BlockContext
+        self.on_done = on_done
+        self.on_error = on_error  # Called with the exception when a block fails
+        self.requests = queue.SimpleQueue()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        while True:
+            try:
+                block, _ = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            self.on_done(block)
+
+    def submit(self, block, timestamp):
+        """Queue a block received at host time `timestamp`; safe from any thread"""
+        self.requests.put((block, timestamp))
+
+    def pending(self):
+        return self.requests.qsize()
+
+    def _run(self):
+        while self.running:
+            try:
+                block, timestamp = self.requests.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            try:
+                context = self.make_context(timestamp)
+                with self.state.updating():
+                    self.pipeline.process(block, context)
+            except Exception as e:
+                logging.error(f"Processing a block of channel {self.state.index} failed: {e}")
+                if self.on_error is not None:
+                    self.on_error(e)
+            finally:
+                # No stage keeps a reference to the block
+                self.on_done(block)
+
+
+class ThreadedStage(Stage):
+    """Runs a stage, or a whole Pipeline, on its own thread.
+
+    process() copies the block into a bounded queue and returns: upstream
+    blocks live in reused buffers, so this is the one place a block is
+    copied. When `max_pending` blocks are waiting the new one is dropped and
+    counted, like the receiver's processing queue, so a slow stage never
+    stalls the stages before it. Nothing is passed on; stages that should
+    follow the wrapped one go inside a wrapped Pipeline. close() lets the
+    queued blocks finish.
+    """
+
+    metric = 'stage_seconds'
+
+    def __init__(self, stage, max_pending=8, metrics=None):
+        super().__init__()
+        self.stage = stage
+        self.name = f"{stage.name}@thread"
+        self.input_spec = stage.input_spec
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        self.requests = queue.Queue(maxsize=max_pending)
+        self.running = False
+        self.thread = None
+        self.blocks = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+
+    def active(self, context):
+        return self.enabled and self.stage.active(context)
+
+    def start(self):
+        if not self.running:
+            self.stage.start()
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.stage.close()
+
+    def process(self, block, context):
+        try:
+            self.requests.put_nowait((np.array(block), context))
+        except queue.Full:
+            self.dropped += 1
+            self.metrics.increment('stage_dropped_blocks_total', f"{context.channel}:{self.stage.name}")
+        return None
+
+    def _run(self):
+        # Blocks still queued at close() are processed before the thread ends
+        while self.running or not self.requests.empty():
+            try:
+                block, context = self.requests.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            began = time.perf_counter()
+            try:
+                self.stage.process(block, context)
+            except Exception as e:
+                logging.error(f"Stage {self.stage.name} failed on its thread: {e}")
+            self.busy_seconds += time.perf_counter() - began
+            self.blocks += 1
+
+
+def _serve_stage(stage, requests):
+    # Body of a ProcessStage's child process
+    stage.start()
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            try:
+                stage.process(*request)
+            except Exception as e:
+                logging.error(f"Stage {stage.name} failed in its process: {e}")
+    finally:
+        stage.close()
+
+
+class ProcessStage(Stage):
+    """Runs a stage, or a whole Pipeline, in a separate process.
+
+    The stage is pickled into a spawned child process at start(). Blocks are
+    copied into a bounded multiprocessing queue and dropped when it is full,
+    as for ThreadedStage. Contexts arrive without their channel state, so
+    this suits stages that only need the block and its metadata (recorders,
+    exporters, heavy analysis). Whatever the stage accumulates stays in the
+    child process.
+    """
+
+    metric = 'stage_seconds'
+
+    def __init__(self, stage, max_pending=8, metrics=None):
+        super().__init__()
+        self.stage = stage
+        self.name = f"{stage.name}@process"
+        self.input_spec = stage.input_spec
+        self.max_pending = max_pending
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        self.requests = None
+        self.worker = None
+        self.dropped = 0
+
+    def start(self):
+        if self.worker is None:
+            spawn = multiprocessing.get_context('spawn')  # Forking a process with Qt and UHD threads is unsafe
+            self.requests = spawn.Queue(maxsize=self.max_pending)
+            self.worker = spawn.Process(target=_serve_stage, args=(self.stage, self.requests), daemon=True)
+            self.worker.start()
+
+    def close(self):
+        if self.worker is None:
+            return
+        try:
+            self.requests.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+        self.worker.join(timeout=5.0)
+        if self.worker.is_alive():
+            self.worker.terminate()
+        self.worker = None
+
+    def process(self, block, context):
+        # The queue pickles in a feeder thread, after the upstream buffer may have been reused
+        try:
+            self.requests.put_nowait((np.array(block), context))
+        except queue.Full:
+            self.dropped += 1
+            self.metrics.increment('stage_dropped_blocks_total', f"{context.channel}:{self.stage.name}")
+        return None
@@ -0,0 +1,98 @@
+from core.fft_backend import FFT_SIZES
+from core.sample_formats import max_link_sample_rate
+
+# AD936x master clock limits; with both RX channels streaming the clock is shared
+# and capped at half the single-channel maximum
+MIN_MASTER_CLOCK_RATE = 220e3
+MAX_MASTER_CLOCK_RATE = {1: 61.44e6, 2: 30.72e6}
+
+# FPGA DDC decimations. Powers of two run every halfband stage and leave the CIC
+# at unity, so the passband stays flat; odd factors add CIC droop.
+DDC_DECIMATIONS = tuple(1 << n for n in range(8))
+
+# AD936x analog filter range
+MIN_ANALOG_BANDWIDTH = 200e3
+MAX_ANALOG_BANDWIDTH = 56e6
+
+# Fraction of the sample rate treated as usable span; the edges are lost to the
+# DDC and analog filter rolloff
+USABLE_SPAN_FRACTION = 0.8
+
+# Equivalent noise bandwidth of each window, in FFT bins
+WINDOW_ENBW = {'Hamming': 1.36, 'Hanning': 1.50, 'Blackman': 1.73, 'Rectangular': 1.0}
+
+
+class RatePlan:
+    """Device and display settings that deliver an analysis span and RBW.
+
+    The device streams at exactly `sample_rate` (master clock / DDC decimation),
+    so no host-side resampling is needed to reach the requested resolution.
+    Spans narrower than the lowest rate the device produces are widened to it.
+    """
+
+    def __init__(self, span_hz, rbw_hz, channels, master_clock_rate, device_decimation, fft_size,
+                 analog_bandwidth, window_name, link, otw_format, notes):
+        self.span_hz = span_hz  # Usable span actually delivered
+        self.rbw_hz = rbw_hz  # Actual resolution bandwidth
+        self.channels = channels
+        self.master_clock_rate = master_clock_rate
+        self.device_decimation = device_decimation
+        self.fft_size = fft_size
+        self.analog_bandwidth = analog_bandwidth
+        self.window_name = window_name
+        self.link = link
+        self.otw_format = otw_format
+        self.notes = notes  # Why the plan differs from what was asked for
+
+    @property
+    def sample_rate(self):
+        return self.master_clock_rate / self.device_decimation
+
+    def describe(self):
+        return (f"MCR {self.master_clock_rate / 1e6:g} MHz / {self.device_decimation} = "
+                f"{self.sample_rate / 1e6:g} MSps, FFT {self.fft_size}, RBW {self.rbw_hz:.4g} Hz, "
+                f"span {self.span_hz / 1e6:.4g} MHz")
+
+
+def plan_rates(span_hz, rbw_hz, channels=1, link='USB 3.0', otw_format='sc16', window_name='Hamming',
+               fft_sizes=FFT_SIZES):
+    """Choose the master clock rate, DDC decimation and FFT size for a span and RBW.
+
+    The sample rate is the FFT size times the requested bin width, so the RBW is
+    met exactly, and is capped by the link (per channel count and wire format)
+    and the master clock limit for the channel count. Among the DDC decimations
+    that reach it, the largest is used, keeping the ADC clock high.
+    """
+    if channels not in MAX_MASTER_CLOCK_RATE:
+        raise ValueError(f"Unsupported channel count: {channels}")
+    if span_hz <= 0 or rbw_hz <= 0:
+        raise ValueError("Span and RBW must be positive")
+    notes = []
+    max_clock = MAX_MASTER_CLOCK_RATE[channels]
+    max_rate = min(max_clock, max_link_sample_rate(link, otw_format, channels))
+    min_rate = MIN_MASTER_CLOCK_RATE / DDC_DECIMATIONS[-1]
+    enbw = WINDOW_ENBW.get(window_name, 1.0)
+    bin_width = rbw_hz / enbw
+
+    rate = span_hz / USABLE_SPAN_FRACTION
+    if rate > max_rate:
+        rate = max_rate
+        notes.append(f"span limited to {max_rate * USABLE_SPAN_FRACTION / 1e6:g} MHz by {link} "
+                     f"with {channels} channel(s) in {otw_format}")
+    elif rate < min_rate:
+        rate = min_rate
+        notes.append(f"span widened: the device's lowest rate is {min_rate:.4g} Hz")
+    fitting = [size for size in fft_sizes if rate / size <= bin_width]
+    if fitting:
+        fft_size = fitting[0]
+        rate = min(bin_width * fft_size, max_rate)
+    else:
+        fft_size = fft_sizes[-1]
+        notes.append(f"RBW limited to {enbw * rate / fft_size:.4g} Hz by the largest FFT size")
+
+    decimation = max(d for d in DDC_DECIMATIONS if MIN_MASTER_CLOCK_RATE <= rate * d <= max_clock)
+    master_clock_rate = rate * decimation
+    span = rate * USABLE_SPAN_FRACTION
+    analog_bandwidth = min(max(span, MIN_ANALOG_BANDWIDTH), MAX_ANALOG_BANDWIDTH)
+    return RatePlan(span, enbw * rate / fft_size, channels, master_clock_rate, decimation, fft_size,
+                    analog_bandwidth, window_name, link, otw_format, notes)
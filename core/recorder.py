@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+class RawRecorder:
+    """Writes a channel's raw IQ to disk in the host wire format, without float conversion.
+
+    Samples are taken from the channel's IQHistory on a background thread, so
+    the receive thread only does its usual ring write. With the sc16 host
+    format the file is interleaved int16 I/Q, as it arrived from the device;
+    with fc32 it is interleaved float32. A JSON sidecar (<path>.json) records
+    the format, sample rate and center frequency, and batch_process.py reads it.
+    If disk writes fall more than the ring's length behind, the skipped samples
+    are counted in `lost_samples` rather than stalling the receiver.
+    """
+
+    POLL_INTERVAL = 0.05  # Seconds
+
+    def __init__(self, iq_history, path, center_freq=0.0, max_bytes=None):
+        self.iq_history = iq_history
+        self.path = path
+        self.center_freq = center_freq
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+        self.samples_written = 0
+        self.lost_samples = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            self.file = open(self.path, 'wb')
+            self.write_sidecar()
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def write_sidecar(self):
+        metadata = {
+            'format': self.iq_history.cpu_format,
+            'sample_rate': self.iq_history.sample_rate,
+            'center_freq': self.center_freq,
+            'start_time': time.time(),
+        }
+        with open(self.path + '.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    def _run(self):
+        history = self.iq_history
+        sequence = history.written
+        try:
+            while self.running:
+                start, samples = history.read_since(sequence, raw=True)
+                if len(samples) == 0:
+                    time.sleep(self.POLL_INTERVAL)
+                    continue
+                self.lost_samples += start - sequence
+                sequence = start + len(samples)
+                self.file.write(memoryview(samples))
+                self.bytes_written += samples.nbytes
+                self.samples_written += len(samples)
+                if self.max_bytes is not None and self.bytes_written >= self.max_bytes:
+                    break
+        except Exception as e:
+            logging.error(f"Raw recording to {self.path} stopped: {e}")
+        finally:
+            self.running = False
+            self.file.close()
+            logging.info(f"Recorded {self.samples_written} samples ({self.bytes_written / 1e6:.1f} MB) to "
+                         f"{self.path}, {self.lost_samples} lost")
+
+
+def read_sidecar(path):
+    """Metadata written next to a raw recording, or None"""
+    sidecar = path + '.json'
+    if not os.path.exists(sidecar):
+        return None
+    with open(sidecar) as f:
+        return json.load(f)
@@ -0,0 +1,222 @@
+import numpy as np
+
+MEASUREMENT_FIELDS = ('channel_power_db', 'peak_db', 'peak_freq_hz', 'obw_hz', 'snr_db')
+
+# Frames of measurements kept per ROI by default (about 2 minutes at 30 frames/s)
+DEFAULT_HISTORY_FRAMES = 4096
+
+
+class RoiHistory:
+    """Fixed-size ring buffer of one ROI's per-frame measurements.
+
+    Values are float64 so peak frequencies keep Hz resolution at GHz carriers;
+    memory is capacity * (len(MEASUREMENT_FIELDS) + 1) * 8 bytes.
+    """
+
+    def __init__(self, capacity=DEFAULT_HISTORY_FRAMES):
+        self.capacity = capacity
+        self.values = np.full((capacity, len(MEASUREMENT_FIELDS)), np.nan)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.sequence = 0  # Rows appended since creation; the next row is written at sequence % capacity
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.timestamps.nbytes
+
+    def __len__(self):
+        return min(self.sequence, self.capacity)
+
+    def append(self, timestamp, values):
+        head = self.sequence % self.capacity
+        self.values[head] = values
+        self.timestamps[head] = timestamp
+        self.sequence += 1
+
+    def read_since(self, sequence):
+        """Rows appended after `sequence`, oldest first, as (new sequence, timestamps, values).
+
+        Rows that were already overwritten are skipped, so a slow reader just loses
+        the oldest part of what it missed.
+        """
+        start = max(sequence, self.sequence - self.capacity)
+        index = np.arange(start, self.sequence) % self.capacity
+        return self.sequence, self.timestamps[index], self.values[index]
+
+    def resize(self, capacity):
+        """Change the capacity in place, keeping the newest rows"""
+        _, timestamps, values = self.read_since(self.sequence - min(len(self), capacity))
+        count = len(timestamps)
+        self.capacity = capacity
+        self.values = np.full((capacity, len(MEASUREMENT_FIELDS)), np.nan)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        # The sequence keeps counting so readers holding a sequence number stay valid
+        index = np.arange(self.sequence - count, self.sequence) % capacity
+        self.values[index] = values
+        self.timestamps[index] = timestamps
+
+    @staticmethod
+    def field_index(field):
+        return MEASUREMENT_FIELDS.index(field)
+
+
+class RoiMeasurements:
+    """A set of frequency ROIs measured together on every spectrum frame.
+
+    ROIs are compiled into bin index ranges with searchsorted, and only recompiled
+    when an ROI is added, moved or removed, or when the tuning (center frequency,
+    sample rate, bin count) changes. Each frame is then measured with a fixed
+    number of whole-array operations, independent of the number of ROIs:
+
+    - channel power and occupied bandwidth from one cumulative sum of linear power
+    - peak level and frequency from reduceat over the concatenated ROI bins
+    - SNR as peak level over the frame's median (noise floor)
+
+    Every ROI also owns a RoiHistory of `history_frames` rows that measure()
+    appends to, so analysis windows can plot it without touching the spectrum.
+    """
+
+    def __init__(self, obw_fraction=0.99, history_frames=DEFAULT_HISTORY_FRAMES):
+        self.obw_fraction = obw_fraction
+        self.history_frames = history_frames
+        self.histories = {}  # key -> RoiHistory
+        self.ranges = {}  # key -> (start Hz, end Hz), absolute frequencies
+        self.dirty = True
+        self.axis_key = None
+        self.keys = []
+        self.starts = np.empty(0, dtype=np.intp)
+        self.histories_in_order = []
+        self.allocate_results()
+        self.noise_floor_db = np.nan
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def set_roi(self, key, freq_start_hz, freq_end_hz):
+        self.ranges[key] = (min(freq_start_hz, freq_end_hz), max(freq_start_hz, freq_end_hz))
+        if key not in self.histories:
+            self.histories[key] = RoiHistory(self.history_frames)
+        self.dirty = True
+
+    def remove_roi(self, key):
+        self.histories.pop(key, None)
+        if self.ranges.pop(key, None) is not None:
+            self.dirty = True
+
+    def clear(self):
+        self.ranges.clear()
+        self.histories.clear()
+        self.dirty = True
+
+    def history(self, key):
+        return self.histories.get(key)
+
+    def set_history_frames(self, frames):
+        """Change the per-ROI history length, keeping the newest rows"""
+        self.history_frames = frames
+        for history in self.histories.values():
+            history.resize(frames)
+
+    @property
+    def history_nbytes(self):
+        return sum(history.nbytes for history in self.histories.values())
+
+    def allocate_results(self):
+        # One row per field, one column per ROI; results[field] are views of the rows
+        self.values = np.full((len(MEASUREMENT_FIELDS), len(self.keys)), np.nan)
+        self.results = dict(zip(MEASUREMENT_FIELDS, self.values))
+
+    def compile(self, center_freq_hz, sample_rate_hz, bins):
+        """Map ROI edges to bin ranges; returns True if a recompilation was needed"""
+        axis_key = (center_freq_hz, sample_rate_hz, bins)
+        if not self.dirty and axis_key == self.axis_key:
+            return False
+
+        # Bin centers of an fftshifted spectrum, ascending
+        self.freq_axis = center_freq_hz + np.fft.fftshift(np.fft.fftfreq(bins, d=1.0 / sample_rate_hz))
+        self.bin_width_hz = sample_rate_hz / bins
+        self.keys = list(self.ranges)
+        edges = np.array([self.ranges[key] for key in self.keys], dtype=np.float64).reshape(-1, 2)
+        starts = np.searchsorted(self.freq_axis, edges[:, 0], side='left')
+        stops = np.searchsorted(self.freq_axis, edges[:, 1], side='right')
+
+        # Measurements are only computed for ROIs that cover at least one bin
+        self.valid = stops > starts
+        self.starts = starts[self.valid]
+        self.stops = stops[self.valid]
+        widths = self.stops - self.starts
+        self.widths = widths
+        total = int(widths.sum())
+        self.offsets = np.concatenate(([0], np.cumsum(widths)[:-1])).astype(np.intp)
+        self.positions = np.arange(total)
+        self.gather_index = np.repeat(self.starts - self.offsets, widths) + self.positions
+
+        self.linear = np.empty(bins, dtype=np.float64)
+        self.cumulative = np.zeros(bins + 1, dtype=np.float64)
+        self.allocate_results()
+        self.histories_in_order = [self.histories[key] for key in self.keys]
+
+        self.axis_key = axis_key
+        self.dirty = False
+        return True
+
+    def measure(self, power_db, timestamp=None):
+        """Measure all compiled ROIs on one fftshifted spectrum in dB.
+
+        Returns a dict of arrays aligned with self.keys; ROIs that fall outside the
+        current span are NaN. The arrays are reused by the next call. When a
+        timestamp is given the measurements are also appended to the ROI histories.
+        """
+        results = self.results
+        if not len(self.starts):
+            if timestamp is not None:
+                self.append_histories(timestamp)
+            return results
+        starts, stops, offsets = self.starts, self.stops, self.offsets
+
+        # Linear power and its running sum, computed once for the whole frame
+        linear = self.linear
+        np.multiply(power_db, np.log(10.0) / 10.0, out=linear)
+        np.exp(linear, out=linear)
+        np.cumsum(linear, out=self.cumulative[1:])
+        cumulative = self.cumulative
+        base = cumulative[starts]
+        band_power = cumulative[stops] - base
+
+        # Peak level and the first bin reaching it, per ROI
+        gathered = power_db[self.gather_index]
+        peaks = np.maximum.reduceat(gathered, offsets)
+        is_peak = gathered == np.repeat(peaks, self.widths)
+        first = np.minimum.reduceat(np.where(is_peak, self.positions, len(self.positions)), offsets)
+        peak_bins = self.gather_index[first]
+
+        # Occupied bandwidth: bins holding the central obw_fraction of the ROI power
+        tail = band_power * (1.0 - self.obw_fraction) / 2.0
+        lower = np.searchsorted(cumulative, base + tail, side='right') - 1
+        upper = np.searchsorted(cumulative, base + band_power - tail, side='left') - 1
+        lower = np.clip(lower, starts, stops - 1)
+        upper = np.clip(upper, lower, stops - 1)
+
+        self.noise_floor_db = float(np.median(power_db))
+
+        valid = self.valid
+        results['channel_power_db'][valid] = 10.0 * np.log10(np.maximum(band_power, 1e-30))
+        results['peak_db'][valid] = peaks
+        results['peak_freq_hz'][valid] = self.freq_axis[peak_bins]
+        results['obw_hz'][valid] = (upper - lower + 1) * self.bin_width_hz
+        results['snr_db'][valid] = peaks - self.noise_floor_db
+        if timestamp is not None:
+            self.append_histories(timestamp)
+        return results
+
+    def append_histories(self, timestamp):
+        columns = self.values.T
+        for index, history in enumerate(self.histories_in_order):
+            history.append(timestamp, columns[index])
+
+    def result(self, key):
+        """Latest measurements of one ROI as a dict, or None if it is not compiled yet"""
+        try:
+            index = self.keys.index(key)
+        except ValueError:
+            return None
+        return {field: float(values[index]) for field, values in self.results.items()}
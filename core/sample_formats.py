@@ -0,0 +1,70 @@
+import numpy as np
+
+# Over-the-wire formats: what crosses USB. sc8 halves the link load at the cost of
+# about 48 dB of dynamic range; sc16 keeps the full 12-bit ADC resolution.
+OTW_FORMATS = ('sc16', 'sc8')
+OTW_BYTES_PER_SAMPLE = {'sc16': 4, 'sc8': 2}
+
+# Host (CPU) formats: what recv() writes. fc32 is converted by UHD on the receive
+# thread; sc16 is copied as is and converted to float only where DSP needs it.
+CPU_FORMATS = ('fc32', 'sc16')
+CPU_BYTES_PER_SAMPLE = {'fc32': 8, 'sc16': 4}
+
+# sc16 full scale, matching UHD's own sc16 -> fc32 conversion
+SC16_SCALE = 1.0 / 32768
+
+# Sustained single-direction payload of the B205mini links, in bytes per second
+LINK_BYTES_PER_SECOND = {'USB 2.0': 32e6, 'USB 3.0': 320e6}
+MAX_SAMPLE_RATE = 61.44e6  # B205mini ADC limit, whatever the link
+
+
+def allocate(count, cpu_format):
+    """Zeroed buffer of `count` complex samples in a host format.
+
+    sc16 buffers are int16 arrays of shape (count, 2) holding I and Q.
+    """
+    if cpu_format == 'fc32':
+        return np.zeros(count, dtype=np.complex64)
+    return np.zeros((count, 2), dtype=np.int16)
+
+
+def recv_view(buffer):
+    """The view to hand to rx_streamer.recv().
+
+    UHD counts samples by the number of array elements, so sc16 pairs are passed
+    as one 32-bit element per complex sample.
+    """
+    if buffer.dtype == np.complex64:
+        return buffer
+    return buffer.view(np.uint32).reshape(-1)
+
+
+def to_complex64(samples, scale=1.0, out=None):
+    """Complex64 copy (or the input itself when already complex64) times `scale`.
+
+    For sc16 input the full-scale factor is folded into the same pass, and the
+    trailing I/Q axis is dropped, so (frames, n, 2) int16 becomes (frames, n).
+    With `out` (complex64, the result's shape) nothing is allocated.
+    """
+    if out is not None:
+        if samples.dtype == np.complex64:
+            np.multiply(samples, np.float32(scale), out=out)
+            return out
+        pairs = out.view(np.float32).reshape(samples.shape)
+        np.copyto(pairs, samples)
+        np.multiply(pairs, np.float32(scale * SC16_SCALE), out=pairs)
+        return out
+    if samples.dtype == np.complex64:
+        return samples if scale == 1.0 else samples * np.float32(scale)
+    converted = samples.astype(np.float32)
+    converted *= np.float32(scale * SC16_SCALE)
+    return converted.view(np.complex64)[..., 0]
+
+
+def link_bytes_per_second(sample_rate, otw_format, channels=1):
+    return sample_rate * OTW_BYTES_PER_SAMPLE[otw_format] * channels
+
+
+def max_link_sample_rate(link, otw_format, channels=1):
+    """Highest per-channel sample rate a link sustains in an over-the-wire format"""
+    return min(MAX_SAMPLE_RATE, LINK_BYTES_PER_SECOND[link] / (OTW_BYTES_PER_SAMPLE[otw_format] * channels))
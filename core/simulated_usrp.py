@@ -0,0 +1,252 @@
+import enum
+import time
+
+import numpy as np
+
+from core.sample_formats import SC16_SCALE
+
+# Serials of the form sim0, sim1, ... open a SimulatedMultiUSRP instead of hardware
+SIMULATED_SERIAL_PREFIX = 'sim'
+
+# Carriers every simulated radio sees: (absolute frequency in Hz, level in dBFS)
+DEFAULT_SIGNALS = ((2.4001e9, -20.0), (2.4103e9, -35.0), (2.4252e9, -50.0), (915.2e6, -30.0))
+# Short bursts repeated forever: (absolute frequency in Hz, level in dBFS, duration in s, period in s)
+DEFAULT_BURSTS = ((2.4002e9, -30.0, 50e-6, 0.2),)
+DEFAULT_NOISE_DBFS = -70.0
+
+
+def is_simulated_serial(serial):
+    return bool(serial) and serial.startswith(SIMULATED_SERIAL_PREFIX)
+
+
+class SimulatedTimeSpec:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def get_full_secs(self):
+        return int(self.seconds)
+
+    def get_frac_secs(self):
+        return self.seconds - int(self.seconds)
+
+    def get_real_secs(self):
+        return self.seconds
+
+
+class SimulatedStreamMode(enum.Enum):
+    start_cont = 'start_cont'
+    stop_cont = 'stop_cont'
+    num_done = 'num_done'
+    num_more = 'num_more'
+
+
+class SimulatedErrorCode(enum.IntEnum):
+    # Same values as uhd::rx_metadata_t::error_code_t
+    none = 0x0
+    timeout = 0x1
+    late = 0x2
+    broken_chain = 0x4
+    overflow = 0x8
+    alignment = 0xc
+    bad_packet = 0xf
+
+
+class SimulatedStreamArgs:
+    def __init__(self, cpu_format, otw_format):
+        self.cpu_format = cpu_format
+        self.otw_format = otw_format
+        self.channels = [0]
+
+
+class SimulatedStreamCmd:
+    def __init__(self, stream_mode):
+        self.stream_mode = stream_mode
+        self.stream_now = False
+
+
+class SimulatedRxMetadata:
+    def __init__(self):
+        self.error_code = SimulatedErrorCode.none
+        self.out_of_sequence = False
+        self.has_time_spec = False
+        self.time_spec = SimulatedTimeSpec(0.0)
+
+
+class SimulatedStreamTypes:
+    """Stand-ins for the libpyuhd stream argument, command and metadata types TxRx builds"""
+    stream_args = SimulatedStreamArgs
+    stream_cmd = SimulatedStreamCmd
+    stream_mode = SimulatedStreamMode
+    rx_metadata = SimulatedRxMetadata
+    rx_metadata_error_code = SimulatedErrorCode
+
+
+class SimulatedRxStreamer:
+    """Produces noise, fixed carriers and periodic bursts at the channel's rate, paced to real time.
+
+    recv() fills fc32 or sc16 buffers like a UHD streamer and stamps the
+    metadata with the device time of the first sample. Stream time starts at
+    the device time of the first recv and advances by count / rate, so it
+    stays continuous across rate changes.
+    """
+
+    def __init__(self, device, stream_args):
+        self.device = device
+        self.channel = list(stream_args.channels)[0]
+        self.cpu_format = stream_args.cpu_format
+        self.rng = np.random.default_rng(device.seed * 16 + self.channel)
+        self.sample_index = 0
+        self.stream_seconds = None  # Device time of the next sample
+        self.next_time = None
+
+    def get_max_num_samps(self):
+        return self.device.max_num_samps
+
+    def issue_stream_cmd(self, cmd):
+        self.next_time = None
+
+    def recv(self, buffer, metadata=None, timeout=0.1):
+        count = len(buffer)  # complex64 for fc32, one uint32 per I/Q pair for sc16 (see recv_view)
+        rate = self.device.rates[self.channel]
+        now = time.perf_counter()
+        if self.next_time is None or now - self.next_time > 0.5:
+            self.next_time = now  # Start, or fell far behind: resynchronise instead of bursting
+            self.stream_seconds = self.device.get_time_now().get_real_secs()
+        self.next_time += count / rate
+        if self.next_time > now:
+            time.sleep(self.next_time - now)
+
+        samples = self.generate(count, rate)
+        if self.cpu_format == 'fc32':
+            buffer.view(np.complex64)[:count] = samples
+        else:
+            pairs = buffer.view(np.int16).reshape(-1, 2)[:count]
+            scaled = samples.view(np.float32).reshape(-1, 2) * np.float32(1.0 / SC16_SCALE)
+            np.clip(scaled, -32768, 32767, out=scaled)
+            np.rint(scaled, out=pairs, casting='unsafe')
+        if metadata is not None:
+            metadata.time_spec = SimulatedTimeSpec(self.stream_seconds)
+            metadata.has_time_spec = True
+        self.sample_index += count
+        self.stream_seconds += count / rate
+        return count
+
+    def generate(self, count, rate):
+        noise_scale = 10 ** (self.device.noise_dbfs / 20) / np.sqrt(2)
+        samples = self.rng.standard_normal(2 * count, dtype=np.float32).view(np.complex64)
+        samples *= np.float32(noise_scale)
+        center = self.device.freqs[self.channel]
+        gain = 10 ** ((self.device.gains[self.channel] - 30.0) / 20)
+        t = (self.sample_index + np.arange(count)) / rate
+        for freq, level_dbfs in self.device.signals:
+            offset = freq - center
+            if abs(offset) < rate / 2:
+                samples += (gain * 10 ** (level_dbfs / 20) * np.exp(2j * np.pi * offset * t)).astype(np.complex64)
+        for freq, level_dbfs, duration, period in self.device.bursts:
+            offset = freq - center
+            on = np.flatnonzero(t % period < duration)
+            if abs(offset) < rate / 2 and len(on):
+                tone = gain * 10 ** (level_dbfs / 20) * np.exp(2j * np.pi * offset * t[on])
+                samples[on] += tone.astype(np.complex64)
+        return samples
+
+
+class SimulatedTxStreamer:
+    def issue_stream_cmd(self, cmd):
+        pass
+
+    def send(self, samples, metadata=None):
+        time.sleep(0.01)
+        return len(samples)
+
+
+class SimulatedMultiUSRP:
+    """Stand-in for uhd.usrp.MultiUSRP covering the calls this application makes.
+
+    Each instance is an independent radio with its own settings and signal
+    generators, so several of them exercise the multi-radio pipeline without
+    hardware. Rates, frequencies and gains are stored as set (no coercion).
+    The stream argument, command and metadata types come from `stream_types`
+    rather than libpyuhd, so no part of UHD needs to be installed.
+    """
+
+    stream_types = SimulatedStreamTypes
+
+    def __init__(self, serial='sim0', channels=1, signals=DEFAULT_SIGNALS, noise_dbfs=DEFAULT_NOISE_DBFS,
+                 max_num_samps=8192, bursts=DEFAULT_BURSTS):
+        self.serial = serial
+        digits = serial[len(SIMULATED_SERIAL_PREFIX):]
+        self.seed = int(digits) if digits.isdigit() else 0
+        self.num_channels = channels
+        self.signals = tuple(signals)
+        self.bursts = tuple(bursts)
+        self.noise_dbfs = noise_dbfs
+        self.max_num_samps = max_num_samps
+        self.freqs = [2.4e9] * channels
+        self.rates = [1e6] * channels
+        self.gains = [30.0] * channels
+        self.bandwidths = [20e6] * channels
+        self.antennas = ['RX2'] * channels
+        self.master_clock_rate = 32e6
+        self.tx_rate = 1e6
+        self.start_time = time.time()
+
+    def get_rx_num_channels(self):
+        return self.num_channels
+
+    def get_rx_stream(self, stream_args):
+        return SimulatedRxStreamer(self, stream_args)
+
+    def get_tx_stream(self, stream_args):
+        return SimulatedTxStreamer()
+
+    def set_rx_freq(self, freq, channel=0):
+        self.freqs[channel] = float(freq)
+
+    def get_rx_freq(self, channel=0):
+        return self.freqs[channel]
+
+    def set_rx_rate(self, rate, channel=0):
+        self.rates[channel] = float(rate)
+
+    def get_rx_rate(self, channel=0):
+        return self.rates[channel]
+
+    def set_rx_gain(self, gain, channel=0):
+        self.gains[channel] = float(gain)
+
+    def get_rx_gain(self, channel=0):
+        return self.gains[channel]
+
+    def set_rx_bandwidth(self, bandwidth, channel=0):
+        self.bandwidths[channel] = float(bandwidth)
+
+    def get_rx_bandwidth(self, channel=0):
+        return self.bandwidths[channel]
+
+    def set_rx_antenna(self, antenna, channel=0):
+        self.antennas[channel] = antenna
+
+    def get_rx_antenna(self, channel=0):
+        return self.antennas[channel]
+
+    def set_master_clock_rate(self, rate):
+        self.master_clock_rate = float(rate)
+
+    def get_master_clock_rate(self):
+        return self.master_clock_rate
+
+    def get_time_now(self):
+        return SimulatedTimeSpec(time.time() - self.start_time)
+
+    def set_tx_freq(self, freq, channel=0):
+        pass
+
+    def set_tx_rate(self, rate, channel=0):
+        self.tx_rate = float(rate)
+
+    def get_tx_rate(self, channel=0):
+        return self.tx_rate
+
+    def set_tx_gain(self, gain, channel=0):
+        pass
@@ -0,0 +1,165 @@
+import numpy as np
+
+# Working spectra (current, max hold, average) are kept in this dtype
+SPECTRUM_DTYPE = np.float32
+
+STORAGE_MODES = ('uint8', 'float16', 'float32')
+
+
+class WaterfallHistory:
+    """Ring buffer of waterfall rows in a compact storage format.
+
+    'uint8' quantizes each row to 8 bits with its own float32 offset and step
+    (a block of one row), giving at most (row max - row min) / 510 dB of error.
+    'float16' stores dB values directly (~0.06 dB resolution around -100 dB).
+    'float32' is lossless and mainly useful for comparison.
+
+    Rows are only converted back to float32 dB at the display/export boundary,
+    by to_db(), which writes into a reusable buffer.
+    """
+
+    def __init__(self, capacity, bins, mode='uint8', fill_db=-120.0):
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown waterfall storage mode: {mode}")
+        self.capacity = capacity
+        self.bins = bins
+        self.mode = mode
+        self.fill_db = fill_db
+        self.allocate()
+
+    def allocate(self):
+        storage_dtype = np.uint8 if self.mode == 'uint8' else np.dtype(self.mode)
+        self.data = np.zeros((self.capacity, self.bins), dtype=storage_dtype)
+        self.offsets = np.full(self.capacity, self.fill_db, dtype=np.float32)
+        self.steps = np.zeros(self.capacity, dtype=np.float32)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        if self.mode != 'uint8':
+            self.data[:] = self.fill_db
+        self.head = 0  # Next row to write
+        self.count = 0
+        self.row_numbers = np.arange(self.capacity, dtype=np.float64)
+        self.scratch = np.empty(self.bins, dtype=np.float32)
+        self.display = None
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes + self.steps.nbytes + self.timestamps.nbytes
+
+    def resize(self, bins):
+        """Change the row width, keeping the overlapping columns of existing rows"""
+        if bins == self.bins:
+            return
+        old = self.to_db()
+        old_timestamps = self.ordered(self.timestamps)
+        count = self.count
+        self.bins = bins
+        self.allocate()
+        keep = min(bins, old.shape[1])
+        row = np.full(bins, self.fill_db, dtype=np.float32)
+        for index in range(self.capacity - count, self.capacity):
+            row[:keep] = old[index, :keep]
+            self.append(row, old_timestamps[index])
+
+    def clear(self):
+        self.allocate()
+
+    def append(self, row_db, timestamp=0.0):
+        """Store one spectrum row (float dB, length == bins)"""
+        self.append_rows(row_db[None, :], timestamp)
+
+    def append_rows(self, rows_db, timestamp=0.0, interval=0.0):
+        """Store a block of rows (frames, bins), the last taken at `timestamp`.
+
+        Earlier rows are timed `interval` seconds apart. Rows are encoded through
+        a scratch row, so appends allocate nothing.
+        """
+        count = len(rows_db)
+        if count > self.capacity:
+            rows_db = rows_db[-self.capacity:]
+            count = self.capacity
+        position = 0
+        while position < count:
+            # At most two contiguous runs, split where the ring wraps
+            head = self.head
+            run = min(count - position, self.capacity - head)
+            rows = rows_db[position:position + run]
+            if self.mode == 'uint8':
+                # Row by row: per-row scales would otherwise broadcast through numpy's buffers
+                scaled = self.scratch
+                for index, row in enumerate(rows, head):
+                    low = float(row.min())
+                    step = (float(row.max()) - low) / 255.0 or 1.0
+                    np.subtract(row, low, out=scaled)
+                    np.multiply(scaled, 1.0 / step, out=scaled)
+                    np.rint(scaled, out=scaled)
+                    np.copyto(self.data[index], scaled, casting='unsafe')
+                    self.offsets[index] = low
+                    self.steps[index] = step
+            else:
+                np.copyto(self.data[head:head + run], rows, casting='same_kind')
+            times = self.timestamps[head:head + run]
+            np.multiply(self.row_numbers[:run], interval, out=times)
+            times += timestamp - interval * (count - 1 - position)
+            self.head = (head + run) % self.capacity
+            position += run
+        self.count = min(self.count + count, self.capacity)
+
+    def append_fill(self, timestamp=0.0):
+        """Store a row at the fill level, e.g. to mark a stream discontinuity"""
+        head = self.head
+        if self.mode == 'uint8':
+            self.data[head] = 0
+            self.offsets[head] = self.fill_db
+            self.steps[head] = 0.0
+        else:
+            self.data[head] = self.fill_db
+        self.timestamps[head] = timestamp
+        self.head = (head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self, array):
+        """Chronological (oldest first) copy of a per-row array"""
+        return np.concatenate((array[self.head:], array[:self.head]))
+
+    def to_db(self, rows=None):
+        """Decode the newest `rows` rows (default: all) to float32 dB, oldest first.
+
+        The returned array is an internal buffer reused by the next call.
+        """
+        rows = self.capacity if rows is None else min(rows, self.capacity)
+        if self.display is None or self.display.shape != (rows, self.bins):
+            self.display = np.empty((rows, self.bins), dtype=np.float32)
+        out = self.display
+
+        # Physical row ranges holding the newest `rows` rows, oldest segment first
+        start = (self.head - rows) % self.capacity
+        if start + rows <= self.capacity:
+            segments = [(start, start + rows)]
+        else:
+            segments = [(start, self.capacity), (0, self.head)]
+
+        position = 0
+        for begin, end in segments:
+            target = out[position:position + (end - begin)]
+            self.decode_rows(begin, end, target)
+            position += end - begin
+        return out
+
+    def decode_rows(self, begin, end, out):
+        if self.mode == 'uint8':
+            np.multiply(self.data[begin:end], self.steps[begin:end, None], out=out)
+            np.add(out, self.offsets[begin:end, None], out=out)
+        else:
+            np.copyto(out, self.data[begin:end])
+
+    def row_timestamps(self, rows=None):
+        """Timestamps matching the rows returned by to_db(rows)"""
+        rows = self.capacity if rows is None else min(rows, self.capacity)
+        return self.ordered(self.timestamps)[self.capacity - rows:]
+
+
+def storage_bytes(channels, bins, rows, mode):
+    """Bytes needed to hold `rows` waterfall rows per channel in a given storage mode"""
+    per_value = {'uint8': 1, 'float16': 2, 'float32': 4, 'float64': 8}[mode]
+    per_row_metadata = 16 if mode != 'float64' else 0  # offset, step, timestamp
+    return channels * rows * (bins * per_value + per_row_metadata)
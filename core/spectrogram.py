@@ -0,0 +1,55 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from core.fft_backend import NumpyFFT
+from core.spectral_storage import SPECTRUM_DTYPE
+
+WINDOW_FUNCTIONS = ('Hamming', 'Hanning', 'Blackman', 'Rectangular')
+
+# Complex samples transformed per block, bounding the temporary memory of long clips
+BLOCK_SAMPLES = 1 << 22
+
+
+def window_coefficients(window_name, size):
+    """Window of the given name and length as float32"""
+    if window_name == 'Hamming':
+        window = np.hamming(size)
+    elif window_name == 'Hanning':
+        window = np.hanning(size)
+    elif window_name == 'Blackman':
+        window = np.blackman(size)
+    else:  # Rectangular
+        window = np.ones(size)
+    return window.astype(np.float32)
+
+
+def compute_spectrogram(samples, fft_size, window_name='Hamming', overlap=0.5, fft_backend=None,
+                        offset_db=0.0, column_range=None):
+    """Power spectrogram (rows = time, columns = fftshifted frequency) of an IQ clip in dB.
+
+    Frames are strided views of the clip (hop = fft_size * (1 - overlap)) and are
+    windowed and transformed a block of rows at a time. column_range=(start, stop)
+    keeps only those frequency columns. Returns (spectrogram, hop).
+    """
+    hop = max(1, int(round(fft_size * (1.0 - overlap))))
+    start, stop = column_range if column_range is not None else (0, fft_size)
+    if len(samples) < fft_size:
+        return np.empty((0, stop - start), dtype=SPECTRUM_DTYPE), hop
+
+    backend = fft_backend if fft_backend is not None else NumpyFFT()
+    window = window_coefficients(window_name, fft_size)
+    frames = sliding_window_view(samples, fft_size)[::hop]  # View, nothing is copied yet
+    out = np.empty((len(frames), stop - start), dtype=SPECTRUM_DTYPE)
+
+    block_frames = max(1, BLOCK_SAMPLES // fft_size)
+    shift = fft_size // 2  # fftshift as an index offset
+    for first in range(0, len(frames), block_frames):
+        block = frames[first:first + block_frames] * window
+        spectrum = backend.fft(block)
+        magnitude = np.abs(np.roll(spectrum, shift, axis=-1)[:, start:stop])
+        rows = out[first:first + len(block)]
+        np.add(magnitude, 1e-12, out=magnitude)
+        np.log10(magnitude, out=magnitude)
+        np.multiply(magnitude, 20.0, out=rows, casting='same_kind')
+        rows += offset_db
+    return out, hop
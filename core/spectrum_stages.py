@@ -0,0 +1,143 @@
+import logging
+
+import numpy as np
+
+from core.fft_backend import get_backend
+from core.frame_processor import FrameProcessor
+from core.pipeline import BlockSpec, Stage
+from core.sample_formats import to_complex64
+from core.spectral_storage import SPECTRUM_DTYPE
+
+# Blocks of dB spectra, fftshifted, newest frame last
+SPECTRUM_SPEC = BlockSpec(SPECTRUM_DTYPE, ('frames', 'bins'))
+IQ_SPECS = {
+    'fc32': BlockSpec(np.complex64, ('frames', 'samples')),
+    'sc16': BlockSpec(np.int16, ('frames', 'samples', 2)),  # Interleaved I/Q pairs
+}
+
+
+def iq_block_spec(cpu_format):
+    """Spec of the receiver's blocks in a host sample format"""
+    return IQ_SPECS[cpu_format]
+
+
+class FftStage(Stage):
+    """IQ frames to calibrated dB spectra, in buffers reused per channel.
+
+    The FFT backend (by name), window and calibration come with every block
+    in context.settings, so changing them needs no rewiring. The stage keeps
+    a FrameProcessor and a backend instance per channel rather than using the
+    ChannelState, so it holds no references to the GUI and runs the same in a
+    ProcessStage. The returned spectra are overwritten by the channel's next
+    block.
+    """
+
+    name = 'fft'
+    input_spec = tuple(IQ_SPECS.values())
+    output_spec = SPECTRUM_SPEC
+    metric = 'fft_seconds'
+
+    def __init__(self):
+        super().__init__()
+        self.processors = {}  # Channel -> FrameProcessor
+        self.backends = {}  # Channel -> FFT backend; pyFFTW plans are not shared between threads
+
+    def process(self, block, context):
+        frames = block
+        if frames.ndim == (2 if frames.dtype == np.int16 else 1):
+            frames = frames[None]  # A single frame
+        fft_size = context.fft_size
+        if frames.shape[1] != fft_size:
+            # The frame length lags behind a size change; truncate or zero-pad (allocates, rarely)
+            frames = to_complex64(frames)
+            if frames.shape[1] > fft_size:
+                frames = frames[:, :fft_size]
+            else:
+                frames = np.pad(frames, ((0, 0), (0, fft_size - frames.shape[1])))
+            logging.warning(f"Data length adjusted to match FFT size for RX channel {context.channel}")
+        settings = context.settings
+        processor = self.processors.get(context.channel)
+        if processor is None:
+            processor = self.processors[context.channel] = FrameProcessor()
+        backend = self.backends.get(context.channel)
+        if backend is None or backend.name != settings.fft_backend:
+            backend = self.backends[context.channel] = get_backend(settings.fft_backend)
+        return processor.process(frames, backend, settings.window_name, settings.calibration_db)
+
+
+class SpectrumStage(Stage):
+    """Publishes the newest frame of the block as the channel's spectrum"""
+
+    name = 'spectrum'
+    input_spec = SPECTRUM_SPEC
+
+    def process(self, block, context):
+        state = context.state
+        state.spectrum = block[-1]
+        state.freq_bins = context.freq_bins
+
+
+class RoiStage(Stage):
+    """Measures all ROIs of the channel on the newest frame"""
+
+    name = 'roi'
+    input_spec = SPECTRUM_SPEC
+    metric = 'roi_seconds'
+
+    def active(self, context):
+        return self.enabled and len(context.state.roi_measurements) > 0
+
+    def process(self, block, context):
+        measurements = context.state.roi_measurements
+        measurements.compile(context.center_freq, context.sample_rate, context.fft_size)
+        measurements.measure(block[-1], context.timestamp)
+
+
+class StatisticsStage(Stage):
+    """Max/min hold, average and percentile histograms over every frame of the block"""
+
+    name = 'statistics'
+    input_spec = SPECTRUM_SPEC
+
+    def active(self, context):
+        return self.enabled and bool(context.state.statistics.statistics)
+
+    def process(self, block, context):
+        context.state.statistics.update(block)
+
+
+class PersistenceStage(Stage):
+    """Adds the block to the channel's persistence density; off until enabled"""
+
+    name = 'persistence'
+    input_spec = SPECTRUM_SPEC
+
+    def __init__(self):
+        super().__init__()
+        self.enabled = False
+
+    def process(self, block, context):
+        context.state.persistence.accumulate(block, context.frame_interval)
+
+
+class WaterfallStage(Stage):
+    """Appends one peak-decimated row per frame to the channel's waterfall history"""
+
+    name = 'waterfall'
+    input_spec = SPECTRUM_SPEC
+    metric = 'waterfall_seconds'
+
+    def __init__(self, max_columns, on_resize=None):
+        super().__init__()
+        self.max_columns = max_columns
+        self.on_resize = on_resize  # Called with the context when the history is resized
+
+    def process(self, block, context):
+        state = context.state
+        rows = state.frame_processor.waterfall_rows(block, self.max_columns)
+        history = state.waterfall_history
+        if history.bins != rows.shape[1]:
+            history.resize(rows.shape[1])
+            if self.on_resize is not None:
+                self.on_resize(context)
+        history.append_rows(rows, context.timestamp, context.frame_seconds)
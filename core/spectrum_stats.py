@@ -0,0 +1,215 @@
+import numpy as np
+
+from core.spectral_storage import SPECTRUM_DTYPE
+
+STATISTICS = ('max', 'min', 'mean', 'percentile')
+
+# Level grid of the percentile histograms, in dB
+PERCENTILE_FLOOR_DB = -160.0
+PERCENTILE_CEILING_DB = 20.0
+PERCENTILE_STEP_DB = 1.0
+
+# Histogram weights grow by 1 / decay per frame instead of decaying every count;
+# everything is rescaled when they get this large
+WEIGHT_RENORMALIZE = 1e12
+# Batches longer than this update the histograms with one bincount rather than frame by frame
+BINCOUNT_MIN_FRAMES = 64
+
+
+class SpectrumStatistics:
+    """Running per-bin statistics of a channel's power spectra, updated in place.
+
+    Every update touches each bin a fixed number of times, whatever the number
+    of frames seen so far, and takes one frame (bins,) or a batch (frames, bins)
+    of dB spectra. Max, min and mean work in scratch buffers kept between
+    updates, so once they exist an update allocates nothing:
+
+    - max and min hold in dB, optionally relaxing by `hold_decay_db` per frame
+    - mean of linear power, exponential with `averaging_factor` or, when
+      `average_count` is set, a true running mean over the first N frames that
+      then continues as an exponential average of length N
+    - approximate percentiles from a per-bin histogram on a 1 dB grid. Each
+      frame adds one weighted count per bin; `percentile_decay` < 1 forgets old
+      frames by growing the weight of new ones rather than scaling the histogram
+
+    Only the statistics named in `statistics` are kept. A change in bin count
+    resets everything.
+    """
+
+    def __init__(self, statistics=('max', 'mean'), averaging_factor=0.5, average_count=None, hold_decay_db=0.0,
+                 percentile_decay=1.0):
+        self.statistics = ()
+        self.averaging_factor = averaging_factor
+        self.average_count = average_count
+        self.hold_decay_db = hold_decay_db
+        self.percentile_decay = percentile_decay
+        self.levels = np.arange(PERCENTILE_FLOOR_DB, PERCENTILE_CEILING_DB, PERCENTILE_STEP_DB)
+        self.bins = 0
+        self.reset()
+        self.set_statistics(statistics)
+
+    def reset(self, bins=None):
+        """Forget every frame; optionally change the bin count"""
+        if bins is not None:
+            self.bins = bins
+        self.count = 0
+        self.max_db = self.min_db = self.histogram = None
+        self.clear_mean()
+        self.weight = 1.0
+        self.row_offsets = np.arange(self.bins) * len(self.levels)
+        self.extreme = np.empty(self.bins, dtype=SPECTRUM_DTYPE)
+        self.update_power = np.empty(self.bins, dtype=np.float32)
+        self.block_power = np.empty((0, self.bins), dtype=np.float32)
+        self.weights = np.empty(0, dtype=np.float32)
+
+    def clear_mean(self):
+        """Restart the average, e.g. after changing how it is computed"""
+        self.mean_power = None
+        self.mean_count = 0
+
+    def set_statistics(self, statistics):
+        """Change which statistics are kept; dropped ones are cleared, the others carry on"""
+        unknown = set(statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError(f"Unknown statistics: {sorted(unknown)}")
+        self.statistics = tuple(statistics)
+        if 'max' not in self.statistics:
+            self.max_db = None
+        if 'min' not in self.statistics:
+            self.min_db = None
+        if 'mean' not in self.statistics:
+            self.clear_mean()
+        if 'percentile' not in self.statistics:
+            self.histogram = None
+            self.weight = 1.0
+
+    @property
+    def nbytes(self):
+        arrays = (self.max_db, self.min_db, self.mean_power, self.histogram)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def update(self, power_db):
+        frames = np.atleast_2d(power_db)
+        if frames.shape[1] != self.bins:
+            self.reset(frames.shape[1])
+        if 'max' in self.statistics:
+            extreme = self._extreme(frames, np.maximum)
+            self.max_db = self._hold(self.max_db, extreme, np.maximum, -self.hold_decay_db, len(frames))
+        if 'min' in self.statistics:
+            extreme = self._extreme(frames, np.minimum)
+            self.min_db = self._hold(self.min_db, extreme, np.minimum, self.hold_decay_db, len(frames))
+        if 'mean' in self.statistics:
+            self._update_mean(frames)
+        if 'percentile' in self.statistics:
+            self._update_histogram(frames)
+        self.count += len(frames)
+
+    def _extreme(self, frames, combine):
+        # Frame by frame rather than a reduction over axis 0, which allocates iterator buffers
+        extreme = self.extreme
+        np.copyto(extreme, frames[0])
+        for frame in frames[1:]:
+            combine(extreme, frame, out=extreme)
+        return extreme
+
+    def _hold(self, held, extreme, combine, decay_db, frames):
+        if held is None:
+            return extreme.copy()
+        if decay_db:
+            held += np.float32(decay_db * frames)
+        combine(held, extreme, out=held)
+        return held
+
+    def _mean_coefficients(self, frames):
+        # The average follows m_k = b_k * m_(k-1) + (1 - b_k) * p_k; unrolled over a
+        # batch this is m = carry * m_0 + weights @ p. Batches are at most a few
+        # hundred frames, so plain Python keeps this free of temporary arrays.
+        keep = []
+        for k in range(frames):
+            if self.average_count:
+                keep.append(1.0 - 1.0 / min(self.mean_count + k + 1, self.average_count))
+            elif self.mean_count == 0 and k == 0:
+                keep.append(0.0)
+            else:
+                keep.append(self.averaging_factor)
+        weights = []
+        later = 1.0  # Product of keep[j] for j > k
+        for k in reversed(range(frames)):
+            weights.append((1.0 - keep[k]) * later)
+            later *= keep[k]
+        weights.reverse()
+        return later, weights
+
+    def _update_mean(self, frames):
+        count = len(frames)
+        if len(self.block_power) < count:
+            self.block_power = np.empty((count, self.bins), dtype=np.float32)
+            self.weights = np.empty(count, dtype=np.float32)
+        power = self.block_power[:count]
+        np.multiply(frames, np.float32(0.1), out=power)
+        np.power(np.float32(10.0), power, out=power)
+        carry, weights = self._mean_coefficients(count)
+        update = self.update_power
+        if count == 1:
+            np.multiply(power[0], np.float32(weights[0]), out=update)
+        else:
+            self.weights[:count] = weights
+            np.dot(self.weights[:count], power, out=update)
+        if self.mean_power is None:
+            self.mean_power = update.copy()
+        else:
+            self.mean_power *= np.float32(carry)
+            self.mean_power += update
+        self.mean_count += count
+
+    def _update_histogram(self, frames):
+        if self.histogram is None:
+            self.histogram = np.zeros(self.bins * len(self.levels), dtype=np.float32)
+        index = np.clip(((frames - PERCENTILE_FLOOR_DB) / PERCENTILE_STEP_DB).astype(np.intp), 0, len(self.levels) - 1)
+        weights = self._frame_weights(len(frames))
+        if len(frames) > BINCOUNT_MIN_FRAMES:
+            # Long batches: one weighted bincount over every frame
+            index += self.row_offsets
+            counts = np.bincount(index.ravel(), np.broadcast_to(weights[:, None], index.shape).ravel(),
+                                 len(self.histogram))
+            self.histogram += counts.astype(np.float32)
+            return
+        for row, weight in zip(index, weights):
+            # Within one frame every bin lands in its own histogram row, so the
+            # flattened indices are unique and plain fancy-index addition is safe
+            self.histogram[row + self.row_offsets] += weight
+
+    def _frame_weights(self, frames):
+        # Weights of the next `frames` frames, growing by 1 / decay per frame. Worked
+        # out in logs and rescaled before they reach WEIGHT_RENORMALIZE, so a long
+        # batch cannot overflow them; counts that fall below float32 resolution
+        # next to the new ones are forgotten, which is what the decay asks for.
+        if self.percentile_decay >= 1.0:
+            return np.full(frames, self.weight, dtype=np.float32)
+        growth = -np.log(self.percentile_decay)
+        log_weights = np.log(self.weight) + growth * np.arange(frames)
+        if log_weights[-1] > np.log(WEIGHT_RENORMALIZE):
+            self.histogram *= np.float32(np.exp(-log_weights[-1]))
+            log_weights -= log_weights[-1]
+        self.weight = float(np.exp(log_weights[-1] + growth))
+        return np.exp(log_weights).astype(np.float32)
+
+    def max_hold(self):
+        return self.max_db
+
+    def min_hold(self):
+        return self.min_db
+
+    def mean_db(self):
+        if self.mean_power is None:
+            return None
+        return (10.0 * np.log10(self.mean_power + np.float32(1e-30))).astype(SPECTRUM_DTYPE)
+
+    def percentile(self, q):
+        """Per-bin q-th percentile in dB, to the histogram's 1 dB resolution"""
+        if self.histogram is None:
+            return None
+        cumulative = np.cumsum(self.histogram.reshape(self.bins, len(self.levels)), axis=1)
+        target = cumulative[:, -1:] * (q / 100.0)
+        index = (cumulative >= target).argmax(axis=1)
+        return (self.levels[index] + PERCENTILE_STEP_DB / 2).astype(SPECTRUM_DTYPE)
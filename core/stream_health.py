@@ -0,0 +1,158 @@
+import logging
+
+
+class StreamHealth:
+    """Sample-accurate continuity accounting for one RX channel, driven by rx_metadata"""
+
+    def __init__(self, rx_channel, sample_rate):
+        self.rx_channel = rx_channel
+        self.sample_rate = sample_rate
+        self.expected_ticks = None
+        self.overflows = 0
+        self.sequence_errors = 0
+        self.timeouts = 0
+        self.other_errors = 0
+        self.gap_events = 0
+        self.gap_samples = 0
+        self.last_ticks = None
+
+    def reset(self, sample_rate=None):
+        """Forget the expected timestamp, e.g. after a rate change or stream restart"""
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        self.expected_ticks = None
+
+    def to_ticks(self, full_secs, frac_secs):
+        return int(round(full_secs * self.sample_rate + frac_secs * self.sample_rate))
+
+    def update(self, error_kind, out_of_sequence, ticks, samples_received):
+        """Account for one recv() call; returns the number of samples missing before this packet.
+
+        error_kind is one of 'none', 'overflow', 'timeout' or 'other'. ticks is the
+        timestamp of the first sample in units of the sample rate, or None when the
+        packet carried no time_spec.
+        """
+        if error_kind == 'overflow':
+            # Samples were lost; the size of the hole is measured from the next timestamp
+            if out_of_sequence:
+                self.sequence_errors += 1
+            else:
+                self.overflows += 1
+            return 0
+        if error_kind == 'timeout':
+            self.timeouts += 1
+            return 0
+        if error_kind != 'none':
+            self.other_errors += 1
+            self.expected_ticks = None
+            return 0
+
+        if samples_received == 0 or ticks is None:
+            return 0
+
+        gap = 0
+        if self.expected_ticks is not None and ticks != self.expected_ticks:
+            gap = ticks - self.expected_ticks
+            if gap > 0:
+                self.gap_events += 1
+                self.gap_samples += gap
+            else:
+                # Time went backwards (device time reset); resynchronise silently
+                logging.warning(f"RX{self.rx_channel} timestamp moved back by {-gap} samples")
+                gap = 0
+        self.last_ticks = ticks
+        self.expected_ticks = ticks + samples_received
+        return gap
+
+    def counters(self):
+        return {
+            'overflows': self.overflows,
+            'sequence_errors': self.sequence_errors,
+            'timeouts': self.timeouts,
+            'other_errors': self.other_errors,
+            'gap_events': self.gap_events,
+            'gap_samples': self.gap_samples,
+        }
+
+
+class RetunePoint:
+    """Where a channel's samples become valid again after a retune.
+
+    Kept in device seconds, not ticks: a retune can change the sample rate,
+    and the receive loop learns the new rate only after the retune point was
+    taken, so ticks counted at one rate would be compared with ticks at the
+    other. The host clock is the fallback for packets without a time_spec.
+    """
+
+    __slots__ = ('until_seconds', 'until_time')
+
+    def __init__(self, until_seconds, until_time):
+        self.until_seconds = until_seconds  # Device time, or None when it was unavailable
+        self.until_time = until_time  # time.perf_counter() deadline
+
+    @classmethod
+    def pending(cls):
+        """Point that holds every sample until it is replaced, for a retune still being applied"""
+        return cls(float('inf'), float('inf'))
+
+    @classmethod
+    def after(cls, device_now, settle_time, host_now):
+        """Point settle_time after `device_now` (a time_spec, or None) and `host_now`"""
+        until_seconds = None
+        if device_now is not None:
+            until_seconds = device_now.get_full_secs() + device_now.get_frac_secs() + settle_time
+        return cls(until_seconds, host_now + settle_time)
+
+    def settling(self, time_spec, host_now):
+        """True while a packet stamped `time_spec` (or received at `host_now`) precedes the point"""
+        if time_spec is not None and self.until_seconds is not None:
+            return time_spec.get_full_secs() + time_spec.get_frac_secs() < self.until_seconds
+        return host_now < self.until_time
+
+
+class LoadShedder:
+    """Steps processing load down on sustained overflows and back up once headroom returns.
+
+    Each call to update() covers one evaluation interval. After `degrade_after`
+    consecutive intervals with overflows the level increases by one; after
+    `recover_after` consecutive clean intervals it decreases by one.
+    """
+
+    def __init__(self, max_level=3, degrade_after=3, recover_after=10):
+        self.max_level = max_level
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.level = 0
+        self.bad_intervals = 0
+        self.good_intervals = 0
+
+    def update(self, overflow_count):
+        """Returns the new level when it changes, otherwise None"""
+        if overflow_count > 0:
+            self.bad_intervals += 1
+            self.good_intervals = 0
+        else:
+            self.good_intervals += 1
+            self.bad_intervals = 0
+
+        if self.bad_intervals >= self.degrade_after and self.level < self.max_level:
+            self.level += 1
+            self.bad_intervals = 0
+            return self.level
+        if self.good_intervals >= self.recover_after and self.level > 0:
+            self.level -= 1
+            self.good_intervals = 0
+            return self.level
+        return None
+
+    def reset(self):
+        self.level = 0
+        self.bad_intervals = 0
+        self.good_intervals = 0
+
+    @staticmethod
+    def degraded_settings(level, fft_size, frame_rate, min_fft_size=256):
+        """FFT size and update rate to use at a given shedding level"""
+        shed_fft = max(min_fft_size, fft_size >> level) if fft_size > min_fft_size else fft_size
+        shed_rate = max(1, frame_rate >> level)
+        return shed_fft, shed_rate
@@ -0,0 +1,419 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from core.fft_backend import get_backend
+from core.frame_processor import FrameProcessor
+from core.metrics import PipelineMetrics
+
+TRIGGER_KINDS = ('band_power', 'cfar', 'mask')
+
+
+def bin_frequencies(center_freq, sample_rate, fft_size):
+    """Absolute frequency in Hz of each fftshifted bin"""
+    return center_freq + np.fft.fftshift(np.fft.fftfreq(fft_size, d=1.0 / sample_rate))
+
+
+class BandPowerTrigger:
+    """Fires when the integrated power between two absolute frequencies reaches a threshold"""
+
+    kind = 'band_power'
+
+    def __init__(self, freq_start, freq_end, threshold_db):
+        self.freq_start = min(freq_start, freq_end)
+        self.freq_end = max(freq_start, freq_end)
+        self.threshold_db = threshold_db
+        self.start = self.stop = 0
+
+    def compile(self, freq_points):
+        self.start = int(np.searchsorted(freq_points, self.freq_start, side='left'))
+        self.stop = int(np.searchsorted(freq_points, self.freq_end, side='right'))
+
+    def evaluate(self, power_db):
+        if self.stop <= self.start:
+            return None
+        band_power = 10 * np.log10(np.sum(10 ** (power_db[:, self.start:self.stop] / 10), axis=1))
+        frame = int(np.argmax(band_power))
+        if band_power[frame] < self.threshold_db:
+            return None
+        return frame, float(band_power[frame])
+
+    def describe(self):
+        return {'freq_start': self.freq_start, 'freq_end': self.freq_end, 'threshold_db': self.threshold_db}
+
+
+class CfarTrigger:
+    """Cell-averaging CFAR across frequency on the block's peak-hold spectrum.
+
+    Each bin is compared with the mean linear power of `training_bins` bins on
+    either side, skipping `guard_bins` next to it; the trigger fires when any
+    bin stands `threshold_db` above that local noise estimate. Both windows are
+    summed from one cumulative sum, so the cost is a few passes over the bins.
+    """
+
+    kind = 'cfar'
+
+    def __init__(self, threshold_db=15.0, guard_bins=4, training_bins=32):
+        self.threshold_db = threshold_db
+        self.guard_bins = guard_bins
+        self.training_bins = training_bins
+        self.lead = self.lag = None
+
+    def compile(self, freq_points):
+        # Window edges per bin, clipped to the spectrum
+        bins = np.arange(len(freq_points))
+        self.lead = (np.clip(bins - self.guard_bins - self.training_bins, 0, len(bins)),
+                     np.clip(bins - self.guard_bins, 0, len(bins)))
+        self.lag = (np.clip(bins + self.guard_bins + 1, 0, len(bins)),
+                    np.clip(bins + self.guard_bins + self.training_bins + 1, 0, len(bins)))
+        self.cells = (self.lead[1] - self.lead[0]) + (self.lag[1] - self.lag[0])
+
+    def evaluate(self, power_db):
+        peak_db = power_db.max(axis=0)
+        # float64 sums, or a strong carrier cancels the noise cells next to it out of the differences
+        cumulative = np.concatenate(([0.0], np.cumsum(10 ** (peak_db / 10.0), dtype=np.float64)))
+        training = (cumulative[self.lead[1]] - cumulative[self.lead[0]]
+                    + cumulative[self.lag[1]] - cumulative[self.lag[0]])
+        noise_db = 10 * np.log10(np.maximum(training, 1e-30) / np.maximum(self.cells, 1))
+        excess_db = peak_db - noise_db
+        cell = int(np.argmax(excess_db))
+        if excess_db[cell] < self.threshold_db:
+            return None
+        return int(np.argmax(power_db[:, cell])), float(excess_db[cell])
+
+    def describe(self):
+        return {'threshold_db': self.threshold_db, 'guard_bins': self.guard_bins,
+                'training_bins': self.training_bins}
+
+
+class MaskTrigger:
+    """Fires when the spectrum rises above a limit line.
+
+    The mask is a list of (frequency in Hz, level in dB) points, interpolated
+    linearly onto the bins; bins outside the mask's span are not checked.
+    """
+
+    kind = 'mask'
+
+    def __init__(self, points):
+        self.points = sorted((float(freq), float(level)) for freq, level in points)
+        self.limits = None
+
+    def compile(self, freq_points):
+        freqs, levels = zip(*self.points)
+        self.limits = np.interp(freq_points, freqs, levels, left=np.inf, right=np.inf).astype(np.float32)
+
+    def evaluate(self, power_db):
+        excess = power_db - self.limits
+        index = int(np.argmax(excess))
+        frame, cell = divmod(index, power_db.shape[1])
+        if excess[frame, cell] <= 0:
+            return None
+        return frame, float(excess[frame, cell])
+
+    def describe(self):
+        return {'points': self.points}
+
+
+class TriggerEvent:
+    """One firing of a trigger, with the IQ window to save around it.
+
+    Positions are sample sequence numbers of the channel's IQHistory, so the
+    window is cut from the samples themselves rather than from host times.
+    """
+
+    def __init__(self, kind, value, trigger_sequence, sample_rate, pre_seconds, post_seconds, details=None):
+        self.kind = kind
+        self.value = value  # dB: band power, level over noise, or excess over the mask
+        self.trigger_sequence = trigger_sequence  # First sample of the frame that fired
+        self.sample_rate = sample_rate
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.details = details or {}
+
+    @property
+    def start_sequence(self):
+        return self.trigger_sequence - int(round(self.pre_seconds * self.sample_rate))
+
+    @property
+    def end_sequence(self):
+        return self.trigger_sequence + int(round(self.post_seconds * self.sample_rate))
+
+
+class TriggerEngine:
+    """Evaluates one trigger condition on consecutive spectra of a channel.
+
+    Conditions are compiled to bin ranges once per tuning, like ROI
+    measurements, so evaluating a block is a handful of numpy passes over it.
+    After firing, the trigger is held off for `holdoff` seconds so one long
+    burst or a noisy threshold does not flood the disk.
+    """
+
+    def __init__(self, condition, pre_seconds=0.05, post_seconds=0.2, holdoff=1.0):
+        self.condition = condition
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.holdoff = holdoff
+        self.key = None
+        self.last_trigger_sequence = None
+        self.fired = 0
+        self.held_off = 0
+
+    def compile(self, center_freq, sample_rate, fft_size):
+        key = (center_freq, sample_rate, fft_size)
+        if key != self.key:
+            self.condition.compile(bin_frequencies(center_freq, sample_rate, fft_size))
+            self.key = key
+
+    def evaluate(self, power_db, first_sequence, sample_rate):
+        """TriggerEvent for (frames, bins) spectra of contiguous frames starting at sample `first_sequence`, or None"""
+        hit = self.condition.evaluate(power_db)
+        if hit is None:
+            return None
+        frame, value = hit
+        trigger_sequence = first_sequence + frame * power_db.shape[1]
+        if (self.last_trigger_sequence is not None
+                and trigger_sequence - self.last_trigger_sequence < self.holdoff * sample_rate):
+            self.held_off += 1
+            return None
+        self.last_trigger_sequence = trigger_sequence
+        self.fired += 1
+        return TriggerEvent(self.condition.kind, value, trigger_sequence, sample_rate, self.pre_seconds,
+                            self.post_seconds, self.condition.describe())
+
+
+class TriggerWorker:
+    """Evaluates a channel's TriggerEngine on every frame of its raw IQ, on its own thread.
+
+    The display path only sees the frames due at the frame rate, a small part
+    of the stream, so a short burst between two of them would be missed. Like
+    BurstDetectorWorker, this reads the channel's IQHistory gapless, cuts it
+    into consecutive fft_size frames and turns them into dB spectra with the
+    display's window and calibration, so thresholds mean the same as on screen.
+    `tuning()` returns (center_freq, fft_size, SpectrumSettings) and is read
+    on every poll. Events are passed to `on_event(event, center_freq)` on this
+    thread. If the worker falls more than max_latency seconds behind it skips
+    ahead and counts the samples it never looked at.
+    """
+
+    POLL_INTERVAL = 0.01  # Seconds
+    MAX_LATENCY = 0.25  # Seconds
+
+    def __init__(self, iq_history, engine, tuning, on_event, metrics=None, channel=0, max_latency=MAX_LATENCY):
+        self.iq_history = iq_history
+        self.engine = engine
+        self.tuning = tuning
+        self.on_event = on_event
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        self.channel = channel
+        self.max_latency = max_latency
+        self.processor = FrameProcessor()
+        self.backend = None
+        self.running = False
+        self.thread = None
+        self.samples_in = 0
+        self.skipped_samples = 0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _run(self):
+        history = self.iq_history
+        sequence = history.written
+        leftover = np.zeros(0, dtype=np.complex64)  # Start of the next frame, not yet complete
+        try:
+            while self.running:
+                center_freq, fft_size, settings = self.tuning()
+                sample_rate = history.sample_rate
+                if self.engine.key != (center_freq, sample_rate, fft_size):
+                    # Retuned or resized: frames restart from here
+                    self.engine.compile(center_freq, sample_rate, fft_size)
+                    sequence, leftover = history.written, leftover[:0]
+                if self.backend is None or self.backend.name != settings.fft_backend:
+                    self.backend = get_backend(settings.fft_backend)
+
+                start, samples = history.read_since(sequence, int(self.max_latency * sample_rate))
+                if len(samples) == 0:
+                    time.sleep(self.POLL_INTERVAL)
+                    continue
+                if start != sequence:
+                    self.skipped_samples += start - sequence
+                    leftover = leftover[:0]
+                sequence = start + len(samples)
+                self.samples_in += len(samples)
+
+                began = time.perf_counter()
+                if len(leftover):
+                    samples = np.concatenate((leftover, samples))
+                first = sequence - len(samples)
+                frames = len(samples) // fft_size
+                leftover = samples[frames * fft_size:].copy()
+                if not frames:
+                    continue
+                power_db = self.processor.process(samples[:frames * fft_size].reshape(frames, fft_size),
+                                                  self.backend, settings.window_name, settings.calibration_db)
+                event = self.engine.evaluate(power_db, first, sample_rate)
+                self.metrics.observe('trigger_seconds', self.channel, time.perf_counter() - began)
+                if event is not None:
+                    self.on_event(event, center_freq)
+        except Exception as e:
+            logging.error(f"Trigger on RX{self.channel} stopped: {e}")
+        finally:
+            self.running = False
+
+
+class BurstWriter:
+    """Saves triggered IQ bursts to disk on a background thread.
+
+    submit() only queues the request, so the trigger never waits on the
+    disk. The thread waits until the history has received the post-trigger
+    window, copies [trigger - pre, trigger + post] out of the channel's
+    IQHistory by sample sequence, in its storage format (sc16 stays int16),
+    and writes it with a JSON sidecar in the RawRecorder layout plus the
+    trigger's metadata, so batch_process.py reads bursts like recordings.
+
+    Writes are rate-limited by a byte budget refilled at max_bytes_per_second
+    (up to one second's worth). A burst is written whenever the budget is not
+    in debt and may overdraw it, so bursts larger than a second's budget are
+    still saved and the debt holds off the next ones. Bursts arriving while
+    the budget is in debt, or while `max_pending` are queued, are dropped and
+    counted. Bursts still queued at stop(), or whose window is not complete
+    MAX_WAIT seconds after it should have been (the stream stopped), are
+    written with what the history holds.
+    """
+
+    POLL_INTERVAL = 0.02  # Seconds
+    MAX_WAIT = 1.0  # Seconds
+
+    def __init__(self, directory, max_pending=16, max_bytes_per_second=50e6, metrics=None):
+        self.directory = directory
+        self.max_bytes_per_second = max_bytes_per_second
+        self.metrics = metrics
+        self.requests = queue.Queue(maxsize=max_pending)
+        self.budget = max_bytes_per_second
+        self.budget_time = time.perf_counter()
+        self.bursts_written = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.last_path = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            os.makedirs(self.directory, exist_ok=True)
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def submit(self, event, iq_history, center_freq=0.0, channel=0, name='rx1'):
+        """Queue a burst for writing; False when it was dropped because the queue is full"""
+        try:
+            self.requests.put_nowait((event, iq_history, center_freq, channel, name))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self._count('bursts_dropped_total', channel)
+            return False
+
+    def _count(self, name, channel, amount=1):
+        if self.metrics is not None:
+            self.metrics.increment(name, channel, amount)
+
+    def _take_budget(self, nbytes):
+        now = time.perf_counter()
+        self.budget = min(self.max_bytes_per_second,
+                          self.budget + (now - self.budget_time) * self.max_bytes_per_second)
+        self.budget_time = now
+        if self.budget < 0:
+            return False
+        self.budget -= nbytes  # May go into debt, repaid before the next burst
+        return True
+
+    @classmethod
+    def history_seconds(cls, pre_seconds, post_seconds):
+        """Raw IQ a channel must keep so the pre-trigger samples are still there when the burst is copied"""
+        return pre_seconds + post_seconds + TriggerWorker.MAX_LATENCY + cls.POLL_INTERVAL
+
+    def _run(self):
+        # After stop() the queued bursts are still written, with what the ring holds by then
+        while self.running or not self.requests.empty():
+            try:
+                request = self.requests.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            event, iq_history = request[0], request[1]
+            # The post-trigger samples arrive after the trigger; wait for them
+            deadline = time.perf_counter() + event.post_seconds + self.MAX_WAIT
+            while (self.running and iq_history.written < event.end_sequence
+                   and time.perf_counter() < deadline):
+                time.sleep(self.POLL_INTERVAL)
+            try:
+                self.write(*request)
+            except Exception as e:
+                logging.error(f"Writing {event.kind} burst failed: {e}")
+
+    def write(self, event, iq_history, center_freq, channel, name):
+        clip = iq_history.extract_range(event.start_sequence, event.end_sequence, raw=True)
+        if clip is None:
+            self.dropped += 1
+            self._count('bursts_dropped_total', channel)
+            return None
+        if not self._take_budget(clip.samples.nbytes):
+            self.rate_limited += 1
+            self._count('bursts_dropped_total', channel)
+            return None
+
+        trigger_time, _ = iq_history.time_at(event.trigger_sequence)
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(trigger_time))
+        millis = int((trigger_time % 1) * 1000)
+        path = os.path.join(self.directory,
+                            f"{name}_{stamp}_{millis:03d}_{event.kind}.{iq_history.cpu_format}")
+        with open(path, 'wb') as f:
+            f.write(memoryview(np.ascontiguousarray(clip.samples)))
+        metadata = {
+            'format': iq_history.cpu_format,
+            'sample_rate': clip.sample_rate,
+            'center_freq': center_freq,
+            'start_time': clip.start_time,
+            'trigger': {
+                'kind': event.kind,
+                'value_db': event.value,
+                'time': trigger_time,
+                'offset_samples': event.trigger_sequence - clip.start_sequence,
+                'pre_seconds': event.pre_seconds,
+                'post_seconds': event.post_seconds,
+                'channel': name,
+                'settings': event.details,
+            },
+        }
+        with open(path + '.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+        self.bursts_written += 1
+        self.bytes_written += clip.samples.nbytes
+        self.last_path = path
+        self._count('bursts_written_total', channel)
+        logging.info(f"Saved {event.kind} burst ({len(clip.samples)} samples) to {path}")
+        return path
@@ -1,29 +1,61 @@
 import numpy as np
-import uhd
-from uhd import libpyuhd
 import threading
 import time
 import logging
+from types import SimpleNamespace
 from PyQt5.QtCore import QObject, pyqtSignal
+from core.metrics import PipelineMetrics
+from core.stream_health import RetunePoint, StreamHealth
+from core.iq_history import DEFAULT_IQ_HISTORY_SAMPLES, IQHistory
+from core.sample_formats import CPU_FORMATS, OTW_FORMATS, recv_view
+from core.buffer_pool import BufferPool
+
+
+def device_stream_types(usrp):
+    """Stream argument, command and metadata types for a device.
+
+    Devices that bring their own (SimulatedMultiUSRP) expose them as
+    `stream_types`; for hardware they are libpyuhd's, imported only then.
+    """
+    stream_types = getattr(usrp, 'stream_types', None)
+    if stream_types is not None:
+        return stream_types
+    from uhd import libpyuhd
+    return SimpleNamespace(stream_args=libpyuhd.usrp.stream_args,
+                           stream_cmd=libpyuhd.types.stream_cmd,
+                           stream_mode=libpyuhd.types.stream_mode,
+                           rx_metadata=libpyuhd.types.rx_metadata,
+                           rx_metadata_error_code=libpyuhd.types.rx_metadata_error_code)
 
 
 class TxRx(QObject):
-    # Signals for RX data
-    data_received_rx1 = pyqtSignal(np.ndarray, int)  # Signal for RX1 data
-    data_received_rx2 = pyqtSignal(np.ndarray, int)  # Signal for RX2 data
+    # Blocks of RX data, with the device RX channel they came from and the host time they were received
+    data_received = pyqtSignal(np.ndarray, int, float)
+    stream_gap = pyqtSignal(int, int)  # RX channel, number of samples lost
 
-    def __init__(self, usrp_control):
+    def __init__(self, usrp_control, metrics=None, otw_format='sc16', cpu_format='fc32', first_channel=0):
         super().__init__()
         self.usrp = usrp_control.usrp
+        self.stream_types = device_stream_types(self.usrp)
+        # Metrics are labelled first_channel + RX channel, so several radios can share one registry
+        self.first_channel = first_channel
+        # Wire format (sc16/sc8) and the format recv() writes on the host (fc32/sc16)
+        self.otw_format = otw_format
+        self.cpu_format = cpu_format
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
         self.fft_size = 1024
         self.frame_rate = 30  # Hz
         self.frame_interval = 1.0 / self.frame_rate
-        self.last_frame_time = 0
+        # Consecutive frames handed over together as one (frames, fft_size) block
+        self.frames_per_block = 1
 
         self.running = False
-        self.rx_thread_rx1 = None
-        self.rx_thread_rx2 = None
+        self.rx_threads = []  # One receive thread per RX channel
         self.tx_thread = None
+        self.max_pending_frames = 8
+
+        # Recent raw IQ per channel, for re-processing past signals at other settings
+        self.iq_history_samples = DEFAULT_IQ_HISTORY_SAMPLES
 
         # Determine available RX channels and initialize streamers
         self.setup_rx_streamers()
@@ -31,31 +63,34 @@ class TxRx(QObject):
         self.setup_tx_streamer()
 
     def setup_rx_streamers(self):
-        """Setup RX streamers for available channels"""
+        """Setup one RX streamer, and the per-channel state below, for every RX channel of the device"""
         try:
             self.num_rx_channels = self.usrp.get_rx_num_channels()
             logging.info(f"Number of RX channels available: {self.num_rx_channels}")
-
-            # Initialize RX1 (TX/RX) streamer
-            stream_args = libpyuhd.usrp.stream_args("fc32", "sc16")
-            stream_args.channels = [0]
-            self.rx_streamer_rx1 = self.usrp.get_rx_stream(stream_args)
-            logging.info("TX/RX Streamer initialized successfully")
-
-            # Initialize RX2 streamer if available
-            if self.num_rx_channels >= 2:
-                stream_args.channels = [1]
-                self.rx_streamer_rx2 = self.usrp.get_rx_stream(stream_args)
-                self.rx2_available = True
-                logging.info("RX2 Streamer initialized successfully")
-            else:
-                self.rx2_available = False
-                logging.info("RX2 Streamer not available")
-
-            # Get buffer sizes
-            self.rx_buffer_size_rx1 = self.rx_streamer_rx1.get_max_num_samps()
-            if self.rx2_available:
-                self.rx_buffer_size_rx2 = self.rx_streamer_rx2.get_max_num_samps()
+            channels = range(self.num_rx_channels)
+
+            self.rx_streamers = []
+            for chan in channels:
+                stream_args = self.stream_types.stream_args(self.cpu_format, self.otw_format)
+                stream_args.channels = [chan]
+                self.rx_streamers.append(self.usrp.get_rx_stream(stream_args))
+                logging.info(f"RX{chan} streamer initialized successfully")
+
+            # Continuity accounting per channel
+            self.stream_health = [StreamHealth(chan, self.usrp.get_rx_rate(chan)) for chan in channels]
+            self.iq_history = [IQHistory(self.iq_history_samples, health.sample_rate, self.cpu_format)
+                               for health in self.stream_health]
+
+            # Frames emitted by the RX threads and consumed by the processing side, per channel.
+            # Each counter has a single writer so no locking is needed to derive the queue depth.
+            self.frames_emitted = [0] * self.num_rx_channels
+            self.frames_consumed = [0] * self.num_rx_channels
+            # Blocks are filled in place and handed over without copying; one pool per channel,
+            # sized so the queue limit is reached before the pool runs dry
+            self.buffer_pools = [None] * self.num_rx_channels
+            # Per channel RetunePoint (device seconds, host perf_counter deadline) before which
+            # samples are discarded while a retune is applied and the LO and clocks settle
+            self.retune_points = [None] * self.num_rx_channels
 
         except Exception as e:
             logging.error(f"Failed to initialize RX streamers: {e}")
@@ -64,7 +99,8 @@ class TxRx(QObject):
     def setup_tx_streamer(self):
         """Setup TX streamer for channel 0"""
         try:
-            stream_args = libpyuhd.usrp.stream_args("fc32", "sc16")
+            # Waveforms are generated as complex64; only the wire format follows the RX choice
+            stream_args = self.stream_types.stream_args("fc32", self.otw_format)
             stream_args.channels = [0]
             self.tx_streamer = self.usrp.get_tx_stream(stream_args)
             logging.info("TX Streamer initialized successfully")
@@ -73,20 +109,16 @@ class TxRx(QObject):
             raise
 
     def start_receiving(self):
-        """Start the receiving threads for RX channels"""
+        """Start one receiving thread per RX channel"""
         if not self.running:
             try:
                 self.running = True
-                # Start TX/RX (RX1) thread
-                self.rx_thread_rx1 = threading.Thread(target=self.receive_rx1, daemon=True)
-                self.rx_thread_rx1.start()
-                logging.info("TX/RX receiving thread started")
-
-                # Start RX2 thread if available
-                if self.rx2_available:
-                    self.rx_thread_rx2 = threading.Thread(target=self.receive_rx2, daemon=True)
-                    self.rx_thread_rx2.start()
-                    logging.info("RX2 receiving thread started")
+                self.rx_threads = []
+                for chan, rx_streamer in enumerate(self.rx_streamers):
+                    thread = threading.Thread(target=self._receive_data, args=(rx_streamer, chan), daemon=True)
+                    thread.start()
+                    self.rx_threads.append(thread)
+                    logging.info(f"RX{chan} receiving thread started")
 
             except Exception as e:
                 logging.error(f"Failed to start receiving threads: {e}")
@@ -98,19 +130,12 @@ class TxRx(QObject):
         try:
             self.running = False
 
-            # Stop TX/RX thread
-            if self.rx_thread_rx1 and self.rx_thread_rx1.is_alive():
-                cmd = libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.stop_cont)
-                self.rx_streamer_rx1.issue_stream_cmd(cmd)
-                self.rx_thread_rx1.join(timeout=1.0)
-                logging.info("TX/RX receiving thread stopped")
-
-            # Stop RX2 thread if available
-            if self.rx2_available and self.rx_thread_rx2 and self.rx_thread_rx2.is_alive():
-                cmd = libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.stop_cont)
-                self.rx_streamer_rx2.issue_stream_cmd(cmd)
-                self.rx_thread_rx2.join(timeout=1.0)
-                logging.info("RX2 receiving thread stopped")
+            for chan, thread in enumerate(self.rx_threads):
+                if thread.is_alive():
+                    cmd = self.stream_types.stream_cmd(self.stream_types.stream_mode.stop_cont)
+                    self.rx_streamers[chan].issue_stream_cmd(cmd)
+                    thread.join(timeout=1.0)
+                    logging.info(f"RX{chan} receiving thread stopped")
 
         except Exception as e:
             logging.error(f"Failed to stop receiving threads: {e}")
@@ -150,7 +175,7 @@ class TxRx(QObject):
     def _transmit_waveform(self, waveform, duration):
         """Transmit a given waveform on the TX port for a specified duration"""
         try:
-            cmd = libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.start_cont)
+            cmd = self.stream_types.stream_cmd(self.stream_types.stream_mode.start_cont)
             cmd.stream_now = True
             self.tx_streamer.issue_stream_cmd(cmd)
 
@@ -159,7 +184,7 @@ class TxRx(QObject):
                 self.tx_streamer.send(waveform, metadata=None)
 
             # Stop TX stream
-            stop_cmd = libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.stop_cont)
+            stop_cmd = self.stream_types.stream_cmd(self.stream_types.stream_mode.stop_cont)
             self.tx_streamer.issue_stream_cmd(stop_cmd)
             logging.info("TX stream stopped after transmitting waveform")
 
@@ -167,49 +192,235 @@ class TxRx(QObject):
             logging.error(f"Error during transmission: {e}")
             raise
 
-    def receive_rx1(self):
-        """Receive data continuously for TX/RX port"""
-        self._receive_data(self.rx_streamer_rx1, 0)
-
-    def receive_rx2(self):
-        """Receive data continuously for RX2 port"""
-        if self.rx2_available:
-            self._receive_data(self.rx_streamer_rx2, 1)
+    def set_fft_size(self, fft_size):
+        """Change the frame size; the receive loops reallocate their buffer on the next recv"""
+        self.fft_size = fft_size
+
+    def set_frames_per_block(self, frames):
+        """Emit blocks of this many contiguous frames; takes effect on the next recv"""
+        self.frames_per_block = max(1, int(frames))
+
+    def set_frame_rate(self, frame_rate):
+        """Change how many frames per second are handed to the processing side"""
+        self.frame_rate = frame_rate
+        self.frame_interval = 1.0 / frame_rate
+
+    def set_sample_rate(self, sample_rate, rx_channel):
+        """Tell the continuity tracker that the channel now runs at a new rate"""
+        if rx_channel < len(self.stream_health):
+            self.stream_health[rx_channel].reset(sample_rate)
+            self.iq_history[rx_channel].set_sample_rate(sample_rate)
+
+    def set_iq_history_samples(self, samples):
+        """Resize the raw IQ history of every channel; stored samples are discarded"""
+        self.iq_history_samples = samples
+        self.iq_history = [IQHistory(samples, health.sample_rate, self.cpu_format) for health in self.stream_health]
+
+    def set_stream_formats(self, otw_format, cpu_format):
+        """Recreate the streamers with new wire and host formats; only while stopped.
+
+        The raw IQ histories are recreated in the new host format, so stored
+        samples are discarded.
+        """
+        if otw_format not in OTW_FORMATS or cpu_format not in CPU_FORMATS:
+            raise ValueError(f"Unsupported stream format: otw={otw_format}, cpu={cpu_format}")
+        if self.running:
+            raise RuntimeError("Stop receiving before changing stream formats")
+        self.otw_format = otw_format
+        self.cpu_format = cpu_format
+        self.setup_rx_streamers()
+        self.setup_tx_streamer()
+        logging.info(f"Stream formats set to otw={otw_format}, cpu={cpu_format}")
+
+    def begin_retune(self, rx_channel):
+        """Stop assembling frames for rx_channel until mark_retune(); called before the retune is applied"""
+        if rx_channel < len(self.stream_health):
+            self.retune_points[rx_channel] = RetunePoint.pending()
+
+    def mark_retune(self, rx_channel, settle_time):
+        """Tag the stream: samples up to now plus settle_time are discarded for rx_channel.
+
+        Called right after a retune has been applied. The retune point is taken from
+        the device clock in seconds (see RetunePoint), so it holds across a rate change
+        that stream_health has not seen yet.
+        """
+        if rx_channel >= len(self.stream_health):
+            return
+        device_now = None
+        try:
+            device_now = self.usrp.get_time_now()
+        except Exception as e:
+            logging.debug(f"Device time unavailable for RX{rx_channel} retune point: {e}")
+        self.retune_points[rx_channel] = RetunePoint.after(device_now, settle_time, time.perf_counter())
+
+    def frame_consumed(self, rx_channel, buffer=None):
+        """Called by the consumer once a block emitted for rx_channel has been processed.
+
+        Passing the block back returns it to the receiver's pool; it must not be
+        used afterwards.
+        """
+        self.frames_consumed[rx_channel] += 1
+        pool = self.buffer_pools[rx_channel]
+        if buffer is not None and pool is not None:
+            pool.release(buffer)
+
+    def queue_depth(self, rx_channel):
+        return self.frames_emitted[rx_channel] - self.frames_consumed[rx_channel]
+
+    @staticmethod
+    def _classify_error(error_code, error_codes):
+        if error_code == error_codes.none:
+            return 'none'
+        if error_code == error_codes.overflow:
+            return 'overflow'
+        if error_code == error_codes.timeout:
+            return 'timeout'
+        return 'other'
 
     def _receive_data(self, rx_streamer, rx_channel):
-        """Common method to receive data from a specified RX streamer"""
+        """Common method to receive data from a specified RX streamer.
+
+        The streamer is drained continuously so host-side throttling never causes
+        device overflows; only the frames due at the configured frame rate are emitted.
+        Frames longer than one recv() (large FFT sizes) are assembled from consecutive
+        packets, and a partially assembled frame is discarded when a gap is detected.
+        Each emission is a block of `frames_per_block` contiguous frames, shaped
+        (frames, fft_size), so the processing side handles them in one vectorized
+        call. Blocks are emitted in the host format; with sc16 they stay int16
+        (with a trailing I/Q axis) until the DSP stage converts them. recv() writes
+        straight into blocks from a BufferPool, and the emitted block is the pool's
+        own array; the consumer hands it back through frame_consumed().
+        """
         try:
-            cmd = libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.start_cont)
+            cmd = self.stream_types.stream_cmd(self.stream_types.stream_mode.start_cont)
             cmd.stream_now = True
             rx_streamer.issue_stream_cmd(cmd)
 
-            buffer_samps = min(self.fft_size, rx_streamer.get_max_num_samps())
-            recv_buffer = np.zeros((buffer_samps,), dtype=np.complex64)
-            metadata = libpyuhd.types.rx_metadata()
-
-            logging.info(f"Starting RX{rx_channel} receive loop with buffer size: {buffer_samps}")
+            metadata = self.stream_types.rx_metadata()
+            error_codes = self.stream_types.rx_metadata_error_code
+            health = self.stream_health[rx_channel]
+            health.reset(self.usrp.get_rx_rate(rx_channel))
+            self.iq_history[rx_channel].set_sample_rate(health.sample_rate)
+
+            metrics = self.metrics
+            label = self.first_channel + rx_channel
+            rate_window_start = time.perf_counter()
+            rate_window_samples = 0
+            reported = health.counters()
+            last_emit_time = 0.0
+            buffer_shape = None
+            frame_filled = 0
+            self.frames_emitted[rx_channel] = 0
+            self.frames_consumed[rx_channel] = 0
 
             while self.running:
-                current_time = time.time()
-                if current_time - self.last_frame_time >= self.frame_interval:
-                    try:
-                        samples_received = rx_streamer.recv(recv_buffer, metadata)
-
-                        if samples_received:
-                            data = recv_buffer[:samples_received].copy()
-                            if rx_channel == 0:
-                                self.data_received_rx1.emit(data, rx_channel)
-                            else:
-                                self.data_received_rx2.emit(data, rx_channel)
-                            self.last_frame_time = current_time
-
-                    except Exception as e:
-                        if not self.running:
-                            break
-                        logging.warning(f"RX{rx_channel} receive error: {e}")
-                        time.sleep(0.1)
-                else:
-                    time.sleep(0.001)
+                if buffer_shape != (self.frames_per_block, self.fft_size):
+                    buffer_shape = (self.frames_per_block, self.fft_size)
+                    block_samples = buffer_shape[0] * buffer_shape[1]
+                    buffer_samps = min(block_samples, rx_streamer.get_max_num_samps())
+                    pool = BufferPool(self.max_pending_frames + 1, *buffer_shape, self.cpu_format)
+                    self.buffer_pools[rx_channel] = pool
+                    frame_buffer = pool.acquire()
+                    frame_samples = BufferPool.samples(frame_buffer)
+                    frame_filled = 0
+                    logging.info(f"Starting RX{rx_channel} receive loop with buffer size: {buffer_samps}, "
+                                 f"frame size: {buffer_shape[1]}, frames per block: {buffer_shape[0]}")
+
+                try:
+                    recv_buffer = frame_samples[frame_filled:frame_filled + buffer_samps]
+                    recv_start = time.perf_counter()
+                    samples_received = rx_streamer.recv(recv_view(recv_buffer), metadata)
+                    recv_end = time.perf_counter()
+                    metrics.observe('recv_seconds', label, recv_end - recv_start)
+
+                    error_kind = self._classify_error(metadata.error_code, error_codes)
+                    ticks = time_spec = None
+                    if samples_received and metadata.has_time_spec:
+                        time_spec = metadata.time_spec
+                        ticks = health.to_ticks(time_spec.get_full_secs(), time_spec.get_frac_secs())
+                    gap = health.update(error_kind, metadata.out_of_sequence, ticks, samples_received)
+
+                    if error_kind == 'overflow':
+                        metrics.increment('sequence_errors_total' if metadata.out_of_sequence else 'overflows_total', label)
+                    elif error_kind == 'timeout':
+                        metrics.increment('timeouts_total', label)
+                    if gap:
+                        metrics.increment('gap_samples_total', label, gap)
+                        self.stream_gap.emit(rx_channel, gap)
+                        self.iq_history[rx_channel].mark_discontinuity()
+                        if frame_filled:
+                            # The partial frame straddles the gap; restart it from this packet
+                            frame_samples[:samples_received] = recv_buffer[:samples_received]
+                            frame_filled = 0
+
+                    if recv_end - rate_window_start >= 1.0:
+                        metrics.set_gauge('samples_per_second', label,
+                                          rate_window_samples / (recv_end - rate_window_start))
+                        rate_window_start = recv_end
+                        rate_window_samples = 0
+                        counters = health.counters()
+                        if counters != reported:
+                            logging.warning(
+                                f"RX{rx_channel} stream: {counters['overflows'] - reported['overflows']} overflows, "
+                                f"{counters['sequence_errors'] - reported['sequence_errors']} sequence errors, "
+                                f"{counters['gap_samples'] - reported['gap_samples']} samples lost in the last second"
+                            )
+                            reported = counters
+
+                    if not samples_received:
+                        continue
+
+                    metrics.increment('samples_total', label, samples_received)
+                    rate_window_samples += samples_received
+                    self.iq_history[rx_channel].write(recv_buffer[:samples_received],
+                                                      time.time() - samples_received / health.sample_rate)
+
+                    retune_point = self.retune_points[rx_channel]
+                    if retune_point is not None:
+                        # Any partial frame holds pre-retune samples
+                        frame_filled = 0
+                        if retune_point.settling(time_spec, recv_end):
+                            metrics.increment('retune_discarded_samples_total', label, samples_received)
+                            continue
+                        if self.retune_points[rx_channel] is retune_point:
+                            self.retune_points[rx_channel] = None
+                        # This packet starts after the settling point and begins a fresh frame
+                        frame_samples[:samples_received] = recv_buffer[:samples_received]
+
+                    current_time = time.time()
+                    if frame_filled == 0 and current_time - last_emit_time < self.frame_interval:
+                        # Not due yet; the samples are consumed but not assembled into a frame
+                        continue
+
+                    frame_filled += samples_received
+                    if frame_filled < block_samples:
+                        continue
+                    frame_filled = 0
+
+                    depth = self.queue_depth(rx_channel)
+                    metrics.set_gauge('queue_depth', label, depth)
+                    if depth >= self.max_pending_frames:
+                        # Consumer is behind; drop rather than let the Qt event queue grow
+                        metrics.increment('dropped_frames_total', label)
+                        continue
+
+                    next_buffer = pool.acquire()
+                    if next_buffer is None:
+                        # Every block is still held downstream; drop this one and refill it
+                        metrics.increment('pool_exhausted_total', label)
+                        continue
+                    data, frame_buffer = frame_buffer, next_buffer
+                    frame_samples = BufferPool.samples(frame_buffer)
+                    self.frames_emitted[rx_channel] += 1
+                    metrics.increment('frames_total', label, buffer_shape[0])
+                    self.data_received.emit(data, rx_channel, current_time)
+                    last_emit_time = current_time
+
+                except Exception as e:
+                    if not self.running:
+                        break
+                    logging.warning(f"RX{rx_channel} receive error: {e}")
+                    time.sleep(0.1)
 
         except Exception as e:
             logging.error(f"Fatal error in RX{rx_channel} receive function: {e}")
@@ -1,45 +1,86 @@
-import uhd
 import numpy as np
 import logging
 import time
 
+from core.simulated_usrp import SimulatedMultiUSRP, is_simulated_serial
+
+# Time allowed for clocks and LOs to settle after a rate/frequency change
+SETTLE_TIME = 0.1
+
+
+def parse_device_args(text):
+    """'serial=123,product=B205mini' -> {'serial': '123', 'product': 'B205mini'}"""
+    args = {}
+    for item in text.split(','):
+        key, _, value = item.partition('=')
+        if key.strip():
+            args[key.strip()] = value.strip()
+    return args
+
+
+def find_devices(args='type=b200'):
+    """Attached USRPs as dicts of their device args (serial, product, name, ...)"""
+    import uhd
+    devices = []
+    for address in uhd.find(args):
+        text = address.to_string() if hasattr(address, 'to_string') else str(address)
+        devices.append(parse_device_args(text))
+    return devices
+
+
 class USRPControl:
-    def __init__(self):
+    def __init__(self, freq=2.4e9, rate=1e6, gain=30, bandwidth=20e6, serial=None):
         try:
-            # Initialize USRP with default parameters
-            self.usrp = uhd.usrp.MultiUSRP()
-            self.setup_default_configuration()
-            logging.info("USRP device initialized successfully")
+            # Initialize USRP with the requested starting parameters; without a serial
+            # UHD opens the first device it finds, and sim* serials open a simulated radio
+            self.serial = serial
+            if is_simulated_serial(serial):
+                self.usrp = SimulatedMultiUSRP(serial)
+            else:
+                import uhd  # Only needed for hardware, so simulated radios run without UHD installed
+                self.usrp = uhd.usrp.MultiUSRP(f"serial={serial}" if serial else "")
+            self.setup_default_configuration(freq, rate, gain, bandwidth)
+            logging.info(f"USRP device {serial or ''} initialized successfully")
         except Exception as e:
             logging.error(f"Failed to initialize USRP device: {e}")
             raise
 
-    def setup_default_configuration(self):
-        """Set up default configuration for all available channels"""
+    def setup_default_configuration(self, freq=2.4e9, rate=1e6, gain=30, bandwidth=20e6):
+        """Set up the starting configuration for all available channels"""
         try:
             # Get number of channels
             self.num_channels = self.usrp.get_rx_num_channels()
-            
-            # Default settings
-            default_freq = 2.4e9  # 2.4 GHz
-            default_rate = 1e6    # 1 MSps
-            default_gain = 30     # 30 dB
-            default_bw = 20e6     # 20 MHz
-            
-            # Configure each channel
-            for chan in range(self.num_channels):
-                self.set_rx_freq(default_freq, chan)
-                self.set_rx_rate(default_rate, chan)
-                self.set_rx_gain(default_gain, chan)
-                self.set_bandwidth(default_bw, chan)
-                
-            # Let the settings settle
-            time.sleep(0.1)
-            
+            self.configure_channels(range(self.num_channels), freq=freq, rate=rate, gain=gain, bandwidth=bandwidth)
         except Exception as e:
             logging.error(f"Failed to set default configuration: {e}")
             raise
 
+    def configure_channels(self, channels, freq=None, rate=None, gain=None, bandwidth=None):
+        """Apply several settings to several channels, waiting for them to settle only once"""
+        channels = list(channels)
+        for chan in channels:
+            if rate is not None:
+                self.set_rx_rate(rate, chan, settle=0)
+            if freq is not None:
+                self.set_rx_freq(freq, chan)
+            if gain is not None:
+                self.set_rx_gain(gain, chan)
+            if bandwidth is not None:
+                self.set_bandwidth(bandwidth, chan)
+        if rate is not None or freq is not None:
+            time.sleep(SETTLE_TIME)
+
+    def set_master_clock_rate(self, rate):
+        """Set the device-wide master clock; channel rates are re-derived from it"""
+        try:
+            self.usrp.set_master_clock_rate(rate)
+            actual_rate = self.usrp.get_master_clock_rate()
+            logging.info(f"Master clock rate set to {actual_rate/1e6:.6f} MHz")
+            return actual_rate
+        except Exception as e:
+            logging.error(f"Failed to set master clock rate: {e}")
+            raise
+
     def set_rx_freq(self, freq, channel=0):
         try:
             self.usrp.set_rx_freq(freq, channel)
@@ -60,10 +101,11 @@ class USRPControl:
             logging.error(f"Failed to set RX{channel} gain: {e}")
             raise
 
-    def set_rx_rate(self, rate, channel=0):
+    def set_rx_rate(self, rate, channel=0, settle=SETTLE_TIME):
         try:
             self.usrp.set_rx_rate(rate, channel)
-            time.sleep(0.1)  # Allow for clock stabilization
+            if settle:
+                time.sleep(settle)  # Allow for clock stabilization
             actual_rate = self.usrp.get_rx_rate(channel)
             logging.info(f"RX{channel} sample rate set to {actual_rate/1e6:.3f} MSps")
             return actual_rate
@@ -0,0 +1,397 @@
+# gui/analysis_windows.py
+# ROI analysis dialogs; imported on demand by the main window
+from PyQt5 import QtWidgets
+from PyQt5.QtWidgets import QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QComboBox, QDialog, QTextEdit, QWidget
+from PyQt5.QtCore import QTimer, pyqtSignal
+import pyqtgraph as pg
+import numpy as np
+import threading
+import time
+import traceback
+from core.fft_backend import FFT_SIZES
+from core.roi_measurements import RoiHistory
+from core.spectrogram import WINDOW_FUNCTIONS, compute_spectrogram
+
+
+class RoiHistorySegment:
+    """Up to `rows` consecutive history rows drawn as one curve per plot"""
+
+    def __init__(self, plots, rows, pen):
+        self.times = np.empty(rows, dtype=np.float64)
+        self.data = np.empty((len(plots), rows), dtype=np.float64)
+        self.fill = 0
+        self.plots = plots
+        self.curves = [plot.plot(pen=pen, connect='finite') for plot in plots]
+
+    def full(self):
+        return self.fill == len(self.times)
+
+    def append(self, times, data):
+        """Copy as many of the rows as fit and redraw; returns how many were taken"""
+        count = min(len(times), len(self.times) - self.fill)
+        self.times[self.fill:self.fill + count] = times[:count]
+        self.data[:, self.fill:self.fill + count] = data[:, :count]
+        self.fill += count
+        for curve, series in zip(self.curves, self.data):
+            curve.setData(self.times[:self.fill], series[:self.fill])
+        return count
+
+    def remove(self):
+        for plot, curve in zip(self.plots, self.curves):
+            plot.removeItem(curve)
+
+
+class RoiHistoryPlots(QWidget):
+    """Live time-series plots of an ROI's measurement history.
+
+    Times are plotted in seconds since the plots were opened, so points already
+    drawn never move. Each curve is split into segments of SEGMENT_ROWS rows; a
+    refresh appends the rows added since the previous one to the newest segment
+    and redraws only that segment, and segments that fall out of the history are
+    removed whole. The cost per refresh is bounded by the segment size, not by
+    how much history is shown.
+    """
+
+    # (field, axis label, units, scale applied to the stored value)
+    PLOTS = [
+        ('channel_power_db', 'Power', 'dB', 1.0),
+        ('peak_freq_hz', 'Peak Freq', 'MHz', 1e-6),
+        ('obw_hz', 'OBW', 'kHz', 1e-3),
+    ]
+    SEGMENT_ROWS = 256
+
+    def __init__(self, history, refresh_ms=100, parent=None):
+        super(RoiHistoryPlots, self).__init__(parent)
+        self.history = history
+        self.sequence = max(0, history.sequence - history.capacity)
+        self.origin = time.time()
+        self.segments = []
+        self.field_indices = [RoiHistory.field_index(field) for field, _, _, _ in self.PLOTS]
+        self.scales = np.array([scale for _, _, _, scale in self.PLOTS])[:, None]
+        self.pen = pg.mkPen(color='y', width=1)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.plot_layout = pg.GraphicsLayoutWidget()
+        layout.addWidget(self.plot_layout)
+        self.plots = []
+        for row, (_, label, units, _) in enumerate(self.PLOTS):
+            plot = self.plot_layout.addPlot(row=row, col=0)
+            plot.setLabel('left', label, units=units)
+            plot.showGrid(x=True, y=True, alpha=0.3)
+            plot.setClipToView(True)
+            plot.setDownsampling(auto=True, mode='peak')
+            if self.plots:
+                plot.setXLink(self.plots[0])
+            self.plots.append(plot)
+        plot.setLabel('bottom', 'Time since opened', units='s')
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(refresh_ms)
+        self.refresh()
+
+    def refresh(self):
+        self.sequence, timestamps, values = self.history.read_since(self.sequence)
+        if not len(timestamps):
+            return
+        times = timestamps - self.origin
+        data = values[:, self.field_indices].T * self.scales
+        while len(times):
+            segment = self.segments[-1] if self.segments else None
+            if segment is None or segment.full():
+                segment = self.add_segment(segment)
+            taken = segment.append(times, data)
+            times, data = times[taken:], data[:, taken:]
+
+        # Drop the oldest segments once the newer ones alone cover the history length
+        kept = sum(segment.fill for segment in self.segments)
+        while len(self.segments) > 1 and kept - self.segments[0].fill >= self.history.capacity:
+            kept -= self.segments[0].fill
+            self.segments.pop(0).remove()
+
+    def add_segment(self, previous):
+        # A new segment starts at the previous one's last point so the curve stays joined
+        segment = RoiHistorySegment(self.plots, self.SEGMENT_ROWS + 1, self.pen)
+        if previous is not None:
+            segment.append(previous.times[-1:], previous.data[:, -1:])
+        self.segments.append(segment)
+        return segment
+
+    def stop(self):
+        self.refresh_timer.stop()
+
+
+class AnalysisWindow(QDialog):
+    def __init__(self, roi_info, parent=None, history=None):
+        super(AnalysisWindow, self).__init__(parent)
+        self.setWindowTitle("ROI Analysis")
+        self.setGeometry(150, 150, 500, 600)
+        layout = QVBoxLayout()
+
+        # Display ROI information
+        info_label = QLabel("Selected ROI Information:")
+        layout.addWidget(info_label)
+
+        info_text = QTextEdit()
+        info_text.setReadOnly(True)
+        info_content = (
+            f"Frequency Range: {roi_info['freq_start']:.3f} MHz - {roi_info['freq_end']:.3f} MHz\n"
+            f"Time Range: {roi_info['time_start']:.3f} s - {roi_info['time_end']:.3f} s"
+        )
+        info_text.setText(info_content)
+        layout.addWidget(info_text)
+
+        # Placeholder for further analysis options
+        analysis_label = QLabel("Analysis Options:")
+        layout.addWidget(analysis_label)
+
+        # Example: Display average power within ROI
+        average_power = roi_info['average_power']
+        avg_label = QLabel(f"Average Power: {average_power:.2f} dBm")
+        layout.addWidget(avg_label)
+
+        # Live measurements of the ROI's frequency range
+        self.history_plots = None
+        if history is not None:
+            self.history_plots = RoiHistoryPlots(history, parent=self)
+            layout.addWidget(self.history_plots, stretch=1)
+
+        self.setLayout(layout)
+
+    def closeEvent(self, event):
+        if self.history_plots is not None:
+            self.history_plots.stop()
+        event.accept()
+
+
+class SpectrumAnalysisWindow(QDialog):
+    def __init__(self, roi_info, parent=None, history=None):
+        super(SpectrumAnalysisWindow, self).__init__(parent)
+        self.setWindowTitle("Spectrum ROI Analysis")
+        self.setGeometry(200, 200, 500, 600)
+        layout = QVBoxLayout()
+
+        # Display ROI information
+        info_label = QLabel("Spectrum ROI Information:")
+        layout.addWidget(info_label)
+
+        info_text = QTextEdit()
+        info_text.setReadOnly(True)
+        info_content = (
+            f"Frequency Range: {roi_info['freq_start']:.3f} MHz - {roi_info['freq_end']:.3f} MHz\n"
+            f"Peak Power: {roi_info['peak_power']:.2f} dBm\n"
+            f"Peak Frequency: {roi_info['peak_freq']:.3f} MHz"
+        )
+        if 'channel_power' in roi_info:
+            info_content += (
+                f"\nChannel Power: {roi_info['channel_power']:.2f} dBm\n"
+                f"Occupied Bandwidth (99%): {roi_info['obw']:.1f} kHz\n"
+                f"SNR: {roi_info['snr']:.1f} dB"
+            )
+        info_text.setText(info_content)
+        layout.addWidget(info_text)
+
+        # Live history of the ROI measurements
+        analysis_label = QLabel("Measurement History:")
+        layout.addWidget(analysis_label)
+
+        self.history_plots = None
+        if history is not None:
+            self.history_plots = RoiHistoryPlots(history, parent=self)
+            layout.addWidget(self.history_plots, stretch=1)
+        else:
+            layout.addWidget(QLabel("No history recorded for this ROI yet."))
+
+        self.setLayout(layout)
+
+    def closeEvent(self, event):
+        if self.history_plots is not None:
+            self.history_plots.stop()
+        event.accept()
+
+
+class WaterfallClipWindow(QDialog):
+    # Emitted from the recompute thread: request id, (spectrogram, freq range, time span) or error text
+    recompute_done = pyqtSignal(int, object)
+
+    OVERLAPS = ['0%', '25%', '50%', '75%', '87.5%']
+
+    def __init__(self, snapshot_data, freq_range, time_span, parent=None, iq_clip=None, center_freq=None,
+                 fft_size=None, window_name='Hamming', fft_backend=None, offset_db=0.0):
+        super(WaterfallClipWindow, self).__init__(parent)
+        self.setWindowTitle("Waterfall Snapshot")
+        self.setGeometry(250, 250, 800, 600)
+        self.snapshot_data = snapshot_data  # 2D numpy array (time, frequency)
+        self.freq_range = freq_range  # Tuple (freq_start, freq_end) in MHz
+        self.time_span = time_span  # Time span in seconds
+        self.iq_clip = iq_clip  # Raw IQ covering the snapshot, or None if it has left the history
+        self.center_freq = center_freq  # Hz
+        self.fft_backend = fft_backend
+        self.offset_db = offset_db
+        self.window_name = window_name
+        self.current_fft_size = fft_size if fft_size is not None else FFT_SIZES[0]
+        self.request_id = 0
+        self.recompute_done.connect(self.on_recompute_done)
+        self.init_ui()
+        if self.iq_clip is not None:
+            self.start_recompute()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        # Controls for re-processing the raw IQ behind the snapshot
+        controls_layout = QHBoxLayout()
+        fft_label = QLabel("FFT Size:")
+        self.fft_combo = QComboBox()
+        self.fft_combo.addItems([str(size) for size in FFT_SIZES])
+        self.fft_combo.setCurrentText(str(self.current_fft_size))
+        self.fft_combo.currentTextChanged.connect(self.on_fft_size_changed)
+        controls_layout.addWidget(fft_label)
+        controls_layout.addWidget(self.fft_combo)
+
+        self.window_combo = QComboBox()
+        self.window_combo.addItems(WINDOW_FUNCTIONS)
+        self.window_combo.setCurrentText(self.window_name)
+        self.window_combo.currentTextChanged.connect(self.start_recompute)
+        controls_layout.addWidget(QLabel("Window:"))
+        controls_layout.addWidget(self.window_combo)
+
+        self.overlap_combo = QComboBox()
+        self.overlap_combo.addItems(self.OVERLAPS)
+        self.overlap_combo.setCurrentText('50%')
+        self.overlap_combo.currentTextChanged.connect(self.start_recompute)
+        controls_layout.addWidget(QLabel("Overlap:"))
+        controls_layout.addWidget(self.overlap_combo)
+
+        for control in (self.fft_combo, self.window_combo, self.overlap_combo):
+            control.setEnabled(self.iq_clip is not None)
+
+        # Controls for Zoom
+        zoom_label = QLabel("Zoom:")
+        self.zoom_in_button = QPushButton("Zoom In")
+        self.zoom_out_button = QPushButton("Zoom Out")
+        self.zoom_in_button.clicked.connect(self.on_zoom_in)
+        self.zoom_out_button.clicked.connect(self.on_zoom_out)
+        controls_layout.addWidget(zoom_label)
+        controls_layout.addWidget(self.zoom_in_button)
+        controls_layout.addWidget(self.zoom_out_button)
+
+        layout.addLayout(controls_layout)
+
+        if self.iq_clip is not None:
+            status = (f"Raw IQ: {len(self.iq_clip.samples):,} samples, "
+                      f"{self.iq_clip.duration * 1e3:.1f} ms at {self.iq_clip.sample_rate / 1e6:g} MSps")
+        else:
+            status = "Raw IQ for this time range is no longer in the history; showing waterfall rows"
+        self.status_label = QLabel(status)
+        layout.addWidget(self.status_label)
+
+        # Plot Widget for the snapshot
+        self.snapshot_plot = pg.PlotWidget()
+        self.snapshot_plot.setBackground('k')
+        self.snapshot_plot.showGrid(x=True, y=True, alpha=0.3)
+        self.snapshot_plot.setLabel('left', 'Time', units='s')
+        self.snapshot_plot.setLabel('bottom', 'Frequency', units='MHz')
+
+        # Initialize ImageItem
+        self.image_item = pg.ImageItem()
+        self.snapshot_plot.addItem(self.image_item)
+
+        # Set initial image
+        self.update_image()
+
+        # Enable mouse interactions for zooming
+        self.snapshot_plot.setMouseEnabled(x=True, y=True)
+
+        layout.addWidget(self.snapshot_plot)
+
+        self.setLayout(layout)
+
+    def update_image(self):
+        # Update the ImageItem with the current snapshot data
+        try:
+            image_data = self.snapshot_data
+            if image_data.size == 0:
+                return
+            self.image_item.setImage(
+                image_data,
+                autoLevels=False,
+                levels=(float(np.min(image_data)), float(np.max(image_data))),
+                pos=(self.freq_range[0], 0),
+                scale=((self.freq_range[1] - self.freq_range[0]) / image_data.shape[1], self.time_span / image_data.shape[0])
+            )
+            self.snapshot_plot.setLimits(xMin=self.freq_range[0], xMax=self.freq_range[1], yMin=0, yMax=self.time_span)
+            self.snapshot_plot.setRange(xRange=self.freq_range, yRange=(0, self.time_span))
+        except Exception as e:
+            tb = traceback.format_exc()
+            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to update snapshot image:\n{str(e)}\n{tb}")
+
+    def on_fft_size_changed(self, size_text):
+        # Handle FFT size changes
+        try:
+            size = int(size_text)
+            self.current_fft_size = size
+            self.start_recompute()
+        except Exception as e:
+            tb = traceback.format_exc()
+            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to change FFT size:\n{str(e)}\n{tb}")
+
+    def start_recompute(self, *args):
+        # Recompute the spectrogram from raw IQ in the background; only the latest request is shown
+        if self.iq_clip is None:
+            return
+        self.request_id += 1
+        overlap = float(self.overlap_combo.currentText().rstrip('%')) / 100.0
+        settings = (self.request_id, self.current_fft_size, self.window_combo.currentText(), overlap)
+        self.status_label.setText(f"Recomputing at FFT size {self.current_fft_size}...")
+        threading.Thread(target=self._recompute_worker, args=settings, daemon=True).start()
+
+    def _recompute_worker(self, request_id, fft_size, window_name, overlap):
+        try:
+            clip = self.iq_clip
+            if len(clip.samples) < fft_size:
+                raise ValueError(f"Clip holds {len(clip.samples):,} samples, fewer than the FFT size")
+
+            # Only the columns inside the selected frequency range are kept
+            freq_axis = self.center_freq + np.fft.fftshift(np.fft.fftfreq(fft_size, d=1.0 / clip.sample_rate))
+            columns = (int(np.searchsorted(freq_axis, self.freq_range[0] * 1e6, side='left')),
+                       int(np.searchsorted(freq_axis, self.freq_range[1] * 1e6, side='right')))
+            if columns[1] <= columns[0]:
+                raise ValueError("Selected range is narrower than one bin at this FFT size")
+
+            spectrogram, hop = compute_spectrogram(clip.samples, fft_size, window_name, overlap,
+                                                   self.fft_backend, self.offset_db, columns)
+            freq_range = (freq_axis[columns[0]] / 1e6, freq_axis[columns[1] - 1] / 1e6)
+            time_span = (len(spectrogram) * hop) / clip.sample_rate
+            self.recompute_done.emit(request_id, (spectrogram, freq_range, time_span))
+        except Exception as e:
+            self.recompute_done.emit(request_id, str(e))
+
+    def on_recompute_done(self, request_id, result):
+        if request_id != self.request_id:
+            return  # Superseded by a newer setting
+        if isinstance(result, str):
+            self.status_label.setText(f"Recompute failed: {result}")
+            return
+        self.snapshot_data, self.freq_range, self.time_span = result
+        bin_width = self.iq_clip.sample_rate / self.current_fft_size
+        self.status_label.setText(f"{self.snapshot_data.shape[0]} frames x {self.snapshot_data.shape[1]} bins, "
+                                  f"RBW {bin_width:,.1f} Hz")
+        self.update_image()
+
+    def on_zoom_in(self):
+        # Zoom in on the snapshot plot
+        try:
+            self.snapshot_plot.getViewBox().scaleBy((0.8, 0.8))
+        except Exception as e:
+            tb = traceback.format_exc()
+            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to zoom in:\n{str(e)}\n{tb}")
+
+    def on_zoom_out(self):
+        # Zoom out on the snapshot plot
+        try:
+            self.snapshot_plot.getViewBox().scaleBy((1.25, 1.25))
+        except Exception as e:
+            tb = traceback.format_exc()
+            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to zoom out:\n{str(e)}\n{tb}")
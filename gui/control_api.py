@@ -0,0 +1,209 @@
+# gui/control_api.py
+from concurrent.futures import Future
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from core.channels import READ_ATTEMPTS, InconsistentRead, read_consistent
+from core.control_server import UNAVAILABLE, RpcError
+from core.roi_measurements import MEASUREMENT_FIELDS
+
+SPECTRUM_TRACES = ('current', 'max', 'min', 'mean', 'percentile')
+
+
+class GuiInvoker(QObject):
+    """Runs callables on the GUI thread for other threads, returning a concurrent Future"""
+
+    requested = pyqtSignal(object, object)  # callable, Future
+
+    def __init__(self, parent=None):
+        super(GuiInvoker, self).__init__(parent)
+        # Emitted from the server thread, so delivered queued to this object's (the GUI) thread
+        self.requested.connect(self._run)
+
+    def invoke(self, function):
+        future = Future()
+        self.requested.emit(function, future)
+        return future
+
+    def _run(self, function, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function())
+        except Exception as e:
+            future.set_exception(e)
+
+
+class ControlApi:
+    """The methods the control socket serves, bound to the main window.
+
+    Device settings go straight to the radios' command workers, and queries
+    copy the latest results on the server's worker threads, so neither waits
+    for the GUI thread (nor reads its widgets). Each channel's results are read under its seqlock version
+    (odd while its pipeline worker is updating them) and the copy is
+    retried if a block landed meanwhile. Methods in GUI_METHODS change
+    state owned by widgets and run on the GUI thread.
+    """
+
+    GUI_METHODS = ('set_fft_size', 'set_frames_per_block', 'set_frame_rate', 'set_window', 'start_rx', 'stop_rx',
+                   'transmit')
+    READ_ATTEMPTS = READ_ATTEMPTS
+
+    def __init__(self, window):
+        self.window = window
+
+    def methods(self):
+        names = ('status', 'set_frequency', 'set_gain', 'set_rate', 'set_bandwidth', 'get_spectrum', 'get_spectra',
+                 'get_rois', 'get_metrics') + self.GUI_METHODS
+        return {name: getattr(self, name) for name in names}
+
+    def channel(self, channel):
+        channels = self.window.channels
+        if not len(channels):
+            raise RpcError(UNAVAILABLE, "No device is ready yet")
+        return channels[int(channel)]
+
+    def read_consistent(self, channel, read):
+        try:
+            return read_consistent(channel, read, self.READ_ATTEMPTS)
+        except InconsistentRead as e:
+            raise RpcError(UNAVAILABLE, str(e))
+
+    def status(self):
+        window = self.window
+        channels = []
+        for channel in window.channels:
+            usrp_control = channel.radio.usrp_control
+            channels.append({
+                'channel': channel.index,
+                'label': channel.label,
+                'radio': channel.radio.label,
+                'center_freq': usrp_control.get_rx_freq(channel.rx_channel),
+                'sample_rate': usrp_control.get_rx_rate(channel.rx_channel),
+                'rois': len(channel.rois),
+            })
+        return {
+            'receiving': window.is_receiving,
+            'fft_size': window.fft_size,
+            'frame_rate': window.radios[0].tx_rx.frame_rate if window.radios else None,
+            'frames_per_block': window.radios[0].tx_rx.frames_per_block if window.radios else None,
+            'window': window.window_name,
+            'channels': channels,
+        }
+
+    def _submit(self, parameter, channel, value):
+        self.channel(channel)
+        self.window.submit_device_command(parameter, int(channel), float(value))
+        return {'channel': int(channel), parameter: float(value)}
+
+    def set_frequency(self, freq_hz, channel=0):
+        return self._submit('freq', channel, freq_hz)
+
+    def set_gain(self, gain_db, channel=0):
+        return self._submit('gain', channel, gain_db)
+
+    def set_rate(self, rate_hz, channel=0):
+        return self._submit('rate', channel, rate_hz)
+
+    def set_bandwidth(self, bandwidth_hz, channel=0):
+        return self._submit('bandwidth', channel, bandwidth_hz)
+
+    # GUI thread: these go through the widgets so the controls show the new values
+
+    def set_fft_size(self, size):
+        if str(int(size)) not in [self.window.fft_combo.itemText(i) for i in range(self.window.fft_combo.count())]:
+            raise ValueError(f"Unsupported FFT size {size}")
+        self.window.fft_combo.setCurrentText(str(int(size)))
+        return self.window.fft_size
+
+    def set_frames_per_block(self, frames):
+        self.window.block_spin.setValue(int(frames))
+        return self.window.block_spin.value()
+
+    def set_frame_rate(self, rate):
+        self.window.frame_spin.setValue(int(rate))
+        return self.window.frame_spin.value()
+
+    def set_window(self, name):
+        if self.window.window_combo.findText(name) < 0:
+            raise ValueError(f"Unknown window {name!r}")
+        self.window.window_combo.setCurrentText(name)
+        return self.window.window_name
+
+    def start_rx(self):
+        if not self.window.radios:
+            raise RpcError(UNAVAILABLE, "No device is ready yet")
+        if not self.window.is_receiving:
+            self.window.toggle_rx()
+        return self.window.is_receiving
+
+    def stop_rx(self):
+        if self.window.is_receiving:
+            self.window.toggle_rx()
+        return self.window.is_receiving
+
+    def transmit(self, freq_hz, rate_hz=1e6, modulation='AM', amplitude=0.5, duration=1.0, radio=0):
+        if not self.window.radios:
+            raise RpcError(UNAVAILABLE, "No device is ready yet")
+        self.window.radios[int(radio)].tx_rx.start_transmitting(float(freq_hz), float(rate_hz) / 1e6, modulation,
+                                                                float(amplitude), float(duration))
+        return True
+
+    # Server worker threads: copies of the latest results
+
+    def _trace(self, channel, trace, percentile):
+        if trace == 'current':
+            spectrum = channel.spectrum
+        elif trace == 'max':
+            spectrum = channel.statistics.max_hold()
+        elif trace == 'min':
+            spectrum = channel.statistics.min_hold()
+        elif trace == 'mean':
+            spectrum = channel.statistics.mean_db()
+        elif trace == 'percentile':
+            spectrum = channel.statistics.percentile(percentile)
+        else:
+            raise ValueError(f"Unknown trace {trace!r}; expected one of {', '.join(SPECTRUM_TRACES)}")
+        return None if spectrum is None else np.array(spectrum)
+
+    def get_spectrum(self, channel=0, trace='current', percentile=90.0):
+        """Newest spectrum (or statistic trace) of one channel in dB, fftshifted"""
+        state = self.channel(channel)
+        spectrum = self.read_consistent(state, lambda: self._trace(state, trace, percentile))
+        if spectrum is None:
+            raise RpcError(UNAVAILABLE, f"No {trace} spectrum on channel {state.index} yet")
+        usrp_control = state.radio.usrp_control
+        return {
+            'channel': state.index,
+            'trace': trace,
+            'center_freq': usrp_control.get_rx_freq(state.rx_channel),
+            'sample_rate': usrp_control.get_rx_rate(state.rx_channel),
+            'spectrum': spectrum,
+        }
+
+    def get_spectra(self, channels=None, trace='current', percentile=90.0):
+        """get_spectrum for several channels (default all) in one response"""
+        if channels is None:
+            channels = range(len(self.window.channels))
+        return [self.get_spectrum(channel, trace, percentile) for channel in channels]
+
+    def get_rois(self, channel=None):
+        """Latest ROI measurements as a (rois, fields) array, rows named like the ROI table"""
+        states = self.window.channels if channel is None else [self.channel(channel)]
+        names, rows = [], []
+        for state in states:
+            def read():
+                measurements = state.roi_measurements
+                return list(measurements.keys), measurements.values.copy()
+            keys, values = self.read_consistent(state, read)
+            for column, roi in enumerate(keys):
+                if roi in state.rois:
+                    names.append(f"RX{state.index + 1} #{state.rois.index(roi) + 1}")
+                    rows.append(values[:, column])
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(MEASUREMENT_FIELDS))
+        return {'fields': list(MEASUREMENT_FIELDS), 'rois': names, 'values': values}
+
+    def get_metrics(self):
+        """Pipeline metrics in the Prometheus text format"""
+        return self.window.metrics.to_prometheus()
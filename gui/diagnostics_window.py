@@ -0,0 +1,99 @@
+# gui/diagnostics_window.py
+from PyQt5 import QtWidgets
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem,
+    QHeaderView, QLabel, QFileDialog
+)
+from PyQt5.QtCore import QTimer
+import traceback
+
+
+class DiagnosticsWindow(QDialog):
+    """Live view of the pipeline metrics: latency histograms, counters and gauges"""
+
+    HISTOGRAM_COLUMNS = ['Stage', 'Channel', 'Count', 'Mean (ms)', 'P50 (ms)', 'P95 (ms)', 'P99 (ms)', 'Max (ms)']
+
+    def __init__(self, metrics, parent=None):
+        super(DiagnosticsWindow, self).__init__(parent)
+        self.metrics = metrics
+        self.setWindowTitle("Pipeline Diagnostics")
+        self.setGeometry(300, 200, 720, 480)
+        self.init_ui()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(500)
+        self.refresh()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        layout.addWidget(QLabel("Stage Latency (rolling window):"))
+        self.histogram_table = QTableWidget(0, len(self.HISTOGRAM_COLUMNS))
+        self.histogram_table.setHorizontalHeaderLabels(self.HISTOGRAM_COLUMNS)
+        self.histogram_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.histogram_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.histogram_table)
+
+        layout.addWidget(QLabel("Counters and Gauges:"))
+        self.value_table = QTableWidget(0, 3)
+        self.value_table.setHorizontalHeaderLabels(['Metric', 'Channel', 'Value'])
+        self.value_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.value_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.value_table)
+
+        buttons_layout = QHBoxLayout()
+        self.reset_button = QPushButton("Reset")
+        self.reset_button.clicked.connect(self.on_reset)
+        self.export_button = QPushButton("Export Prometheus File...")
+        self.export_button.clicked.connect(self.on_export)
+        buttons_layout.addWidget(self.reset_button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.export_button)
+        layout.addLayout(buttons_layout)
+
+        self.setLayout(layout)
+
+    def refresh(self):
+        snapshot = self.metrics.snapshot()
+
+        histograms = sorted(snapshot['histograms'].items(), key=lambda item: (item[0][0], str(item[0][1])))
+        self.histogram_table.setRowCount(len(histograms))
+        for row, ((name, channel), summary) in enumerate(histograms):
+            values = [
+                name.replace('_seconds', ''),
+                str(channel),
+                str(summary['count']),
+                f"{summary['mean'] * 1e3:.3f}",
+                f"{summary['p50'] * 1e3:.3f}",
+                f"{summary['p95'] * 1e3:.3f}",
+                f"{summary['p99'] * 1e3:.3f}",
+                f"{summary['max'] * 1e3:.3f}",
+            ]
+            for column, value in enumerate(values):
+                self.histogram_table.setItem(row, column, QTableWidgetItem(value))
+
+        values = sorted(list(snapshot['counters'].items()) + list(snapshot['gauges'].items()),
+                        key=lambda item: (item[0][0], str(item[0][1])))
+        self.value_table.setRowCount(len(values))
+        for row, ((name, channel), value) in enumerate(values):
+            self.value_table.setItem(row, 0, QTableWidgetItem(name))
+            self.value_table.setItem(row, 1, QTableWidgetItem(str(channel)))
+            self.value_table.setItem(row, 2, QTableWidgetItem(f"{value:,.1f}" if isinstance(value, float) else f"{value:,}"))
+
+    def on_reset(self):
+        self.metrics.reset()
+        self.refresh()
+
+    def on_export(self):
+        try:
+            path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "b205_metrics.prom", "Prometheus Text (*.prom);;All Files (*)")
+            if path:
+                self.metrics.write_prometheus(path)
+        except Exception as e:
+            tb = traceback.format_exc()
+            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to export metrics:\n{str(e)}\n{tb}")
+
+    def closeEvent(self, event):
+        self.refresh_timer.stop()
+        event.accept()
@@ -2,224 +2,122 @@ from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import (
     QLabel, QPushButton, QWidget, QVBoxLayout, QHBoxLayout,
     QGroupBox, QComboBox, QGridLayout, QSlider, QSpinBox, QCheckBox,
-    QSplitter, QStatusBar, QDoubleSpinBox, QMenu, QAction, QDialog, QTextEdit
+    QSplitter, QStatusBar, QDoubleSpinBox, QMenu, QAction, QDialog, QTextEdit,
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog
 )
-from PyQt5.QtCore import Qt, QTimer, QRectF
+from PyQt5.QtCore import Qt, QTimer, QRectF, pyqtSignal
 from PyQt5.QtGui import QColor
 import pyqtgraph as pg
 import numpy as np
 from datetime import datetime
 import traceback  # For enhanced error logging
 import time  # For timing measurements
-from core.usrp_control import USRPControl
-from core.tx_rx import TxRx
-
-
-class AnalysisWindow(QDialog):
-    def __init__(self, roi_info, parent=None):
-        super(AnalysisWindow, self).__init__(parent)
-        self.setWindowTitle("ROI Analysis")
-        self.setGeometry(150, 150, 400, 300)
-        layout = QVBoxLayout()
-
-        # Display ROI information
-        info_label = QLabel("Selected ROI Information:")
-        layout.addWidget(info_label)
-
-        info_text = QTextEdit()
-        info_text.setReadOnly(True)
-        info_content = (
-            f"Frequency Range: {roi_info['freq_start']:.3f} MHz - {roi_info['freq_end']:.3f} MHz\n"
-            f"Time Range: {roi_info['time_start']:.3f} s - {roi_info['time_end']:.3f} s"
-        )
-        info_text.setText(info_content)
-        layout.addWidget(info_text)
-
-        # Placeholder for further analysis options
-        analysis_label = QLabel("Analysis Options:")
-        layout.addWidget(analysis_label)
-
-        # Example: Display average power within ROI
-        average_power = roi_info['average_power']
-        avg_label = QLabel(f"Average Power: {average_power:.2f} dBm")
-        layout.addWidget(avg_label)
-
-        self.setLayout(layout)
-
-
-class SpectrumAnalysisWindow(QDialog):
-    def __init__(self, roi_info, parent=None):
-        super(SpectrumAnalysisWindow, self).__init__(parent)
-        self.setWindowTitle("Spectrum ROI Analysis")
-        self.setGeometry(200, 200, 500, 400)
-        layout = QVBoxLayout()
-
-        # Display ROI information
-        info_label = QLabel("Spectrum ROI Information:")
-        layout.addWidget(info_label)
-
-        info_text = QTextEdit()
-        info_text.setReadOnly(True)
-        info_content = (
-            f"Frequency Range: {roi_info['freq_start']:.3f} MHz - {roi_info['freq_end']:.3f} MHz\n"
-            f"Peak Power: {roi_info['peak_power']:.2f} dBm\n"
-            f"Peak Frequency: {roi_info['peak_freq']:.3f} MHz"
-        )
-        info_text.setText(info_content)
-        layout.addWidget(info_text)
-
-        # Placeholder for further analysis charts
-        analysis_label = QLabel("Analysis Charts:")
-        layout.addWidget(analysis_label)
-
-        # Example: Plot the spectrum within the ROI
-        spectrum_plot = pg.PlotWidget()
-        spectrum_plot.setBackground('w')
-        spectrum_plot.setLabel('left', 'Power', units='dBm')
-        spectrum_plot.setLabel('bottom', 'Frequency', units='MHz')
-
-        # Extract frequency and power data
-        freq_range = np.linspace(roi_info['freq_start'], roi_info['freq_end'], 100)
-        # Generate dummy data for demonstration; replace with actual data
-        power_data = np.random.normal(loc=roi_info['peak_power'], scale=1.0, size=100)
-
-        spectrum_plot.plot(freq_range, power_data, pen=pg.mkPen(color='blue', width=2))
-        layout.addWidget(spectrum_plot)
-
-        self.setLayout(layout)
-
-
-class WaterfallClipWindow(QDialog):
-    def __init__(self, snapshot_data, freq_range, time_span, parent=None):
-        super(WaterfallClipWindow, self).__init__(parent)
-        self.setWindowTitle("Waterfall Snapshot")
-        self.setGeometry(250, 250, 800, 600)
-        self.snapshot_data = snapshot_data  # 2D numpy array (time, frequency)
-        self.freq_range = freq_range  # Tuple (freq_start, freq_end) in MHz
-        self.time_span = time_span  # Time span in seconds
-        self.current_fft_size = snapshot_data.shape[1]  # Initial FFT size
-        self.init_ui()
-
-    def init_ui(self):
-        layout = QVBoxLayout()
-
-        # Controls for FFT size adjustment
-        controls_layout = QHBoxLayout()
-        fft_label = QLabel("FFT Size:")
-        self.fft_combo = QComboBox()
-        self.fft_combo.addItems(['512', '1024', '2048', '4096', '8192'])
-        self.fft_combo.setCurrentText(str(self.current_fft_size))
-        self.fft_combo.currentTextChanged.connect(self.on_fft_size_changed)
-        controls_layout.addWidget(fft_label)
-        controls_layout.addWidget(self.fft_combo)
-
-        # Controls for Zoom
-        zoom_label = QLabel("Zoom:")
-        self.zoom_in_button = QPushButton("Zoom In")
-        self.zoom_out_button = QPushButton("Zoom Out")
-        self.zoom_in_button.clicked.connect(self.on_zoom_in)
-        self.zoom_out_button.clicked.connect(self.on_zoom_out)
-        controls_layout.addWidget(zoom_label)
-        controls_layout.addWidget(self.zoom_in_button)
-        controls_layout.addWidget(self.zoom_out_button)
-
-        layout.addLayout(controls_layout)
-
-        # Plot Widget for the snapshot
-        self.snapshot_plot = pg.PlotWidget()
-        self.snapshot_plot.setBackground('k')
-        self.snapshot_plot.showGrid(x=True, y=True, alpha=0.3)
-        self.snapshot_plot.setLabel('left', 'Power', units='dBm')
-        self.snapshot_plot.setLabel('bottom', 'Frequency', units='MHz')
-
-        # Initialize ImageItem
-        self.image_item = pg.ImageItem()
-        self.snapshot_plot.addItem(self.image_item)
-
-        # Set initial image
-        self.update_image()
-
-        # Enable mouse interactions for zooming
-        self.snapshot_plot.setMouseEnabled(x=True, y=True)
-
-        layout.addWidget(self.snapshot_plot)
-
-        self.setLayout(layout)
-
-    def update_image(self):
-        # Update the ImageItem with the current snapshot data
-        try:
-            image_data = self.snapshot_data.copy()
-            # Adjust FFT size by truncating or zero-padding
-            desired_fft = self.current_fft_size
-            current_fft = image_data.shape[1]
-            if current_fft != desired_fft:
-                if current_fft > desired_fft:
-                    image_data = image_data[:, :desired_fft]
-                else:
-                    padding = np.full((image_data.shape[0], desired_fft - current_fft), -120)  # Fill with reference level minus dynamic range
-                    image_data = np.hstack((image_data, padding))
-            self.image_item.setImage(
-                image_data,
-                autoLevels=False,
-                levels=(np.min(image_data), np.max(image_data)),
-                pos=(self.freq_range[0], 0),
-                scale=( (self.freq_range[1] - self.freq_range[0]) / image_data.shape[1], self.time_span / image_data.shape[0])
-            )
-            self.snapshot_plot.setLimits(xMin=self.freq_range[0], xMax=self.freq_range[1], yMin=0, yMax=self.time_span)
-            self.snapshot_plot.setRange(xRange=self.freq_range, yRange=(0, self.time_span))
-        except Exception as e:
-            tb = traceback.format_exc()
-            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to update snapshot image:\n{str(e)}\n{tb}")
-
-    def on_fft_size_changed(self, size_text):
-        # Handle FFT size changes
-        try:
-            size = int(size_text)
-            self.current_fft_size = size
-            self.update_image()
-        except Exception as e:
-            tb = traceback.format_exc()
-            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to change FFT size:\n{str(e)}\n{tb}")
-
-    def on_zoom_in(self):
-        # Zoom in on the snapshot plot
-        try:
-            self.snapshot_plot.getViewBox().scaleBy((0.8, 0.8))
-        except Exception as e:
-            tb = traceback.format_exc()
-            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to zoom in:\n{str(e)}\n{tb}")
-
-    def on_zoom_out(self):
-        # Zoom out on the snapshot plot
-        try:
-            self.snapshot_plot.getViewBox().scaleBy((1.25, 1.25))
-        except Exception as e:
-            tb = traceback.format_exc()
-            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to zoom out:\n{str(e)}\n{tb}")
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from core.metrics import PipelineMetrics
+from core.stream_health import LoadShedder
+from core.fft_backend import FFT_SIZES, NumpyFFT, backend_names, get_backend, select_fastest_backend
+from core.spectral_storage import STORAGE_MODES, WaterfallHistory
+from core.roi_measurements import DEFAULT_HISTORY_FRAMES
+from core.iq_history import DEFAULT_IQ_HISTORY_SAMPLES
+from core.spectrogram import WINDOW_FUNCTIONS
+from core.sample_formats import CPU_BYTES_PER_SAMPLE, CPU_FORMATS, LINK_BYTES_PER_SECOND, OTW_FORMATS
+from core.rate_planner import plan_rates
+from core.channels import ChannelRegistry, InconsistentRead, Radio, channel_label, read_consistent
+from core.pipeline import BlockContext, Pipeline, PipelineWorker
+from core.spectrum_stages import (FftStage, PersistenceStage, RoiStage, SpectrumStage, StatisticsStage,
+                                  WaterfallStage, iq_block_spec)
+from core.frame_processor import SpectrumSettings
+
+# Image arrays are (time, frequency): rows are waterfall lines
+pg.setConfigOptions(imageAxisOrder='row-major')
+
+# Waterfall rows are peak-decimated to at most this many columns so that very large
+# FFT sizes do not blow up history memory or image upload time
+WATERFALL_MAX_BINS = 8192
+
+# Rows shown in the waterfall image; the history itself may be longer
+WATERFALL_DISPLAY_ROWS = 500
+
+# Spectrum (line) ROIs measure this fraction of the sample rate around the line
+SPECTRUM_ROI_SPAN_FRACTION = 0.05
+
+# ROI measurements are computed every frame but the table is refreshed at this rate
+ROI_TABLE_REFRESH_SECONDS = 0.25
 
 
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self):
+    # Emitted from the device init thread
+    device_ready = pyqtSignal(object, object)  # USRPControl, FFT backend
+    device_failed = pyqtSignal(str)
+    # Emitted from pipeline worker threads: message, level
+    status_requested = pyqtSignal(str, str)
+
+    def __init__(self, startup_time=None, autostart=False, otw_format='sc16', cpu_format='fc32', devices=None,
+                 control_socket=None):
         super(MainWindow, self).__init__()
         self.setWindowTitle("USRP B205 Mini Spectrum Analyzer")
         self.setGeometry(100, 100, 1600, 900)
 
+        # Reference point for the startup timings (process start when provided by main.py)
+        self.startup_time = startup_time if startup_time is not None else time.perf_counter()
+        self.autostart = autostart
+        # Stream formats: over the wire (sc16/sc8) and as written by recv() on the host (fc32/sc16)
+        self.otw_format = otw_format
+        self.cpu_format = cpu_format
+        # Serials of the radios to open (sim* for simulated ones); None opens the first USRP found
+        self.device_serials = list(devices) if devices else [None]
+        # Unix socket of the JSON-RPC control server to start with the window ('' for the default path), or None
+        self.control_socket_path = control_socket
+
         self.setup_status_bar()
         self.init_variables()
-        self.init_usrp()
         self.init_ui()
         self.setup_update_timer()
+        if self.control_socket_path is not None:
+            self.control_socket_check.setChecked(True)
+        self.start_device_init()
 
     def init_variables(self):
         # Initialize control variables
         self.max_hold_enabled = False
+        self.min_hold_enabled = False
         self.averaging_enabled = False
         self.averaging_factor = 0.5
+        self.average_count = None  # Frames in a count-limited average; None averages exponentially
+        self.trace_percentile = None  # Percentile drawn as a trace, or None
+        self.persistence_enabled = False
+        self.window_name = WINDOW_FUNCTIONS[0]
         self.current_colormap = 'viridis'
         self.is_receiving = False
         self.fft_size = 1024
 
+        # User-requested processing load; the effective values may be lower while load shedding
+        self.requested_fft_size = self.fft_size
+        self.requested_frame_rate = 30
+        self.load_shedder = LoadShedder()
+        self.load_shedding_enabled = False
+        self.last_overload_count = 0
+
+        # FFT backend picked from a quick self-benchmark during device init; bin frequencies cached per (size, rate)
+        self.fft_backend = NumpyFFT()
+        self.freq_bins_cache = {}
+
+        # One Radio (control, receiver, command worker) per device, created in the background
+        # by start_device_init()
+        self.radios = []
+        self.demodulators = []  # Running DemodulatorWorkers
+        self.recorders = []  # Running RawRecorders
+        self.burst_writer = None  # BurstWriter while capture triggers are armed
+        self.burst_detectors = []  # Running BurstDetectorWorkers, one per channel
+        self.first_spectrum_time = None
+
+        # Waterfall history storage (see core.spectral_storage)
+        self.waterfall_storage = 'uint8'
+        self.waterfall_history_rows = WATERFALL_DISPLAY_ROWS
+        self.iq_history_mb = DEFAULT_IQ_HISTORY_SAMPLES * np.dtype(np.complex64).itemsize >> 20
+
         # Initialize timing variables for FPS calculation
         self.last_update_time = None
         self.fps = 0.0
@@ -227,21 +125,165 @@ class MainWindow(QtWidgets.QMainWindow):
         # Calibration factor for dBm adjustment (to be fine-tuned)
         self.calibration_db = 0.0
 
-        # Dictionary to store ROIs per RX channel
-        self.rois = {0: [], 1: []}
+        # Per-channel DSP and display state (ROIs, statistics, persistence, waterfall), filled once
+        # the device reports its RX channels
+        self.channels = ChannelRegistry()
+        self.roi_table_refresh_time = 0.0
+
+        # Pipeline instrumentation (cheap enough to leave enabled)
+        self.metrics = PipelineMetrics()
+        self.init_pipeline()
+        self.metrics_server = None
+        self.control_server = None  # ControlServer while the control socket is enabled
+        self.diagnostics_window = None
+
+    def start_device_init(self):
+        # Discover and configure the USRP off the GUI thread so the window appears immediately
+        self.start_stop_button.setEnabled(False)
+        self.update_status("Connecting to USRP...", "info")
+        self.device_ready.connect(self.on_device_ready)
+        self.device_failed.connect(self.on_device_failed)
+        self.status_requested.connect(self.update_status)
+        settings = {
+            'freq': self.freq_input.value() * 1e6,
+            'rate': float(self.rate_combo.currentText()) * 1e6,
+            'gain': self.gain_slider.value(),
+        }
+        threading.Thread(target=self._device_init_worker, args=(settings,), daemon=True).start()
 
-    def init_usrp(self):
-        # Initialize USRP control and data reception
+    def _device_init_worker(self, settings):
         try:
-            self.usrp_control = USRPControl()
-            self.tx_rx = TxRx(self.usrp_control)
-            self.tx_rx.data_received_rx1.connect(lambda data, channel: self.process_received_data(data, 0))
-            if self.tx_rx.rx2_available:
-                self.tx_rx.data_received_rx2.connect(lambda data, channel: self.process_received_data(data, 1))
-            self.update_status("USRP initialized successfully", "success")
+            # uhd is only imported here, in the background
+            from core.usrp_control import USRPControl
+            # Radios are opened concurrently; each one loads its own firmware and FPGA image
+            with ThreadPoolExecutor(max_workers=len(self.device_serials)) as executor:
+                futures = [executor.submit(USRPControl, serial=serial, **settings) for serial in self.device_serials]
+            usrp_controls, errors = [], []
+            for serial, future in zip(self.device_serials, futures):
+                try:
+                    usrp_controls.append(future.result())
+                except Exception as e:
+                    errors.append(f"{serial or 'USRP'}: {e}")
+            if not usrp_controls:
+                raise RuntimeError("; ".join(errors))
+            for error in errors:
+                logging.error(f"Device initialization failed for {error}")
+            fft_backend = select_fastest_backend()
+            self.device_ready.emit(usrp_controls, fft_backend)
         except Exception as e:
-            self.update_status(f"Failed to initialize USRP: {str(e)}", "error")
-            raise
+            logging.error(f"Device initialization failed: {e}")
+            self.device_failed.emit(str(e))
+
+    def on_device_ready(self, usrp_controls, fft_backend):
+        # Finish initialization on the GUI thread once the devices are configured
+        try:
+            self.fft_backend = fft_backend
+            self.fft_backend_combo.blockSignals(True)
+            self.fft_backend_combo.setCurrentText(fft_backend.name)
+            self.fft_backend_combo.blockSignals(False)
+
+            self.rx_select.blockSignals(True)
+            self.rx_select.clear()
+            for usrp_control in usrp_controls:
+                self.open_radio(usrp_control, label_channels=len(usrp_controls) > 1)
+            self.rx_select.blockSignals(False)
+            self.apply_processing_load()
+
+            self.displays_placeholder.hide()
+            self.init_displays()
+            self.configure_spectrum_statistics()
+            self.start_stop_button.setEnabled(True)
+
+            device_seconds = time.perf_counter() - self.startup_time
+            self.metrics.set_gauge('time_to_device_seconds', 'all', device_seconds)
+            logging.info(f"Startup: device ready after {device_seconds:.3f} s")
+            self.update_status(f"USRP initialized successfully ({device_seconds:.2f} s)", "success")
+            if self.autostart:
+                self.toggle_rx()
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Failed to initialize USRP: {str(e)}\n{tb}", "error")
+
+    def on_device_failed(self, message):
+        self.displays_placeholder.setText(f"USRP not available: {message}")
+        self.update_status(f"Failed to initialize USRP: {message}", "error")
+
+    def available_rx_channels(self):
+        # RX channels with displays; empty until the device is ready
+        return self.channels.indices()
+
+    def open_radio(self, usrp_control, label_channels=False):
+        # Build the acquisition pipeline of one device and register its RX channels
+        from core.tx_rx import TxRx
+        from core.device_commands import DeviceCommandWorker
+        first_channel = len(self.channels)
+        tx_rx = TxRx(usrp_control, self.metrics, self.otw_format, self.cpu_format, first_channel=first_channel)
+        if self.iq_history_samples() != tx_rx.iq_history_samples:
+            tx_rx.set_iq_history_samples(self.iq_history_samples())
+        tx_rx.set_frames_per_block(self.block_spin.value())
+        tx_rx.set_fft_size(self.fft_size)
+        device_commands = DeviceCommandWorker(usrp_control, self.metrics, retune_callback=tx_rx.mark_retune,
+                                              first_channel=first_channel, retune_start_callback=tx_rx.begin_retune)
+        radio = Radio(len(self.radios), usrp_control, tx_rx, device_commands, first_channel)
+        self.radios.append(radio)
+
+        # Device-local RX channel numbers become registry indices
+        device_commands.command_applied.connect(
+            lambda parameter, rx, actual: self.on_device_command_applied(parameter, first_channel + rx, actual))
+        device_commands.command_failed.connect(
+            lambda parameter, rx, message: self.on_device_command_failed(parameter, first_channel + rx, message))
+        device_commands.start()
+        tx_rx.stream_gap.connect(lambda rx, gap: self.on_stream_gap(first_channel + rx, gap))
+
+        for rx_channel in range(tx_rx.num_rx_channels):
+            label = f"{radio.label} {channel_label(rx_channel)}" if label_channels else None
+            channel = self.channels.add(rx_channel, label, radio)
+            channel.persistence.half_life = self.persistence_fade_spin.value()
+            channel.statistics.average_count = self.average_count
+            channel.roi_measurements.set_history_frames(self.roi_history_spin.value())
+            channel.worker = PipelineWorker(self.pipeline, channel,
+                                            lambda timestamp, channel=channel: self.block_context(channel, timestamp),
+                                            lambda block, rx=rx_channel: tx_rx.frame_consumed(rx, block),
+                                            self.on_processing_error)
+            channel.worker.start()
+            self.rx_select.addItem(channel.label)
+        # Blocks go from the receive thread straight to the channel's worker, not through the GUI thread
+        tx_rx.data_received.connect(
+            lambda data, rx, timestamp: self.channels[first_channel + rx].worker.submit(data, timestamp),
+            Qt.DirectConnection)
+        return radio
+
+    def submit_device_command(self, parameter, index, value):
+        # Queue a setting for a registry channel on its own radio's command worker
+        channel = self.channels[index]
+        channel.radio.device_commands.submit(parameter, channel.rx_channel, value)
+
+    def channel_iq_history(self, index):
+        # Raw IQ ring of a registry channel, or None when there is none
+        if index >= len(self.channels):
+            return None
+        channel = self.channels[index]
+        iq_history = channel.radio.tx_rx.iq_history
+        return iq_history[channel.rx_channel] if channel.rx_channel < len(iq_history) else None
+
+    def channel_center_freq(self, index):
+        channel = self.channels[index]
+        return channel.radio.usrp_control.get_rx_freq(channel.rx_channel)
+
+    def spectrum_settings(self):
+        # The display's FFT settings as plain values, for processing off the GUI thread
+        return SpectrumSettings(self.fft_backend.name, self.window_name, self.calibration_db)
+
+    def channel_sample_rate(self, index):
+        channel = self.channels[index]
+        return channel.radio.usrp_control.get_rx_rate(channel.rx_channel)
+
+    def showEvent(self, event):
+        super(MainWindow, self).showEvent(event)
+        if not hasattr(self, 'window_shown_time'):
+            self.window_shown_time = time.perf_counter() - self.startup_time
+            self.metrics.set_gauge('time_to_window_seconds', 'all', self.window_shown_time)
+            logging.info(f"Startup: window shown after {self.window_shown_time:.3f} s")
 
     def init_ui(self):
         # Set up the main UI layout with splitter
@@ -265,32 +307,69 @@ class MainWindow(QtWidgets.QMainWindow):
         splitter.setStretchFactor(0, 7)
         splitter.setStretchFactor(1, 3)
 
-        # Initialize control panel before displays to ensure dependencies are met
+        # Displays are added once the device is ready and the channel count is known
+        self.displays_placeholder = QLabel("Connecting to USRP...")
+        self.displays_placeholder.setAlignment(Qt.AlignCenter)
+        self.displays_layout.addWidget(self.displays_placeholder)
         self.init_control_panel()
-        self.init_displays()
 
     def init_displays(self):
         # Initialize displays for each available RX channel
-        self.init_rx_displays(0)
-        if self.tx_rx.rx2_available:
-            self.init_rx_displays(1)
+        if len(self.radios) <= 1:
+            for channel in self.channels:
+                self.init_rx_displays(channel, self.displays_layout)
+            return
 
-    def init_rx_displays(self, rx_channel):
+        # Several radios: one combined spectrum on top, then a column per radio
+        self.displays_layout.addWidget(self.create_combined_spectrum_display(), stretch=1)
+        columns_layout = QHBoxLayout()
+        for radio in self.radios:
+            column_layout = QVBoxLayout()
+            for channel in self.channels:
+                if channel.radio is radio:
+                    self.init_rx_displays(channel, column_layout)
+            columns_layout.addLayout(column_layout)
+        self.displays_layout.addLayout(columns_layout, stretch=3)
+
+    def create_combined_spectrum_display(self):
+        # Current spectrum of every channel at its absolute frequency, one colour per channel
+        combined_group = QGroupBox("Combined Spectrum")
+        combined_layout = QVBoxLayout()
+
+        plot_widget = pg.PlotWidget()
+        plot_widget.setBackground('k')
+        plot_widget.showGrid(x=True, y=True, alpha=0.3)
+        plot_widget.setLabel('left', 'Power', units='dBm')
+        plot_widget.setLabel('bottom', 'Frequency', units='MHz')
+        plot_widget.setYRange(-120, 0)
+        plot_widget.setDownsampling(auto=True, mode='peak')
+        plot_widget.setClipToView(True)
+        plot_widget.addLegend()
+
+        for channel in self.channels:
+            color = pg.intColor(channel.index, hues=max(len(self.channels), 2))
+            channel.combined_curve = plot_widget.plot(pen=pg.mkPen(color=color, width=1), name=channel.label)
+
+        combined_layout.addWidget(plot_widget)
+        combined_group.setLayout(combined_layout)
+        return combined_group
+
+    def init_rx_displays(self, channel, layout):
         # Create group boxes for each RX channel
-        channel_group = QGroupBox(f"{'TX/RX' if rx_channel == 0 else 'RX2'} Channel")
+        channel_group = QGroupBox(f"{channel.label} Channel")
         channel_layout = QVBoxLayout()
 
         # Create spectrum and waterfall displays
-        spectrum_widget = self.create_spectrum_display(rx_channel)
+        spectrum_widget = self.create_spectrum_display(channel)
         channel_layout.addWidget(spectrum_widget, stretch=1)
 
-        waterfall_widget = self.create_waterfall_display(rx_channel)
+        waterfall_widget = self.create_waterfall_display(channel)
         channel_layout.addWidget(waterfall_widget, stretch=1)
 
         channel_group.setLayout(channel_layout)
-        self.displays_layout.addWidget(channel_group)
+        layout.addWidget(channel_group)
 
-    def create_spectrum_display(self, rx_channel):
+    def create_spectrum_display(self, channel):
         # Create the spectrum analyzer display
         spectrum_group = QGroupBox("Spectrum Analyzer")
         spectrum_layout = QVBoxLayout()
@@ -303,37 +382,51 @@ class MainWindow(QtWidgets.QMainWindow):
         plot_widget.setLabel('bottom', 'Frequency', units='MHz')
         plot_widget.setYRange(-120, 0)
 
+        # Large FFT sizes: let pyqtgraph peak-decimate the curves to the screen width
+        plot_widget.setDownsampling(auto=True, mode='peak')
+        plot_widget.setClipToView(True)
+
+        # Persistence image sits under every curve
+        persistence_image = pg.ImageItem()
+        persistence_image.setColorMap(pg.colormap.get('inferno'))
+        persistence_image.setZValue(-100)
+        persistence_image.setVisible(self.persistence_enabled)
+        plot_widget.addItem(persistence_image)
+
         # Define curve pens with explicit colors
         spectrum_curve = plot_widget.plot(pen=pg.mkPen(color='yellow', width=2), name='Current')
         max_hold_curve = plot_widget.plot(pen=pg.mkPen(color='red', width=1), name='Max Hold')
         average_curve = plot_widget.plot(pen=pg.mkPen(color='green', width=1), name='Average')
+        min_hold_curve = plot_widget.plot(pen=pg.mkPen(color='cyan', width=1), name='Min Hold')
+        percentile_curve = plot_widget.plot(pen=pg.mkPen(color='magenta', width=1), name='Percentile')
 
         plot_widget.addLegend()
 
-        # Initially hide Max Hold and Averaging curves
+        # Initially hide the statistics curves
         max_hold_curve.setVisible(self.max_hold_enabled)
         average_curve.setVisible(self.averaging_enabled)
+        min_hold_curve.setVisible(self.min_hold_enabled)
+        percentile_curve.setVisible(self.trace_percentile is not None)
 
         # Store references for later updates
-        setattr(self, f'spectrum_plot_rx{rx_channel}', plot_widget)
-        setattr(self, f'spectrum_curve_rx{rx_channel}', spectrum_curve)
-        setattr(self, f'max_hold_curve_rx{rx_channel}', max_hold_curve)
-        setattr(self, f'average_curve_rx{rx_channel}', average_curve)
-        setattr(self, f'max_hold_data_rx{rx_channel}', None)
-        setattr(self, f'average_data_rx{rx_channel}', None)
+        channel.spectrum_plot = plot_widget
+        channel.spectrum_curve = spectrum_curve
+        channel.trace_curves = {'max': max_hold_curve, 'mean': average_curve, 'min': min_hold_curve,
+                                'percentile': percentile_curve}
+        channel.persistence_image = persistence_image
 
         # Lock the spectrum display to prevent panning and zooming
         plot_widget.setMouseEnabled(x=False, y=False)
         plot_widget.getViewBox().setMouseMode(pg.ViewBox.RectMode)  # Prevent dragging
 
         # Connect right-click to open context menu for adding ROIs
-        plot_widget.scene().sigMouseClicked.connect(lambda event, rx=rx_channel: self.on_spectrum_clicked(event, rx))
+        plot_widget.scene().sigMouseClicked.connect(lambda event, rx=channel.index: self.on_spectrum_clicked(event, rx))
 
         spectrum_layout.addWidget(plot_widget)
         spectrum_group.setLayout(spectrum_layout)
         return spectrum_group
 
-    def create_waterfall_display(self, rx_channel):
+    def create_waterfall_display(self, channel):
         # Create the waterfall display using PlotWidget and ImageItem
         waterfall_group = QGroupBox("Waterfall")
         waterfall_layout = QVBoxLayout()
@@ -361,13 +454,14 @@ class MainWindow(QtWidgets.QMainWindow):
         # Calculate initial scaling factors
         time_span = self.time_spin.value()  # in seconds
         scale_x = 1.0  # MHz per pixel (to be updated dynamically)
-        scale_y = time_span / 500  # seconds per pixel
+        scale_y = time_span / WATERFALL_DISPLAY_ROWS  # seconds per pixel
 
-        # Initialize waterfall data with reference level minus dynamic range
+        # Initialize waterfall history with reference level minus dynamic range
         initial_value = self.ref_level_spin.value() - self.range_spin.value() if hasattr(self, 'ref_level_spin') and hasattr(self, 'range_spin') else -120
-        waterfall_data = np.full((500, self.fft_size), initial_value)
-        image_item.setImage(waterfall_data, autoLevels=False, levels=(initial_value, 0))
-        image_item.setRect(QtCore.QRectF(0, 0, self.fft_size, time_span))
+        waterfall_history = WaterfallHistory(self.waterfall_history_rows, self.waterfall_bins(),
+                                             mode=self.waterfall_storage, fill_db=initial_value)
+        image_item.setImage(waterfall_history.to_db(WATERFALL_DISPLAY_ROWS), autoLevels=False, levels=(initial_value, 0))
+        image_item.setRect(QtCore.QRectF(0, 0, self.waterfall_bins(), time_span))
 
         # Set color map
         image_item.setColorMap(pg.colormap.get(self.current_colormap))
@@ -389,13 +483,13 @@ class MainWindow(QtWidgets.QMainWindow):
         time_label.setFixedHeight(20)
 
         # Store references for later updates
-        setattr(self, f'waterfall_plot_rx{rx_channel}', image_item)
-        setattr(self, f'waterfall_data_rx{rx_channel}', waterfall_data)
-        setattr(self, f'time_label_rx{rx_channel}', time_label)
-        setattr(self, f'waterfall_plot_widget_rx{rx_channel}', plot_widget)
+        channel.waterfall_image = image_item
+        channel.waterfall_history = waterfall_history
+        channel.time_label = time_label
+        channel.waterfall_plot = plot_widget
 
         # Connect right-click to open context menu for adding ROIs
-        plot_widget.scene().sigMouseClicked.connect(lambda event, rx=rx_channel: self.on_waterfall_clicked(event, rx))
+        plot_widget.scene().sigMouseClicked.connect(lambda event, rx=channel.index: self.on_waterfall_clicked(event, rx))
 
         waterfall_layout.addWidget(plot_widget)
         waterfall_layout.addWidget(time_label)
@@ -427,6 +521,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.create_tuning_controls()
         self.create_display_controls()
         self.create_processing_controls()
+        self.create_roi_controls()
+        self.create_trigger_controls()
+        self.create_diagnostics_controls()
         self.control_layout.addStretch()
 
     def create_rx_control(self):
@@ -448,8 +545,6 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.rx_select = QComboBox()
         self.rx_select.addItems(["TX/RX"])
-        if self.tx_rx.rx2_available:
-            self.rx_select.addItems(["RX2"])
         self.rx_select.currentTextChanged.connect(self.on_rx_channel_changed)
         tuning_layout.addWidget(QLabel("RX Channel:"), 0, 0)
         tuning_layout.addWidget(self.rx_select, 0, 1)
@@ -485,6 +580,36 @@ class MainWindow(QtWidgets.QMainWindow):
         tuning_layout.addWidget(QLabel("Sample Rate (MSps):"), 4, 0)
         tuning_layout.addWidget(self.rate_combo, 4, 1)
 
+        # Rate planner: pick the master clock, rate and FFT size from span and RBW
+        self.span_spin = QDoubleSpinBox()
+        self.span_spin.setRange(0.001, 56.0)  # MHz
+        self.span_spin.setDecimals(3)
+        self.span_spin.setValue(10.0)
+        tuning_layout.addWidget(QLabel("Analysis Span (MHz):"), 5, 0)
+        tuning_layout.addWidget(self.span_spin, 5, 1)
+
+        self.rbw_spin = QDoubleSpinBox()
+        self.rbw_spin.setRange(0.01, 1e6)  # Hz
+        self.rbw_spin.setDecimals(2)
+        self.rbw_spin.setValue(10e3)
+        tuning_layout.addWidget(QLabel("RBW (Hz):"), 6, 0)
+        tuning_layout.addWidget(self.rbw_spin, 6, 1)
+
+        self.link_combo = QComboBox()
+        self.link_combo.addItems(list(LINK_BYTES_PER_SECOND))
+        self.link_combo.setCurrentText('USB 3.0')
+        tuning_layout.addWidget(QLabel("USB Link:"), 7, 0)
+        tuning_layout.addWidget(self.link_combo, 7, 1)
+
+        self.apply_plan_button = QPushButton("Plan Rate")
+        self.apply_plan_button.setToolTip("Set the master clock, sample rate, analog bandwidth and FFT size "
+                                          "for the span and RBW in one reconfiguration")
+        self.apply_plan_button.clicked.connect(self.apply_rate_plan)
+        self.rate_plan_label = QLabel("")
+        self.rate_plan_label.setWordWrap(True)
+        tuning_layout.addWidget(self.apply_plan_button, 8, 0)
+        tuning_layout.addWidget(self.rate_plan_label, 8, 1)
+
         tuning_group.setLayout(tuning_layout)
         self.control_layout.addWidget(tuning_group)
 
@@ -530,6 +655,54 @@ class MainWindow(QtWidgets.QMainWindow):
         display_layout.addWidget(QLabel("Calibration (dB):"), 4, 0)
         display_layout.addWidget(self.calibration_spin, 4, 1)
 
+        self.storage_combo = QComboBox()
+        self.storage_combo.addItems(STORAGE_MODES)
+        self.storage_combo.setCurrentText(self.waterfall_storage)
+        self.storage_combo.currentTextChanged.connect(self.on_waterfall_storage_changed)
+        display_layout.addWidget(QLabel("Waterfall Storage:"), 5, 0)
+        display_layout.addWidget(self.storage_combo, 5, 1)
+
+        self.history_rows_spin = QSpinBox()
+        self.history_rows_spin.setRange(WATERFALL_DISPLAY_ROWS, 100000)
+        self.history_rows_spin.setSingleStep(500)
+        self.history_rows_spin.setValue(self.waterfall_history_rows)
+        self.history_rows_spin.valueChanged.connect(self.on_history_rows_changed)
+        display_layout.addWidget(QLabel("Waterfall History (rows):"), 6, 0)
+        display_layout.addWidget(self.history_rows_spin, 6, 1)
+
+        self.iq_history_spin = QSpinBox()
+        self.iq_history_spin.setRange(8, 4096)
+        self.iq_history_spin.setSingleStep(32)
+        self.iq_history_spin.setValue(self.iq_history_mb)
+        self.iq_history_spin.setToolTip("Raw IQ kept per channel for re-processing waterfall snapshots")
+        self.iq_history_spin.valueChanged.connect(self.on_iq_history_changed)
+        display_layout.addWidget(QLabel("Raw IQ History (MB/channel):"), 7, 0)
+        display_layout.addWidget(self.iq_history_spin, 7, 1)
+
+        self.record_button = QPushButton("Record Raw IQ...")
+        self.record_button.setToolTip("Write the selected channel's IQ to disk in the host format, without conversion")
+        self.record_button.clicked.connect(lambda: self.start_recording(self.selected_rx_channel()))
+        display_layout.addWidget(self.record_button, 8, 0)
+        self.record_stop_button = QPushButton("Stop Recording")
+        self.record_stop_button.setEnabled(False)
+        self.record_stop_button.clicked.connect(self.stop_recording)
+        display_layout.addWidget(self.record_stop_button, 8, 1)
+
+        self.persistence_check = QCheckBox("Persistence Display")
+        self.persistence_check.setToolTip("Show how often each power level occurs at each frequency, fading over time")
+        self.persistence_check.stateChanged.connect(self.on_persistence_changed)
+        display_layout.addWidget(self.persistence_check, 9, 0)
+
+        self.persistence_fade_spin = QDoubleSpinBox()
+        self.persistence_fade_spin.setRange(0.0, 60.0)
+        self.persistence_fade_spin.setSingleStep(0.5)
+        self.persistence_fade_spin.setValue(1.0)
+        self.persistence_fade_spin.setSpecialValueText("Infinite")
+        self.persistence_fade_spin.setSuffix(" s")
+        self.persistence_fade_spin.setToolTip("Half-life of the persistence display")
+        self.persistence_fade_spin.valueChanged.connect(self.on_persistence_fade_changed)
+        display_layout.addWidget(self.persistence_fade_spin, 9, 1)
+
         display_group.setLayout(display_layout)
         self.control_layout.addWidget(display_group)
 
@@ -539,7 +712,7 @@ class MainWindow(QtWidgets.QMainWindow):
         processing_layout = QGridLayout()
 
         self.fft_combo = QComboBox()
-        self.fft_combo.addItems(['512', '1024', '2048', '4096', '8192'])
+        self.fft_combo.addItems([str(size) for size in FFT_SIZES])
         self.fft_combo.setCurrentText(str(self.fft_size))
         self.fft_combo.currentTextChanged.connect(self.on_fft_size_changed)
         processing_layout.addWidget(QLabel("FFT Size:"), 0, 0)
@@ -552,9 +725,22 @@ class MainWindow(QtWidgets.QMainWindow):
         processing_layout.addWidget(QLabel("Update Rate (fps):"), 1, 0)
         processing_layout.addWidget(self.frame_spin, 1, 1)
 
+        self.block_spin = QSpinBox()
+        self.block_spin.setRange(1, 256)
+        self.block_spin.setValue(1)
+        self.block_spin.setToolTip("Contiguous frames processed per update; waterfall rows per second = "
+                                   "update rate x frames per block")
+        self.block_spin.valueChanged.connect(self.on_frames_per_block_changed)
+        processing_layout.addWidget(QLabel("Frames per Block:"), 12, 0)
+        processing_layout.addWidget(self.block_spin, 12, 1)
+
         self.max_hold_check = QCheckBox("Enable Max Hold")
         self.max_hold_check.stateChanged.connect(self.on_max_hold_changed)
-        processing_layout.addWidget(self.max_hold_check, 2, 0, 1, 2)
+        processing_layout.addWidget(self.max_hold_check, 2, 0)
+
+        self.min_hold_check = QCheckBox("Enable Min Hold")
+        self.min_hold_check.stateChanged.connect(self.on_min_hold_changed)
+        processing_layout.addWidget(self.min_hold_check, 2, 1)
 
         self.averaging_check = QCheckBox("Enable Averaging")
         self.averaging_check.stateChanged.connect(self.on_averaging_changed)
@@ -569,14 +755,232 @@ class MainWindow(QtWidgets.QMainWindow):
         processing_layout.addWidget(self.averaging_spin, 4, 1)
 
         self.window_combo = QComboBox()
-        self.window_combo.addItems(['Hamming', 'Hanning', 'Blackman', 'Rectangular'])
+        self.window_combo.addItems(WINDOW_FUNCTIONS)
         self.window_combo.currentTextChanged.connect(self.on_window_changed)
         processing_layout.addWidget(QLabel("Window Function:"), 5, 0)
         processing_layout.addWidget(self.window_combo, 5, 1)
 
+        self.load_shedding_check = QCheckBox("Auto Load Shedding")
+        self.load_shedding_check.setToolTip("Reduce FFT size and update rate while overflows persist")
+        self.load_shedding_check.stateChanged.connect(self.on_load_shedding_changed)
+        processing_layout.addWidget(self.load_shedding_check, 6, 0)
+
+        self.load_level_label = QLabel("Level: 0")
+        processing_layout.addWidget(self.load_level_label, 6, 1)
+
+        self.fft_backend_combo = QComboBox()
+        self.fft_backend_combo.addItems(backend_names())
+        self.fft_backend_combo.setCurrentText(self.fft_backend.name)
+        self.fft_backend_combo.currentTextChanged.connect(self.on_fft_backend_changed)
+        processing_layout.addWidget(QLabel("FFT Backend:"), 7, 0)
+        processing_layout.addWidget(self.fft_backend_combo, 7, 1)
+
+        self.otw_format_combo = QComboBox()
+        self.otw_format_combo.addItems(OTW_FORMATS)
+        self.otw_format_combo.setCurrentText(self.otw_format)
+        self.otw_format_combo.setToolTip("USB wire format: sc8 halves the link load, sc16 keeps full resolution")
+        self.otw_format_combo.currentTextChanged.connect(self.on_stream_format_changed)
+        processing_layout.addWidget(QLabel("Wire Format:"), 8, 0)
+        processing_layout.addWidget(self.otw_format_combo, 8, 1)
+
+        self.cpu_format_combo = QComboBox()
+        self.cpu_format_combo.addItems(CPU_FORMATS)
+        self.cpu_format_combo.setCurrentText(self.cpu_format)
+        self.cpu_format_combo.setToolTip("Host format: sc16 skips float conversion on the receive thread")
+        self.cpu_format_combo.currentTextChanged.connect(self.on_stream_format_changed)
+        processing_layout.addWidget(QLabel("Host Format:"), 9, 0)
+        processing_layout.addWidget(self.cpu_format_combo, 9, 1)
+
+        self.average_count_spin = QSpinBox()
+        self.average_count_spin.setRange(0, 10000)
+        self.average_count_spin.setSpecialValueText("Exponential")
+        self.average_count_spin.setToolTip("Average the first N frames equally, then as an N-frame running average")
+        self.average_count_spin.valueChanged.connect(self.on_average_count_changed)
+        processing_layout.addWidget(QLabel("Average Count:"), 10, 0)
+        processing_layout.addWidget(self.average_count_spin, 10, 1)
+
+        self.percentile_combo = QComboBox()
+        self.percentile_combo.addItems(['Off', '10', '50', '90', '99'])
+        self.percentile_combo.setToolTip("Per-bin percentile of all frames since enabled, to 1 dB")
+        self.percentile_combo.currentTextChanged.connect(self.on_percentile_changed)
+        processing_layout.addWidget(QLabel("Percentile Trace:"), 11, 0)
+        processing_layout.addWidget(self.percentile_combo, 11, 1)
+
         processing_group.setLayout(processing_layout)
         self.control_layout.addWidget(processing_group)
 
+    def create_roi_controls(self):
+        # Create ROI Measurements group
+        roi_group = QGroupBox("ROI Measurements")
+        roi_layout = QVBoxLayout()
+
+        self.roi_table = QTableWidget(0, 6)
+        self.roi_table.setHorizontalHeaderLabels(['ROI', 'Power (dB)', 'Peak (dB)', 'Peak (MHz)', 'OBW (kHz)', 'SNR (dB)'])
+        self.roi_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.roi_table.verticalHeader().setVisible(False)
+        self.roi_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        roi_layout.addWidget(self.roi_table)
+
+        history_layout = QHBoxLayout()
+        history_layout.addWidget(QLabel("History per ROI (frames):"))
+        self.roi_history_spin = QSpinBox()
+        self.roi_history_spin.setRange(64, 1 << 18)
+        self.roi_history_spin.setSingleStep(1024)
+        self.roi_history_spin.setValue(DEFAULT_HISTORY_FRAMES)
+        self.roi_history_spin.valueChanged.connect(self.on_roi_history_changed)
+        history_layout.addWidget(self.roi_history_spin)
+        self.roi_memory_label = QLabel("")
+        history_layout.addWidget(self.roi_memory_label)
+        roi_layout.addLayout(history_layout)
+
+        self.constellation_button = QPushButton("Show Constellation")
+        self.constellation_button.setToolTip("Live constellation of the selected RX channel")
+        self.constellation_button.clicked.connect(lambda: self.open_constellation(self.selected_rx_channel()))
+        roi_layout.addWidget(self.constellation_button)
+
+        demod_layout = QHBoxLayout()
+        self.demod_mode_combo = QComboBox()
+        self.demod_mode_combo.addItems(['AM', 'FM', 'USB', 'LSB'])
+        demod_layout.addWidget(self.demod_mode_combo)
+        self.fm_deviation_spin = QDoubleSpinBox()
+        self.fm_deviation_spin.setRange(1.0, 100.0)
+        self.fm_deviation_spin.setValue(5.0)
+        self.fm_deviation_spin.setSuffix(" kHz dev")
+        self.fm_deviation_spin.setToolTip("FM peak deviation; 50 kHz and above is treated as broadcast FM")
+        demod_layout.addWidget(self.fm_deviation_spin)
+        self.demod_button = QPushButton("Demodulate...")
+        self.demod_button.setToolTip("Demodulate the selected RX channel center to a WAV file or FIFO")
+        self.demod_button.clicked.connect(lambda: self.start_demodulation(self.selected_rx_channel()))
+        demod_layout.addWidget(self.demod_button)
+        self.demod_stop_button = QPushButton("Stop")
+        self.demod_stop_button.setEnabled(False)
+        self.demod_stop_button.clicked.connect(self.stop_demodulation)
+        demod_layout.addWidget(self.demod_stop_button)
+        roi_layout.addLayout(demod_layout)
+
+        roi_group.setLayout(roi_layout)
+        self.control_layout.addWidget(roi_group)
+
+    def create_trigger_controls(self):
+        # Create Capture Triggers group
+        trigger_group = QGroupBox("Capture Triggers")
+        trigger_layout = QGridLayout()
+
+        self.trigger_combo = QComboBox()
+        self.trigger_combo.addItems(['Band Power', 'CFAR', 'Mask From Trace'])
+        self.trigger_combo.setToolTip("Band Power: integrated power in the band reaches the threshold\n"
+                                      "CFAR: a bin stands the threshold above its neighbours\n"
+                                      "Mask From Trace: the spectrum exceeds the current trace plus the threshold")
+        trigger_layout.addWidget(QLabel("Trigger:"), 0, 0)
+        trigger_layout.addWidget(self.trigger_combo, 0, 1)
+
+        self.trigger_threshold_spin = QDoubleSpinBox()
+        self.trigger_threshold_spin.setRange(-200.0, 200.0)
+        self.trigger_threshold_spin.setValue(15.0)
+        self.trigger_threshold_spin.setSuffix(" dB")
+        trigger_layout.addWidget(QLabel("Threshold:"), 1, 0)
+        trigger_layout.addWidget(self.trigger_threshold_spin, 1, 1)
+
+        band_layout = QHBoxLayout()
+        self.trigger_start_spin = QDoubleSpinBox()
+        self.trigger_end_spin = QDoubleSpinBox()
+        for spin, value in ((self.trigger_start_spin, 2399.5), (self.trigger_end_spin, 2400.5)):
+            spin.setRange(70.0, 6000.0)
+            spin.setDecimals(4)
+            spin.setValue(value)
+            band_layout.addWidget(spin)
+        trigger_layout.addWidget(QLabel("Band (MHz):"), 2, 0)
+        trigger_layout.addLayout(band_layout, 2, 1)
+
+        window_layout = QHBoxLayout()
+        self.trigger_pre_spin = QSpinBox()
+        self.trigger_pre_spin.setRange(0, 10000)
+        self.trigger_pre_spin.setValue(50)
+        self.trigger_pre_spin.setPrefix("pre ")
+        self.trigger_pre_spin.setSuffix(" ms")
+        window_layout.addWidget(self.trigger_pre_spin)
+        self.trigger_post_spin = QSpinBox()
+        self.trigger_post_spin.setRange(0, 10000)
+        self.trigger_post_spin.setValue(200)
+        self.trigger_post_spin.setPrefix("post ")
+        self.trigger_post_spin.setSuffix(" ms")
+        window_layout.addWidget(self.trigger_post_spin)
+        trigger_layout.addWidget(QLabel("Window:"), 3, 0)
+        trigger_layout.addLayout(window_layout, 3, 1)
+
+        self.trigger_holdoff_spin = QDoubleSpinBox()
+        self.trigger_holdoff_spin.setRange(0.0, 3600.0)
+        self.trigger_holdoff_spin.setValue(1.0)
+        self.trigger_holdoff_spin.setSuffix(" s")
+        self.trigger_holdoff_spin.setToolTip("Minimum time between two captures of a channel")
+        trigger_layout.addWidget(QLabel("Holdoff:"), 4, 0)
+        trigger_layout.addWidget(self.trigger_holdoff_spin, 4, 1)
+
+        self.trigger_rate_spin = QDoubleSpinBox()
+        self.trigger_rate_spin.setRange(0.1, 1000.0)
+        self.trigger_rate_spin.setValue(50.0)
+        self.trigger_rate_spin.setSuffix(" MB/s")
+        self.trigger_rate_spin.setToolTip("Disk write budget; bursts beyond it are dropped")
+        trigger_layout.addWidget(QLabel("Write Limit:"), 5, 0)
+        trigger_layout.addWidget(self.trigger_rate_spin, 5, 1)
+
+        self.trigger_arm_button = QPushButton("Arm...")
+        self.trigger_arm_button.setToolTip("Choose a directory and save an IQ burst from every channel whenever "
+                                           "the trigger fires")
+        self.trigger_arm_button.clicked.connect(lambda: self.arm_triggers())
+        trigger_layout.addWidget(self.trigger_arm_button, 6, 0)
+        self.trigger_disarm_button = QPushButton("Disarm")
+        self.trigger_disarm_button.setEnabled(False)
+        self.trigger_disarm_button.clicked.connect(self.disarm_triggers)
+        trigger_layout.addWidget(self.trigger_disarm_button, 6, 1)
+
+        self.trigger_status_label = QLabel("")
+        trigger_layout.addWidget(self.trigger_status_label, 7, 0, 1, 2)
+
+        # Time-domain detection at the full sample rate, for bursts shorter than an FFT frame
+        self.burst_detector_check = QCheckBox("Burst Detector")
+        self.burst_detector_check.setToolTip("Detect short bursts in the raw IQ of every channel, sample by sample")
+        self.burst_detector_check.stateChanged.connect(
+            lambda state: self.set_burst_detection(state == Qt.Checked))
+        trigger_layout.addWidget(self.burst_detector_check, 8, 0)
+        self.burst_threshold_spin = QDoubleSpinBox()
+        self.burst_threshold_spin.setRange(1.0, 60.0)
+        self.burst_threshold_spin.setValue(10.0)
+        self.burst_threshold_spin.setSuffix(" dB over noise")
+        self.burst_threshold_spin.valueChanged.connect(lambda _: self.restart_burst_detection())
+        trigger_layout.addWidget(self.burst_threshold_spin, 8, 1)
+        self.burst_status_label = QLabel("")
+        self.burst_status_label.setWordWrap(True)
+        trigger_layout.addWidget(self.burst_status_label, 9, 0, 1, 2)
+
+        trigger_group.setLayout(trigger_layout)
+        self.control_layout.addWidget(trigger_group)
+
+    def create_diagnostics_controls(self):
+        # Create Diagnostics group
+        diagnostics_group = QGroupBox("Diagnostics")
+        diagnostics_layout = QGridLayout()
+
+        self.diagnostics_button = QPushButton("Show Diagnostics")
+        self.diagnostics_button.clicked.connect(self.show_diagnostics)
+        diagnostics_layout.addWidget(self.diagnostics_button, 0, 0, 1, 2)
+
+        self.metrics_server_check = QCheckBox("Serve /metrics on port")
+        self.metrics_server_check.stateChanged.connect(self.on_metrics_server_changed)
+        diagnostics_layout.addWidget(self.metrics_server_check, 1, 0)
+
+        self.metrics_port_spin = QSpinBox()
+        self.metrics_port_spin.setRange(1024, 65535)
+        self.metrics_port_spin.setValue(9105)
+        diagnostics_layout.addWidget(self.metrics_port_spin, 1, 1)
+
+        self.control_socket_check = QCheckBox("Serve control socket")
+        self.control_socket_check.stateChanged.connect(self.on_control_socket_changed)
+        diagnostics_layout.addWidget(self.control_socket_check, 2, 0, 1, 2)
+
+        diagnostics_group.setLayout(diagnostics_layout)
+        self.control_layout.addWidget(diagnostics_group)
+
     def setup_status_bar(self):
         # Initialize the status bar with labels
         self.status_bar = self.statusBar()
@@ -584,12 +988,14 @@ class MainWindow(QtWidgets.QMainWindow):
         self.freq_status = QLabel("Freq: -- MHz")
         self.rate_status = QLabel("Rate: -- MSps")
         self.fps_label = QLabel("FPS: 0.00")
+        self.overflow_status = QLabel("Overflows: 0 | Lost: 0")
         self.calibration_status = QLabel("Calibration: 0.0 dB")
 
         self.status_bar.addPermanentWidget(self.rx_status)
         self.status_bar.addPermanentWidget(self.freq_status)
         self.status_bar.addPermanentWidget(self.rate_status)
         self.status_bar.addPermanentWidget(self.fps_label)
+        self.status_bar.addPermanentWidget(self.overflow_status)
         self.status_bar.addPermanentWidget(self.calibration_status)
         self.status_bar.showMessage("Initializing...")
 
@@ -599,11 +1005,19 @@ class MainWindow(QtWidgets.QMainWindow):
         self.update_timer.timeout.connect(self.update_displays)
         self.update_timer.start(33)  # Approximately 30 fps
 
+        # Stream health is evaluated once per second
+        self.health_timer = QTimer()
+        self.health_timer.timeout.connect(self.check_stream_health)
+        self.health_timer.start(1000)
+
     def toggle_rx(self):
         # Start or stop the RX process
+        if not self.radios:
+            return
         if not self.is_receiving:
             try:
-                self.tx_rx.start_receiving()
+                for radio in self.radios:
+                    radio.tx_rx.start_receiving()
                 self.is_receiving = True
                 self.start_stop_button.setText("Stop RX")
                 self.rx_status.setText("RX: Running")
@@ -612,7 +1026,8 @@ class MainWindow(QtWidgets.QMainWindow):
                 self.update_status(f"Failed to start RX: {str(e)}", "error")
         else:
             try:
-                self.tx_rx.stop_receiving()
+                for radio in self.radios:
+                    radio.tx_rx.stop_receiving()
                 self.is_receiving = False
                 self.start_stop_button.setText("Start RX")
                 self.rx_status.setText("RX: Stopped")
@@ -620,93 +1035,50 @@ class MainWindow(QtWidgets.QMainWindow):
             except Exception as e:
                 self.update_status(f"Failed to stop RX: {str(e)}", "error")
 
-    def process_received_data(self, data, rx_channel):
-        # Process incoming data from USRP
-        try:
-            # Ensure data length matches FFT size
-            if len(data) != self.fft_size:
-                # Adjust data length by truncating or zero-padding
-                if len(data) > self.fft_size:
-                    data = data[:self.fft_size]
-                else:
-                    padding = np.zeros(self.fft_size - len(data))
-                    data = np.concatenate((data, padding))
-                self.update_status(f"Data length adjusted to match FFT size for RX channel {rx_channel}", "warning")
-
-            window_name = self.window_combo.currentText()
-            if window_name == 'Hamming':
-                window = np.hamming(len(data))
-            elif window_name == 'Hanning':
-                window = np.hanning(len(data))
-            elif window_name == 'Blackman':
-                window = np.blackman(len(data))
-            else:  # Rectangular
-                window = np.ones(len(data))
-
-            windowed_data = data * window
-            spectrum = np.fft.fftshift(np.fft.fft(windowed_data))
-            # Correct frequency bins calculation
-            sample_rate_hz = self.usrp_control.get_rx_rate(rx_channel)  # in Hz
-            freq_bins = np.fft.fftshift(np.fft.fftfreq(len(spectrum), d=1.0 / sample_rate_hz))  # in Hz
-            power_db = 20 * np.log10(np.abs(spectrum) + 1e-12) + self.calibration_db  # Apply calibration
-
-            # Ensure spectrum and freq_bins have correct shapes
-            if spectrum.shape != (self.fft_size,):
-                self.update_status(f"Spectrum shape mismatch: expected ({self.fft_size},), got {spectrum.shape}", "error")
-                return
-            if freq_bins.shape != (self.fft_size,):
-                self.update_status(f"Frequency bins shape mismatch: expected ({self.fft_size},), got {freq_bins.shape}", "error")
-                return
-
-            # Store spectrum data
-            setattr(self, f'current_spectrum_rx{rx_channel}', power_db)
-            setattr(self, f'current_freq_bins_rx{rx_channel}', freq_bins)
-
-            # Implement Max Hold
-            if self.max_hold_enabled:
-                max_hold_data = getattr(self, f'max_hold_data_rx{rx_channel}')
-                if max_hold_data is None:
-                    max_hold_data = power_db.copy()
-                else:
-                    max_hold_data = np.maximum(max_hold_data, power_db)
-                setattr(self, f'max_hold_data_rx{rx_channel}', max_hold_data)
-
-            # Implement Averaging
-            if self.averaging_enabled:
-                avg_data = getattr(self, f'average_data_rx{rx_channel}')
-                if avg_data is None:
-                    avg_data = power_db.copy()
-                else:
-                    avg_data = self.averaging_factor * avg_data + (1 - self.averaging_factor) * power_db
-                setattr(self, f'average_data_rx{rx_channel}', avg_data)
-
-            # Update waterfall data by rolling and adding new data at the end
-            waterfall_data = getattr(self, f'waterfall_data_rx{rx_channel}')
-            if waterfall_data.shape[1] != self.fft_size:
-                # Resize waterfall_data to match new FFT size
-                new_waterfall_data = np.full((waterfall_data.shape[0], self.fft_size),
-                                             self.ref_level_spin.value() - self.range_spin.value())
-                min_size = min(self.fft_size, waterfall_data.shape[1])
-                new_waterfall_data[:, :min_size] = waterfall_data[:, :min_size]
-                waterfall_data = new_waterfall_data
-                setattr(self, f'waterfall_data_rx{rx_channel}', waterfall_data)
-                self.update_status(f"Waterfall data resized for RX channel {rx_channel} to FFT size {self.fft_size}", "info")
-
-            # Roll the waterfall data upwards and insert new spectrum at the bottom
-            waterfall_data = np.roll(waterfall_data, -1, axis=0)
-            waterfall_data[-1, :] = power_db
-            setattr(self, f'waterfall_data_rx{rx_channel}', waterfall_data)
-
-        except Exception as e:
-            tb = traceback.format_exc()
-            self.update_status(f"Error processing data: {str(e)}\n{tb}", "error")
+    def init_pipeline(self):
+        # The per-block DSP as a graph of stages fed by every channel's receiver (see core.pipeline), run by
+        # one PipelineWorker per channel; stages work on the ChannelState in the context or key state by channel
+        self.pipeline = Pipeline(iq_block_spec(self.cpu_format), self.metrics)
+        fft = self.pipeline.add(FftStage())
+        self.pipeline.add(SpectrumStage(), fft)
+        self.pipeline.add(RoiStage(), fft)
+        self.pipeline.add(StatisticsStage(), fft)
+        self.persistence_stage = self.pipeline.add(PersistenceStage(), fft)
+        self.pipeline.add(WaterfallStage(WATERFALL_MAX_BINS, self.on_waterfall_resized), fft)
+
+    def block_context(self, channel, timestamp):
+        # What the stages need to know about a block besides its samples; built on the channel's worker thread
+        usrp_control = channel.radio.usrp_control
+        sample_rate_hz = usrp_control.get_rx_rate(channel.rx_channel)  # in Hz
+        fft_size = self.fft_size
+        return BlockContext(channel.index, channel, timestamp, sample_rate_hz,
+                            usrp_control.get_rx_freq(channel.rx_channel), fft_size,
+                            1.0 / channel.radio.tx_rx.frame_rate, self.get_freq_bins(fft_size, sample_rate_hz),
+                            self.spectrum_settings())
+
+    def on_processing_error(self, error):
+        # Called on a pipeline worker thread
+        self.status_requested.emit(f"Error processing data: {error}", "error")
+
+    def on_trigger_event(self, index, iq_history, event, center_freq):
+        # A capture trigger fired (on its worker thread); the burst is written in the background
+        self.metrics.increment('triggers_total', index)
+        writer = self.burst_writer
+        if writer is not None:
+            writer.submit(event, iq_history, center_freq, index, f"rx{index + 1}")
+
+    def on_waterfall_resized(self, context):
+        # Called on a pipeline worker thread
+        self.status_requested.emit(f"Waterfall data resized for RX channel {context.channel} "
+                                   f"to FFT size {context.fft_size}", "info")
 
     def update_displays(self):
         # Update both spectrum and waterfall displays
         try:
-            self.update_channel_displays(0)
-            if self.tx_rx.rx2_available:
-                self.update_channel_displays(1)
+            for channel in self.channels:
+                self.update_channel_displays(channel)
+            if time.time() - self.roi_table_refresh_time >= ROI_TABLE_REFRESH_SECONDS:
+                self.refresh_roi_table()
         except Exception as e:
             tb = traceback.format_exc()
             self.update_status(f"Display update error: {str(e)}\n{tb}", "error")
@@ -722,14 +1094,172 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             self.last_update_time = current_time
 
-    def update_channel_displays(self, rx_channel):
-        # Update displays for a specific RX channel
-        spectrum = getattr(self, f'current_spectrum_rx{rx_channel}', None)
-        freq_bins = getattr(self, f'current_freq_bins_rx{rx_channel}', None)
-
-        if spectrum is not None and freq_bins is not None:
-            center_freq_hz = self.usrp_control.get_rx_freq(rx_channel)  # in Hz
-            sample_rate_hz = self.usrp_control.get_rx_rate(rx_channel)  # in Hz
+    def refresh_roi_table(self):
+        # Show the latest measurements of every ROI on every channel
+        self.roi_table_refresh_time = time.time()
+        rows = []
+        for channel in self.channels:
+            def read():
+                measurements = channel.roi_measurements
+                return list(measurements.keys), {name: values.copy() for name, values in measurements.results.items()}
+            try:
+                keys, results = read_consistent(channel, read)
+            except InconsistentRead:
+                continue
+            for index, roi in enumerate(keys):
+                if roi in channel.rois:
+                    name = f"RX{channel.index + 1} #{channel.rois.index(roi) + 1}"
+                    rows.append((name, [results['channel_power_db'][index], results['peak_db'][index],
+                                        results['peak_freq_hz'][index] / 1e6, results['obw_hz'][index] / 1e3,
+                                        results['snr_db'][index]]))
+        self.roi_table.setRowCount(len(rows))
+        for row, (name, values) in enumerate(rows):
+            self.roi_table.setItem(row, 0, QTableWidgetItem(name))
+            for column, (value, decimals) in enumerate(zip(values, (2, 2, 4, 1, 1)), start=1):
+                text = "-" if np.isnan(value) else f"{value:.{decimals}f}"
+                self.roi_table.setItem(row, column, QTableWidgetItem(text))
+
+    def selected_rx_channel(self):
+        return max(self.rx_select.currentIndex(), 0)
+
+    def open_constellation(self, rx_channel, roi=None):
+        # Live constellation of a channel, or of an ROI mixed down to baseband
+        iq_history = self.channel_iq_history(rx_channel)
+        if iq_history is None:
+            self.update_status(f"No IQ available for RX channel {rx_channel}", "error")
+            return
+        try:
+            from core.constellation import IQTap
+            from analysis_tools.constellation_viewer import ConstellationViewer
+            title = f"Constellation RX{rx_channel + 1}"
+            tap = IQTap(iq_history)
+            if roi is not None:
+                freq_start, freq_end = self.roi_frequency_range(roi, rx_channel)
+                center = (freq_start + freq_end) / 2
+                tap = IQTap(iq_history,
+                            offset_hz=center - self.channel_center_freq(rx_channel),
+                            bandwidth_hz=freq_end - freq_start)
+                title += f" ROI {center / 1e6:.3f} MHz"
+            viewer = ConstellationViewer(tap, title, parent=self)
+            viewer.setWindowFlags(Qt.Window)
+            viewer.setAttribute(Qt.WA_DeleteOnClose)
+            viewer.resize(600, 650)
+            viewer.show()
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Constellation error: {str(e)}\n{tb}", "error")
+
+    def start_demodulation(self, rx_channel, roi=None, target=None):
+        # Demodulate a channel center or an ROI center to a WAV file, FIFO or '-' (stdout)
+        history = self.channel_iq_history(rx_channel)
+        if history is None:
+            self.update_status(f"No IQ available for RX channel {rx_channel}", "error")
+            return None
+        if target is None:
+            target, _ = QFileDialog.getSaveFileName(self, "Demodulate to WAV file or FIFO", "",
+                                                    "WAV files (*.wav);;All files (*)")
+            if not target:
+                return None
+        try:
+            from core.demodulator import Demodulator, DemodulatorWorker, WIDEBAND_FM_DEVIATION, open_audio_sink
+            mode = self.demod_mode_combo.currentText()
+            deviation = self.fm_deviation_spin.value() * 1e3
+            deemphasis = 75 if deviation >= WIDEBAND_FM_DEVIATION else None
+            offset = 0.0
+            if roi is not None:
+                freq_start, freq_end = self.roi_frequency_range(roi, rx_channel)
+                offset = (freq_start + freq_end) / 2 - self.channel_center_freq(rx_channel)
+
+            def factory(sample_rate):
+                return Demodulator(mode, sample_rate, offset, fm_deviation_hz=deviation, deemphasis_us=deemphasis)
+
+            audio_rate = factory(history.sample_rate).audio_rate
+            worker = DemodulatorWorker(history, factory,
+                                       lambda keep_waiting: open_audio_sink(target, audio_rate, keep_waiting),
+                                       self.metrics, rx_channel)
+            worker.start()
+            self.demodulators.append(worker)
+            self.demod_stop_button.setEnabled(True)
+            self.update_status(f"{mode} demodulation of RX{rx_channel + 1} ({offset / 1e3:+.1f} kHz) "
+                               f"to {target} at {audio_rate:.0f} Hz")
+            return worker
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Demodulation error: {str(e)}\n{tb}", "error")
+            return None
+
+    def stop_demodulation(self):
+        for worker in self.demodulators:
+            worker.stop()
+            self.update_status(f"Demodulation of RX{worker.channel + 1} stopped: "
+                               f"{worker.samples_out} audio samples, {worker.real_time_factor():.0f}x real time")
+        self.demodulators = []
+        self.demod_stop_button.setEnabled(False)
+
+    def on_roi_history_changed(self, frames):
+        # Bound the memory used by ROI histories; the newest rows are kept
+        for channel in self.channels:
+            with channel.updating():
+                channel.roi_measurements.set_history_frames(frames)
+        self.update_roi_memory_label()
+
+    def update_roi_memory_label(self):
+        total = sum(channel.roi_measurements.history_nbytes for channel in self.channels)
+        self.roi_memory_label.setText(f"{total / 1e6:.1f} MB")
+
+    def roi_frequency_range(self, roi, rx_channel):
+        # Absolute frequency range (Hz) covered by a spectrum line ROI or a waterfall rectangle ROI
+        if isinstance(roi, pg.InfiniteLine):
+            span = self.channel_sample_rate(rx_channel) * SPECTRUM_ROI_SPAN_FRACTION
+            center = roi.value() * 1e6
+            return center - span / 2, center + span / 2
+        freq_start = roi.pos().x() * 1e6
+        return freq_start, freq_start + roi.size().x() * 1e6
+
+    def update_roi_range(self, roi, rx_channel):
+        # (Re)register an ROI with the per-frame measurement set after it was added or moved
+        if rx_channel >= len(self.channels):
+            return
+        channel = self.channels[rx_channel]
+        with channel.updating():
+            channel.roi_measurements.set_roi(roi, *self.roi_frequency_range(roi, rx_channel))
+        self.update_roi_memory_label()
+
+    def copy_channel_results(self, channel):
+        # What update_channel_displays draws, copied, since the channel's worker overwrites the originals
+        spectrum = channel.spectrum
+        freq_bins = channel.freq_bins
+        if spectrum is None or freq_bins is None:
+            return None
+        statistics = channel.statistics
+        traces = {}
+        for name, enabled, values in (
+                ('max', self.max_hold_enabled, statistics.max_hold),
+                ('mean', self.averaging_enabled, statistics.mean_db),
+                ('min', self.min_hold_enabled, statistics.min_hold),
+                ('percentile', self.trace_percentile is not None,
+                 lambda: statistics.percentile(self.trace_percentile))):
+            trace = values() if enabled else None
+            if trace is not None:
+                traces[name] = np.array(trace)
+        persistence = None
+        if self.persistence_enabled:
+            persistence = (channel.persistence.image().copy(), channel.persistence.floor_db,
+                           channel.persistence.ceiling_db)
+        # to_db() decodes into a buffer of its own that only this thread uses
+        waterfall_data = channel.waterfall_history.to_db(WATERFALL_DISPLAY_ROWS)
+        return spectrum.copy(), freq_bins, traces, persistence, waterfall_data
+
+    def update_channel_displays(self, channel):
+        # Update displays for a specific RX channel from a consistent copy of its results
+        try:
+            results = read_consistent(channel, lambda: self.copy_channel_results(channel))
+        except InconsistentRead:
+            return  # Blocks kept landing during the copy; drawn on the next tick
+        if results is not None:
+            spectrum, freq_bins, traces, persistence, waterfall_data = results
+            render_start = time.perf_counter()
+            center_freq_hz = channel.radio.usrp_control.get_rx_freq(channel.rx_channel)  # in Hz
 
             # Convert freq_bins to MHz and shift by center frequency
             freq_bins_mhz = freq_bins / 1e6  # Convert Hz to MHz
@@ -737,32 +1267,30 @@ class MainWindow(QtWidgets.QMainWindow):
             freq_points = freq_bins_mhz + center_freq_mhz  # Final frequency points in MHz
 
             # Update spectrum plot
-            spectrum_curve = getattr(self, f'spectrum_curve_rx{rx_channel}')
-            spectrum_curve.setData(freq_points, spectrum)
-
-            # Update Max Hold curve if enabled
-            if self.max_hold_enabled:
-                max_hold_data = getattr(self, f'max_hold_data_rx{rx_channel}')
-                if max_hold_data is not None:
-                    max_hold_curve = getattr(self, f'max_hold_curve_rx{rx_channel}')
-                    max_hold_curve.setData(freq_points, max_hold_data)
-
-            # Update Averaging curve if enabled
-            if self.averaging_enabled:
-                avg_data = getattr(self, f'average_data_rx{rx_channel}')
-                if avg_data is not None:
-                    average_curve = getattr(self, f'average_curve_rx{rx_channel}')
-                    average_curve.setData(freq_points, avg_data)
+            channel.spectrum_curve.setData(freq_points, spectrum)
+            if channel.combined_curve is not None:
+                channel.combined_curve.setData(freq_points, spectrum)
+
+            # Update the enabled statistics curves
+            for name, trace in traces.items():
+                if len(trace) == len(freq_points):
+                    channel.trace_curves[name].setData(freq_points, trace)
+
+            if persistence is not None:
+                image, floor_db, ceiling_db = persistence
+                persistence_image = channel.persistence_image
+                persistence_image.setImage(image, autoLevels=False, levels=(0.0, 1.0))
+                persistence_image.setRect(QRectF(freq_points[0], floor_db, freq_points[-1] - freq_points[0],
+                                                 ceiling_db - floor_db))
 
             # Update waterfall plot
-            image_item = getattr(self, f'waterfall_plot_rx{rx_channel}')
-            waterfall_data = getattr(self, f'waterfall_data_rx{rx_channel}')
+            image_item = channel.waterfall_image
 
             # **Calculate Frequency and Time Scale for Waterfall**
             frequency_range = freq_points[-1] - freq_points[0]  # in MHz
             time_span = self.time_spin.value()  # in seconds
 
-            scale_x = frequency_range / self.fft_size  # MHz per pixel
+            scale_x = frequency_range / waterfall_data.shape[1]  # MHz per pixel
             scale_y = time_span / waterfall_data.shape[0]  # seconds per pixel
 
             # **Set pos and scale correctly**
@@ -791,15 +1319,22 @@ class MainWindow(QtWidgets.QMainWindow):
             image_item.setColorMap(pg.colormap.get(self.current_colormap))
 
             # **Update the time label**
-            time_label = getattr(self, f'time_label_rx{rx_channel}')
-            time_label.setText(f"Time: {datetime.now().strftime('%H:%M:%S')}")
+            channel.time_label.setText(f"Time: {datetime.now().strftime('%H:%M:%S')}")
+            self.metrics.observe('render_seconds', channel.index, time.perf_counter() - render_start)
+
+            if self.first_spectrum_time is None:
+                self.first_spectrum_time = time.perf_counter() - self.startup_time
+                self.metrics.set_gauge('time_to_first_spectrum_seconds', 'all', self.first_spectrum_time)
+                logging.info(f"Startup: first spectrum after {self.first_spectrum_time:.3f} s")
 
     def on_rx_channel_changed(self, channel_text):
         # Handle RX channel selection changes
-        channel = 0 if channel_text == "TX/RX" else 1
+        if not self.channels:
+            return
+        channel = self.channels[self.selected_rx_channel()]
         try:
-            freq = self.usrp_control.get_rx_freq(channel) / 1e6  # MHz
-            gain = self.usrp_control.get_rx_gain(channel)
+            freq = channel.radio.usrp_control.get_rx_freq(channel.rx_channel) / 1e6  # MHz
+            gain = channel.radio.usrp_control.get_rx_gain(channel.rx_channel)
             # Update both slider and input without triggering signals
             self.freq_slider.blockSignals(True)
             self.freq_input.blockSignals(True)
@@ -842,11 +1377,13 @@ class MainWindow(QtWidgets.QMainWindow):
             self.update_status(f"Frequency input error: {str(e)}\n{tb}", "error")
 
     def set_frequency(self, freq_mhz):
-        # Common method to set frequency
+        # Common method to set frequency; applied asynchronously by the device command worker
+        if not self.channels:
+            return
         try:
-            channel = 0 if self.rx_select.currentText() == "TX/RX" else 1
+            channel = self.selected_rx_channel()
             freq_hz = freq_mhz * 1e6  # Convert MHz to Hz
-            self.usrp_control.set_rx_freq(freq_hz, channel)
+            self.submit_device_command('freq', channel, freq_hz)
             self.freq_status.setText(f"Freq: {freq_mhz:.3f} MHz")
         except Exception as e:
             tb = traceback.format_exc()
@@ -854,37 +1391,354 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def on_gain_changed(self, gain):
         # Handle gain slider changes
+        if not self.channels:
+            return
         try:
-            channel = 0 if self.rx_select.currentText() == "TX/RX" else 1
-            self.usrp_control.set_rx_gain(gain, channel)
+            channel = self.selected_rx_channel()
+            self.submit_device_command('gain', channel, gain)
         except Exception as e:
             tb = traceback.format_exc()
             self.update_status(f"Gain error: {str(e)}\n{tb}", "error")
 
     def on_sample_rate_changed(self, rate_text):
         # Handle sample rate selection changes
+        if not self.channels:
+            return
         try:
             rate = float(rate_text) * 1e6  # Convert MSps to Sps
-            channel = 0 if self.rx_select.currentText() == "TX/RX" else 1
-            self.usrp_control.set_rx_rate(rate, channel)
-            self.rate_status.setText(f"Rate: {rate_text} MSps")
+            channel = self.selected_rx_channel()
+            self.submit_device_command('rate', channel, rate)
         except Exception as e:
             tb = traceback.format_exc()
             self.update_status(f"Sample rate error: {str(e)}\n{tb}", "error")
 
+    def apply_rate_plan(self):
+        # Queue the whole plan at once; the command worker applies it in a single pass
+        if not self.channels:
+            return
+        try:
+            # Every radio gets the same plan, made for the radio with the most channels
+            # since they share the master clock
+            channel_count = max(radio.channel_count for radio in self.radios)
+            plan = plan_rates(self.span_spin.value() * 1e6, self.rbw_spin.value(), channel_count,
+                              self.link_combo.currentText(), self.otw_format, self.window_combo.currentText())
+            for radio in self.radios:
+                radio.device_commands.submit('master_clock_rate', 0, plan.master_clock_rate)
+            for channel in self.channels:
+                self.submit_device_command('rate', channel.index, plan.sample_rate)
+                self.submit_device_command('bandwidth', channel.index, plan.analog_bandwidth)
+
+            rate_text = f"{plan.sample_rate / 1e6:g}"
+            self.rate_combo.blockSignals(True)
+            if self.rate_combo.findText(rate_text) < 0:
+                self.rate_combo.addItem(rate_text)
+            self.rate_combo.setCurrentText(rate_text)
+            self.rate_combo.blockSignals(False)
+            self.fft_combo.setCurrentText(str(plan.fft_size))
+
+            self.rate_plan_label.setText(plan.describe())
+            if plan.notes:
+                self.update_status("Rate plan: " + "; ".join(plan.notes), "warning")
+            else:
+                self.update_status(f"Rate plan: {plan.describe()}", "success")
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Rate plan error: {str(e)}\n{tb}", "error")
+
+    def on_device_command_applied(self, parameter, channel, actual):
+        # Runs on the GUI thread once the worker has applied a (coalesced) setting
+        if parameter == 'rate':
+            state = self.channels[channel]
+            state.radio.tx_rx.set_sample_rate(actual, state.rx_channel)
+            self.rate_status.setText(f"Rate: {actual / 1e6:g} MSps")
+            # Line ROIs span a fraction of the sample rate
+            for roi in self.channels[channel].rois:
+                self.update_roi_range(roi, channel)
+        elif parameter == 'freq':
+            self.freq_status.setText(f"Freq: {actual / 1e6:.3f} MHz")
+        elif parameter == 'master_clock_rate':
+            logging.info(f"Master clock rate is {actual / 1e6:.6f} MHz")
+
+    def on_device_command_failed(self, parameter, channel, message):
+        self.update_status(f"Failed to set RX{channel} {parameter}: {message}", "error")
+
     def on_colormap_changed(self, colormap):
         # Handle colormap selection changes
         self.current_colormap = colormap
         try:
-            for rx in range(2):
-                if self.tx_rx.rx2_available or rx == 0:
-                    image_item = getattr(self, f'waterfall_plot_rx{rx}', None)
-                    if image_item is not None:
-                        image_item.setColorMap(pg.colormap.get(colormap))
+            for channel in self.channels:
+                if channel.waterfall_image is not None:
+                    channel.waterfall_image.setColorMap(pg.colormap.get(colormap))
         except Exception as e:
             tb = traceback.format_exc()
             self.update_status(f"Colormap change error: {str(e)}\n{tb}", "error")
 
+    def on_waterfall_storage_changed(self, mode):
+        # Handle waterfall storage format changes (history is restarted)
+        self.waterfall_storage = mode
+        self.reallocate_waterfall_histories()
+
+    def on_iq_history_changed(self, megabytes):
+        # Resize the raw IQ rings (contents are discarded)
+        self.iq_history_mb = megabytes
+        if self.radios:
+            for radio in self.radios:
+                radio.tx_rx.set_iq_history_samples(self.iq_history_samples())
+            self.restart_burst_detection()
+            self.restart_triggers()
+            self.update_status(f"Raw IQ history: {megabytes} MB per channel", "info")
+
+    def on_stream_format_changed(self, _):
+        # Streamers can only be recreated while stopped; restart afterwards if RX was running
+        self.otw_format = self.otw_format_combo.currentText()
+        self.cpu_format = self.cpu_format_combo.currentText()
+        self.pipeline.set_source_spec(iq_block_spec(self.cpu_format))
+        if not self.radios:
+            return
+        was_receiving = self.is_receiving
+        try:
+            self.stop_recording()
+            self.stop_demodulation()
+            if was_receiving:
+                self.toggle_rx()
+            # The same memory budget holds twice as many sc16 samples
+            for radio in self.radios:
+                radio.tx_rx.iq_history_samples = self.iq_history_samples()
+                radio.tx_rx.set_stream_formats(self.otw_format, self.cpu_format)
+            self.restart_burst_detection()
+            self.restart_triggers()
+            if was_receiving:
+                self.toggle_rx()
+            self.update_status(f"Stream formats: wire {self.otw_format}, host {self.cpu_format}", "success")
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Failed to change stream formats: {str(e)}\n{tb}", "error")
+
+    def start_recording(self, rx_channel, path=None):
+        # Record raw IQ of one channel; the file extension follows the host format
+        iq_history = self.channel_iq_history(rx_channel)
+        if iq_history is None:
+            self.update_status(f"No IQ available for RX channel {rx_channel}", "error")
+            return None
+        if path is None:
+            default = datetime.now().strftime(f"rx{rx_channel + 1}_%Y%m%d_%H%M%S.{self.cpu_format}")
+            path, _ = QFileDialog.getSaveFileName(self, "Record raw IQ", default,
+                                                  f"Raw IQ (*.{self.cpu_format});;All files (*)")
+            if not path:
+                return None
+        try:
+            from core.recorder import RawRecorder
+            recorder = RawRecorder(iq_history, path, center_freq=self.channel_center_freq(rx_channel))
+            recorder.start()
+            self.recorders.append(recorder)
+            self.record_stop_button.setEnabled(True)
+            self.update_status(f"Recording RX{rx_channel + 1} ({self.cpu_format}) to {path}")
+            return recorder
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Recording error: {str(e)}\n{tb}", "error")
+            return None
+
+    def stop_recording(self):
+        for recorder in self.recorders:
+            recorder.stop()
+            self.update_status(f"Recorded {recorder.bytes_written / 1e6:.1f} MB to {recorder.path}"
+                               f" ({recorder.lost_samples} samples lost)")
+        self.recorders = []
+        self.record_stop_button.setEnabled(False)
+
+    def trigger_condition(self, channel):
+        # The selected trigger condition for one channel, or None when it cannot be built yet
+        from core.triggers import BandPowerTrigger, CfarTrigger, MaskTrigger
+        kind = self.trigger_combo.currentText()
+        threshold = self.trigger_threshold_spin.value()
+        if kind == 'Band Power':
+            return BandPowerTrigger(self.trigger_start_spin.value() * 1e6, self.trigger_end_spin.value() * 1e6,
+                                    threshold)
+        if kind == 'CFAR':
+            return CfarTrigger(threshold)
+        # Mask from the displayed trace: average if shown, else max hold, else the current spectrum
+        def read():
+            trace = None
+            if self.averaging_enabled:
+                trace = channel.statistics.mean_db()
+            if trace is None and self.max_hold_enabled:
+                trace = channel.statistics.max_hold()
+            if trace is None:
+                trace = channel.spectrum
+            return None if trace is None else np.array(trace), channel.freq_bins
+        try:
+            trace, freq_bins = read_consistent(channel, read)
+        except InconsistentRead:
+            return None
+        if trace is None or freq_bins is None or len(trace) != len(freq_bins):
+            return None
+        freq_points = freq_bins + self.channel_center_freq(channel.index)
+        return MaskTrigger(zip(freq_points, trace + threshold))
+
+    def arm_triggers(self, directory=None):
+        # Evaluate the trigger on every block of every channel and save bursts to `directory`
+        if not self.channels:
+            self.update_status("No RX channels to trigger on", "error")
+            return None
+        if directory is None:
+            directory = QFileDialog.getExistingDirectory(self, "Save triggered bursts to")
+            if not directory:
+                return None
+        try:
+            from core.triggers import BurstWriter, TriggerEngine
+            self.disarm_triggers()
+            writer = BurstWriter(directory, max_bytes_per_second=self.trigger_rate_spin.value() * 1e6,
+                                 metrics=self.metrics)
+            engines = {}
+            for channel in self.channels:
+                condition = self.trigger_condition(channel)
+                if condition is not None:
+                    engines[channel.index] = TriggerEngine(condition, self.trigger_pre_spin.value() / 1e3,
+                                                           self.trigger_post_spin.value() / 1e3,
+                                                           self.trigger_holdoff_spin.value())
+            armed = len(engines)
+            if not armed:
+                self.update_status("Trigger not armed: the mask needs a spectrum first", "error")
+                return None
+            history_note = self.fit_iq_history(BurstWriter.history_seconds(self.trigger_pre_spin.value() / 1e3,
+                                                                           self.trigger_post_spin.value() / 1e3))
+            writer.start()
+            self.burst_writer = writer
+            for index, engine in engines.items():
+                self.start_trigger(self.channels[index], engine)
+            self.trigger_disarm_button.setEnabled(True)
+            self.update_trigger_status()
+            self.update_status(f"{self.trigger_combo.currentText()} trigger armed on {armed} channel(s), "
+                               f"saving to {directory}{history_note}", "warning" if history_note else "info")
+            return writer
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Trigger error: {str(e)}\n{tb}", "error")
+            return None
+
+    def fit_iq_history(self, seconds):
+        # Grow the raw IQ rings to hold `seconds` at the fastest channel's rate; returns a note for the status
+        rate = max(self.channel_sample_rate(channel.index) for channel in self.channels)
+        needed_mb = int(np.ceil(seconds * rate * CPU_BYTES_PER_SAMPLE[self.cpu_format] / (1 << 20)))
+        if needed_mb <= self.iq_history_mb:
+            return ""
+        if needed_mb > self.iq_history_spin.maximum():
+            return (f" (warning: {seconds * 1e3:.0f} ms of raw IQ needs {needed_mb} MB per channel, more than the "
+                    f"IQ history allows; bursts will be cut short)")
+        self.iq_history_spin.setValue(needed_mb)  # Recreates the rings through on_iq_history_changed
+        return f" (raw IQ history grown to {needed_mb} MB per channel to hold {seconds * 1e3:.0f} ms)"
+
+    def start_trigger(self, channel, engine):
+        # Evaluate the engine on every frame of the channel's raw IQ, on a worker thread
+        from core.triggers import TriggerWorker
+        history = self.channel_iq_history(channel.index)
+        if history is None:
+            return
+        index = channel.index
+        channel.trigger = TriggerWorker(
+            history, engine, lambda: (self.channel_center_freq(index), self.fft_size, self.spectrum_settings()),
+            lambda event, center_freq: self.on_trigger_event(index, history, event, center_freq),
+            self.metrics, index)
+        channel.trigger.start()
+
+    def restart_triggers(self):
+        # After the IQ histories were replaced; the engines keep their holdoff and counts
+        for channel in self.channels:
+            if channel.trigger is not None:
+                channel.trigger.stop()
+                self.start_trigger(channel, channel.trigger.engine)
+
+    def disarm_triggers(self):
+        for channel in self.channels:
+            if channel.trigger is not None:
+                channel.trigger.stop()
+                channel.trigger = None
+        if self.burst_writer is not None:
+            self.burst_writer.stop()
+            self.update_trigger_status()
+            self.burst_writer = None
+        self.trigger_disarm_button.setEnabled(False)
+
+    def set_burst_detection(self, enabled):
+        # One detector thread per channel, reading the channel's raw IQ history
+        self.stop_burst_detection()
+        if not enabled:
+            return
+        try:
+            from core.burst_detector import BurstDetector, BurstDetectorWorker
+            threshold = self.burst_threshold_spin.value()
+            for channel in self.channels:
+                history = self.channel_iq_history(channel.index)
+                if history is None:
+                    continue
+                worker = BurstDetectorWorker(history, lambda rate: BurstDetector(rate, threshold_db=threshold),
+                                             self.metrics, channel.index)
+                worker.start()
+                self.burst_detectors.append(worker)
+            self.update_status(f"Burst detector running on {len(self.burst_detectors)} channel(s)")
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Burst detector error: {str(e)}\n{tb}", "error")
+
+    def stop_burst_detection(self):
+        for worker in self.burst_detectors:
+            worker.stop()
+        self.burst_detectors = []
+
+    def restart_burst_detection(self):
+        # After the IQ histories were replaced or the settings changed
+        if self.burst_detectors:
+            self.set_burst_detection(True)
+
+    def update_burst_status(self):
+        if not self.burst_detectors:
+            self.burst_status_label.setText("")
+            return
+        total = sum(worker.burst_count for worker in self.burst_detectors)
+        margin = min(worker.real_time_factor() for worker in self.burst_detectors)
+        text = f"Bursts: {total} | {margin:.1f}x real time"
+        latest = max((worker for worker in self.burst_detectors if worker.bursts),
+                     key=lambda worker: worker.bursts[-1].start_time, default=None)
+        if latest is not None:
+            burst = latest.bursts[-1]
+            text += (f"\nLast: {self.channels[latest.channel].label}, {burst.duration * 1e6:.1f} us, "
+                     f"{burst.peak_power_db:.1f} dBFS peak, {burst.freq_offset_hz / 1e3:+.1f} kHz, "
+                     f"{burst.bandwidth_hz / 1e3:.1f} kHz wide")
+        self.burst_status_label.setText(text)
+
+    def update_trigger_status(self):
+        writer = self.burst_writer
+        if writer is None:
+            return
+        fired = sum(channel.trigger.engine.fired for channel in self.channels if channel.trigger is not None)
+        self.trigger_status_label.setText(f"Fired: {fired} | Saved: {writer.bursts_written} | "
+                                          f"Dropped: {writer.dropped + writer.rate_limited}")
+
+    def iq_history_samples(self):
+        return self.iq_history_mb * (1 << 20) // CPU_BYTES_PER_SAMPLE[self.cpu_format]
+
+    def on_history_rows_changed(self, rows):
+        # Handle waterfall history length changes (history is restarted)
+        self.waterfall_history_rows = rows
+        self.reallocate_waterfall_histories()
+
+    def reallocate_waterfall_histories(self):
+        try:
+            total_bytes = 0
+            for channel in self.channels:
+                waterfall_history = WaterfallHistory(self.waterfall_history_rows, self.waterfall_bins(),
+                                                     mode=self.waterfall_storage,
+                                                     fill_db=self.ref_level_spin.value() - self.range_spin.value())
+                with channel.updating():
+                    channel.waterfall_history = waterfall_history
+                total_bytes += channel.waterfall_history.nbytes
+            self.update_status(f"Waterfall history: {self.waterfall_history_rows} rows, {self.waterfall_storage}, "
+                               f"{total_bytes / 1e6:.1f} MB", "info")
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Waterfall storage error: {str(e)}\n{tb}", "error")
+
     def on_ref_level_changed(self, level):
         # Handle reference level changes
         self.update_displays()
@@ -896,12 +1750,9 @@ class MainWindow(QtWidgets.QMainWindow):
     def on_time_span_changed(self, span):
         # Handle waterfall time span changes
         try:
-            plot_widget = None
             # Update all waterfall plots
-            for rx_channel in [0, 1]:
-                if not self.tx_rx.rx2_available and rx_channel == 1:
-                    continue
-                plot_widget = getattr(self, f'waterfall_plot_widget_rx{rx_channel}', None)
+            for channel in self.channels:
+                plot_widget = channel.waterfall_plot
                 if plot_widget is not None:
                     # Update Y-axis range
                     plot_widget.setYRange(0, span)
@@ -915,74 +1766,245 @@ class MainWindow(QtWidgets.QMainWindow):
     def on_fft_size_changed(self, size_text):
         # Handle FFT size changes
         try:
-            size = int(size_text)
-            self.fft_size = size
-            self.tx_rx.set_fft_size(size)
-            for rx in range(2):
-                if self.tx_rx.rx2_available or rx == 0:
-                    waterfall_data = getattr(self, f'waterfall_data_rx{rx}', None)
-                    if waterfall_data is not None:
-                        # Resize the waterfall data while preserving existing data
-                        new_waterfall_data = np.full((waterfall_data.shape[0], size),
-                                                     self.ref_level_spin.value() - self.range_spin.value())
-                        min_size = min(size, waterfall_data.shape[1])
-                        new_waterfall_data[:, :min_size] = waterfall_data[:, :min_size]
-                        setattr(self, f'waterfall_data_rx{rx}', new_waterfall_data)
-            self.update_status(f"FFT size set to {size}", "success")
+            self.requested_fft_size = int(size_text)
+            self.apply_processing_load()
+            self.update_status(f"FFT size set to {self.fft_size}", "success")
         except Exception as e:
             tb = traceback.format_exc()
             self.update_status(f"FFT size error: {str(e)}\n{tb}", "error")
 
+    def set_fft_size(self, size):
+        # Apply an effective FFT size to the receiver and the waterfall buffers
+        if size == self.fft_size:
+            return
+        self.fft_size = size
+        for radio in self.radios:
+            radio.tx_rx.set_fft_size(size)
+        for channel in self.channels:
+            if channel.waterfall_history is not None:
+                # Resize the waterfall history while preserving existing data
+                with channel.updating():
+                    channel.waterfall_history.resize(self.waterfall_bins())
+
+    def get_freq_bins(self, size, sample_rate_hz):
+        # fftshifted bin frequencies in Hz, computed once per (size, rate)
+        key = (size, sample_rate_hz)
+        freq_bins = self.freq_bins_cache.get(key)
+        if freq_bins is None:
+            freq_bins = np.fft.fftshift(np.fft.fftfreq(size, d=1.0 / sample_rate_hz))
+            if len(self.freq_bins_cache) >= 8:
+                self.freq_bins_cache.clear()
+            self.freq_bins_cache[key] = freq_bins
+        return freq_bins
+
+    def waterfall_bins(self):
+        # Number of waterfall columns for the current FFT size
+        return min(self.fft_size, WATERFALL_MAX_BINS)
+
+    def waterfall_freq_bins(self, freq_bins):
+        # Frequency of each waterfall column (centre of its group of FFT bins)
+        columns = min(len(freq_bins), WATERFALL_MAX_BINS)
+        if len(freq_bins) == columns:
+            return freq_bins
+        return freq_bins.reshape(columns, -1).mean(axis=1)
+
+    def on_fft_backend_changed(self, name):
+        # Handle FFT backend override
+        try:
+            self.fft_backend = get_backend(name)
+            self.update_status(f"FFT backend set to {name}", "success")
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"FFT backend error: {str(e)}\n{tb}", "error")
+
+    def on_frames_per_block_changed(self, frames):
+        for radio in self.radios:
+            radio.tx_rx.set_frames_per_block(frames)
+
     def on_frame_rate_changed(self, rate):
         # Handle frame rate changes
         try:
-            self.tx_rx.set_frame_rate(rate)
+            self.requested_frame_rate = rate
+            self.apply_processing_load()
         except Exception as e:
             tb = traceback.format_exc()
             self.update_status(f"Frame rate error: {str(e)}\n{tb}", "error")
 
+    def apply_processing_load(self):
+        # Derive the effective FFT size and update rate from the requested ones and the shedding level
+        level = self.load_shedder.level if self.load_shedding_enabled else 0
+        fft_size, frame_rate = LoadShedder.degraded_settings(level, self.requested_fft_size, self.requested_frame_rate)
+        self.set_fft_size(fft_size)
+        for radio in self.radios:
+            radio.tx_rx.set_frame_rate(frame_rate)
+        self.load_level_label.setText(f"Level: {level}")
+
+    def on_load_shedding_changed(self, state):
+        # Handle Auto Load Shedding toggle
+        self.load_shedding_enabled = bool(state)
+        self.load_shedder.reset()
+        self.apply_processing_load()
+
+    def check_stream_health(self):
+        # Surface overflow/gap counters and drive the load-shedding policy
+        if not self.radios:
+            return
+        try:
+            overflows = 0
+            lost_samples = 0
+            for radio in self.radios:
+                for health in radio.tx_rx.stream_health:
+                    overflows += health.overflows + health.sequence_errors
+                    lost_samples += health.gap_samples
+            self.overflow_status.setText(f"Overflows: {overflows} | Lost: {lost_samples}")
+            self.update_trigger_status()
+            self.update_burst_status()
+
+            # Dropped frames indicate that processing, not the USB link, is behind
+            overload_count = overflows + sum(self.metrics.get_counter('dropped_frames_total', rx)
+                                             for rx in self.available_rx_channels())
+            new_overloads = overload_count - self.last_overload_count
+            self.last_overload_count = overload_count
+
+            if self.load_shedding_enabled and self.is_receiving:
+                level = self.load_shedder.update(new_overloads)
+                if level is not None:
+                    self.apply_processing_load()
+                    self.update_status(f"Load shedding level {level}: FFT size {self.fft_size}, "
+                                       f"{self.radios[0].tx_rx.frame_rate} fps", "warning")
+        except Exception as e:
+            tb = traceback.format_exc()
+            self.update_status(f"Stream health error: {str(e)}\n{tb}", "error")
+
+    def on_stream_gap(self, rx_channel, gap_samples):
+        # Mark the discontinuity in the waterfall so rows before and after a gap are not read as contiguous
+        channel = self.channels[rx_channel]
+        if channel.waterfall_history is None:
+            return
+        with channel.updating():
+            channel.waterfall_history.fill_db = self.ref_level_spin.value() - self.range_spin.value()
+            channel.waterfall_history.append_fill(time.time())
+
+    def configure_spectrum_statistics(self):
+        # Keep only the statistics that have a visible trace
+        statistics = [name for name, enabled in (('max', self.max_hold_enabled), ('min', self.min_hold_enabled),
+                                                 ('mean', self.averaging_enabled),
+                                                 ('percentile', self.trace_percentile is not None)) if enabled]
+        for channel in self.channels:
+            with channel.updating():
+                channel.statistics.averaging_factor = self.averaging_factor
+                channel.statistics.set_statistics(statistics)
+            for name, curve in channel.trace_curves.items():
+                curve.setVisible(name in statistics)
+                if name not in statistics:
+                    curve.clear()
+
     def on_max_hold_changed(self, state):
-        # Handle Max Hold toggle
+        # Handle Max Hold toggle; disabling it discards the held trace
         self.max_hold_enabled = bool(state)
-        # Enable or disable the Max Hold curve for all available RX channels
-        for rx_channel in [0, 1]:
-            if not self.tx_rx.rx2_available and rx_channel == 1:
-                continue  # Skip RX2 if not available
-            max_hold_curve = getattr(self, f'max_hold_curve_rx{rx_channel}', None)
-            if max_hold_curve is not None:
-                max_hold_curve.setVisible(self.max_hold_enabled)
-            if not self.max_hold_enabled:
-                # Clear Max Hold data when disabled
-                setattr(self, f'max_hold_data_rx{rx_channel}', None)
-                # Optionally, clear the Max Hold curve
-                if max_hold_curve is not None:
-                    max_hold_curve.clear()
+        self.configure_spectrum_statistics()
+
+    def on_min_hold_changed(self, state):
+        self.min_hold_enabled = bool(state)
+        self.configure_spectrum_statistics()
 
     def on_averaging_changed(self, state):
         # Handle Averaging toggle
         self.averaging_enabled = bool(state)
-        self.averaging_spin.setEnabled(self.averaging_enabled)
-        # Enable or disable the Averaging curve for all available RX channels
-        for rx_channel in [0, 1]:
-            if not self.tx_rx.rx2_available and rx_channel == 1:
-                continue  # Skip RX2 if not available
-            average_curve = getattr(self, f'average_curve_rx{rx_channel}', None)
-            if average_curve is not None:
-                average_curve.setVisible(self.averaging_enabled)
-            if not self.averaging_enabled:
-                # Clear Averaging data when disabled
-                setattr(self, f'average_data_rx{rx_channel}', None)
-                # Optionally, clear the Averaging curve
-                if average_curve is not None:
-                    average_curve.clear()
+        self.averaging_spin.setEnabled(self.averaging_enabled and self.average_count is None)
+        self.configure_spectrum_statistics()
 
     def on_averaging_factor_changed(self, factor):
         # Handle Averaging Factor changes
         self.averaging_factor = factor
+        self.configure_spectrum_statistics()
+
+    def on_average_count_changed(self, count):
+        # 0 selects exponential averaging; the average restarts either way
+        self.average_count = count or None
+        self.averaging_spin.setEnabled(self.averaging_enabled and self.average_count is None)
+        for channel in self.channels:
+            with channel.updating():
+                channel.statistics.average_count = self.average_count
+                channel.statistics.clear_mean()
+
+    def on_percentile_changed(self, text):
+        self.trace_percentile = None if text == 'Off' else float(text)
+        self.configure_spectrum_statistics()
+
+    def on_persistence_changed(self, state):
+        # The density restarts whenever it is switched on
+        self.persistence_enabled = bool(state)
+        self.persistence_stage.enabled = self.persistence_enabled
+        for channel in self.channels:
+            with channel.updating():
+                channel.persistence.clear()
+            if channel.persistence_image is not None:
+                channel.persistence_image.setVisible(self.persistence_enabled)
+
+    def on_persistence_fade_changed(self, half_life):
+        # A half-life of 0 keeps every spectrum
+        for channel in self.channels:
+            with channel.updating():
+                channel.persistence.half_life = half_life
 
     def on_window_changed(self, window_type):
-        # Handle Window Function changes (placeholder for future implementation)
-        pass
+        # Looked up once here rather than read from the combo box on every block
+        self.window_name = window_type
+
+    def show_diagnostics(self):
+        # Open (or raise) the non-modal diagnostics panel
+        if self.diagnostics_window is None:
+            from gui.diagnostics_window import DiagnosticsWindow
+            self.diagnostics_window = DiagnosticsWindow(self.metrics, self)
+        self.diagnostics_window.show()
+        self.diagnostics_window.raise_()
+
+    def on_metrics_server_changed(self, state):
+        # Start or stop the local Prometheus endpoint
+        try:
+            if state and self.metrics_server is None:
+                from core.metrics import MetricsServer
+                self.metrics_server = MetricsServer(self.metrics, port=self.metrics_port_spin.value())
+                self.metrics_server.start()
+                self.metrics_port_spin.setEnabled(False)
+                self.update_status(f"Metrics served on http://127.0.0.1:{self.metrics_server.port}/metrics", "success")
+            elif not state and self.metrics_server is not None:
+                self.metrics_server.stop()
+                self.metrics_server = None
+                self.metrics_port_spin.setEnabled(True)
+                self.update_status("Metrics endpoint stopped", "info")
+        except Exception as e:
+            self.metrics_server = None
+            self.metrics_server_check.blockSignals(True)
+            self.metrics_server_check.setChecked(False)
+            self.metrics_server_check.blockSignals(False)
+            tb = traceback.format_exc()
+            self.update_status(f"Metrics endpoint error: {str(e)}\n{tb}", "error")
+
+    def on_control_socket_changed(self, state):
+        # Start or stop the JSON-RPC control server on its Unix socket
+        try:
+            if state and self.control_server is None:
+                from core.control_server import ControlServer
+                from gui.control_api import ControlApi, GuiInvoker
+                self.gui_invoker = GuiInvoker(self)
+                api = ControlApi(self)
+                self.control_server = ControlServer(api.methods(), self.control_socket_path, api.GUI_METHODS,
+                                                    self.gui_invoker.invoke)
+                self.control_server.start()
+                self.update_status(f"Control socket at {self.control_server.path}", "success")
+            elif not state and self.control_server is not None:
+                self.control_server.stop()
+                self.control_server = None
+                self.update_status("Control socket stopped", "info")
+        except Exception as e:
+            self.control_server = None
+            self.control_socket_check.blockSignals(True)
+            self.control_socket_check.setChecked(False)
+            self.control_socket_check.blockSignals(False)
+            tb = traceback.format_exc()
+            self.update_status(f"Control socket error: {str(e)}\n{tb}", "error")
 
     def on_calibration_changed(self, calibration_db):
         # Handle Calibration changes
@@ -1005,29 +2027,18 @@ class MainWindow(QtWidgets.QMainWindow):
         # Handle application closure
         try:
             self.update_timer.stop()
-            if hasattr(self, 'tx_rx'):
-                self.tx_rx.stop_receiving()
+            for radio in self.radios:
+                radio.tx_rx.stop_receiving()
             event.accept()
         except Exception as e:
             print(f"Error during shutdown: {str(e)}")
             event.accept()
 
-    def set_frequency(self, freq_mhz):
-        # Common method to set frequency
-        try:
-            channel = 0 if self.rx_select.currentText() == "TX/RX" else 1
-            freq_hz = freq_mhz * 1e6  # Convert MHz to Hz
-            self.usrp_control.set_rx_freq(freq_hz, channel)
-            self.freq_status.setText(f"Freq: {freq_mhz:.3f} MHz")
-        except Exception as e:
-            tb = traceback.format_exc()
-            self.update_status(f"Frequency setting error: {str(e)}\n{tb}", "error")
-
     def on_spectrum_clicked(self, event, rx_channel):
         # Handle right-click on the spectrum plot to add ROI
         if event.button() == Qt.RightButton:
             pos = event.scenePos()
-            plot_widget = getattr(self, f'spectrum_plot_rx{rx_channel}', None)
+            plot_widget = self.channels[rx_channel].spectrum_plot
             vb = plot_widget.getViewBox()
             if plot_widget is not None:
                 mouse_point = vb.mapSceneToView(pos)
@@ -1052,10 +2063,11 @@ class MainWindow(QtWidgets.QMainWindow):
         roi = pg.InfiniteLine(pos=freq, angle=90, pen=pg.mkPen(color='magenta', width=2), movable=True)
 
         # Store ROI in the dictionary
-        self.rois[rx_channel].append(roi)
+        self.channels[rx_channel].rois.append(roi)
+        self.update_roi_range(roi, rx_channel)
 
         # Add ROI to the plot
-        plot_widget = getattr(self, f'spectrum_plot_rx{rx_channel}', None)
+        plot_widget = self.channels[rx_channel].spectrum_plot
         if plot_widget is not None:
             plot_widget.addItem(roi)
 
@@ -1065,8 +2077,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
     # Spectrum ROI handlers
     def on_spectrum_roi_changed(self, roi, rx_channel):
-        # Handle ROI position changes (optional: update any related data)
-        pass  # Placeholder for any real-time updates
+        # Handle ROI position changes; the bin ranges are recompiled on the next frame
+        self.update_roi_range(roi, rx_channel)
 
     def on_spectrum_roi_clicked(self, roi, rx_channel):
         # Handle ROI click to open analysis options
@@ -1082,59 +2094,59 @@ class MainWindow(QtWidgets.QMainWindow):
             analyze_action.triggered.connect(lambda: self.analyze_spectrum_roi(roi, rx_channel))
             remove_action = QAction("Remove ROI", self)
             remove_action.triggered.connect(lambda: self.remove_spectrum_roi(roi, rx_channel))
+            constellation_action = QAction("Show Constellation", self)
+            constellation_action.triggered.connect(lambda: self.open_constellation(rx_channel, roi))
+            menu.addAction(constellation_action)
+            demod_action = QAction(f"Demodulate ({self.demod_mode_combo.currentText()})...", self)
+            demod_action.triggered.connect(lambda: self.start_demodulation(rx_channel, roi))
+            menu.addAction(demod_action)
             menu.addAction(analyze_action)
             menu.addAction(remove_action)
             menu.exec_(QtWidgets.QCursor.pos())
 
     def analyze_spectrum_roi(self, roi, rx_channel):
-        # Redefine to analyze spectrum ROI
-        # Extract ROI boundaries
-        freq_position = roi.value()  # Current frequency position of the line
-        bandwidth = self.fft_size * 0.05  # Define bandwidth around the line (e.g., ± bandwidth)
-
-        freq_start = freq_position - bandwidth / 2
-        freq_end = freq_position + bandwidth / 2
-
-        # Extract corresponding spectrum data within ROI
-        spectrum = getattr(self, f'current_spectrum_rx{rx_channel}', None)
-        freq_bins = getattr(self, f'current_freq_bins_rx{rx_channel}', None)
-        if spectrum is None or freq_bins is None:
+        # Show the live measurements of a spectrum ROI
+        if self.channels[rx_channel].spectrum is None:
             self.update_status(f"No spectrum data for RX channel {rx_channel}", "error")
             return
 
-        # Map frequency to indices
-        freq_indices = np.where((freq_bins / 1e6 >= freq_start) & (freq_bins / 1e6 <= freq_end))[0]
-
-        if len(freq_indices) == 0:
+        freq_start, freq_end = self.roi_frequency_range(roi, rx_channel)
+        with self.channels[rx_channel].lock:
+            measurement = self.channels[rx_channel].roi_measurements.result(roi)
+        if measurement is None or np.isnan(measurement['peak_db']):
             self.update_status("ROI does not overlap with data.", "warning")
             return
 
-        # Extract the subset of data within ROI
-        roi_data = spectrum[freq_indices]
-
-        # Perform analysis (example: calculate peak power and frequency)
-        peak_power = np.max(roi_data)
-        peak_index = np.argmax(roi_data)
-        peak_freq = freq_bins[freq_indices][peak_index] / 1e6  # Convert to MHz
-
         # Prepare ROI information
         roi_info = {
-            'freq_start': freq_start,
-            'freq_end': freq_end,
-            'peak_power': peak_power,
-            'peak_freq': peak_freq
+            'freq_start': freq_start / 1e6,
+            'freq_end': freq_end / 1e6,
+            'peak_power': measurement['peak_db'],
+            'peak_freq': measurement['peak_freq_hz'] / 1e6,
+            'channel_power': measurement['channel_power_db'],
+            'obw': measurement['obw_hz'] / 1e3,
+            'snr': measurement['snr_db'],
         }
 
         # Open Analysis Window
-        analysis_window = SpectrumAnalysisWindow(roi_info, self)
-        analysis_window.exec_()
+        # Non-modal so the live plots can be watched next to the main display
+        from gui.analysis_windows import SpectrumAnalysisWindow
+        analysis_window = SpectrumAnalysisWindow(roi_info, self, history=self.channels[rx_channel].roi_measurements.history(roi))
+        analysis_window.setAttribute(Qt.WA_DeleteOnClose)
+        analysis_window.show()
 
     def remove_spectrum_roi(self, roi, rx_channel):
         # Handle ROI removal
-        if roi in self.rois[rx_channel]:
-            self.rois[rx_channel].remove(roi)
+        if roi in self.channels[rx_channel].rois:
+            self.channels[rx_channel].rois.remove(roi)
+        with self.channels[rx_channel].updating():
+            self.channels[rx_channel].roi_measurements.remove_roi(roi)
+        self.update_roi_memory_label()
+        plot_widget = self.channels[rx_channel].waterfall_plot
+        if plot_widget is not None:
+            plot_widget.removeItem(roi)
         # Remove ROI from the plot
-        plot_widget = getattr(self, f'spectrum_plot_rx{rx_channel}', None)
+        plot_widget = self.channels[rx_channel].spectrum_plot
         if plot_widget is not None:
             plot_widget.removeItem(roi)
 
@@ -1147,7 +2159,7 @@ class MainWindow(QtWidgets.QMainWindow):
         # Handle right-click on the waterfall plot to add ROI
         if event.button() == Qt.RightButton:
             pos = event.scenePos()
-            plot_widget = getattr(self, f'waterfall_plot_widget_rx{rx_channel}', None)
+            plot_widget = self.channels[rx_channel].waterfall_plot
             vb = plot_widget.getViewBox()
             if plot_widget is not None:
                 mouse_point = vb.mapSceneToView(pos)
@@ -1177,26 +2189,30 @@ class MainWindow(QtWidgets.QMainWindow):
         roi.setZValue(10)  # Ensure ROI is on top
 
         # Store ROI in the dictionary
-        self.rois[rx_channel].append(roi)
+        self.channels[rx_channel].rois.append(roi)
+        self.update_roi_range(roi, rx_channel)
 
         # Add ROI to the plot
-        plot_widget = getattr(self, f'waterfall_plot_widget_rx{rx_channel}', None)
+        plot_widget = self.channels[rx_channel].waterfall_plot
         if plot_widget is not None:
             plot_widget.addItem(roi)
 
         # Connect signals
         roi.sigRegionChanged.connect(lambda: self.on_roi_changed(roi, rx_channel))
-        roi.sigRemoved.connect(lambda: self.on_roi_removed(roi, rx_channel))
+        roi.sigRemoveRequested.connect(lambda: self.on_roi_removed(roi, rx_channel))
         roi.sigClicked.connect(lambda: self.on_roi_clicked(roi, rx_channel))
 
     def on_roi_changed(self, roi, rx_channel):
-        # Handle ROI region changes (optional: update any related data)
-        pass  # Placeholder for any real-time updates
+        # Handle ROI region changes; the bin ranges are recompiled on the next frame
+        self.update_roi_range(roi, rx_channel)
 
     def on_roi_removed(self, roi, rx_channel):
         # Handle ROI removal
-        if roi in self.rois[rx_channel]:
-            self.rois[rx_channel].remove(roi)
+        if roi in self.channels[rx_channel].rois:
+            self.channels[rx_channel].rois.remove(roi)
+        with self.channels[rx_channel].updating():
+            self.channels[rx_channel].roi_measurements.remove_roi(roi)
+        self.update_roi_memory_label()
 
     def on_roi_clicked(self, roi, rx_channel):
         # Handle ROI click to open analysis options or snapshot pop-up
@@ -1213,7 +2229,13 @@ class MainWindow(QtWidgets.QMainWindow):
             analyze_action = QAction("Analyze ROI", self)
             analyze_action.triggered.connect(lambda: self.analyze_roi(roi, rx_channel))
             remove_action = QAction("Remove ROI", self)
-            remove_action.triggered.connect(lambda: roi.remove())
+            remove_action.triggered.connect(lambda: self.on_roi_removed(roi, rx_channel))
+            constellation_action = QAction("Show Constellation", self)
+            constellation_action.triggered.connect(lambda: self.open_constellation(rx_channel, roi))
+            menu.addAction(constellation_action)
+            demod_action = QAction(f"Demodulate ({self.demod_mode_combo.currentText()})...", self)
+            demod_action.triggered.connect(lambda: self.start_demodulation(rx_channel, roi))
+            menu.addAction(demod_action)
             menu.addAction(analyze_action)
             menu.addAction(remove_action)
             menu.exec_(QtWidgets.QCursor.pos())
@@ -1228,20 +2250,25 @@ class MainWindow(QtWidgets.QMainWindow):
         time_end = roi_pos.y() + roi_size.y()
 
         # Extract corresponding waterfall data within ROI
-        waterfall_data = getattr(self, f'waterfall_data_rx{rx_channel}', None)
-        if waterfall_data is None:
+        waterfall_history = self.channels[rx_channel].waterfall_history
+        if waterfall_history is None:
             self.update_status(f"No waterfall data for RX channel {rx_channel}", "error")
             return
+        with self.channels[rx_channel].lock:
+            waterfall_data = waterfall_history.to_db(WATERFALL_DISPLAY_ROWS).copy()
+            row_timestamps = waterfall_history.row_timestamps(WATERFALL_DISPLAY_ROWS)
 
-        freq_bins = getattr(self, f'current_freq_bins_rx{rx_channel}', None)
+        freq_bins = self.channels[rx_channel].freq_bins
         if freq_bins is None:
             self.update_status(f"No frequency bins data for RX channel {rx_channel}", "error")
             return
+        center_freq_hz = self.channel_center_freq(rx_channel)
+        freq_bins = self.waterfall_freq_bins(freq_bins) + center_freq_hz  # Absolute Hz, like the ROI
 
         # Map frequency and time to indices
         freq_indices = np.where((freq_bins / 1e6 >= freq_start) & (freq_bins / 1e6 <= freq_end))[0]
-        time_indices = np.where((np.linspace(0, self.time_spin.value(), waterfall_data.shape[0]) >= time_start) &
-                                (np.linspace(0, self.time_spin.value(), waterfall_data.shape[0]) <= time_end))[0]
+        row_times = np.linspace(0, self.time_spin.value(), waterfall_data.shape[0])
+        time_indices = np.where((row_times >= time_start) & (row_times <= time_end))[0]
 
         if len(freq_indices) == 0 or len(time_indices) == 0:
             self.update_status("ROI does not overlap with data.", "warning")
@@ -1253,12 +2280,30 @@ class MainWindow(QtWidgets.QMainWindow):
         snapshot_freq_end = freq_bins[freq_indices][-1] / 1e6  # MHz
         snapshot_time_span = time_end - time_start  # seconds
 
+        # Raw IQ recorded while the selected rows were captured, for re-processing
+        iq_clip = None
+        iq_history = self.channel_iq_history(rx_channel)
+        if iq_history is not None:
+            # Rows are stamped when processed, just after their frame's last sample arrived
+            timestamps = row_timestamps[time_indices]
+            timestamps = timestamps[timestamps > 0]
+            if len(timestamps):
+                frame_seconds = self.fft_size / self.channel_sample_rate(rx_channel)
+                iq_clip = iq_history.extract(timestamps[0] - frame_seconds, timestamps[-1])
+
         # Open Waterfall Clip Window
+        from gui.analysis_windows import WaterfallClipWindow
         snapshot_window = WaterfallClipWindow(
             snapshot_data=snapshot_data,
             freq_range=(snapshot_freq_start, snapshot_freq_end),
             time_span=snapshot_time_span,
-            parent=self
+            parent=self,
+            iq_clip=iq_clip,
+            center_freq=center_freq_hz,
+            fft_size=self.fft_size,
+            window_name=self.window_combo.currentText(),
+            fft_backend=get_backend(self.fft_backend.name),
+            offset_db=self.calibration_db
         )
         snapshot_window.exec_()
 
@@ -1274,15 +2319,18 @@ class MainWindow(QtWidgets.QMainWindow):
             time_end = roi_pos.y() + roi_size.y()
 
             # Extract corresponding waterfall data within ROI
-            waterfall_data = getattr(self, f'waterfall_data_rx{rx_channel}', None)
-            if waterfall_data is None:
+            waterfall_history = self.channels[rx_channel].waterfall_history
+            if waterfall_history is None:
                 self.update_status(f"No waterfall data for RX channel {rx_channel}", "error")
                 return
+            with self.channels[rx_channel].lock:
+                waterfall_data = waterfall_history.to_db(WATERFALL_DISPLAY_ROWS).copy()
 
-            freq_bins = getattr(self, f'current_freq_bins_rx{rx_channel}', None)
+            freq_bins = self.channels[rx_channel].freq_bins
             if freq_bins is None:
                 self.update_status(f"No frequency bins data for RX channel {rx_channel}", "error")
                 return
+            freq_bins = self.waterfall_freq_bins(freq_bins) + self.channel_center_freq(rx_channel)  # Absolute Hz, like the ROI
 
             # Map frequency and time to indices
             freq_indices = np.where((freq_bins / 1e6 >= freq_start) & (freq_bins / 1e6 <= freq_end))[0]
@@ -1309,8 +2357,10 @@ class MainWindow(QtWidgets.QMainWindow):
             }
 
             # Open Analysis Window
-            analysis_window = AnalysisWindow(roi_info, self)
-            analysis_window.exec_()
+            from gui.analysis_windows import AnalysisWindow
+            analysis_window = AnalysisWindow(roi_info, self, history=self.channels[rx_channel].roi_measurements.history(roi))
+            analysis_window.setAttribute(Qt.WA_DeleteOnClose)
+            analysis_window.show()
         except Exception as e:
             tb = traceback.format_exc()
             self.update_status(f"Error analyzing ROI: {str(e)}\n{tb}", "error")
@@ -1330,8 +2380,21 @@ class MainWindow(QtWidgets.QMainWindow):
         # Handle application closure
         try:
             self.update_timer.stop()
-            if hasattr(self, 'tx_rx'):
-                self.tx_rx.stop_receiving()
+            self.health_timer.stop()
+            self.stop_demodulation()
+            self.stop_recording()
+            self.disarm_triggers()
+            self.stop_burst_detection()
+            for radio in self.radios:
+                radio.device_commands.stop()
+                radio.tx_rx.stop_receiving()
+            for channel in self.channels:
+                channel.worker.stop()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            if self.control_server is not None:
+                self.control_server.stop()
+            self.pipeline.close()
             event.accept()
         except Exception as e:
             print(f"Error during shutdown: {str(e)}")
@@ -1,4 +1,10 @@
 # main.py
+import time
+
+# Taken before the heavy imports so startup timings cover the whole launch
+STARTUP_TIME = time.perf_counter()
+
+import argparse
 import sys
 from PyQt5.QtWidgets import QApplication
 from gui.main_window import MainWindow
@@ -11,8 +17,40 @@ def setup_logging():
         datefmt='%Y-%m-%d %H:%M:%S'
     )
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="B205mini spectrum analyzer")
+    parser.add_argument('--autostart', action='store_true',
+                        help="Start receiving as soon as the device is ready")
+    parser.add_argument('--otw', choices=('sc16', 'sc8'), default='sc16',
+                        help="Over-the-wire sample format (sc8 halves the USB load)")
+    parser.add_argument('--cpu', choices=('fc32', 'sc16'), default='fc32',
+                        help="Host sample format (sc16 defers float conversion to the DSP stage)")
+    parser.add_argument('--serial', action='append', default=[],
+                        help="Serial of a USRP to open; repeat for several radios (default: the first found)")
+    parser.add_argument('--simulate', type=int, default=0, metavar='N',
+                        help="Add N simulated radios (serials sim0, sim1, ...)")
+    parser.add_argument('--control-socket', nargs='?', const='', default=None, metavar='PATH',
+                        help="Serve the JSON-RPC control API on a Unix socket (default path under $XDG_RUNTIME_DIR)")
+    parser.add_argument('--list-devices', action='store_true',
+                        help="Print the attached USRPs and exit")
+    args, _ = parser.parse_known_args(argv)  # Leave Qt's own options alone
+    args.devices = args.serial + [f"sim{n}" for n in range(args.simulate)]
+    return args
+
+def list_devices():
+    from core.usrp_control import find_devices
+    devices = find_devices()
+    if not devices:
+        print("No USRP found")
+    for device in devices:
+        print(", ".join(f"{key}={value}" for key, value in device.items()))
+
 def main():
     setup_logging()
+    args = parse_args(sys.argv[1:])
+    if args.list_devices:
+        list_devices()
+        return 0
     app = QApplication(sys.argv)
     
     # Set dark theme
@@ -21,7 +59,8 @@ def main():
     app.setPalette(dark_palette)
     
     # Create and show main window
-    window = MainWindow()
+    window = MainWindow(startup_time=STARTUP_TIME, autostart=args.autostart, otw_format=args.otw, cpu_format=args.cpu,
+                        devices=args.devices, control_socket=args.control_socket)
     window.show()
     return app.exec_()
 
@@ -0,0 +1,59 @@
+# check_stream_formats.py
+"""Compare receive throughput of the wire/host format combinations on a connected device.
+
+For each combination and sample rate the stream runs for a few seconds, and the
+script reports the delivered rate, overflows, the USB payload rate and the
+host CPU time per second of signal:
+
+    python -m tests.check_stream_formats --rates 8e6 16e6 32e6 --seconds 3
+"""
+import argparse
+import time
+
+import uhd
+from uhd import libpyuhd
+
+from core.sample_formats import CPU_FORMATS, OTW_FORMATS, allocate, link_bytes_per_second, recv_view
+
+
+def measure(usrp, otw_format, cpu_format, rate, seconds, channel=0):
+    usrp.set_rx_rate(rate, channel)
+    stream_args = libpyuhd.usrp.stream_args(cpu_format, otw_format)
+    stream_args.channels = [channel]
+    streamer = usrp.get_rx_stream(stream_args)
+    buffer = allocate(streamer.get_max_num_samps(), cpu_format)
+    view = recv_view(buffer)
+    metadata = libpyuhd.types.rx_metadata()
+
+    cmd = libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.start_cont)
+    cmd.stream_now = True
+    streamer.issue_stream_cmd(cmd)
+    received = overflows = 0
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    while time.perf_counter() - wall_start < seconds:
+        received += streamer.recv(view, metadata)
+        if metadata.error_code == libpyuhd.types.rx_metadata_error_code.overflow:
+            overflows += 1
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    streamer.issue_stream_cmd(libpyuhd.types.stream_cmd(libpyuhd.types.stream_mode.stop_cont))
+    return received / wall, overflows, cpu / (received / rate) if received else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rates', type=float, nargs='+', default=[8e6, 16e6, 32e6])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    usrp = uhd.usrp.MultiUSRP()
+    print(f"{'otw':>5} {'cpu':>5} {'rate MS/s':>10} {'got MS/s':>9} {'overflows':>9} {'USB MB/s':>9} {'CPU s/s':>8}")
+    for rate in args.rates:
+        for otw_format in OTW_FORMATS:
+            for cpu_format in CPU_FORMATS:
+                got, overflows, cpu_per_second = measure(usrp, otw_format, cpu_format, rate, args.seconds)
+                print(f"{otw_format:>5} {cpu_format:>5} {rate / 1e6:>10.2f} {got / 1e6:>9.2f} {overflows:>9} "
+                      f"{link_bytes_per_second(got, otw_format) / 1e6:>9.1f} {cpu_per_second:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+# test_buffer_pool.py
+import numpy as np
+
+from core.buffer_pool import BufferPool
+
+
+def test_blocks_are_reused_and_exhaustion_is_counted():
+    pool = BufferPool(2, frames=4, fft_size=16, cpu_format='sc16')
+    first, second = pool.acquire(), pool.acquire()
+    assert first.shape == (4, 16, 2) and first.dtype == np.int16
+    assert pool.acquire() is None and pool.exhausted == 1
+
+    # Filling through the flat view writes the block itself
+    BufferPool.samples(first)[:3] = 7
+    assert (first[0, :3] == 7).all()
+
+    pool.release(first)
+    pool.release(first)  # Double release is ignored
+    pool.release(np.zeros((4, 16, 2), dtype=np.int16))  # So is a block from elsewhere
+    assert pool.available() == 1
+    assert pool.acquire() is first
+    pool.release(second)
+    assert pool.nbytes == 2 * 4 * 16 * 4
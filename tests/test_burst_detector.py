@@ -0,0 +1,71 @@
+# test_burst_detector.py
+import numpy as np
+from scipy import signal
+
+from core.burst_detector import BurstDetector
+
+RATE = 10e6
+
+
+def noise(count, seed=1, level=1e-3):
+    rng = np.random.default_rng(seed)
+    return (level * (rng.standard_normal(count) + 1j * rng.standard_normal(count))).astype(np.complex64)
+
+
+def run(detector, samples, block):
+    bursts = []
+    for first in range(0, len(samples), block):
+        bursts += detector.process(samples[first:first + block], first)
+    return bursts
+
+
+def test_short_tone_burst_is_timed_and_measured_across_blocks():
+    samples = noise(200000)
+    start, length = 65000, 300  # 30 us, straddling the block boundary at 65536
+    t = np.arange(length) / RATE
+    samples[start:start + length] += (0.1 * np.exp(2j * np.pi * 1.5e6 * t)).astype(np.complex64)
+
+    bursts = run(BurstDetector(RATE), samples, 65536)
+    assert len(bursts) == 1
+    burst = bursts[0]
+    assert (burst.start, burst.stop) == (start, start + length)
+    assert abs(burst.duration - 30e-6) < 1e-9
+    assert abs(burst.peak_power_db - -20.0) < 0.5
+    assert abs(burst.freq_offset_hz - 1.5e6) < 10e3
+    assert burst.bandwidth_hz < 100e3
+
+
+def test_bandwidth_of_a_noise_burst_and_no_false_alarms():
+    quiet = noise(1 << 20)
+    assert run(BurstDetector(RATE), quiet, 1 << 16) == []
+
+    # 1 MHz wide noise burst, 400 us long
+    taps = signal.firwin(255, 0.5e6, fs=RATE)
+    wideband = signal.lfilter(taps, 1.0, noise(8000, seed=2, level=0.3)).astype(np.complex64)[-4000:]
+    samples = quiet.copy()
+    samples[300000:304000] += wideband
+    bursts = run(BurstDetector(RATE), samples, 1 << 16)
+    assert len(bursts) == 1
+    assert abs(bursts[0].start - 300000) < 50 and abs(bursts[0].stop - 304000) < 50
+    assert 0.7e6 < bursts[0].bandwidth_hz < 1.3e6
+    assert abs(bursts[0].freq_offset_hz) < 50e3
+
+
+def test_skipped_samples_restart_detection():
+    detector = BurstDetector(RATE)
+    samples = noise(4096)
+    samples[4000:] += 0.1
+    assert detector.process(samples, 0) == [] and detector.open is not None
+    # A hole in the sequence drops the open burst instead of stretching it over the gap
+    assert detector.process(noise(4096, seed=3), 10000) == []
+    assert detector.open is None
+
+
+def test_blockwise_envelope_matches_one_pass():
+    power = np.random.default_rng(4).random(1000).astype(np.float32)
+    for window in (1, 4, 16):
+        detector = BurstDetector(1e6, window_samples=window)
+        # Blocks shorter than the window too, so carried samples span several blocks
+        blocks = np.split(power, [3, 10, 250, 253, 700])
+        blockwise = np.concatenate([detector.envelope(block).copy() for block in blocks])
+        np.testing.assert_allclose(blockwise, np.convolve(power, np.ones(window))[:len(power)], rtol=1e-5)
@@ -0,0 +1,27 @@
+# test_channels.py
+import numpy as np
+import pytest
+
+from core.channels import ChannelRegistry, ChannelState
+
+
+def test_registry_indices_and_labels():
+    channels = ChannelRegistry()
+    for rx_channel in range(3):
+        channels.add(rx_channel)
+    assert len(channels) == 3 and channels.indices() == [0, 1, 2]
+    assert [channel.label for channel in channels] == ['TX/RX', 'RX2', 'RX3']
+    assert channels[1].index == 1 and channels[1].rx_channel == 1
+
+    # Every channel owns its own DSP state
+    assert channels[0].frame_processor is not channels[1].frame_processor
+    assert channels[0].rois is not channels[1].rois
+    channels.clear()
+    assert len(channels) == 0
+
+
+def test_channel_state_is_slotted():
+    channel = ChannelState(0)
+    channel.spectrum = np.zeros(8, dtype=np.float32)
+    with pytest.raises(AttributeError):
+        channel.spectrum_rx0 = None
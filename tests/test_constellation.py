@@ -0,0 +1,59 @@
+# test_constellation.py
+import numpy as np
+
+from core.constellation import DensityHistogram, IQTap, recover_carrier, recover_timing
+from core.iq_history import IQHistory
+
+
+def qpsk_symbols(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return (np.exp(1j * (np.pi / 4 + np.pi / 2 * rng.integers(0, 4, count)))).astype(np.complex64)
+
+
+def test_density_histogram_bins_and_decays():
+    histogram = DensityHistogram(bins=4, extent=1.0, half_life=1.0)
+    histogram.accumulate(np.array([0.1 + 0.1j, 0.1 + 0.1j, -0.9 - 0.9j, 5 + 0j], dtype=np.complex64))
+    assert histogram.counts[2, 2] == 2 and histogram.counts[0, 0] == 1
+    assert histogram.counts.sum() == 3  # Out-of-extent points are dropped
+    histogram.accumulate(np.empty(0, dtype=np.complex64), elapsed=1.0)
+    assert histogram.counts[2, 2] == 1.0
+    assert histogram.image().max() == 1.0
+
+
+def test_carrier_recovery_removes_frequency_and_phase_offset():
+    symbols = qpsk_symbols(8192)
+    n = np.arange(len(symbols))
+    received = symbols * np.exp(1j * (2 * np.pi * 0.002 * n + 0.7)).astype(np.complex64)
+    recovered = recover_carrier(received, 4)
+    # Points land back on the diagonals (up to the inherent 90 degree ambiguity)
+    angles = np.angle(recovered[256:]) % (np.pi / 2)
+    assert np.max(np.abs(angles - np.pi / 4)) < 0.1
+
+
+def test_timing_recovery_picks_symbol_centres():
+    symbols = qpsk_symbols(2048, seed=1)
+    sps = 8
+    # Triangular pulses so the symbol centres are the only points at full amplitude
+    pulse = np.convolve(np.ones(sps), np.ones(sps)) / sps
+    upsampled = np.zeros(len(symbols) * sps, dtype=np.complex64)
+    upsampled[::sps] = symbols
+    shaped = np.convolve(upsampled, pulse)[3:].astype(np.complex64)  # Arbitrary delay
+    recovered = recover_timing(shaped, sps)
+    assert np.median(np.abs(recovered)) > 0.95 * np.max(np.abs(recovered))
+
+
+def test_tap_mixes_roi_to_baseband():
+    rate = 1e6
+    history = IQHistory(capacity=1 << 16, sample_rate=rate)
+    tap = IQTap(history, offset_hz=200e3, bandwidth_hz=50e3)
+    n = np.arange(1 << 15)
+    tone = np.exp(2j * np.pi * (200e3 + 1e3) / rate * n).astype(np.complex64)
+    history.write(tone[:10000], 0.0)
+    first = tap.read()
+    history.write(tone[10000:], 0.01)
+    second = tap.read()
+    output = np.concatenate((first, second))[200:]
+    assert tap.sample_rate == rate / 10
+    # What is left is the 1 kHz offset from the ROI centre, continuous across reads
+    phase_step = np.angle(output[1:] * np.conj(output[:-1]))
+    np.testing.assert_allclose(phase_step, 2 * np.pi * 1e3 / tap.sample_rate, atol=1e-3)
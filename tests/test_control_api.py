@@ -0,0 +1,74 @@
+# test_control_api.py
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core.channels import ChannelState
+from core.control_server import UNAVAILABLE, RpcError
+from gui.control_api import ControlApi
+
+
+class FakeControl:
+    def get_rx_freq(self, channel):
+        return 100e6
+
+    def get_rx_rate(self, channel):
+        return 1e6
+
+
+def make_window(bins=512):
+    # Only what ControlApi reads from the main window; no widgets, so a widget read fails loudly
+    radio = SimpleNamespace(label='sim0', usrp_control=FakeControl(),
+                            tx_rx=SimpleNamespace(frame_rate=30, frames_per_block=4))
+    channel = ChannelState(0, radio=radio)
+    channel.spectrum = np.zeros(bins, dtype=np.float32)
+    return SimpleNamespace(channels=[channel], radios=[radio], is_receiving=True, fft_size=bins,
+                           window_name='Hann')
+
+
+def test_status_reads_no_widgets():
+    status = ControlApi(make_window()).status()
+    assert status['frames_per_block'] == 4
+    assert status['channels'][0]['center_freq'] == 100e6
+
+
+def test_spectrum_reads_never_see_a_half_written_block():
+    window = make_window()
+    channel = window.channels[0]
+    api = ControlApi(window)
+    running = True
+
+    def process_blocks():
+        # Writes like a PipelineWorker: version odd while the results change
+        n = 0
+        while running:
+            n += 1
+            with channel.updating():
+                channel.spectrum[:256] = n
+                time.sleep(0)  # Let the reader in mid-block
+                channel.spectrum[256:] = n
+            time.sleep(0.0001)  # Blocks arrive with gaps between them
+
+    writer = threading.Thread(target=process_blocks)
+    writer.start()
+    try:
+        for _ in range(500):
+            spectrum = api.get_spectrum()['spectrum']
+            assert not np.shares_memory(spectrum, channel.spectrum)
+            assert (spectrum == spectrum[0]).all()
+    finally:
+        running = False
+        writer.join()
+
+
+def test_read_gives_up_while_a_block_never_finishes():
+    window = make_window()
+    window.channels[0].version = 1
+    api = ControlApi(window)
+    api.READ_ATTEMPTS = 3
+    with pytest.raises(RpcError) as error:
+        api.get_spectrum()
+    assert error.value.code == UNAVAILABLE
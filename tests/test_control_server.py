@@ -0,0 +1,126 @@
+# test_control_server.py
+import json
+import os
+import socket
+import stat
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from core.control_server import (INVALID_PARAMS, METHOD_NOT_FOUND, ControlClient, ControlServer, RpcError,
+                                 attach_arrays, encode_message)
+
+
+@pytest.fixture
+def server(tmp_path):
+    calls = []
+    spectrum = np.linspace(-100, -20, 1024, dtype=np.float32)
+
+    def set_frequency(freq_hz, channel=0):
+        calls.append(('freq', channel, freq_hz))
+        return freq_hz
+
+    def on_other_thread(function):
+        # Stand-in for the GUI thread
+        future = Future()
+        threading.Thread(target=lambda: future.set_result((function(), threading.current_thread().name)),
+                         name='gui').start()
+        return future
+
+    methods = {
+        'set_frequency': set_frequency,
+        'get_spectrum': lambda channel=0: {'channel': channel, 'spectrum': spectrum + channel},
+        'start_rx': lambda: 'started',
+        'fail': lambda: 1 / 0,
+    }
+    control = ControlServer(methods, str(tmp_path / 'control.sock'), gui_methods=('start_rx',),
+                            invoke=on_other_thread)
+    control.start()
+    control.calls = calls
+    control.spectrum = spectrum
+    yield control
+    control.stop()
+
+
+def test_arrays_round_trip_as_binary():
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    empty = np.zeros((0, 5))
+    data = encode_message({'result': {'a': array, 'b': [np.arange(3, dtype=np.int16), empty], 'n': np.float64(2.5)}})
+    line, payload = data.split(b'\n', 1)
+    assert len(payload) == array.nbytes + 6
+    message = attach_arrays(json.loads(line), payload)
+    np.testing.assert_array_equal(message['result']['a'], array)
+    np.testing.assert_array_equal(message['result']['b'][0], [0, 1, 2])
+    assert message['result']['b'][1].shape == (0, 5)
+    assert message['result']['n'] == 2.5
+
+
+def test_socket_is_private_and_removed_on_stop(tmp_path):
+    control = ControlServer({}, str(tmp_path / 'private.sock'))
+    control.start()
+    assert stat.S_IMODE(os.stat(control.path).st_mode) == 0o600
+    control.stop()
+    assert not os.path.exists(control.path)
+
+
+def test_call_and_errors(server):
+    with ControlClient(server.path) as client:
+        assert client.call('set_frequency', freq_hz=2.4e9, channel=1) == 2.4e9
+        assert server.calls == [('freq', 1, 2.4e9)]
+        with pytest.raises(RpcError) as error:
+            client.call('nope')
+        assert error.value.code == METHOD_NOT_FOUND
+        with pytest.raises(RpcError) as error:
+            client.call('set_frequency', bogus=1)
+        assert error.value.code == INVALID_PARAMS
+        with pytest.raises(RpcError):
+            client.call('fail')
+        # The connection survives errors
+        assert client.call('get_spectrum')['channel'] == 0
+
+
+def test_pipeline_answers_in_order_with_arrays(server):
+    with ControlClient(server.path) as client:
+        calls = [('set_frequency', {'freq_hz': 100e6 + n}) for n in range(50)]
+        calls += [('get_spectrum', {'channel': 1}), ('start_rx', {})]
+        results = client.pipeline(calls)
+    assert results[:50] == [100e6 + n for n in range(50)]
+    assert [call[2] for call in server.calls] == [100e6 + n for n in range(50)]
+    np.testing.assert_array_equal(results[50]['spectrum'], server.spectrum + 1)
+    assert results[51] == ['started', 'gui']
+
+
+def test_batch_and_notifications(server):
+    with ControlClient(server.path) as client:
+        results = client.batch([('get_spectrum', {'channel': n}) for n in range(3)])
+        assert [result['channel'] for result in results] == [0, 1, 2]
+        np.testing.assert_array_equal(results[2]['spectrum'], server.spectrum + 2)
+
+    # A notification (no id) is executed but not answered
+    raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    raw.connect(server.path)
+    raw.sendall(b'{"jsonrpc": "2.0", "method": "set_frequency", "params": [1e9]}\n'
+                b'not json\n')
+    reply = json.loads(raw.makefile('rb').readline())
+    raw.close()
+    assert reply['error']['code'] == -32700
+    assert server.calls == [('freq', 0, 1e9)]
+
+
+def test_slow_methods_do_not_block_other_connections(tmp_path):
+    release = threading.Event()
+    control = ControlServer({'slow': lambda: release.wait(5.0), 'fast': lambda: 'fast'}, str(tmp_path / 'slow.sock'))
+    control.start()
+    try:
+        slow = ControlClient(control.path)
+        slow.socket.sendall(json.dumps(slow.request('slow')).encode() + b'\n')
+        with ControlClient(control.path, timeout=1.0) as client:
+            assert client.call('fast') == 'fast'
+        release.set()
+        assert slow.result(slow.read_message()) is True
+        slow.close()
+    finally:
+        release.set()
+        control.stop()
@@ -0,0 +1,100 @@
+# test_demodulator.py
+import os
+import time
+import wave
+
+import numpy as np
+from scipy import signal
+
+from core.decimation import MultistageDecimator, PolyphaseDecimator, plan_stages, smooth_factor
+from core.demodulator import Demodulator, DemodulatorWorker, WavSink, open_audio_sink
+from core.iq_history import IQHistory
+
+
+def dominant_frequency(audio, rate):
+    spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+    return np.fft.rfftfreq(len(audio), 1 / rate)[np.argmax(spectrum)]
+
+
+def test_polyphase_decimator_matches_one_long_filter():
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(50000) + 1j * rng.standard_normal(50000)).astype(np.complex64)
+    taps = signal.firwin(37, 0.1).astype(np.float32)
+    decimator = PolyphaseDecimator(taps, 5)
+    blocks, position = [], 0
+    for size in rng.integers(0, 2000, 60):
+        blocks.append(decimator.process(samples[position:position + size]))
+        position += size
+    expected = signal.lfilter(taps, 1.0, samples[:position])[::5]
+    np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-5)
+
+
+def test_stage_planning_prefers_short_stages():
+    assert smooth_factor(20.8) == 20
+    assert smooth_factor(23) == 21
+    assert plan_stages(40) == [8, 5]
+    decimator = MultistageDecimator(2e6, 40, 8e3)
+    assert decimator.output_rate == 50e3
+    assert decimator.total_taps < 100
+
+
+def test_demodulators_recover_a_test_tone():
+    rate, offset, tone_hz = 1e6, 150e3, 1000.0
+    t = np.arange(int(rate * 0.5)) / rate
+    tone = np.sin(2 * np.pi * tone_hz * t)
+    signals = {
+        'AM': (1 + 0.5 * tone) * np.exp(2j * np.pi * offset * t),
+        'FM': np.exp(1j * (2 * np.pi * offset * t + 2 * np.pi * 5e3 * np.cumsum(tone) / rate)),
+        'USB': np.exp(2j * np.pi * (offset + tone_hz) * t),
+        'LSB': np.exp(2j * np.pi * (offset - tone_hz) * t),
+    }
+    for mode, samples in signals.items():
+        samples = samples.astype(np.complex64)
+        demodulator = Demodulator(mode, rate, offset)
+        audio = np.concatenate([demodulator.process(samples[i:i + 25000], i)
+                                for i in range(0, len(samples), 25000)])
+        assert demodulator.audio_rate == 50e3
+        assert len(audio) == len(samples) // 20
+        assert abs(dominant_frequency(audio[5000:], demodulator.audio_rate) - tone_hz) < 10, mode
+
+
+def test_wav_sink_writes_pcm16(tmp_path):
+    path = str(tmp_path / 'out.wav')
+    sink = WavSink(path, 48000.0)
+    sink.write(np.array([0.0, 0.5, -1.0, 2.0], dtype=np.float32))
+    sink.close()
+    with wave.open(path) as f:
+        assert f.getframerate() == 48000 and f.getsampwidth() == 2
+        frames = np.frombuffer(f.readframes(4), dtype='<i2')
+    np.testing.assert_array_equal(frames, [0, 16383, -32767, 32767])
+
+
+def test_fifo_sink_waits_for_its_reader_on_the_worker(tmp_path):
+    path = str(tmp_path / 'audio.fifo')
+    os.mkfifo(path)
+    rate = 200e3
+    history = IQHistory(capacity=1 << 18, sample_rate=rate)
+
+    def open_sink(keep_waiting):
+        return open_audio_sink(path, 48000.0, keep_waiting, poll_interval=0.01)
+
+    # Stopped before anyone reads: start() and stop() return promptly
+    idle = DemodulatorWorker(history, lambda sample_rate: Demodulator('AM', sample_rate), open_sink)
+    began = time.perf_counter()
+    idle.start()
+    idle.stop()
+    assert time.perf_counter() - began < 0.5 and idle.sink is None
+
+    worker = DemodulatorWorker(history, lambda sample_rate: Demodulator('AM', sample_rate), open_sink)
+    worker.start()
+    reader = open(path, 'rb')  # The worker's open completes once a reader is attached
+    try:
+        deadline = time.perf_counter() + 2.0
+        while worker.sink is None and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        tone = 0.5 * (1 + 0.5 * np.cos(2 * np.pi * 1e3 * np.arange(int(rate * 0.2)) / rate))
+        history.write(tone.astype(np.complex64), 0.0)
+        assert len(reader.read(2000)) == 2000
+    finally:
+        worker.stop()
+        reader.close()
@@ -0,0 +1,111 @@
+# test_device_commands.py
+import threading
+
+from core.device_commands import DeviceCommandWorker
+from core.metrics import PipelineMetrics
+
+
+class RecordingControl:
+    """Stand-in for USRPControl that records the settings applied to it"""
+
+    def __init__(self):
+        self.applied = []
+
+    def set_master_clock_rate(self, rate):
+        self.applied.append(('master_clock_rate', 0, rate))
+        return rate
+
+    def set_rx_freq(self, freq, channel=0):
+        self.applied.append(('freq', channel, freq))
+        return freq
+
+    def set_rx_rate(self, rate, channel=0, settle=0.1):
+        self.applied.append(('rate', channel, rate))
+        return rate
+
+    def set_rx_gain(self, gain, channel=0):
+        self.applied.append(('gain', channel, gain))
+        return gain
+
+
+def test_latest_value_wins_and_retune_is_tagged():
+    control = RecordingControl()
+    metrics = PipelineMetrics()
+    retunes = []
+    done = threading.Event()
+
+    def on_retune(channel, settle_time):
+        retunes.append((channel, settle_time))
+        done.set()
+
+    worker = DeviceCommandWorker(control, metrics, retune_callback=on_retune, settle_time=0.05)
+    # A slider drag queued before the worker gets to run
+    for step in range(200):
+        worker.submit('freq', 0, 100e6 + step * 1e5)
+    worker.submit('gain', 0, 20)
+    worker.submit('rate', 0, 2e6)
+    worker.submit('master_clock_rate', 0, 32e6)
+    worker.start()
+    try:
+        assert done.wait(timeout=2.0)
+    finally:
+        worker.stop()
+
+    # Clock and rate are applied before frequency, and only the last frequency survives
+    assert control.applied == [('master_clock_rate', 0, 32e6), ('rate', 0, 2e6), ('freq', 0, 100e6 + 199 * 1e5), ('gain', 0, 20)]
+    assert metrics.get_counter('coalesced_commands_total', 0) == 199
+    assert retunes == [(0, 0.05)]
+    assert worker.pending_count() == 0
+
+
+def test_metrics_are_labelled_with_the_registry_channel():
+    # The second radio of a shared registry: its device channel 0 is registry channel 2
+    control = RecordingControl()
+    metrics = PipelineMetrics()
+    retunes = []
+    done = threading.Event()
+
+    def on_retune(channel, settle_time):
+        retunes.append(channel)
+        done.set()
+
+    worker = DeviceCommandWorker(control, metrics, retune_callback=on_retune, first_channel=2)
+    worker.submit('freq', 0, 100e6)
+    worker.submit('freq', 0, 101e6)
+    worker.start()
+    try:
+        assert done.wait(timeout=2.0)
+    finally:
+        worker.stop()
+
+    assert control.applied == [('freq', 0, 101e6)]
+    assert retunes == [0]  # The receiver is told its own channel
+    assert metrics.get_counter('coalesced_commands_total', 2) == 1
+    assert metrics.get_counter('retunes_total', 2) == 1
+    assert metrics.get_counter('retunes_total', 0) == 0
+
+
+def test_failed_retune_still_releases_the_receiver():
+    class FailingControl(RecordingControl):
+        def set_rx_freq(self, freq, channel=0):
+            raise RuntimeError("tune failed")
+
+    metrics = PipelineMetrics()
+    events = []
+    done = threading.Event()
+
+    def on_retune(channel, settle_time):
+        events.append(('retuned', channel))
+        done.set()
+
+    worker = DeviceCommandWorker(FailingControl(), metrics, retune_callback=on_retune,
+                                 retune_start_callback=lambda channel: events.append(('started', channel)))
+    worker.submit('freq', 1, 100e6)
+    worker.start()
+    try:
+        assert done.wait(timeout=2.0)
+    finally:
+        worker.stop()
+
+    assert events == [('started', 1), ('retuned', 1)]
+    assert metrics.get_counter('retunes_total', 1) == 0
@@ -0,0 +1,32 @@
+# test_fft_backend.py
+import numpy as np
+
+from core.fft_backend import (
+    FFT_SIZES, MAX_FFT_SIZE, available_backends, backend_names, get_backend, select_fastest_backend
+)
+
+
+def test_backends_match_numpy_and_stay_complex64():
+    rng = np.random.default_rng(1)
+    data = (rng.standard_normal((3, 1024)) + 1j * rng.standard_normal((3, 1024))).astype(np.complex64)
+    expected = np.fft.fft(data.astype(np.complex128), axis=-1)
+    for backend in available_backends():
+        result = backend.fft(data)
+        assert result.dtype == np.complex64, backend.name
+        np.testing.assert_allclose(result, expected, rtol=1e-3, atol=1e-2)
+
+
+def test_sizes_reach_one_million_points():
+    assert FFT_SIZES[-1] == MAX_FFT_SIZE == 1 << 20
+
+
+def test_select_fastest_backend_returns_a_backend():
+    backend = select_fastest_backend(size=256, batch=1, repeats=1)
+    assert backend.name in {b.name for b in available_backends()}
+
+
+def test_backend_names_resolve_without_benchmark():
+    names = backend_names()
+    assert names[:2] == ['numpy', 'scipy']
+    for name in names:
+        assert get_backend(name).name == name
@@ -0,0 +1,66 @@
+# test_frame_processor.py
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from core.fft_backend import NumpyFFT, ScipyFFT
+from core.frame_processor import FrameProcessor
+from core.spectral_storage import WaterfallHistory
+from core.spectrogram import window_coefficients
+from core.spectrum_stats import SpectrumStatistics
+
+
+def reference_power_db(samples, window_name, calibration_db):
+    window = window_coefficients(window_name, samples.shape[-1])
+    spectra = np.fft.fftshift(np.fft.fft(samples * window), axes=-1)
+    return 20 * np.log10(np.abs(spectra) + 1e-12) + calibration_db
+
+
+@pytest.mark.parametrize('backend', [NumpyFFT(), ScipyFFT()])
+def test_matches_shifted_windowed_fft(backend):
+    rng = np.random.default_rng(5)
+    iq = rng.integers(-3000, 3000, size=(4, 256, 2)).astype(np.int16)
+    samples = (iq[..., 0] + 1j * iq[..., 1]).astype(np.complex64) / 32768.0
+    expected = reference_power_db(samples, 'Blackman', 3.0)
+    processor = FrameProcessor()
+
+    power_db = processor.process(iq, backend, 'Blackman', 3.0)
+    np.testing.assert_allclose(power_db, expected, atol=1e-3)
+
+    # fc32 blocks are windowed directly and the caller's block is left alone
+    block = samples.copy()
+    power_db = processor.process(block, backend, 'Blackman', 3.0)
+    np.testing.assert_allclose(power_db, expected, atol=1e-3)
+    np.testing.assert_array_equal(block, samples)
+
+    rows = processor.waterfall_rows(power_db, 64)
+    np.testing.assert_array_equal(rows, power_db.reshape(4, 64, 4).max(axis=-1))
+
+
+def test_steady_state_hot_path_does_not_allocate():
+    frames, fft_size = 16, 4096
+    rng = np.random.default_rng(6)
+    block = rng.integers(-3000, 3000, size=(frames, fft_size, 2)).astype(np.int16)
+    processor = FrameProcessor()
+    backend = ScipyFFT()
+    statistics = SpectrumStatistics(statistics=('max', 'min', 'mean'))
+    history = WaterfallHistory(capacity=64, bins=1024, mode='uint8')
+
+    def run():
+        power_db = processor.process(block, backend, 'Hamming', 0.0)
+        statistics.update(power_db)
+        history.append_rows(processor.waterfall_rows(power_db, 1024), 1.0, 0.001)
+
+    # The first blocks size the scratch buffers; after that nothing should grow
+    for _ in range(3):
+        run()
+    tracemalloc.start()
+    try:
+        for _ in range(10):
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # One block of float32 spectra is 256 KiB; only small Python objects may be allocated
+    assert peak < 16 * 1024
@@ -0,0 +1,40 @@
+# test_iq_history.py
+import numpy as np
+
+from core.iq_history import IQHistory
+from core.spectrogram import compute_spectrogram, window_coefficients
+
+
+def test_extract_by_host_time_across_wraparound():
+    rate = 1000.0
+    history = IQHistory(capacity=2500, sample_rate=rate)
+    samples = np.arange(4000).astype(np.complex64)
+    for start in range(0, 4000, 100):
+        history.write(samples[start:start + 100], 10.0 + start / rate)
+
+    # Samples 0..1499 have been overwritten
+    clip = history.extract(11.6, 12.0)
+    assert clip.sample_rate == rate
+    np.testing.assert_array_equal(clip.samples.real, np.arange(1600, 2000))
+    assert np.isclose(clip.start_time, 11.6)
+
+    clip = history.extract(9.0, 11.7)
+    assert clip.samples.real[0] == 1500 and clip.samples.real[-1] == 1699
+    assert history.extract(20.0, 21.0) is None
+
+
+def test_spectrogram_resolves_tone_and_crops_columns():
+    rate, fft_size = 1e6, 1024
+    tone_bin = 100
+    t = np.arange(16 * fft_size)
+    samples = np.exp(2j * np.pi * tone_bin / fft_size * t).astype(np.complex64)
+
+    full, hop = compute_spectrogram(samples, fft_size, 'Hanning', overlap=0.5)
+    assert hop == 512 and full.shape == (31, fft_size) and full.dtype == np.float32
+    assert np.all(np.argmax(full, axis=1) == fft_size // 2 + tone_bin)
+
+    reference = 20 * np.log10(np.abs(np.fft.fftshift(np.fft.fft(samples[:fft_size] * window_coefficients('Hanning', fft_size)))) + 1e-12)
+    np.testing.assert_allclose(full[0], reference, atol=1e-2)
+
+    cropped, _ = compute_spectrogram(samples, fft_size, 'Hanning', overlap=0.5, column_range=(600, 700))
+    np.testing.assert_array_equal(cropped, full[:, 600:700])
@@ -0,0 +1,44 @@
+# test_metrics.py
+from core.metrics import PipelineMetrics, RollingHistogram
+
+
+def test_rolling_histogram_keeps_last_window():
+    hist = RollingHistogram(window=4)
+    for value in range(10):
+        hist.observe(float(value))
+    assert sorted(hist.recent()) == [6.0, 7.0, 8.0, 9.0]
+    assert hist.count == 10
+    assert hist.summary()['max'] == 9.0
+
+
+def test_prometheus_export_contains_all_series():
+    metrics = PipelineMetrics(window=16)
+    metrics.observe('fft_seconds', 0, 0.002)
+    metrics.increment('dropped_frames_total', 1, 3)
+    metrics.set_gauge('queue_depth', 0, 2)
+    text = metrics.to_prometheus()
+    assert '# TYPE b205_fft_seconds histogram' in text
+    assert 'b205_fft_seconds_bucket{channel="0",le="+Inf"} 1' in text
+    assert 'b205_dropped_frames_total{channel="1"} 3' in text
+    assert 'b205_queue_depth{channel="0"} 2' in text
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = PipelineMetrics(enabled=False)
+    metrics.observe('fft_seconds', 0, 0.002)
+    metrics.increment('frames_total', 0)
+    assert metrics.snapshot() == {'histograms': {}, 'counters': {}, 'gauges': {}}
+
+
+def test_prometheus_histograms_are_cumulative_past_the_window():
+    metrics = PipelineMetrics(window=4)
+    for _ in range(10):
+        metrics.observe('fft_seconds', 0, 0.002)
+    metrics.observe('fft_seconds', 0, 2.0)  # Above every bound
+    text = metrics.to_prometheus()
+    assert 'b205_fft_seconds_bucket{channel="0",le="0.001"} 0' in text
+    assert 'b205_fft_seconds_bucket{channel="0",le="0.005"} 10' in text
+    assert 'b205_fft_seconds_bucket{channel="0",le="0.5"} 10' in text
+    assert 'b205_fft_seconds_bucket{channel="0",le="+Inf"} 11' in text
+    assert 'b205_fft_seconds_count{channel="0"} 11' in text
+    assert 'b205_fft_seconds_sum{channel="0"} 2.02' in text
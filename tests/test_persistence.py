@@ -0,0 +1,32 @@
+# test_persistence.py
+import numpy as np
+
+from core.persistence import PersistenceHistogram
+
+
+def test_image_resolution_is_independent_of_fft_size():
+    for bins in (256, 4096):
+        persistence = PersistenceHistogram(columns=512, rows=100, floor_db=-100.0, ceiling_db=0.0)
+        spectra = np.full((10, bins), -80.0, dtype=np.float32)
+        spectra[:, bins // 2] = -20.0
+        persistence.accumulate(spectra)
+        image = persistence.image()
+        assert image.shape == (100, 512)
+        # Every column holds all the spectra, whether it gathered several bins or sampled one
+        assert persistence.counts.sum(axis=0).min() >= 10
+        assert image[80].argmax() == 256 and image[80].max() > 0
+
+
+def test_batch_equals_individual_spectra_and_fades_by_half_life():
+    rng = np.random.default_rng(1)
+    spectra = rng.normal(-60.0, 10.0, (50, 2048)).astype(np.float32)
+    single = PersistenceHistogram(half_life=0.5)
+    batched = PersistenceHistogram(half_life=0.5)
+    for spectrum in spectra:
+        single.accumulate(spectrum)
+    batched.accumulate(spectra)
+    np.testing.assert_array_equal(single.counts, batched.counts)
+    assert batched.counts.sum() == 50 * 2048
+
+    batched.accumulate(spectra[:0], elapsed=0.5)
+    assert batched.counts.sum() == 25 * 2048
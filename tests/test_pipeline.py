@@ -0,0 +1,207 @@
+# test_pipeline.py
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from core.channels import ChannelState
+from core.frame_processor import SpectrumSettings
+from core.metrics import PipelineMetrics
+from core.pipeline import BlockContext, BlockSpec, Pipeline, PipelineWorker, ProcessStage, Stage, ThreadedStage
+from core.spectral_storage import WaterfallHistory
+from core.spectrum_stages import (SPECTRUM_SPEC, FftStage, SpectrumStage, StatisticsStage, WaterfallStage,
+                                  iq_block_spec)
+
+
+class Scale(Stage):
+    name = 'scale'
+    input_spec = BlockSpec(np.float32, ('frames', 'bins'))
+    output_spec = BlockSpec(np.float32, ('frames', 'bins'))
+
+    def process(self, block, context):
+        return block * 2
+
+
+class Collect(Stage):
+    name = 'collect'
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.blocks = []
+        self.delay = delay
+
+    def process(self, block, context):
+        time.sleep(self.delay)
+        self.blocks.append(block)
+
+
+class AppendToFile(Stage):
+    """Module level so a spawned process can unpickle it"""
+
+    name = 'append'
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def process(self, block, context):
+        with open(self.path, 'a') as f:
+            f.write(f"{context.channel} {context.state} {block.sum():g}\n")
+
+
+class PeakToFile(Stage):
+    """Module level so a spawned process can unpickle it"""
+
+    name = 'peak'
+    input_spec = SPECTRUM_SPEC
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def process(self, block, context):
+        with open(self.path, 'a') as f:
+            f.write(f"{context.channel} {int(np.argmax(block[-1]))} {block[-1].max():.1f}\n")
+
+
+def test_connections_are_checked_when_built():
+    pipeline = Pipeline(iq_block_spec('sc16'))
+    with pytest.raises(ValueError):
+        pipeline.add(Scale())  # int16 IQ is not float32 spectra
+    fft = pipeline.add(FftStage())
+    scale = pipeline.add(Scale(), fft)
+    sink = pipeline.add(Collect(), scale)
+    with pytest.raises(ValueError):
+        pipeline.add(Collect(), sink)  # Nothing follows a sink
+    with pytest.raises(ValueError):
+        pipeline.set_source_spec(SPECTRUM_SPEC)
+    assert [stage.name for stage in pipeline.stages()] == ['fft', 'scale', 'collect']
+    pipeline.remove(scale)
+    assert pipeline.stages() == [fft]
+
+
+def test_fan_out_shares_one_read_only_view():
+    metrics = PipelineMetrics()
+    pipeline = Pipeline(SPECTRUM_SPEC, metrics, check_blocks=True)
+    first, second = pipeline.add(Collect()), pipeline.add(Collect())
+    skipped = pipeline.add(Collect())
+    skipped.enabled = False
+    chained = pipeline.add(Collect(), pipeline.add(Scale()))
+    block = np.ones((2, 8), dtype=np.float32)
+    pipeline.process(block, BlockContext(channel=3))
+
+    assert first.blocks[0] is second.blocks[0]
+    assert np.shares_memory(first.blocks[0], block)
+    assert not first.blocks[0].flags.writeable
+    assert skipped.blocks == []
+    np.testing.assert_array_equal(chained.blocks[0], 2 * block)
+    assert dict((name, blocks) for name, blocks, _ in pipeline.stage_timings())['collect'] == 1
+    assert metrics.histogram('stage_seconds', '3:scale').count == 1
+
+
+def test_threaded_stage_copies_and_drops_when_behind():
+    slow = Collect(delay=0.05)
+    stage = ThreadedStage(slow, max_pending=2)
+    pipeline = Pipeline(SPECTRUM_SPEC)
+    pipeline.add(stage)
+    block = np.zeros((1, 4), dtype=np.float32)
+    for n in range(10):
+        block[:] = n  # The source reuses its buffer
+        pipeline.process(block, BlockContext())
+    pipeline.close()
+    assert stage.dropped > 0
+    assert len(slow.blocks) + stage.dropped == 10
+    assert [int(b[0, 0]) for b in slow.blocks] == sorted({int(b[0, 0]) for b in slow.blocks})
+
+
+def test_process_stage_runs_in_a_child(tmp_path):
+    path = tmp_path / 'blocks.txt'
+    pipeline = Pipeline(SPECTRUM_SPEC)
+    pipeline.add(ProcessStage(AppendToFile(str(path))))
+    for n in range(3):
+        pipeline.process(np.full((2, 4), n, dtype=np.float32), BlockContext(channel=1, state=object()))
+    pipeline.close()
+    assert path.read_text().splitlines() == ['1 None 0', '1 None 8', '1 None 16']
+
+
+def test_fft_stage_runs_in_a_child(tmp_path):
+    # The FFT stage needs only the context's plain values, not the channel state or the GUI
+    path = tmp_path / 'peaks.txt'
+    branch = Pipeline(iq_block_spec('fc32'))
+    branch.add(PeakToFile(str(path)), branch.add(FftStage()))
+    pipeline = Pipeline(iq_block_spec('fc32'))
+    pipeline.add(ProcessStage(branch))
+    rate, fft_size = 1.024e6, 1024
+    tone = np.exp(2j * np.pi * 100e3 * np.arange(2 * fft_size) / rate).astype(np.complex64).reshape(2, fft_size)
+    settings = SpectrumSettings('numpy', 'Hamming', 0.0)
+    for channel in (0, 1):
+        pipeline.process(tone, BlockContext(channel, ChannelState(channel), 1.0, rate, 100e6, fft_size, 1 / 30,
+                                            settings=settings))
+    pipeline.close()
+    lines = [line.split() for line in path.read_text().splitlines()]
+    # +100 kHz is 100 bins above the centre bin (512) of the fftshifted spectrum
+    assert [(channel, peak) for channel, peak, _ in lines] == [('0', '612'), ('1', '612')]
+
+
+def test_worker_processes_blocks_under_the_seqlock():
+    channel = ChannelState(0)
+    versions, done = [], []
+    all_done = threading.Event()
+
+    class Record(Stage):
+        name = 'record'
+
+        def process(self, block, context):
+            versions.append(channel.version)
+            channel.spectrum = block[-1] * 1
+
+    def on_done(block):
+        done.append(block)
+        if len(done) == 3:
+            all_done.set()
+
+    pipeline = Pipeline(SPECTRUM_SPEC)
+    pipeline.add(Record())
+    worker = PipelineWorker(pipeline, channel, lambda timestamp: BlockContext(0, channel, timestamp), on_done)
+    worker.start()
+    blocks = [np.full((1, 4), n, dtype=np.float32) for n in range(3)]
+    for block in blocks:
+        worker.submit(block, 1.0)
+    assert all_done.wait(timeout=2.0)
+    worker.stop()
+    # Odd while each block is processed, even again once it is done; every block is handed back
+    assert all(version % 2 == 1 for version in versions)
+    assert channel.version == 6
+    assert [id(block) for block in done] == [id(block) for block in blocks]
+    np.testing.assert_array_equal(channel.spectrum, blocks[-1][-1])
+
+
+def test_spectrum_stages_steady_state_does_not_allocate():
+    channel = ChannelState(0)
+    channel.statistics.set_statistics(('max',))
+    channel.waterfall_history = WaterfallHistory(capacity=64, bins=256, mode='uint8')
+    pipeline = Pipeline(iq_block_spec('sc16'))
+    fft = pipeline.add(FftStage())
+    for stage in (SpectrumStage(), StatisticsStage(), WaterfallStage(256)):
+        pipeline.add(stage, fft)
+    block = np.random.default_rng(1).integers(-3000, 3000, size=(16, 1024, 2)).astype(np.int16)
+    freq_bins = np.fft.fftshift(np.fft.fftfreq(1024, 1e-6))
+
+    def run():
+        pipeline.process(block, BlockContext(0, channel, 1.0, 1e6, 100e6, 1024, 1 / 30, freq_bins,
+                                             SpectrumSettings('scipy', 'Hamming', 0.0)))
+
+    for _ in range(3):
+        run()
+    assert channel.spectrum.shape == (1024,)
+    assert channel.waterfall_history.count == 48
+    tracemalloc.start()
+    try:
+        for _ in range(10):
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 16 * 1024
@@ -0,0 +1,39 @@
+# test_rate_planner.py
+import pytest
+
+from core.rate_planner import (DDC_DECIMATIONS, MAX_MASTER_CLOCK_RATE, MIN_MASTER_CLOCK_RATE, USABLE_SPAN_FRACTION,
+                               WINDOW_ENBW, plan_rates)
+from core.sample_formats import max_link_sample_rate
+
+
+@pytest.mark.parametrize('span, rbw', [(20e6, 10e3), (1e6, 100.0), (200e3, 10.0), (50e3, 1.0)])
+def test_plan_meets_span_and_rbw_at_the_device_rate(span, rbw):
+    plan = plan_rates(span, rbw, channels=1, window_name='Hamming')
+    assert plan.span_hz >= span
+    assert plan.rbw_hz == pytest.approx(rbw)
+    assert plan.device_decimation in DDC_DECIMATIONS
+    assert MIN_MASTER_CLOCK_RATE <= plan.master_clock_rate <= MAX_MASTER_CLOCK_RATE[1]
+    assert plan.rbw_hz == pytest.approx(WINDOW_ENBW['Hamming'] * plan.sample_rate / plan.fft_size)
+    # The largest DDC decimation that fits keeps the ADC clock high
+    assert plan.device_decimation == DDC_DECIMATIONS[-1] or plan.master_clock_rate * 2 > MAX_MASTER_CLOCK_RATE[1]
+
+
+def test_two_channels_and_usb2_cap_the_rate():
+    two = plan_rates(50e6, 10e3, channels=2)
+    assert two.master_clock_rate <= MAX_MASTER_CLOCK_RATE[2]
+    assert two.span_hz == pytest.approx(MAX_MASTER_CLOCK_RATE[2] * USABLE_SPAN_FRACTION)
+    assert two.notes
+
+    usb2 = plan_rates(50e6, 10e3, channels=2, link='USB 2.0', otw_format='sc16')
+    assert usb2.sample_rate <= max_link_sample_rate('USB 2.0', 'sc16', 2)
+    # sc8 doubles what the link carries
+    assert plan_rates(50e6, 10e3, channels=2, link='USB 2.0', otw_format='sc8').sample_rate > usb2.sample_rate
+
+
+def test_narrow_spans_are_widened_to_the_device_minimum():
+    plan = plan_rates(500.0, 1.0, window_name='Rectangular')
+    assert plan.sample_rate >= MIN_MASTER_CLOCK_RATE / DDC_DECIMATIONS[-1]
+    # The span reported is the one the device rate actually delivers
+    assert plan.span_hz == pytest.approx(plan.sample_rate * USABLE_SPAN_FRACTION)
+    assert plan.span_hz > 500.0 and plan.notes
+    assert plan.rbw_hz == pytest.approx(1.0)
@@ -0,0 +1,70 @@
+# test_roi_measurements.py
+import numpy as np
+
+from core.roi_measurements import RoiMeasurements
+
+
+def make_spectrum(bins=1024, floor_db=-100.0):
+    return np.full(bins, floor_db, dtype=np.float32)
+
+
+def test_measurements_match_per_roi_reference():
+    center, rate, bins = 100e6, 1.024e6, 1024  # 1 kHz bins
+    spectrum = make_spectrum(bins)
+    spectrum[600:610] = -40.0  # 10 kHz wide signal
+    spectrum[605] = -30.0
+    freq_axis = center + np.fft.fftshift(np.fft.fftfreq(bins, d=1.0 / rate))
+
+    rois = RoiMeasurements()
+    rois.set_roi('signal', freq_axis[590], freq_axis[620])
+    rois.set_roi('noise', freq_axis[100], freq_axis[199])
+    rois.set_roi('outside', 200e6, 201e6)
+    assert rois.compile(center, rate, bins)
+    assert not rois.compile(center, rate, bins)
+    rois.measure(spectrum)
+
+    signal = rois.result('signal')
+    reference = spectrum[590:621].astype(np.float64)
+    assert np.isclose(signal['channel_power_db'], 10 * np.log10(np.sum(10 ** (reference / 10))))
+    assert signal['peak_db'] == -30.0
+    assert signal['peak_freq_hz'] == freq_axis[605]
+    assert signal['obw_hz'] == 10 * 1e3
+    assert signal['snr_db'] == 70.0
+    assert np.isclose(rois.result('noise')['channel_power_db'], -100 + 10 * np.log10(100))
+    assert np.isnan(rois.result('outside')['peak_db'])
+
+
+def test_moving_or_retuning_recompiles():
+    rois = RoiMeasurements()
+    rois.set_roi('a', 99.9e6, 100.1e6)
+    assert rois.compile(100e6, 1e6, 1024)
+    rois.set_roi('a', 100.0e6, 100.2e6)
+    assert rois.compile(100e6, 1e6, 1024)
+    assert rois.compile(100.05e6, 1e6, 1024)
+    rois.remove_roi('a')
+    assert rois.compile(100.05e6, 1e6, 1024)
+    assert rois.measure(make_spectrum())['peak_db'].shape == (0,)
+
+
+def test_history_ring_is_bounded_and_readable_incrementally():
+    rois = RoiMeasurements(history_frames=8)
+    rois.set_roi('a', 99.9e6, 100.1e6)
+    rois.compile(100e6, 1e6, 1024)
+    history = rois.history('a')
+    for frame in range(5):
+        rois.measure(make_spectrum(floor_db=-100.0 + frame), timestamp=float(frame))
+
+    sequence, timestamps, values = history.read_since(0)
+    assert sequence == 5 and list(timestamps) == [0, 1, 2, 3, 4]
+    assert values[-1, history.field_index('peak_db')] == -96.0
+
+    for frame in range(5, 20):
+        rois.measure(make_spectrum(), timestamp=float(frame))
+    sequence, timestamps, _ = history.read_since(sequence)
+    # Only the newest capacity rows survive a slow reader
+    assert sequence == 20 and list(timestamps) == list(range(12, 20))
+    assert history.nbytes == 8 * (len(values[0]) + 1) * 8
+
+    rois.set_history_frames(4)
+    sequence, timestamps, _ = history.read_since(0)
+    assert sequence == 20 and list(timestamps) == [16, 17, 18, 19]
@@ -0,0 +1,41 @@
+# test_sample_formats.py
+import time
+
+import numpy as np
+
+from core.iq_history import IQHistory
+from core.recorder import RawRecorder, read_sidecar
+from core.sample_formats import allocate, max_link_sample_rate, recv_view, to_complex64
+
+
+def test_sc16_buffers_convert_with_full_scale():
+    buffer = allocate(3, 'sc16')
+    assert recv_view(buffer).shape == (3,) and recv_view(buffer).itemsize == 4
+    buffer[:] = [[16384, -16384], [0, 32767], [-32768, 0]]
+    np.testing.assert_allclose(to_complex64(buffer), [0.5 - 0.5j, 0.99997j, -1.0], atol=1e-6)
+    assert to_complex64(allocate(4, 'fc32')).dtype == np.complex64
+
+
+def test_sc8_doubles_the_rate_a_link_sustains():
+    assert max_link_sample_rate('USB 2.0', 'sc8') == 2 * max_link_sample_rate('USB 2.0', 'sc16')
+
+
+def test_sc16_history_stores_raw_and_reads_complex(tmp_path):
+    history = IQHistory(capacity=1000, sample_rate=1e3, cpu_format='sc16')
+    raw = np.arange(1200, dtype=np.int16).reshape(600, 2)
+    history.write(raw, 0.0)
+    assert history.nbytes == 4000
+    start, samples = history.read_since(0)
+    assert start == 0 and samples.dtype == np.complex64
+    np.testing.assert_allclose(samples[1], (2 + 3j) / 32768)
+
+    recorder = RawRecorder(history, str(tmp_path / 'capture.sc16'), center_freq=915e6)
+    recorder.start()
+    history.write(raw[:100], 0.6)
+    deadline = time.time() + 2.0
+    while recorder.samples_written < 100 and time.time() < deadline:
+        time.sleep(0.01)
+    recorder.stop()
+    # The file holds the untouched int16 pairs
+    np.testing.assert_array_equal(np.fromfile(tmp_path / 'capture.sc16', dtype=np.int16).reshape(-1, 2), raw[:100])
+    assert read_sidecar(str(tmp_path / 'capture.sc16'))['format'] == 'sc16'
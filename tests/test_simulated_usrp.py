@@ -0,0 +1,34 @@
+# test_simulated_usrp.py
+from types import SimpleNamespace
+
+import numpy as np
+
+from core.sample_formats import allocate, recv_view, to_complex64
+from core.simulated_usrp import SimulatedMultiUSRP, is_simulated_serial
+
+
+def receive(device, cpu_format, count=4096):
+    streamer = device.get_rx_stream(SimpleNamespace(channels=[0], cpu_format=cpu_format))
+    buffer = allocate(count, cpu_format)
+    metadata = SimpleNamespace(has_time_spec=False, time_spec=None)
+    assert streamer.recv(recv_view(buffer), metadata) == count
+    assert metadata.has_time_spec and 0.0 <= metadata.time_spec.get_real_secs() < 1.0
+    return to_complex64(buffer)
+
+
+def test_carrier_lands_on_its_offset_in_both_host_formats():
+    device = SimulatedMultiUSRP('sim3', signals=((2.4001e9, -20.0),))
+    device.set_rx_freq(2.4e9)
+    device.set_rx_rate(1.024e6)
+    for cpu_format in ('fc32', 'sc16'):
+        spectrum = np.abs(np.fft.fft(receive(device, cpu_format)))
+        peak_hz = np.fft.fftfreq(len(spectrum), d=1 / 1.024e6)[np.argmax(spectrum)]
+        assert abs(peak_hz - 100e3) <= 250
+
+
+def test_radios_are_independent():
+    first, second = SimulatedMultiUSRP('sim0'), SimulatedMultiUSRP('sim1')
+    first.set_rx_freq(915e6)
+    assert second.get_rx_freq() == 2.4e9
+    assert not np.array_equal(receive(first, 'fc32', 64), receive(second, 'fc32', 64))
+    assert is_simulated_serial('sim1') and not is_simulated_serial('31F5A2B') and not is_simulated_serial(None)
@@ -0,0 +1,50 @@
+# test_spectral_storage.py
+import numpy as np
+import pytest
+
+from core.spectral_storage import STORAGE_MODES, WaterfallHistory, storage_bytes
+
+
+@pytest.mark.parametrize("mode, tolerance", [('uint8', 0.2), ('float16', 0.07), ('float32', 1e-6)])
+def test_rows_round_trip_oldest_first(mode, tolerance):
+    rng = np.random.default_rng(2)
+    rows = rng.uniform(-110, -10, size=(7, 64)).astype(np.float32)
+    history = WaterfallHistory(capacity=5, bins=64, mode=mode)
+    for index, row in enumerate(rows):
+        history.append(row, float(index))
+    decoded = history.to_db()
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, rows[2:], atol=tolerance)
+    np.testing.assert_array_equal(history.row_timestamps(2), [5.0, 6.0])
+
+
+def test_fill_rows_and_resize_keep_columns():
+    history = WaterfallHistory(capacity=3, bins=8, mode='uint8', fill_db=-130.0)
+    history.append(np.linspace(-100, -30, 8).astype(np.float32), 1.0)
+    history.append_fill(2.0)
+    history.resize(4)
+    decoded = history.to_db()
+    assert decoded.shape == (3, 4)
+    np.testing.assert_allclose(decoded[1], np.linspace(-100, -30, 8)[:4], atol=0.2)
+    np.testing.assert_allclose(decoded[2], -130.0)
+
+
+def test_uint8_history_is_an_eighth_of_float64():
+    history = WaterfallHistory(capacity=1000, bins=8192, mode='uint8')
+    assert history.data.nbytes * 8 == storage_bytes(1, 8192, 1000, 'float64')
+    assert history.nbytes == storage_bytes(1, 8192, 1000, 'uint8')
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_block_append_matches_row_by_row_across_the_wrap(mode):
+    rng = np.random.default_rng(3)
+    rows = rng.uniform(-110, -10, size=(11, 32)).astype(np.float32)
+    single = WaterfallHistory(capacity=8, bins=32, mode=mode)
+    block = WaterfallHistory(capacity=8, bins=32, mode=mode)
+    for index, row in enumerate(rows):
+        single.append(row, float(index))
+    block.append_rows(rows[:5], 4.0, 1.0)
+    block.append_rows(rows[5:], 10.0, 1.0)
+    np.testing.assert_array_equal(block.to_db(), single.to_db())
+    np.testing.assert_array_equal(block.row_timestamps(), single.row_timestamps())
+    assert block.head == single.head and block.count == single.count
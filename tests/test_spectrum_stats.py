@@ -0,0 +1,61 @@
+# test_spectrum_stats.py
+import numpy as np
+
+from core.spectrum_stats import SpectrumStatistics
+
+
+def random_spectra(frames=40, bins=256, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(-80.0, 6.0, (frames, bins)).astype(np.float32)
+
+
+def test_batched_updates_match_frame_by_frame():
+    spectra = random_spectra()
+    for options in ({'average_count': 8}, {'averaging_factor': 0.7}):
+        single = SpectrumStatistics(('max', 'min', 'mean', 'percentile'), **options)
+        batched = SpectrumStatistics(('max', 'min', 'mean', 'percentile'), **options)
+        for spectrum in spectra:
+            single.update(spectrum)
+        batched.update(spectra[:13])
+        batched.update(spectra[13:])
+        np.testing.assert_array_equal(single.max_hold(), spectra.max(axis=0))
+        np.testing.assert_array_equal(batched.min_hold(), spectra.min(axis=0))
+        np.testing.assert_allclose(single.mean_db(), batched.mean_db(), atol=1e-4)
+        np.testing.assert_array_equal(single.percentile(90), batched.percentile(90))
+
+
+def test_count_limited_mean_is_linear_power_average():
+    spectra = random_spectra(frames=16)
+    statistics = SpectrumStatistics(('mean',), average_count=100)
+    statistics.update(spectra)
+    expected = 10 * np.log10(np.mean(10 ** (spectra / 10.0), axis=0))
+    np.testing.assert_allclose(statistics.mean_db(), expected, atol=1e-4)
+    # The power average sits above the dB average for a fluctuating signal
+    assert (statistics.mean_db() > spectra.mean(axis=0)).mean() > 0.9
+
+
+def test_percentiles_decay_and_dropped_statistics_clear():
+    statistics = SpectrumStatistics(('max', 'percentile'), percentile_decay=0.9)
+    statistics.update(np.full((50, 8), -100.0, dtype=np.float32))
+    statistics.update(np.full((50, 8), -40.0, dtype=np.float32))
+    # After 50 frames at 0.9 decay, the old level holds well under 1% of the weight
+    np.testing.assert_array_equal(statistics.percentile(5), np.full(8, -39.5, dtype=np.float32))
+    statistics.set_statistics(('percentile',))
+    assert statistics.max_hold() is None and statistics.percentile(50) is not None
+    statistics.update(np.zeros(16, dtype=np.float32))
+    assert statistics.bins == 16 and statistics.count == 1
+
+
+def test_long_decaying_batches_stay_finite():
+    spectra = random_spectra(frames=1000, bins=32)
+    batched = SpectrumStatistics(('percentile',), percentile_decay=0.9)
+    single = SpectrumStatistics(('percentile',), percentile_decay=0.9)
+    batched.update(spectra)
+    for spectrum in spectra:
+        single.update(spectrum)
+    assert np.isfinite(batched.histogram).all() and np.isfinite(batched.weight)
+    for q in (10, 50, 90):
+        np.testing.assert_array_equal(batched.percentile(q), single.percentile(q))
+    # The newest frames still outweigh everything before them
+    batched.update(np.full((100, 32), -20.0, dtype=np.float32))
+    np.testing.assert_array_equal(batched.percentile(5), np.full(32, -19.5, dtype=np.float32))
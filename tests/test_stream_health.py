@@ -0,0 +1,61 @@
+# test_stream_health.py
+import time
+from types import SimpleNamespace
+
+from core.sample_formats import allocate, recv_view
+from core.simulated_usrp import SimulatedMultiUSRP
+from core.stream_health import LoadShedder, RetunePoint, StreamHealth
+
+
+def test_gap_measured_from_timestamps_after_overflow():
+    health = StreamHealth(0, sample_rate=1e6)
+    assert health.update('none', False, 0, 1000) == 0
+    assert health.update('none', False, 1000, 1000) == 0
+    assert health.update('overflow', False, None, 0) == 0
+    assert health.update('none', False, 2500, 1000) == 500
+    assert health.overflows == 1
+    assert health.gap_events == 1
+    assert health.gap_samples == 500
+
+
+def test_ticks_are_sample_accurate():
+    health = StreamHealth(0, sample_rate=56e6)
+    assert health.to_ticks(12, 0.5) == 12 * 56_000_000 + 28_000_000
+
+
+def test_retune_point_holds_across_a_rate_change():
+    # A 5 -> 1 MS/s retune: the point is taken before the receive loop knows the new rate
+    device = SimulatedMultiUSRP('sim0')
+    device.set_rx_rate(5e6)
+    streamer = device.get_rx_stream(SimpleNamespace(channels=[0], cpu_format='fc32'))
+    buffer = allocate(2000, 'fc32')
+    metadata = SimpleNamespace(has_time_spec=False, time_spec=None)
+    streamer.recv(recv_view(buffer), metadata)
+
+    device.set_rx_rate(1e6)
+    point = RetunePoint.after(device.get_time_now(), 0.05, time.perf_counter())
+    started = time.perf_counter()
+    settled_packets = 0
+    while time.perf_counter() - started < 1.0:
+        streamer.recv(recv_view(buffer), metadata)
+        if not point.settling(metadata.time_spec, time.perf_counter()):
+            settled_packets += 1
+            break
+    # Settles after the 50 ms of device time, not after 5x that at the new rate
+    assert settled_packets == 1
+    assert time.perf_counter() - started < 0.2
+
+
+def test_retune_point_falls_back_to_the_host_clock():
+    point = RetunePoint.after(None, 0.1, 100.0)
+    assert point.settling(None, 100.05)
+    assert not point.settling(None, 100.1)
+
+
+def test_load_shedder_degrades_and_recovers():
+    shedder = LoadShedder(max_level=2, degrade_after=2, recover_after=3)
+    assert shedder.update(5) is None
+    assert shedder.update(1) == 1
+    assert [shedder.update(0) for _ in range(3)] == [None, None, 0]
+    assert LoadShedder.degraded_settings(2, 4096, 30) == (1024, 7)
+    assert LoadShedder.degraded_settings(3, 512, 30) == (256, 3)
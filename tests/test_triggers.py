@@ -0,0 +1,117 @@
+# test_triggers.py
+import json
+import time
+
+import numpy as np
+
+from core.frame_processor import SpectrumSettings
+from core.iq_history import IQHistory
+from core.recorder import read_sidecar
+from core.triggers import (BandPowerTrigger, BurstWriter, CfarTrigger, MaskTrigger, TriggerEngine, TriggerEvent,
+                           TriggerWorker, bin_frequencies)
+
+CENTER, RATE, SIZE = 100e6, 1.024e6, 1024
+
+
+def noise_block(frames=4, level_db=-80.0):
+    rng = np.random.default_rng(3)
+    return (level_db + rng.normal(0, 1, (frames, SIZE))).astype(np.float32)
+
+
+def compiled(condition):
+    condition.compile(bin_frequencies(CENTER, RATE, SIZE))
+    return condition
+
+
+def test_conditions_fire_on_the_frame_with_the_signal():
+    block = noise_block()
+    assert compiled(BandPowerTrigger(100.1e6, 100.2e6, -40.0)).evaluate(block) is None
+    assert compiled(CfarTrigger(15.0)).evaluate(block) is None
+    mask = compiled(MaskTrigger([(99.8e6, -60.0), (100.2e6, -60.0)]))
+    assert mask.evaluate(block) is None
+
+    signal_bin = SIZE // 2 + 150  # 150 kHz above the center
+    block[2, signal_bin] = -20.0
+    frame, power = compiled(BandPowerTrigger(100.1e6, 100.2e6, -40.0)).evaluate(block)
+    assert frame == 2 and abs(power - -20.0) < 0.5
+    frame, excess = compiled(CfarTrigger(15.0)).evaluate(block)
+    assert frame == 2 and 55 < excess < 65
+    frame, excess = mask.evaluate(block)
+    assert frame == 2 and abs(excess - 40.0) < 1e-3
+    # Outside the mask's span nothing is checked
+    assert compiled(MaskTrigger([(99.8e6, -60.0), (100.0e6, -60.0)])).evaluate(block) is None
+
+
+def test_engine_places_the_firing_frame_by_sample_and_holds_off():
+    block = noise_block()
+    block[1, SIZE // 2] = -10.0
+    engine = TriggerEngine(CfarTrigger(15.0), pre_seconds=0.01, post_seconds=0.02, holdoff=0.5)
+    engine.compile(CENTER, RATE, SIZE)
+    event = engine.evaluate(block, 50000, RATE)
+    assert event.kind == 'cfar' and event.trigger_sequence == 50000 + SIZE
+    assert event.start_sequence == 51024 - 10240 and event.end_sequence == 51024 + 20480
+    assert engine.evaluate(block, 50000 + int(0.4 * RATE), RATE) is None and engine.held_off == 1
+    assert engine.evaluate(block, 50000 + int(0.6 * RATE), RATE) is not None and engine.fired == 2
+
+
+def test_writer_saves_the_window_with_metadata_and_respects_the_budget(tmp_path):
+    history = IQHistory(capacity=10000, sample_rate=1e3, cpu_format='sc16')
+    history.write(np.arange(16000, dtype=np.int16).reshape(8000, 2), 100.0)
+    event = TriggerEvent('band_power', -20.0, 3000, 1e3, pre_seconds=0.5, post_seconds=1.0,
+                         details={'threshold_db': -40})
+
+    # Bursts larger than a second's budget are still written, overdrawing it
+    writer = BurstWriter(str(tmp_path), max_bytes_per_second=4000)
+    path = writer.write(event, history, 2.4e9, 0, 'rx1')
+    samples = np.fromfile(path, dtype=np.int16).reshape(-1, 2)
+    assert len(samples) == 1500 and samples[0, 0] == 2 * 2500
+    metadata = read_sidecar(path)
+    assert metadata['format'] == 'sc16' and metadata['center_freq'] == 2.4e9 and metadata['start_time'] == 102.5
+    assert metadata['trigger']['time'] == 103.0 and metadata['trigger']['offset_samples'] == 500
+    assert metadata['trigger']['kind'] == 'band_power' and metadata['trigger']['settings'] == {'threshold_db': -40}
+    json.dumps(metadata)
+
+    # The 6000 bytes left a 2000 byte debt; a second burst right away is dropped
+    assert writer.write(event, history, 2.4e9, 0, 'rx1') is None and writer.rate_limited == 1
+    assert writer.bursts_written == 1
+    # Once half a second has repaid the debt the next burst goes through
+    writer.budget_time -= 0.5
+    assert writer.write(event, history, 2.4e9, 0, 'rx1') is not None and writer.bursts_written == 2
+
+
+def test_burst_between_display_frames_fires_on_the_raw_stream(tmp_path):
+    # 50 us burst at 1.024 MS/s, away from every frame a 30 frames/s display would process
+    history = IQHistory(capacity=1 << 20, sample_rate=RATE)
+    rng = np.random.default_rng(5)
+    stream = ((rng.standard_normal(1 << 19) + 1j * rng.standard_normal(1 << 19)) * 1e-4).astype(np.complex64)
+    burst_start, burst_length = 300000, 51
+    stream[burst_start:burst_start + burst_length] += np.complex64(0.1)
+    display_step = int(RATE / 30)
+    assert all(not start <= burst_start < start + SIZE for start in range(0, len(stream), display_step))
+
+    events = []
+    engine = TriggerEngine(BandPowerTrigger(CENTER - 5e3, CENTER + 5e3, -40.0), pre_seconds=0.01, post_seconds=0.01)
+    worker = TriggerWorker(history, engine, lambda: (CENTER, SIZE, SpectrumSettings()),
+                           lambda event, center_freq: events.append(event), max_latency=1.0)
+    worker.start()
+    try:
+        deadline = time.time() + 1.0
+        while worker.engine.key is None and time.time() < deadline:
+            time.sleep(0.005)
+        for start in range(0, len(stream), 8192):
+            history.write(stream[start:start + 8192], 100.0 + start / RATE)
+        while not events and time.time() < deadline + 2.0:
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+
+    assert len(events) == 1 and worker.skipped_samples == 0
+    event = events[0]
+    assert event.trigger_sequence <= burst_start < event.trigger_sequence + SIZE
+    path = BurstWriter(str(tmp_path)).write(event, history, CENTER, 0, 'rx1')
+    samples = np.fromfile(path, dtype=np.complex64)
+    offset = read_sidecar(path)['trigger']['offset_samples']
+    assert len(samples) == event.end_sequence - event.start_sequence
+    # The burst is in the saved clip, where the trigger frame says it is
+    loud = np.flatnonzero(np.abs(samples) > 0.05)
+    assert loud[0] == burst_start - event.start_sequence and offset <= loud[0] < offset + SIZE